@@ -0,0 +1,80 @@
+"""baseline schema
+
+Ausgangsschema der Metadaten-DB (Transaktionen, Processing Logs), wie es bisher per create_all angelegt wurde.
+Für bestehende Datenbanken: `alembic stamp 3f1a6c2d9b01`, danach `alembic upgrade head` für alle späteren Änderungen.
+
+Revision ID: 3f1a6c2d9b01
+Revises: 
+Create Date: 2026-10-18 21:23:12.105990
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mssql
+
+# revision identifiers, used by Alembic.
+revision = '3f1a6c2d9b01'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('invoice_transactions',
+    sa.Column('id', mssql.UNIQUEIDENTIFIER(), nullable=False),
+    sa.Column('status', sa.Enum('RECEIVED', 'PROCESSING', 'VALID', 'INVALID', 'MANUAL_REVIEW', 'ERROR', name='transactionstatus'), nullable=False),
+    sa.Column('format_detected', sa.Enum('XRECHNUNG_UBL', 'XRECHNUNG_CII', 'ZUGFERD_CII', 'FACTURX_CII', 'OTHER_PDF', 'PLAIN_XML', 'UNKNOWN', name='invoiceformat'), nullable=True),
+    sa.Column('original_filename', sa.String(length=255), nullable=True),
+    sa.Column('file_size_bytes', sa.Integer(), nullable=True),
+    sa.Column('content_type', sa.String(length=100), nullable=True),
+    sa.Column('storage_uri_raw', sa.String(length=1024), nullable=True),
+    sa.Column('storage_uri_xml', sa.String(length=1024), nullable=True),
+    sa.Column('validation_report', sa.JSON(), nullable=True),
+    sa.Column('validation_level_reached', sa.Enum('STRUCTURE', 'SEMANTIC', 'CALCULATION', 'BUSINESS', 'COMPLIANCE', name='validationlevel'), nullable=True),
+    sa.Column('invoice_number', sa.String(length=100), nullable=True),
+    sa.Column('issue_date', sa.DateTime(), nullable=True),
+    sa.Column('total_amount', sa.Numeric(precision=18, scale=2), nullable=True),
+    sa.Column('currency_code', sa.String(length=3), nullable=True),
+    sa.Column('seller_name', sa.String(length=255), nullable=True),
+    sa.Column('seller_vat_id', sa.String(length=50), nullable=True),
+    sa.Column('buyer_name', sa.String(length=255), nullable=True),
+    sa.Column('buyer_vat_id', sa.String(length=50), nullable=True),
+    sa.Column('erp_vendor_id', sa.String(length=50), nullable=True),
+    sa.Column('purchase_order_id', sa.String(length=100), nullable=True),
+    sa.Column('is_duplicate', sa.Boolean(), nullable=True),
+    sa.Column('error_message', sa.Text(), nullable=True),
+    sa.Column('error_details', sa.JSON(), nullable=True),
+    sa.Column('retry_count', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.Column('processed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('processing_time_seconds', sa.Numeric(precision=8, scale=3), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_invoice_transactions_created_at'), 'invoice_transactions', ['created_at'], unique=False)
+    op.create_index(op.f('ix_invoice_transactions_invoice_number'), 'invoice_transactions', ['invoice_number'], unique=False)
+    op.create_index(op.f('ix_invoice_transactions_seller_vat_id'), 'invoice_transactions', ['seller_vat_id'], unique=False)
+    op.create_index(op.f('ix_invoice_transactions_status'), 'invoice_transactions', ['status'], unique=False)
+    op.create_table('processing_logs',
+    sa.Column('id', mssql.UNIQUEIDENTIFIER(), nullable=False),
+    sa.Column('transaction_id', mssql.UNIQUEIDENTIFIER(), nullable=False),
+    sa.Column('step_name', sa.String(length=100), nullable=False),
+    sa.Column('step_status', sa.String(length=20), nullable=False),
+    sa.Column('message', sa.Text(), nullable=True),
+    sa.Column('details', sa.JSON(), nullable=True),
+    sa.Column('duration_seconds', sa.Numeric(precision=8, scale=3), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.ForeignKeyConstraint(['transaction_id'], ['invoice_transactions.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_processing_logs_transaction_id'), 'processing_logs', ['transaction_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_processing_logs_transaction_id'), table_name='processing_logs')
+    op.drop_table('processing_logs')
+    op.drop_index(op.f('ix_invoice_transactions_status'), table_name='invoice_transactions')
+    op.drop_index(op.f('ix_invoice_transactions_seller_vat_id'), table_name='invoice_transactions')
+    op.drop_index(op.f('ix_invoice_transactions_invoice_number'), table_name='invoice_transactions')
+    op.drop_index(op.f('ix_invoice_transactions_created_at'), table_name='invoice_transactions')
+    op.drop_table('invoice_transactions')
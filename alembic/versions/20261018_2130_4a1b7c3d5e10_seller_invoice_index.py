@@ -0,0 +1,24 @@
+"""seller invoice index
+
+Composite Index (seller_vat_id, invoice_number) für die interne Dublettenprüfung.
+
+Revision ID: 4a1b7c3d5e10
+Revises: 3f1a6c2d9b01
+Create Date: 2026-10-18 21:30:27.402118
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '4a1b7c3d5e10'
+down_revision = '3f1a6c2d9b01'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_invoice_transactions_seller_invoice', 'invoice_transactions', ['seller_vat_id', 'invoice_number'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_invoice_transactions_seller_invoice', table_name='invoice_transactions')
@@ -0,0 +1,44 @@
+"""awaiting erp status
+
+Neuer TransactionStatus AWAITING_ERP (geparkte Business Validierung).
+Auf MSSQL/SQLite ist der Enum ein VARCHAR ohne CHECK-Constraint; die Spaltenlänge ändert sich nicht
+(MANUAL_REVIEW bleibt der längste Wert). Nur PostgreSQL benötigt eine Erweiterung des nativen Typs.
+
+Revision ID: 5b2c8d4e6f21
+Revises: 4a1b7c3d5e10
+Create Date: 2026-10-18 21:35:09.617254
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '5b2c8d4e6f21'
+down_revision = '4a1b7c3d5e10'
+branch_labels = None
+depends_on = None
+
+OLD_STATUS = sa.Enum('RECEIVED', 'PROCESSING', 'VALID', 'INVALID', 'MANUAL_REVIEW', 'ERROR', name='transactionstatus')
+NEW_STATUS = sa.Enum('RECEIVED', 'PROCESSING', 'AWAITING_ERP', 'VALID', 'INVALID', 'MANUAL_REVIEW', 'ERROR', name='transactionstatus')
+
+
+def upgrade() -> None:
+    if op.get_context().dialect.name == 'postgresql':
+        op.execute("ALTER TYPE transactionstatus ADD VALUE IF NOT EXISTS 'AWAITING_ERP'")
+        return
+    with op.batch_alter_table('invoice_transactions') as batch_op:
+        batch_op.alter_column('status', existing_type=OLD_STATUS, type_=NEW_STATUS, existing_nullable=False)
+
+
+def downgrade() -> None:
+    # Geparkte Transaktionen können ohne den Status nicht fortgesetzt werden
+    op.execute(
+        "UPDATE invoice_transactions SET status = 'ERROR', "
+        "error_message = 'Geparkte Business Validierung durch Downgrade abgebrochen.' "
+        "WHERE status = 'AWAITING_ERP'"
+    )
+    if op.get_context().dialect.name == 'postgresql':
+        # Werte eines nativen Enums lassen sich nicht entfernen; der Typ behält AWAITING_ERP
+        return
+    with op.batch_alter_table('invoice_transactions') as batch_op:
+        batch_op.alter_column('status', existing_type=NEW_STATUS, type_=OLD_STATUS, existing_nullable=False)
@@ -0,0 +1,32 @@
+"""transaction claims
+
+Claim durch einen Worker (claimed_by, claimed_at) und Lease (lease_expires_at) für das Aufräumen
+hängender Verarbeitungen, dazu der Index für die Suche nach abgelaufenen Leases.
+
+Revision ID: 6c3d9e5f7a32
+Revises: 5b2c8d4e6f21
+Create Date: 2026-10-18 21:40:44.183590
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '6c3d9e5f7a32'
+down_revision = '5b2c8d4e6f21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('invoice_transactions', sa.Column('claimed_by', sa.String(length=255), nullable=True))
+    op.add_column('invoice_transactions', sa.Column('claimed_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('invoice_transactions', sa.Column('lease_expires_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index('ix_invoice_transactions_status_lease', 'invoice_transactions', ['status', 'lease_expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_invoice_transactions_status_lease', table_name='invoice_transactions')
+    op.drop_column('invoice_transactions', 'lease_expires_at')
+    op.drop_column('invoice_transactions', 'claimed_at')
+    op.drop_column('invoice_transactions', 'claimed_by')
@@ -0,0 +1,34 @@
+"""transaction stats hourly
+
+Stündliche Rollups für /statistics (refresh_transaction_stats_task).
+
+Revision ID: 7d4eaf6a8b43
+Revises: 6c3d9e5f7a32
+Create Date: 2026-10-18 21:45:18.930467
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '7d4eaf6a8b43'
+down_revision = '6c3d9e5f7a32'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('transaction_stats_hourly',
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('status', sa.Enum('RECEIVED', 'PROCESSING', 'AWAITING_ERP', 'VALID', 'INVALID', 'MANUAL_REVIEW', 'ERROR', name='transactionstatus'), nullable=False),
+    sa.Column('format_detected', sa.String(length=20), nullable=False),
+    sa.Column('latency_bucket', sa.Integer(), nullable=False),
+    sa.Column('transaction_count', sa.Integer(), nullable=False),
+    sa.Column('processing_time_sum', sa.Numeric(precision=18, scale=3), nullable=False),
+    sa.Column('refreshed_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.PrimaryKeyConstraint('bucket_start', 'status', 'format_detected', 'latency_bucket')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('transaction_stats_hourly')
@@ -0,0 +1,24 @@
+"""created id index
+
+Composite Index (created_at, id) für die Keyset-Paginierung der Transaktionsliste.
+
+Revision ID: 8e5fb07b9c54
+Revises: 7d4eaf6a8b43
+Create Date: 2026-10-18 21:50:36.275981
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '8e5fb07b9c54'
+down_revision = '7d4eaf6a8b43'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_invoice_transactions_created_id', 'invoice_transactions', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_invoice_transactions_created_id', table_name='invoice_transactions')
@@ -0,0 +1,43 @@
+"""validation findings
+
+Schmale Tabelle der Validierungsfehler/-warnungen für Auswertungen nach Regel-Code und Lieferant.
+
+Revision ID: 9f6a0c8dad65
+Revises: 8e5fb07b9c54
+Create Date: 2026-10-18 21:55:02.749316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mssql
+
+# revision identifiers, used by Alembic.
+revision = '9f6a0c8dad65'
+down_revision = '8e5fb07b9c54'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('validation_findings',
+    sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), autoincrement=True, nullable=False),
+    sa.Column('transaction_id', mssql.UNIQUEIDENTIFIER(), nullable=False),
+    sa.Column('code', sa.String(length=100), nullable=True),
+    sa.Column('category', sa.String(length=20), nullable=False),
+    sa.Column('severity', sa.String(length=10), nullable=False),
+    sa.Column('step_name', sa.String(length=100), nullable=False),
+    sa.Column('seller_vat_id', sa.String(length=50), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.ForeignKeyConstraint(['transaction_id'], ['invoice_transactions.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_validation_findings_code_created', 'validation_findings', ['code', 'created_at'], unique=False)
+    op.create_index('ix_validation_findings_seller_created', 'validation_findings', ['seller_vat_id', 'created_at'], unique=False)
+    op.create_index('ix_validation_findings_transaction', 'validation_findings', ['transaction_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_validation_findings_transaction', table_name='validation_findings')
+    op.drop_index('ix_validation_findings_seller_created', table_name='validation_findings')
+    op.drop_index('ix_validation_findings_code_created', table_name='validation_findings')
+    op.drop_table('validation_findings')
@@ -0,0 +1,122 @@
+"""archive tables
+
+Archivtabellen für cleanup_old_results_task (invoice_transactions_archive, processing_logs_archive).
+Auf MSSQL monatlich nach created_at partitioniert (Partitionsfunktion RANGE RIGHT, Clustered Index auf dem
+Partitionsschema); ältere Monate lassen sich so per SWITCH/TRUNCATE PARTITION ohne Zeilen-DELETE entfernen.
+Neue Monatsgrenzen legt ensure_archive_partitions() im Cleanup-Task an.
+
+Revision ID: 7b2e4d1a5c02
+Revises: 9f6a0c8dad65
+Create Date: 2026-10-18 22:00:41.518203
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mssql
+
+# revision identifiers, used by Alembic.
+revision = '7b2e4d1a5c02'
+down_revision = '9f6a0c8dad65'
+branch_labels = None
+depends_on = None
+
+PARTITION_FUNCTION = 'pf_iiev_archive_monthly'
+PARTITION_SCHEME = 'ps_iiev_archive_monthly'
+MONTHS_BACK = 24
+MONTHS_AHEAD = 12
+
+
+def _monthly_boundaries():
+    now = datetime.now()
+    index = now.year * 12 + now.month - 1
+    for offset in range(-MONTHS_BACK, MONTHS_AHEAD + 1):
+        year, month = divmod(index + offset, 12)
+        yield f"'{year:04d}-{month + 1:02d}-01T00:00:00+00:00'"
+
+
+def _transaction_archive_columns():
+    return [
+        sa.Column('id', mssql.UNIQUEIDENTIFIER(), nullable=False),
+        sa.Column('status', sa.Enum('RECEIVED', 'PROCESSING', 'AWAITING_ERP', 'VALID', 'INVALID', 'MANUAL_REVIEW', 'ERROR', name='transactionstatus', create_type=False), nullable=False),
+        sa.Column('format_detected', sa.Enum('XRECHNUNG_UBL', 'XRECHNUNG_CII', 'ZUGFERD_CII', 'FACTURX_CII', 'OTHER_PDF', 'PLAIN_XML', 'UNKNOWN', name='invoiceformat', create_type=False), nullable=True),
+        sa.Column('original_filename', sa.String(length=255), nullable=True),
+        sa.Column('file_size_bytes', sa.Integer(), nullable=True),
+        sa.Column('content_type', sa.String(length=100), nullable=True),
+        sa.Column('storage_uri_raw', sa.String(length=1024), nullable=True),
+        sa.Column('storage_uri_xml', sa.String(length=1024), nullable=True),
+        sa.Column('validation_report', sa.JSON(), nullable=True),
+        sa.Column('validation_level_reached', sa.Enum('STRUCTURE', 'SEMANTIC', 'CALCULATION', 'BUSINESS', 'COMPLIANCE', name='validationlevel', create_type=False), nullable=True),
+        sa.Column('invoice_number', sa.String(length=100), nullable=True),
+        sa.Column('issue_date', sa.DateTime(), nullable=True),
+        sa.Column('total_amount', sa.Numeric(precision=18, scale=2), nullable=True),
+        sa.Column('currency_code', sa.String(length=3), nullable=True),
+        sa.Column('seller_name', sa.String(length=255), nullable=True),
+        sa.Column('seller_vat_id', sa.String(length=50), nullable=True),
+        sa.Column('buyer_name', sa.String(length=255), nullable=True),
+        sa.Column('buyer_vat_id', sa.String(length=50), nullable=True),
+        sa.Column('erp_vendor_id', sa.String(length=50), nullable=True),
+        sa.Column('purchase_order_id', sa.String(length=100), nullable=True),
+        sa.Column('is_duplicate', sa.Boolean(), nullable=True),
+        sa.Column('error_message', sa.Text(), nullable=True),
+        sa.Column('error_details', sa.JSON(), nullable=True),
+        sa.Column('retry_count', sa.Integer(), nullable=True),
+        sa.Column('claimed_by', sa.String(length=255), nullable=True),
+        sa.Column('claimed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('lease_expires_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('processed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('processing_time_seconds', sa.Numeric(precision=8, scale=3), nullable=True),
+        sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    ]
+
+
+def _log_archive_columns():
+    return [
+        sa.Column('id', mssql.UNIQUEIDENTIFIER(), nullable=False),
+        sa.Column('transaction_id', mssql.UNIQUEIDENTIFIER(), nullable=False),
+        sa.Column('step_name', sa.String(length=100), nullable=False),
+        sa.Column('step_status', sa.String(length=20), nullable=False),
+        sa.Column('message', sa.Text(), nullable=True),
+        sa.Column('details', sa.JSON(), nullable=True),
+        sa.Column('duration_seconds', sa.Numeric(precision=8, scale=3), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    ]
+
+
+def upgrade() -> None:
+    is_mssql = op.get_bind().dialect.name == 'mssql'
+
+    if is_mssql:
+        op.execute(
+            f"CREATE PARTITION FUNCTION {PARTITION_FUNCTION} (datetimeoffset) "
+            f"AS RANGE RIGHT FOR VALUES ({', '.join(_monthly_boundaries())})"
+        )
+        op.execute(f"CREATE PARTITION SCHEME {PARTITION_SCHEME} AS PARTITION {PARTITION_FUNCTION} ALL TO ([PRIMARY])")
+
+    op.create_table('invoice_transactions_archive', *_transaction_archive_columns())
+    op.create_table('processing_logs_archive', *_log_archive_columns())
+
+    for table in ('invoice_transactions_archive', 'processing_logs_archive'):
+        if is_mssql:
+            # Clustered Index auf dem Partitionsschema verschiebt den Heap in die Monatspartitionen
+            op.execute(
+                f"CREATE CLUSTERED INDEX ix_{table}_created_id ON {table} (created_at, id) "
+                f"ON {PARTITION_SCHEME}(created_at)"
+            )
+        else:
+            op.create_index(f'ix_{table}_created_id', table, ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_processing_logs_archive_created_id', table_name='processing_logs_archive')
+    op.drop_table('processing_logs_archive')
+    op.drop_index('ix_invoice_transactions_archive_created_id', table_name='invoice_transactions_archive')
+    op.drop_table('invoice_transactions_archive')
+
+    if op.get_bind().dialect.name == 'mssql':
+        op.execute(f"DROP PARTITION SCHEME {PARTITION_SCHEME}")
+        op.execute(f"DROP PARTITION FUNCTION {PARTITION_FUNCTION}")
@@ -0,0 +1,29 @@
+"""raw content hash
+
+SHA-256 der Rohdatei an der Transaktion (Referenz auf den geteilten Blob im CAS-Layout sha256/<hash>).
+
+Revision ID: 9c4f7e2b1d03
+Revises: 7b2e4d1a5c02
+Create Date: 2026-10-18 23:00:12.731406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '9c4f7e2b1d03'
+down_revision = '7b2e4d1a5c02'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('invoice_transactions', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_invoice_transactions_content_hash'), 'invoice_transactions', ['content_hash'], unique=False)
+    op.add_column('invoice_transactions_archive', sa.Column('content_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('invoice_transactions_archive', 'content_hash')
+    op.drop_index(op.f('ix_invoice_transactions_content_hash'), table_name='invoice_transactions')
+    op.drop_column('invoice_transactions', 'content_hash')
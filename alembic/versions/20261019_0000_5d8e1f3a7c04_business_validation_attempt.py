@@ -0,0 +1,27 @@
+"""business validation attempt
+
+Persistierter Versuch der eingeplanten Business Validierung (AWAITING_ERP), damit der Reaper damit fortsetzt.
+
+Revision ID: 5d8e1f3a7c04
+Revises: 9c4f7e2b1d03
+Create Date: 2026-10-19 00:00:08.214937
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '5d8e1f3a7c04'
+down_revision = '9c4f7e2b1d03'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('invoice_transactions', sa.Column('business_validation_attempt', sa.Integer(), nullable=True))
+    op.add_column('invoice_transactions_archive', sa.Column('business_validation_attempt', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('invoice_transactions_archive', 'business_validation_attempt')
+    op.drop_column('invoice_transactions', 'business_validation_attempt')
@@ -0,0 +1,24 @@
+"""updated_at index
+
+Index auf invoice_transactions.updated_at für den Statistik-Refresh (seit dem letzten Lauf geänderte Transaktionen).
+
+Revision ID: 8a3c5e7f9b15
+Revises: 5d8e1f3a7c04
+Create Date: 2026-10-19 01:00:03.551870
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '8a3c5e7f9b15'
+down_revision = '5d8e1f3a7c04'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_invoice_transactions_updated_at'), 'invoice_transactions', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_invoice_transactions_updated_at'), table_name='invoice_transactions')
@@ -0,0 +1,119 @@
+# scripts/benchmark_blob_downloads.py
+"""
+Misst die Download-Latenz von SyncStorageService.download_blob_by_uri bei parallelen Workern (Threads)
+gegen Azurite bzw. einen echten Storage Account:
+- "per_call": ein neuer BlobClient aus dem Connection String pro Download (bisheriges Verhalten)
+- "pooled":  Blob Clients vom gemeinsamen BlobServiceClient mit Verbindungspool (aktuelles Verhalten)
+
+Voraussetzung: laufendes Azurite (docker compose up azurite) oder AZURE_STORAGE_CONNECTION_STRING.
+
+Beispiel:
+    python scripts/benchmark_blob_downloads.py --workers 32 --downloads 2000 --size-kb 64
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+AZURITE_CONNECTION_STRING = (
+    "DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;"
+    "AccountKey=Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw==;"
+    "BlobEndpoint=http://127.0.0.1:10000/devstoreaccount1;"
+)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark der Blob Downloads im SyncStorageService")
+    parser.add_argument("--workers", type=int, default=32, help="Parallele Threads")
+    parser.add_argument("--downloads", type=int, default=2000, help="Downloads pro Variante")
+    parser.add_argument("--blobs", type=int, default=200, help="Anzahl unterschiedlicher Test-Blobs")
+    parser.add_argument("--size-kb", type=int, default=64, help="Größe eines Test-Blobs in KB")
+    return parser.parse_args()
+
+
+def configure_environment(workers: int) -> None:
+    """Setzt die Settings vor dem ersten Import von src (Settings werden beim Import validiert)."""
+    os.environ.setdefault("AZURE_STORAGE_CONNECTION_STRING", AZURITE_CONNECTION_STRING)
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    os.environ.setdefault("ERP_DATABASE_URL", "sqlite://")
+    os.environ.setdefault("CELERY_BROKER_URL", "memory://")
+    os.environ.setdefault("CELERY_RESULT_BACKEND", "cache+memory://")
+    os.environ.setdefault("AZURE_STORAGE_POOL_MAXSIZE", str(max(workers, 64)))
+    os.environ["DEBUG"] = "false"
+
+
+def upload_fixtures(service, count: int, size_kb: int) -> list:
+    container = service._get_container_client(service.raw_container_name)
+    try:
+        container.create_container()
+    except Exception:
+        pass  # existiert bereits
+    prefix = f"benchmark-{uuid.uuid4()}"
+    payload = os.urandom(size_kb * 1024)
+    uris = []
+    for index in range(count):
+        blob_client = container.get_blob_client(f"{prefix}/{index}.pdf")
+        blob_client.upload_blob(payload, overwrite=True)
+        uris.append(blob_client.url)
+    return uris
+
+
+def per_call_download(uri: str, account_name: str) -> bytes:
+    """Bisheriges Verhalten: Client (inkl. HTTP Session) pro Download."""
+    from azure.storage.blob import BlobClient
+    from src.core.config import settings
+    from src.services.storage_service_sync import parse_blob_uri
+
+    container_name, blob_name = parse_blob_uri(uri, account_name)
+    client = BlobClient.from_connection_string(
+        conn_str=settings.azure_storage_connection_string, container_name=container_name, blob_name=blob_name
+    )
+    return client.download_blob().readall()
+
+
+def run(name: str, download, uris: list, downloads: int, workers: int) -> None:
+    def timed(index: int) -> float:
+        start = time.perf_counter()
+        download(uris[index % len(uris)])
+        return time.perf_counter() - start
+
+    # Aufwärmen (Verbindungsaufbau, DNS)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(timed, range(workers)))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        latencies = sorted(executor.map(timed, range(downloads)))
+    elapsed = time.perf_counter() - start
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(
+        f"{name:>9}: {downloads / elapsed:8.1f} Downloads/s | "
+        f"p50 {quantiles[49] * 1000:7.1f} ms | p95 {quantiles[94] * 1000:7.1f} ms | p99 {quantiles[98] * 1000:7.1f} ms"
+    )
+
+
+def main() -> None:
+    args = parse_args()
+    configure_environment(args.workers)
+
+    from src.services.storage_service_sync import SyncStorageService
+
+    service = SyncStorageService()
+    uris = upload_fixtures(service, args.blobs, args.size_kb)
+    print(f"{args.blobs} Blobs à {args.size_kb} KB, {args.workers} Worker, {args.downloads} Downloads pro Variante")
+
+    account_name = service.blob_service_client.account_name
+    run("per_call", lambda uri: per_call_download(uri, account_name), uris, args.downloads, args.workers)
+    run("pooled", service.download_blob_by_uri, uris, args.downloads, args.workers)
+
+
+if __name__ == "__main__":
+    main()
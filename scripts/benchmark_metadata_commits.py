@@ -0,0 +1,154 @@
+# scripts/benchmark_metadata_commits.py
+"""
+Misst den Durchsatz von process_invoice_task gegen die Metadaten-DB (Transaktionen/s und Commits pro
+Transaktion), einmal nur mit Claim- und Abschluss-Commit und einmal mit Checkpoint-Commits.
+
+Validierung, Mapping und Storage werden durch schnelle Platzhalter ersetzt, damit nur der DB-Anteil
+gemessen wird. Ohne --database-url wird eine SQLite Datei verwendet.
+
+Beispiel:
+    python scripts/benchmark_metadata_commits.py --transactions 500
+    python scripts/benchmark_metadata_commits.py --database-url "mssql+pyodbc://..." --transactions 2000
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+from unittest.mock import MagicMock
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+MINIMAL_UBL_XML = b"""<?xml version="1.0" encoding="UTF-8"?>
+<Invoice xmlns="urn:oasis:names:specification:ubl:schema:xsd:Invoice-2"
+         xmlns:cbc="urn:oasis:names:specification:ubl:schema:xsd:CommonBasicComponents-2">
+    <cbc:CustomizationID>urn:cen.eu:en16931:2017#compliant#urn:xeinkauf.de:kosit:xrechnung_3.0</cbc:CustomizationID>
+    <cbc:ID>BENCH-1</cbc:ID>
+</Invoice>"""
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark der Metadaten-Commits in process_invoice_task")
+    parser.add_argument("--database-url", default=None, help="Metadaten-DB (Standard: temporäre SQLite Datei)")
+    parser.add_argument("--transactions", type=int, default=300, help="Anzahl Transaktionen pro Durchlauf")
+    return parser.parse_args()
+
+
+def configure_environment(database_url: str) -> None:
+    """Setzt die Settings vor dem ersten Import von src (Settings werden beim Import validiert)."""
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("ERP_DATABASE_URL", "sqlite://")
+    os.environ.setdefault("AZURE_STORAGE_CONNECTION_STRING", "UseDevelopmentStorage=true")
+    os.environ.setdefault("CELERY_BROKER_URL", "memory://")
+    os.environ.setdefault("CELERY_RESULT_BACKEND", "cache+memory://")
+    os.environ["ERP_RESILIENCE_ENABLED"] = "false"
+    os.environ["DUPLICATE_FILTER_ENABLED"] = "false"
+    os.environ["DEBUG"] = "false"
+
+
+def build_canonical() -> MagicMock:
+    canonical = MagicMock()
+    canonical.invoice_number = "BENCH-1"
+    canonical.payable_amount = Decimal("119.00")
+    canonical.currency_code = MagicMock(value="EUR")
+    canonical.issue_date = date(2025, 9, 11)
+    canonical.seller = MagicMock(vat_id="DE123456789")
+    canonical.seller.name = "Benchmark Lieferant GmbH"
+    canonical.buyer = MagicMock(vat_id="DE987654321")
+    canonical.buyer.name = "Benchmark Käufer AG"
+    canonical.purchase_order_reference = None
+    return canonical
+
+
+def install_fast_stubs(processor) -> None:
+    """Ersetzt Validierung, Mapping und Storage im Processor-Modul durch schnelle Platzhalter."""
+    storage = MagicMock()
+    storage.download_blob_by_uri.return_value = MINIMAL_UBL_XML
+    processor.sync_storage_service = storage
+    processor.validate_xsd = lambda *args: []
+    processor.validate_kosit_schematron = lambda *args: []
+    processor.validate_calculations = lambda *args: []
+    processor.validate_business_rules = lambda *args: []
+    processor.validate_internal_duplicates = lambda *args: []
+    processor.map_xml_to_canonical = lambda *args: build_canonical()
+
+
+def run(processor, session_module, models, count: int, checkpoints: bool) -> dict:
+    processor.settings.processing_checkpoint_commits = checkpoints
+
+    ids = [uuid.uuid4() for _ in range(count)]
+    with session_module.get_metadata_session() as db:
+        db.add_all([
+            models.InvoiceTransaction(id=tid, status=models.TransactionStatus.RECEIVED, storage_uri_raw=f"azure://raw/{tid}.xml")
+            for tid in ids
+        ])
+
+    commits = 0
+
+    def _count_commit(conn):
+        nonlocal commits
+        commits += 1
+
+    from sqlalchemy import event
+    event.listen(session_module.metadata_engine, "commit", _count_commit)
+    try:
+        start = time.perf_counter()
+        for tid in ids:
+            result = processor.process_invoice_task(str(tid))
+            if result.get("status") != models.TransactionStatus.VALID.value:
+                raise RuntimeError(f"Unerwartetes Ergebnis für {tid}: {result}")
+        elapsed = time.perf_counter() - start
+    finally:
+        event.remove(session_module.metadata_engine, "commit", _count_commit)
+
+    return {
+        "mode": "checkpoints" if checkpoints else "unit_of_work",
+        "transactions": count,
+        "seconds": elapsed,
+        "tx_per_second": count / elapsed,
+        "commits_per_tx": commits / count,
+    }
+
+
+def main() -> None:
+    args = parse_args()
+    temp_dir = None
+    database_url = args.database_url
+    if database_url is None:
+        temp_dir = tempfile.TemporaryDirectory()
+        database_url = f"sqlite:///{Path(temp_dir.name) / 'metadata_bench.sqlite'}"
+    configure_environment(database_url)
+
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s: %(message)s')
+
+    from src.db import models, session as session_module
+    from src.tasks import processor
+
+    models.Base.metadata.create_all(session_module.metadata_engine)
+    install_fast_stubs(processor)
+    # Die Log-Ausgaben des Processors verfälschen die Messung
+    logging.getLogger("src").setLevel(logging.ERROR)
+
+    # Aufwärmen (Imports, Pool, Statement-Cache)
+    run(processor, session_module, models, min(20, args.transactions), checkpoints=False)
+
+    for checkpoints in (False, True):
+        stats = run(processor, session_module, models, args.transactions, checkpoints)
+        print(
+            f"{stats['mode']:<13} {stats['transactions']:>6} Tx  {stats['seconds']:7.2f}s  "
+            f"{stats['tx_per_second']:8.1f} Tx/s  {stats['commits_per_tx']:.1f} Commits/Tx"
+        )
+
+    session_module.metadata_engine.dispose()
+    if temp_dir is not None:
+        temp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+# scripts/seed_sqlite_erp.py
+"""
+Befüllt die SQLite ERP Stand-in Datenbank mit synthetischen Stammdaten und erzeugt
+einen dazu passenden Rechnungskorpus (JSON Lines mit CanonicalInvoice + erwartetem Szenario).
+
+Beispiel:
+    python scripts/seed_sqlite_erp.py --db erp_bench.sqlite --vendors 2000 \
+        --purchase-orders 20000 --journal-entries 200000 --invoices 5000 --corpus-out corpus.jsonl
+"""
+import argparse
+import json
+import logging
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from sqlalchemy import text
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.services.erp.sqlite_adapter import create_sqlite_erp_engine, create_erp_schema  # noqa: E402
+from src.schemas.canonical_model import (  # noqa: E402
+    CanonicalInvoice, Party, Address, CountryCode, CurrencyCode, InvoiceLine, TaxBreakdown,
+    TaxCategory, BankDetails, DocumentReference
+)
+
+# Konfiguriere Logging
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+# Reale BLZ, damit die IBANs die Prüfung im Canonical Model (schwifty) bestehen
+BANK_CODES = ["37040044", "10070000", "50010517", "20041111", "70020270"]
+
+JOURNAL_START = datetime(2025, 1, 1)
+INSERT_BATCH_SIZE = 5000
+TAX_RATE = Decimal("19.00")
+
+# Szenarien des Rechnungskorpus und ihre Gewichtung
+CORPUS_SCENARIOS = {
+    "valid": 70,
+    "duplicate": 10,
+    "unknown_vendor": 5,
+    "bank_mismatch": 5,
+    "quantity_exceeded": 5,
+    "without_po": 5,
+}
+
+
+@dataclass
+class SeededVendor:
+    vendor_id: str
+    vat_id: str
+    ibans: List[str]
+    is_active: bool
+
+
+@dataclass
+class SeededPurchaseOrder:
+    po_number: str
+    vendor_id: str
+    # (HAN, Menge, Einzelpreis)
+    lines: List[Tuple[str, Decimal, Decimal]] = field(default_factory=list)
+
+    @property
+    def total_net_amount(self) -> Decimal:
+        return sum((qty * price for _, qty, price in self.lines), Decimal("0.00"))
+
+
+@dataclass
+class SeedData:
+    vendors: List[SeededVendor]
+    purchase_orders: List[SeededPurchaseOrder]
+    journal: List[Tuple[str, str]]
+
+
+def make_german_iban(rng: random.Random) -> str:
+    bban = rng.choice(BANK_CODES) + f"{rng.randrange(10**10):010d}"
+    # ISO 13616: BBAN + Ländercode (D=13, E=14) + "00", Prüfziffer = 98 - (n mod 97)
+    check = 98 - int(bban + "131400") % 97
+    return f"DE{check:02d}{bban}"
+
+
+def make_gtin(rng: random.Random) -> str:
+    body = f"40{rng.randrange(10**10):010d}"
+    # EAN-13 Prüfziffer
+    total = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(body))
+    return body + str((10 - total % 10) % 10)
+
+
+def _insert_batched(conn, statement: str, rows: List[Dict]) -> None:
+    for i in range(0, len(rows), INSERT_BATCH_SIZE):
+        conn.execute(text(statement), rows[i:i + INSERT_BATCH_SIZE])
+
+
+def seed_erp(engine, vendors: int, purchase_orders: int, journal_entries: int, lines_per_po: int, rng: random.Random) -> SeedData:
+    """Schreibt Kreditoren, Bankverbindungen, Bestellungen und Journal-Einträge."""
+    seeded_vendors = [
+        SeededVendor(
+            vendor_id=f"K{i:06d}",
+            vat_id=f"DE{100000000 + i}",
+            ibans=[make_german_iban(rng) for _ in range(rng.randint(1, 2))],
+            is_active=rng.random() > 0.05,
+        )
+        for i in range(vendors)
+    ]
+
+    seeded_pos = []
+    for i in range(purchase_orders):
+        po = SeededPurchaseOrder(po_number=f"PO-{i:08d}", vendor_id=rng.choice(seeded_vendors).vendor_id)
+        for _ in range(rng.randint(1, lines_per_po)):
+            po.lines.append((make_gtin(rng), Decimal(rng.randint(1, 50)), Decimal(rng.randint(100, 50000)) / 100))
+        seeded_pos.append(po)
+
+    journal = []
+    for i in range(journal_entries):
+        journal.append((rng.choice(seeded_vendors).vendor_id, f"RE-{JOURNAL_START.year}-{i:08d}"))
+
+    with engine.begin() as conn:
+        _insert_batched(conn, "INSERT INTO dbo.KreditorenStamm (KreditorID, UStIdNr, Name, Status) VALUES (:id, :vat, :name, :status)", [
+            {"id": v.vendor_id, "vat": v.vat_id, "name": f"Lieferant {v.vendor_id}", "status": "Aktiv" if v.is_active else "Gesperrt"}
+            for v in seeded_vendors
+        ])
+        _insert_batched(conn, "INSERT INTO dbo.KreditorenBanken (KreditorID, IBAN) VALUES (:id, :iban)", [
+            {"id": v.vendor_id, "iban": iban} for v in seeded_vendors for iban in v.ibans
+        ])
+        _insert_batched(conn, "INSERT INTO dbo.Bestellungen (BestellNr, KreditorID, GesamtbetragNetto, Status) VALUES (:po, :id, :total, 'Offen')", [
+            {"po": po.po_number, "id": po.vendor_id, "total": str(po.total_net_amount)} for po in seeded_pos
+        ])
+        _insert_batched(conn, "INSERT INTO dbo.BestellPositionen (BestellNr, PositionNr, ArtikelHAN, MengeBestellt, MengeBerechnet) VALUES (:po, :pos, :han, :qty, 0)", [
+            {"po": po.po_number, "pos": pos, "han": han, "qty": int(qty)}
+            for po in seeded_pos for pos, (han, qty, _) in enumerate(po.lines, start=1)
+        ])
+        _insert_batched(conn, "INSERT INTO dbo.RechnungsJournal (KreditorID, ExterneRechnungsNr, ErfasstAm) VALUES (:id, :nr, :erfasst)", [
+            {"id": vendor_id, "nr": number, "erfasst": str(JOURNAL_START + timedelta(minutes=i))}
+            for i, (vendor_id, number) in enumerate(journal)
+        ])
+
+    return SeedData(vendors=seeded_vendors, purchase_orders=seeded_pos, journal=journal)
+
+
+def build_invoice(invoice_number: str, vat_id: str, po: SeededPurchaseOrder, iban: str, with_po: bool, quantity_factor: int = 1) -> CanonicalInvoice:
+    lines = [
+        InvoiceLine(
+            line_id=str(pos), item_name=f"Artikel {han}", item_identifier=han,
+            quantity=qty * quantity_factor, unit_price=price, line_net_amount=qty * quantity_factor * price,
+            tax_rate=TAX_RATE, tax_category=TaxCategory.STANDARD_RATE
+        )
+        for pos, (han, qty, price) in enumerate(po.lines, start=1)
+    ]
+    net = sum((line.line_net_amount for line in lines), Decimal("0.00"))
+    tax = (net * TAX_RATE / 100).quantize(Decimal("0.01"))
+
+    return CanonicalInvoice(
+        invoice_number=invoice_number,
+        issue_date=date(2025, 6, 1),
+        currency_code=CurrencyCode.EUR,
+        seller=Party(name="Lieferant", vat_id=vat_id, address=Address(city_name="Köln", postal_zone="50667", country_code=CountryCode.DE)),
+        buyer=Party(name="Käufer", address=Address(city_name="Berlin", postal_zone="10115", country_code=CountryCode.DE)),
+        lines=lines,
+        tax_breakdown=[TaxBreakdown(tax_category=TaxCategory.STANDARD_RATE, tax_rate=TAX_RATE, taxable_amount=net, tax_amount=tax)],
+        line_extension_amount=net,
+        allowance_total_amount=Decimal("0.00"),
+        charge_total_amount=Decimal("0.00"),
+        tax_exclusive_amount=net,
+        tax_inclusive_amount=net + tax,
+        payable_amount=net + tax,
+        payment_details=[BankDetails(iban=iban)],
+        purchase_order_reference=DocumentReference(document_id=po.po_number, document_type="ORDER") if with_po else None,
+    )
+
+
+def build_corpus(data: SeedData, invoices: int, rng: random.Random) -> List[Tuple[str, CanonicalInvoice]]:
+    """Erzeugt Rechnungen, die auf die geseedeten Stammdaten passen (inkl. gezielter Fehlerfälle)."""
+    vendors = {v.vendor_id: v for v in data.vendors}
+    active_pos = [po for po in data.purchase_orders if vendors[po.vendor_id].is_active]
+    scenarios = rng.choices(list(CORPUS_SCENARIOS), weights=list(CORPUS_SCENARIOS.values()), k=invoices)
+
+    corpus = []
+    for i, scenario in enumerate(scenarios):
+        po = rng.choice(active_pos)
+        vendor = vendors[po.vendor_id]
+        invoice_number = f"NEU-{i:08d}"
+        vat_id = vendor.vat_id
+        iban = rng.choice(vendor.ibans)
+        quantity_factor = 1
+
+        if scenario == "duplicate":
+            vendor_id, invoice_number = rng.choice(data.journal)
+            vat_id = vendors[vendor_id].vat_id
+        elif scenario == "unknown_vendor":
+            vat_id = f"DE{900000000 + i % 99999999}"
+        elif scenario == "bank_mismatch":
+            iban = make_german_iban(rng)
+        elif scenario == "quantity_exceeded":
+            quantity_factor = 2
+
+        invoice = build_invoice(invoice_number, vat_id, po, iban, with_po=scenario != "without_po", quantity_factor=quantity_factor)
+        corpus.append((scenario, invoice))
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Befüllt die SQLite ERP Stand-in Datenbank und erzeugt einen passenden Rechnungskorpus.")
+    parser.add_argument("--db", default="erp_bench.sqlite", help="Pfad der SQLite Datei (wird neu angelegt)")
+    parser.add_argument("--vendors", type=int, default=1000)
+    parser.add_argument("--purchase-orders", type=int, default=10000)
+    parser.add_argument("--journal-entries", type=int, default=100000)
+    parser.add_argument("--lines-per-po", type=int, default=5, help="Maximale Anzahl Positionen pro Bestellung")
+    parser.add_argument("--invoices", type=int, default=1000, help="Anzahl Rechnungen im Korpus")
+    parser.add_argument("--corpus-out", default="erp_bench_corpus.jsonl", help="Ausgabedatei des Korpus (JSON Lines)")
+    parser.add_argument("--seed", type=int, default=42, help="Seed für reproduzierbare Daten")
+    args = parser.parse_args()
+
+    db_path = Path(args.db)
+    if db_path.exists():
+        logging.info(f"Entferne bestehende Datenbank: {db_path}")
+        db_path.unlink()
+
+    rng = random.Random(args.seed)
+    engine = create_sqlite_erp_engine(str(db_path))
+    create_erp_schema(engine)
+
+    start = time.perf_counter()
+    data = seed_erp(engine, args.vendors, args.purchase_orders, args.journal_entries, args.lines_per_po, rng)
+    logging.info(f"✅ ERP befüllt: {len(data.vendors)} Kreditoren, {len(data.purchase_orders)} Bestellungen, "
+                 f"{len(data.journal)} Journal-Einträge ({time.perf_counter() - start:.1f}s)")
+
+    corpus = build_corpus(data, args.invoices, rng)
+    with open(args.corpus_out, "w", encoding="utf-8") as f:
+        for scenario, invoice in corpus:
+            f.write(json.dumps({"scenario": scenario, "invoice": invoice.model_dump(mode="json")}) + "\n")
+    logging.info(f"✅ Korpus mit {len(corpus)} Rechnungen geschrieben: {args.corpus_out}")
+
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Download API Endpoints
+Temporäre Download-Links (SAS) für Rohdateien, verarbeitete XML, Berichte und Exporte
+"""
+
+from fastapi import APIRouter, Body, HTTPException, Query
+from typing import Dict, List
+import logging
+from datetime import datetime
+
+from ..core.config import settings
+from ..services.storage_service import get_storage_service
+from ..services.storage_service_sync import parse_blob_uri
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Maximale Gültigkeit eines Links (inkl. Ablauf-Bucket innerhalb der 7 Tage eines User Delegation Keys)
+MAX_EXPIRY_HOURS = 144
+
+
+def _signable_containers() -> set:
+    return {settings.blob_container_raw, settings.blob_container_processed, settings.blob_container_exports}
+
+
+@router.post("/download-urls")
+async def sign_download_urls(
+    blob_uris: List[str] = Body(..., embed=True, description="Blob URIs (z.B. storage_uri_raw, storage_uri_xml)"),
+    expiry_hours: int = Query(24, ge=1, le=MAX_EXPIRY_HOURS, description="Mindestgültigkeit in Stunden")
+) -> dict:
+    """
+    Download-Links für viele Blobs in einer Anfrage (Listenansichten)
+    
+    - Nur Blobs der Raw-, Processed- und Export-Container
+    - Ein User Delegation Key für alle Links, SAS Tokens aus dem Cache wiederverwendet
+    - Ungültige URIs werden unter "errors" gemeldet, der Rest wird signiert
+    """
+    
+    if len(blob_uris) > settings.sas_bulk_max_urls:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Maximal {settings.sas_bulk_max_urls} Blobs pro Anfrage"
+        )
+    
+    storage = get_storage_service()
+    account_name = storage.blob_client.account_name
+    containers = _signable_containers()
+    
+    blobs: Dict[str, tuple] = {}
+    errors: Dict[str, str] = {}
+    for uri in dict.fromkeys(blob_uris):
+        try:
+            container, blob_name = parse_blob_uri(uri, account_name)
+        except ValueError as e:
+            errors[uri] = str(e)
+            continue
+        if container not in containers:
+            errors[uri] = f"Container nicht freigegeben: {container}"
+            continue
+        blobs[uri] = (container, blob_name)
+    
+    signed = await storage.generate_download_urls(list(blobs.values()), expiry_hours)
+    
+    logger.info(f"🔗 {len(signed)} Download-Links signiert ({len(errors)} abgelehnt)")
+    
+    return {
+        "urls": dict(zip(blobs.keys(), signed)),
+        "errors": errors,
+        "expiry_hours": expiry_hours,
+        "timestamp": datetime.now().isoformat()
+    }
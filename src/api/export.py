@@ -0,0 +1,70 @@
+"""
+Export API Endpoints
+GoBD Massenexport für Prüfer (Celery Job, Ergebnis als ZIP/TAR im Export-Container)
+"""
+
+from fastapi import APIRouter, HTTPException, Query
+from typing import List, Optional
+import logging
+from datetime import datetime
+
+from ..db.models import TransactionStatus
+from ..tasks.worker import celery_app
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+@router.post("/export/gobd")
+async def start_gobd_export(
+    created_from: Optional[datetime] = Query(None, description="Eingang ab (inklusive)"),
+    created_to: Optional[datetime] = Query(None, description="Eingang bis (exklusive)"),
+    vendor: Optional[str] = Query(None, description="ERP Kreditor-ID oder USt-IdNr. des Verkäufers"),
+    status: Optional[List[TransactionStatus]] = Query(None, description="Filter nach Status (mehrfach möglich)"),
+    archive_format: str = Query("zip", pattern="^(zip|tar)$", description="zip oder tar (gzip)"),
+    include_archive: bool = Query(True, description="Archivierte Transaktionen einschließen")
+) -> dict:
+    """
+    GoBD Export starten
+    
+    - Auswahl per Zeitraum, Kreditor und Status (live und archiviert)
+    - Rechnungen, verarbeitete XML und Validierungsberichte mit Hash-Manifest
+    - Fortschritt und Ergebnis (URI, Durchsatz) über GET /export/gobd/{export_id}
+    """
+    
+    if created_from and created_to and created_from >= created_to:
+        raise HTTPException(status_code=400, detail="created_from muss vor created_to liegen")
+    
+    result = celery_app.send_task("export_gobd_task", kwargs={
+        "created_from": created_from.isoformat() if created_from else None,
+        "created_to": created_to.isoformat() if created_to else None,
+        "vendor": vendor,
+        "statuses": [item.value for item in status] if status else None,
+        "archive_format": archive_format,
+        "include_archive": include_archive,
+    })
+    
+    logger.info(f"📦 GoBD Export eingeplant: {result.id}")
+    
+    return {
+        "export_id": result.id,
+        "status": "queued",
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+@router.get("/export/gobd/{export_id}")
+async def get_gobd_export(export_id: str) -> dict:
+    """Status eines GoBD Exports (bei Abschluss mit URI des Archivs und Durchsatz)."""
+    result = celery_app.AsyncResult(export_id)
+    
+    response = {
+        "export_id": export_id,
+        "state": result.state,
+        "timestamp": datetime.now().isoformat()
+    }
+    if result.successful():
+        response["result"] = result.result
+    elif result.failed():
+        response["error"] = str(result.result)
+    return response
@@ -3,26 +3,52 @@ Status API Endpoints
 Überwachung von Rechnungsverarbeitungs-Status
 """
 
-from fastapi import APIRouter, HTTPException, Depends, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, and_, func
-from typing import Optional, List
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy import desc, and_, or_, func, text
+from typing import Any, AsyncIterator, Callable, Optional, List, Tuple
+import base64
+import json
 import logging
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from enum import Enum
 from uuid import UUID
 
-from ..db.session import get_metadata_session_dependency
-from ..db.models import InvoiceTransaction, TransactionStatus, ProcessingLog
-from ..schemas.validation_report import ValidationReport
+from ..db.session import (
+    get_metadata_session, get_metadata_session_dependency, get_metadata_read_session_dependency,
+    may_be_stale_on_replica, read_replica_configured,
+)
+from ..db.models import InvoiceTransaction, TransactionStatus, ProcessingLog, TransactionStatsHourly, ValidationFinding
+from ..schemas.validation_report import ValidationReport, ValidationSeverity
+from ..services import report_storage
+from ..services.storage_backend import sync_storage_service
+from ..services.storage_service import get_storage_service
+from ..services.statistics import floor_hour, query_live_stats, query_rollup_stats, summarize
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Spalten der Transaktionsliste (ohne große JSON-Spalten)
+LIST_FIELDS = [
+    "id", "status", "format_detected", "original_filename", "file_size_bytes", "invoice_number", "issue_date",
+    "total_amount", "currency_code", "seller_name", "seller_vat_id", "buyer_name", "buyer_vat_id",
+    "erp_vendor_id", "purchase_order_id", "is_duplicate", "validation_level_reached", "error_message",
+    "retry_count", "created_at", "updated_at", "processed_at", "processing_time_seconds",
+]
+# Per fields= explizit anforderbare Spalten
+OPTIONAL_LIST_FIELDS = [
+    "validation_report", "error_details", "storage_uri_raw", "storage_uri_xml", "content_type", "content_hash",
+    "claimed_by", "claimed_at", "lease_expires_at", "business_validation_attempt",
+]
+
 
 @router.get("/status/{transaction_id}")
 async def get_transaction_status(
     transaction_id: str,
-    db: Session = Depends(get_metadata_session_dependency)
+    db: Session = Depends(get_metadata_read_session_dependency)
 ) -> dict:
     """
     Status einer spezifischen Transaction abfragen
@@ -34,17 +60,13 @@ async def get_transaction_status(
     except ValueError:
         raise HTTPException(status_code=400, detail="Ungültige Transaction ID")
     
-    # Transaction suchen
-    transaction = db.query(InvoiceTransaction).filter(
-        InvoiceTransaction.id == uuid_obj
-    ).first()
-    
-    if not transaction:
-        raise HTTPException(status_code=404, detail="Transaction nicht gefunden")
-    
+    return _read_transaction(db, uuid_obj, _build_status_response)
+
+
+def _build_status_response(db: Session, transaction: InvoiceTransaction) -> dict:
     # Verarbeitungslog laden (letzte 10 Einträge)
     processing_logs = db.query(ProcessingLog).filter(
-        ProcessingLog.transaction_id == uuid_obj
+        ProcessingLog.transaction_id == transaction.id
     ).order_by(desc(ProcessingLog.created_at)).limit(10).all()
     
     # Response zusammenstellen
@@ -78,59 +100,186 @@ async def get_transaction_status(
     return response
 
 
+def _read_transaction(db: Session, uuid_obj: UUID, build: Callable[[Session, InvoiceTransaction], Any]) -> Any:
+    """
+    Lädt eine Transaktion über die Lese-Session (Replikat) und baut die Antwort mit `build`.
+    Fehlt sie dort oder wurde sie im Staleness-Fenster erstellt/geändert, wird vom Primary gelesen,
+    damit frisch hochgeladene Rechnungen nicht als 404 oder mit veraltetem Status erscheinen.
+    """
+    transaction = db.query(InvoiceTransaction).filter(InvoiceTransaction.id == uuid_obj).first()
+    if transaction is not None and not may_be_stale_on_replica(transaction.created_at, transaction.updated_at):
+        return build(db, transaction)
+    
+    if transaction is None and not read_replica_configured():
+        raise HTTPException(status_code=404, detail="Transaction nicht gefunden")
+    
+    found, result = False, None
+    with get_metadata_session() as primary:
+        transaction = primary.query(InvoiceTransaction).filter(InvoiceTransaction.id == uuid_obj).first()
+        if transaction is not None:
+            found, result = True, build(primary, transaction)
+    
+    if not found:
+        raise HTTPException(status_code=404, detail="Transaction nicht gefunden")
+    return result
+
+
 @router.get("/status")
 async def list_transactions(
     status: Optional[TransactionStatus] = Query(None, description="Filter nach Status"),
     limit: int = Query(50, ge=1, le=1000, description="Anzahl Ergebnisse (max 1000)"),
-    offset: int = Query(0, ge=0, description="Offset für Paginierung"),
+    cursor: Optional[str] = Query(None, description="next_cursor der vorherigen Seite (Keyset-Paginierung)"),
     since_hours: Optional[int] = Query(None, ge=1, le=168, description="Nur Transaktionen der letzten X Stunden"),
-    db: Session = Depends(get_metadata_session_dependency)
+    count: str = Query("none", pattern="^(none|approximate|exact)$", description="Gesamtanzahl: none, approximate oder exact"),
+    fields: Optional[str] = Query(None, description=f"Zusätzliche Spalten (kommagetrennt): {', '.join(OPTIONAL_LIST_FIELDS)}"),
+    db: Session = Depends(get_metadata_read_session_dependency)
 ) -> dict:
     """
     Liste aller Transaktionen mit Filteroptionen
+    Keyset-Paginierung auf (created_at, id); geladen werden nur die Listen-Spalten (plus `fields`).
     """
     
-    # Query zusammenbauen
-    query = db.query(InvoiceTransaction)
+    extra_fields = _parse_fields(fields)
+    columns = LIST_FIELDS + extra_fields
+    
+    # Query zusammenbauen (nur die benötigten Spalten, validation_report/error_details nur auf Anfrage)
+    query = db.query(InvoiceTransaction).options(
+        load_only(*[getattr(InvoiceTransaction, name) for name in columns])
+    )
     
     # Filter anwenden
+    filters = []
     if status:
-        query = query.filter(InvoiceTransaction.status == status)
+        filters.append(InvoiceTransaction.status == status)
     
+    cutoff_time = None
     if since_hours:
         cutoff_time = datetime.now() - timedelta(hours=since_hours)
-        query = query.filter(InvoiceTransaction.created_at >= cutoff_time)
-    
-    # Gesamtanzahl für Paginierung
-    total_count = query.count()
-    
-    # Sortierung und Paginierung
-    transactions = query.order_by(desc(InvoiceTransaction.created_at)).offset(offset).limit(limit).all()
+        filters.append(InvoiceTransaction.created_at >= cutoff_time)
+    
+    if filters:
+        query = query.filter(*filters)
+    
+    # Keyset: Einträge nach der letzten Zeile der vorherigen Seite (absteigend sortiert)
+    if cursor:
+        cursor_created_at, cursor_id = _decode_cursor(cursor)
+        query = query.filter(or_(
+            InvoiceTransaction.created_at < cursor_created_at,
+            and_(InvoiceTransaction.created_at == cursor_created_at, InvoiceTransaction.id < cursor_id)
+        ))
+    
+    # Eine Zeile mehr laden, um has_more ohne COUNT zu bestimmen
+    transactions = query.order_by(
+        desc(InvoiceTransaction.created_at), desc(InvoiceTransaction.id)
+    ).limit(limit + 1).all()
+    
+    has_more = len(transactions) > limit
+    transactions = transactions[:limit]
+    next_cursor = _encode_cursor(transactions[-1]) if has_more else None
+    
+    total_count = None
+    if count == "exact":
+        total_count = db.query(func.count(InvoiceTransaction.id)).filter(*filters).scalar()
+    elif count == "approximate":
+        total_count = _approximate_count(db, status, cutoff_time)
     
     # Response zusammenstellen
     return {
-        "transactions": [transaction.to_dict() for transaction in transactions],
+        "transactions": [_serialize_transaction(transaction, columns) for transaction in transactions],
         "pagination": {
-            "total_count": total_count,
             "limit": limit,
-            "offset": offset,
-            "has_more": offset + limit < total_count
+            "next_cursor": next_cursor,
+            "has_more": has_more,
+            "total_count": total_count,
+            "count_mode": count
         },
         "filters": {
             "status": status.value if status else None,
-            "since_hours": since_hours
+            "since_hours": since_hours,
+            "fields": extra_fields
         },
         "timestamp": datetime.now().isoformat()
     }
 
 
+# --- Hilfsfunktionen für die Transaktionsliste ---
+
+def _parse_fields(fields: Optional[str]) -> List[str]:
+    if not fields:
+        return []
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in OPTIONAL_LIST_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unbekannte Felder: {', '.join(unknown)}")
+    return [name for name in OPTIONAL_LIST_FIELDS if name in requested]
+
+
+def _serialize_transaction(transaction: InvoiceTransaction, columns: List[str]) -> dict:
+    """Serialisiert nur die geladenen Spalten (kein Nachladen zurückgestellter Spalten pro Zeile)."""
+    result = {}
+    for name in columns:
+        value = getattr(transaction, name)
+        if isinstance(value, Enum):
+            value = value.value
+        elif isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        elif isinstance(value, Decimal):
+            value = float(value)
+        elif isinstance(value, UUID):
+            value = str(value)
+        result[name] = value
+    return result
+
+
+def _encode_cursor(transaction: InvoiceTransaction) -> str:
+    payload = json.dumps({"created_at": transaction.created_at.isoformat(), "id": str(transaction.id)})
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(payload["created_at"]), UUID(payload["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Ungültiger Cursor")
+
+
+def _approximate_count(db: Session, status: Optional[TransactionStatus], cutoff_time: Optional[datetime]) -> Optional[int]:
+    """
+    Ungefähre Anzahl ohne COUNT über die Tabelle:
+    ohne Filter aus den Tabellenstatistiken der Datenbank, mit Filtern aus den stündlichen Rollups.
+    """
+    if status is None and cutoff_time is None:
+        dialect = db.get_bind().dialect.name
+        if dialect == "mssql":
+            return db.execute(text(
+                "SELECT SUM(row_count) FROM sys.dm_db_partition_stats "
+                "WHERE object_id = OBJECT_ID('invoice_transactions') AND index_id IN (0, 1)"
+            )).scalar()
+        if dialect == "postgresql":
+            return db.execute(text(
+                "SELECT reltuples::bigint FROM pg_class WHERE relname = 'invoice_transactions'"
+            )).scalar()
+    
+    # Stundengenau (Rollup-Stand bis zur letzten Aktualisierung)
+    query = db.query(func.sum(TransactionStatsHourly.transaction_count))
+    if status:
+        query = query.filter(TransactionStatsHourly.status == status)
+    if cutoff_time:
+        query = query.filter(TransactionStatsHourly.bucket_start >= floor_hour(cutoff_time))
+    return int(query.scalar() or 0)
+
+
 @router.get("/status/{transaction_id}/validation-report")
 async def get_validation_report(
     transaction_id: str,
-    db: Session = Depends(get_metadata_session_dependency)
-) -> dict:
+    request: Request,
+    db: Session = Depends(get_metadata_read_session_dependency)
+):
     """
     Vollständigen Validierungsbericht für eine Transaction abrufen
+    Ausgelagerte Berichte werden gestreamt aus dem Blob Storage geliefert (bei gzip und passendem
+    Accept-Encoding unverändert komprimiert, sonst gestreamt dekomprimiert).
     """
     
     try:
@@ -138,79 +287,119 @@ async def get_validation_report(
     except ValueError:
         raise HTTPException(status_code=400, detail="Ungültige Transaction ID")
     
-    transaction = db.query(InvoiceTransaction).filter(
-        InvoiceTransaction.id == uuid_obj
-    ).first()
+    validation_report = _read_transaction(db, uuid_obj, lambda _, transaction: transaction.validation_report)
     
-    if not transaction:
-        raise HTTPException(status_code=404, detail="Transaction nicht gefunden")
-    
-    if not transaction.validation_report:
+    if not validation_report:
         raise HTTPException(
             status_code=404, 
             detail="Validierungsbericht noch nicht verfügbar"
         )
     
-    return transaction.validation_report
+    pointer = report_storage.get_offload_pointer(validation_report)
+    if pointer is None:
+        return validation_report
+    
+    return await _stream_offloaded_report(pointer, request.headers.get("accept-encoding", ""))
+
+
+async def _stream_offloaded_report(pointer: dict, accept_encoding: str) -> StreamingResponse:
+    """Streamt einen ausgelagerten Bericht. Der erste Chunk wird vorab geladen, damit Fehler als Status ankommen."""
+    encoding = pointer["content_encoding"]
+    passthrough = encoding == report_storage.GZIP and "gzip" in accept_encoding.lower()
+    
+    try:
+        chunks = await _open_report_chunks(pointer["uri"])
+        if not passthrough:
+            chunks = report_storage.aiter_decompress(chunks, encoding)
+        first_chunk = await anext(chunks, b"")
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Ausgelagerter Validierungsbericht nicht gefunden")
+    except IOError as e:
+        logger.error(f"Fehler beim Laden des ausgelagerten Validierungsberichts: {e}")
+        raise HTTPException(status_code=502, detail="Validierungsbericht konnte nicht geladen werden")
+    
+    async def _body() -> AsyncIterator[bytes]:
+        yield first_chunk
+        async for chunk in chunks:
+            yield chunk
+    
+    headers = {"Content-Encoding": encoding} if passthrough else {}
+    return StreamingResponse(_body(), media_type="application/json", headers=headers)
+
+
+async def _open_report_chunks(uri: str) -> AsyncIterator[bytes]:
+    """
+    Chunks eines ausgelagerten Berichts, ohne den Event Loop zu blockieren:
+    Azure über den async StorageService, lokales Storage Backend (file:// URIs) im Threadpool.
+    """
+    if uri.startswith("file://"):
+        if sync_storage_service is None:
+            raise HTTPException(status_code=503, detail="Storage Service nicht verfügbar")
+        return iterate_in_threadpool(sync_storage_service.iter_blob_chunks_by_uri(uri))
+    return await get_storage_service().open_blob_chunks_by_uri(uri)
 
 
 @router.get("/statistics")
 async def get_statistics(
     hours: int = Query(24, ge=1, le=168, description="Zeitraum in Stunden"),
-    db: Session = Depends(get_metadata_session_dependency)
+    db: Session = Depends(get_metadata_read_session_dependency)
 ) -> dict:
     """
     Statistiken über Rechnungsverarbeitung
+    Bis zu einer Stunde live (eine gruppierte Abfrage), darüber aus den stündlichen Rollups.
     """
     
-    cutoff_time = datetime.now() - timedelta(hours=hours)
+    now = datetime.now()
+    cutoff_time = now - timedelta(hours=hours)
     
-    # Basis-Query für den Zeitraum
-    base_query = db.query(InvoiceTransaction).filter(
-        InvoiceTransaction.created_at >= cutoff_time
-    )
+    if hours > 1:
+        # Rollups sind stundengenau: Der Zeitraum beginnt mit der vollen Stunde von cutoff_time
+        cutoff_time = floor_hour(cutoff_time)
+        rows = query_rollup_stats(db, cutoff_time)
+        source = "hourly_rollup"
+    else:
+        rows = query_live_stats(db, cutoff_time)
+        source = "live"
     
-    # Statistiken sammeln
-    total_transactions = base_query.count()
-    
-    # Status-Verteilung
-    status_counts = {}
-    for status_enum in TransactionStatus:
-        count = base_query.filter(InvoiceTransaction.status == status_enum).count()
-        status_counts[status_enum.value] = count
-    
-    # Format-Verteilung
-    format_stats = db.query(
-        InvoiceTransaction.format_detected,
-        func.count(InvoiceTransaction.id).label('count')
-    ).filter(
-        InvoiceTransaction.created_at >= cutoff_time,
-        InvoiceTransaction.format_detected.isnot(None)
-    ).group_by(InvoiceTransaction.format_detected).all()
-    
-    format_counts = {
-        format_type.value if format_type else "UNKNOWN": count 
-        for format_type, count in format_stats
+    return {
+        "period": {
+            "hours": hours,
+            "from": cutoff_time.isoformat(),
+            "to": now.isoformat(),
+            "source": source
+        },
+        **summarize(rows),
+        "generated_at": datetime.now().isoformat()
     }
+
+
+@router.get("/statistics/top-error-codes")
+async def get_top_error_codes(
+    hours: int = Query(168, ge=1, le=24 * 90, description="Zeitraum in Stunden"),
+    seller_vat_id: Optional[str] = Query(None, description="Nur Findings dieses Lieferanten (USt-IdNr.)"),
+    severity: Optional[ValidationSeverity] = Query(None, description="Filter nach Schweregrad"),
+    limit: int = Query(20, ge=1, le=200, description="Anzahl Codes"),
+    db: Session = Depends(get_metadata_read_session_dependency)
+) -> dict:
+    """
+    Häufigste Validierungs-Codes im Zeitraum (aus validation_findings, ohne JSON-Berichte zu lesen)
+    """
     
-    # Durchschnittliche Verarbeitungszeit
-    avg_processing_time = db.query(
-        func.avg(InvoiceTransaction.processing_time_seconds)
-    ).filter(
-        InvoiceTransaction.created_at >= cutoff_time,
-        InvoiceTransaction.processing_time_seconds.isnot(None)
-    ).scalar()
+    cutoff_time = datetime.now() - timedelta(hours=hours)
     
-    # Fehlerrate berechnen
-    error_count = base_query.filter(
-        InvoiceTransaction.status.in_([TransactionStatus.ERROR, TransactionStatus.INVALID])
-    ).count()
+    occurrences = func.count(ValidationFinding.id).label("occurrences")
+    query = db.query(
+        ValidationFinding.code,
+        occurrences,
+        func.count(func.distinct(ValidationFinding.transaction_id)).label("transactions")
+    ).filter(ValidationFinding.created_at >= cutoff_time)
     
-    error_rate = (error_count / total_transactions * 100) if total_transactions > 0 else 0
+    if seller_vat_id:
+        query = query.filter(ValidationFinding.seller_vat_id == seller_vat_id)
+    if severity:
+        query = query.filter(ValidationFinding.severity == severity.value)
     
-    # Success Rate
-    success_count = base_query.filter(InvoiceTransaction.status == TransactionStatus.VALID).count()
-    success_rate = (success_count / total_transactions * 100) if total_transactions > 0 else 0
+    rows = query.group_by(ValidationFinding.code).order_by(desc(occurrences)).limit(limit).all()
     
     return {
         "period": {
@@ -218,14 +407,14 @@ async def get_statistics(
             "from": cutoff_time.isoformat(),
             "to": datetime.now().isoformat()
         },
-        "overview": {
-            "total_transactions": total_transactions,
-            "success_rate_percent": round(success_rate, 2),
-            "error_rate_percent": round(error_rate, 2),
-            "avg_processing_time_seconds": round(float(avg_processing_time), 3) if avg_processing_time else None
+        "filters": {
+            "seller_vat_id": seller_vat_id,
+            "severity": severity.value if severity else None
         },
-        "status_distribution": status_counts,
-        "format_distribution": format_counts,
+        "top_error_codes": [
+            {"code": code, "occurrences": count, "transactions": transactions}
+            for code, count, transactions in rows
+        ],
         "generated_at": datetime.now().isoformat()
     }
 
@@ -5,16 +5,22 @@ Rechnungs-Upload und Verarbeitungsstart
 
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
 from fastapi.responses import JSONResponse
+from celery import group
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
+import asyncio
+import hashlib
 import logging
 import uuid
 from datetime import datetime
-from typing import Optional
+from typing import AsyncIterator, Optional, Tuple
 
 from ..db.session import get_metadata_session_dependency
 from ..db.models import InvoiceTransaction, TransactionStatus
-from ..services.storage_service import StorageService
+from ..services.storage_service import FileTooLargeError, RawUploadResult, StorageService, get_storage_service
+from ..services.raw_layout import content_addressed_layout
 from ..core.config import settings
+from ..tasks.worker import celery_app
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -34,56 +40,20 @@ async def upload_invoice(
     - Startet asynchrone Verarbeitung via Celery
     """
     
-    # Validierung der Datei
-    if not file.filename:
-        raise HTTPException(status_code=400, detail="Dateiname ist erforderlich")
-    
-    # Dateigröße prüfen
-    file_content = await file.read()
-    file_size = len(file_content)
-    
-    max_size = settings.max_file_size_mb * 1024 * 1024  # MB zu Bytes
-    if file_size > max_size:
-        raise HTTPException(
-            status_code=413, 
-            detail=f"Datei zu groß. Maximum: {settings.max_file_size_mb} MB"
-        )
-    
-    # Dateityp validieren
-    allowed_types = [
-        "application/pdf",
-        "application/xml", 
-        "text/xml",
-        "application/octet-stream"  # Für unbekannte PDF/XML
-    ]
-    
-    content_type = file.content_type or "application/octet-stream"
-    
-    # Zusätzliche Validierung basierend auf Dateiendung
-    filename_lower = file.filename.lower()
-    if not (content_type in allowed_types or 
-            filename_lower.endswith(('.pdf', '.xml', '.p7m'))):
-        raise HTTPException(
-            status_code=415,
-            detail="Nicht unterstützter Dateityp. Erlaubt: PDF, XML"
-        )
+    content_type = _validate_upload(file)
     
     try:
         # Eindeutige Transaction ID generieren
         transaction_id = uuid.uuid4()
         
-        logger.info(f"📤 Upload gestartet: {file.filename} ({file_size} bytes) - ID: {transaction_id}")
+        logger.info(f"📤 Upload gestartet: {file.filename} - ID: {transaction_id}")
         
-        # Datei in Azure Blob Storage speichern
-        storage_service = StorageService()
-        blob_uri = await storage_service.upload_raw_file(
-            transaction_id=str(transaction_id),
-            filename=file.filename,
-            content=file_content,
-            content_type=content_type
-        )
+        # Datei gestreamt in Azure Blob Storage speichern (Chunk für Chunk, SHA-256 und Größe fortlaufend)
+        upload = await _store_upload(get_storage_service(), transaction_id, file, content_type)
+        blob_uri = upload.uri
+        file_size = upload.size_bytes
         
-        logger.info(f"💾 Datei gespeichert: {blob_uri}")
+        logger.info(f"💾 Datei gespeichert: {blob_uri} ({file_size} bytes)")
         
         # Transaction Record in Datenbank erstellen
         transaction = InvoiceTransaction(
@@ -92,6 +62,7 @@ async def upload_invoice(
             original_filename=file.filename,
             file_size_bytes=file_size,
             content_type=content_type,
+            content_hash=upload.content_hash,
             storage_uri_raw=blob_uri
         )
         
@@ -113,10 +84,16 @@ async def upload_invoice(
             "filename": file.filename,
             "file_size_bytes": file_size,
             "content_type": content_type,
+            "content_hash": upload.content_hash,
+            "deduplicated": upload.deduplicated,
             "blob_uri": blob_uri,
             "created_at": transaction.created_at.isoformat() if transaction.created_at else None
         }
         
+    except FileTooLargeError:
+        logger.warning(f"⚠️ Upload abgebrochen, Datei zu groß: {file.filename}")
+        raise _file_too_large()
+        
     except Exception as e:
         logger.error(f"❌ Upload-Fehler für {file.filename}: {str(e)}")
         
@@ -141,20 +118,108 @@ async def upload_invoice(
             )
 
 
+def _validate_upload(file: UploadFile) -> str:
+    """Prüft Dateiname, (bekannte) Größe und Dateityp. Gibt den Content-Type zurück."""
+    if not file.filename:
+        raise HTTPException(status_code=400, detail="Dateiname ist erforderlich")
+    
+    # Dateigröße prüfen (vorab, falls bekannt; sonst bricht der gestreamte Upload beim Überschreiten ab)
+    if file.size is not None and file.size > _max_file_size_bytes():
+        raise _file_too_large()
+    
+    # Dateityp validieren
+    allowed_types = [
+        "application/pdf",
+        "application/xml", 
+        "text/xml",
+        "application/octet-stream"  # Für unbekannte PDF/XML
+    ]
+    
+    content_type = file.content_type or "application/octet-stream"
+    
+    # Zusätzliche Validierung basierend auf Dateiendung
+    filename_lower = file.filename.lower()
+    if not (content_type in allowed_types or 
+            filename_lower.endswith(('.pdf', '.xml', '.p7m'))):
+        raise HTTPException(
+            status_code=415,
+            detail="Nicht unterstützter Dateityp. Erlaubt: PDF, XML"
+        )
+    return content_type
+
+
+async def _store_upload(storage_service: StorageService, transaction_id: uuid.UUID, file: UploadFile, content_type: str) -> RawUploadResult:
+    if content_addressed_layout():
+        # CAS: Hash vorab über die lokal gepufferte Datei, damit ein vorhandener Blob gar nicht übertragen wird
+        content_hash, size = await _hash_upload(file, settings.upload_chunk_size_bytes, _max_file_size_bytes())
+        await file.seek(0)
+        return await storage_service.upload_raw_content_addressed(
+            transaction_id=str(transaction_id),
+            filename=file.filename,
+            chunks=_iter_upload_chunks(file, settings.upload_chunk_size_bytes),
+            content_type=content_type,
+            content_hash=content_hash,
+            size_bytes=size
+        )
+    return await storage_service.upload_raw_stream(
+        transaction_id=str(transaction_id),
+        filename=file.filename,
+        chunks=_iter_upload_chunks(file, settings.upload_chunk_size_bytes),
+        content_type=content_type,
+        max_size_bytes=_max_file_size_bytes()
+    )
+
+
+def _max_file_size_bytes() -> int:
+    return settings.max_file_size_mb * 1024 * 1024  # MB zu Bytes
+
+
+def _file_too_large() -> HTTPException:
+    return HTTPException(
+        status_code=413, 
+        detail=f"Datei zu groß. Maximum: {settings.max_file_size_mb} MB"
+    )
+
+
+async def _hash_upload(file: UploadFile, chunk_size: int, max_size_bytes: int) -> Tuple[str, int]:
+    """SHA-256 und Größe der hochgeladenen Datei (bricht beim Überschreiten der Maximalgröße ab)."""
+    sha256 = hashlib.sha256()
+    size = 0
+    async for chunk in _iter_upload_chunks(file, chunk_size):
+        size += len(chunk)
+        if size > max_size_bytes:
+            raise FileTooLargeError(f"{file.filename} überschreitet das Maximum von {max_size_bytes} Bytes")
+        sha256.update(chunk)
+    return sha256.hexdigest(), size
+
+
+async def _iter_upload_chunks(file: UploadFile, chunk_size: int) -> AsyncIterator[bytes]:
+    """Liest die hochgeladene Datei in Chunks (Starlette puffert den Multipart-Teil in einer SpooledTemporaryFile)."""
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
 @router.post("/upload/batch")
 async def upload_batch(
     files: list[UploadFile] = File(...),
     db: Session = Depends(get_metadata_session_dependency)
 ) -> dict:
     """
-    Batch-Upload mehrerer Rechnungen
-    Maximal 10 Dateien pro Batch
+    Batch-Upload mehrerer Rechnungen (maximal upload_batch_max_files Dateien)
+    
+    - Blob Uploads laufen parallel (begrenzt durch upload_batch_concurrency)
+    - Ein Bulk-INSERT und ein Commit für alle erfolgreich gespeicherten Dateien
+    - Verarbeitung aller Transaktionen mit einem Celery group Publish
     """
     
-    if len(files) > 10:
+    max_files = settings.upload_batch_max_files
+    if len(files) > max_files:
         raise HTTPException(
             status_code=400,
-            detail="Maximal 10 Dateien pro Batch erlaubt"
+            detail=f"Maximal {max_files} Dateien pro Batch erlaubt"
         )
     
     if len(files) == 0:
@@ -163,40 +228,109 @@ async def upload_batch(
             detail="Mindestens eine Datei erforderlich"
         )
     
-    results = []
-    successful_uploads = 0
-    failed_uploads = 0
-    
     logger.info(f"📦 Batch-Upload gestartet: {len(files)} Dateien")
     
-    for file in files:
-        try:
-            # Einzelne Datei verarbeiten (Code-Wiederverwendung)
-            result = await upload_invoice(file, db)
-            results.append({
-                "filename": file.filename,
-                "status": "success",
-                "transaction_id": result["transaction_id"],
-                "message": "Erfolgreich hochgeladen"
-            })
-            successful_uploads += 1
-            
-        except HTTPException as e:
+    storage_service = get_storage_service()
+    semaphore = asyncio.Semaphore(settings.upload_batch_concurrency)
+    
+    async def _upload_one(file: UploadFile) -> Tuple[uuid.UUID, str, RawUploadResult]:
+        async with semaphore:
+            content_type = _validate_upload(file)
+            transaction_id = uuid.uuid4()
+            try:
+                upload = await _store_upload(storage_service, transaction_id, file, content_type)
+            except FileTooLargeError:
+                raise _file_too_large()
+            return transaction_id, content_type, upload
+    
+    outcomes = await asyncio.gather(*(_upload_one(file) for file in files), return_exceptions=True)
+    
+    results = []
+    stored = []
+    for file, outcome in zip(files, outcomes):
+        if isinstance(outcome, HTTPException):
             results.append({
                 "filename": file.filename or "unknown",
                 "status": "failed",
-                "error_code": e.status_code,
-                "error_message": e.detail
+                "error_code": outcome.status_code,
+                "error_message": outcome.detail
             })
-            failed_uploads += 1
-            
-        except Exception as e:
+        elif isinstance(outcome, BaseException):
+            logger.error(f"❌ Upload-Fehler für {file.filename}: {outcome}")
             results.append({
                 "filename": file.filename or "unknown", 
                 "status": "failed",
-                "error_message": str(e)
+                "error_message": str(outcome)
             })
-            failed_uploads += 1
+        else:
+            stored.append((file, outcome))
+            results.append(None)  # Platzhalter, wird nach dem Commit gefüllt
+    
+    # Ein Bulk-INSERT und ein Commit für alle gespeicherten Dateien
+    committed = False
+    if stored:
+        now = datetime.now()
+        try:
+            db.execute(insert(InvoiceTransaction.__table__), [
+                {
+                    "id": transaction_id,
+                    "status": TransactionStatus.RECEIVED,
+                    "original_filename": file.filename,
+                    "file_size_bytes": upload.size_bytes,
+                    "content_type": content_type,
+                    "content_hash": upload.content_hash,
+                    "storage_uri_raw": upload.uri,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for file, (transaction_id, content_type, upload) in stored
+            ])
+            db.commit()
+            committed = True
+        except Exception as e:
+            db.rollback()
+            # Die Blobs bleiben ohne Transaktion im Raw-Container liegen
+            logger.error(f"❌ Bulk-Insert für {len(stored)} Transaktionen fehlgeschlagen: {e}")
+    
+    # Verarbeitung mit einem Publish einplanen (erst nach dem Commit)
+    queued = False
+    if committed:
+        try:
+            group(
+                celery_app.signature("process_invoice_task", args=[str(transaction_id)])
+                for _, (transaction_id, _, _) in stored
+            ).apply_async()
+            queued = True
+        except Exception as e:
+            # Transaktionen bleiben RECEIVED und können per /status/{id}/retry gestartet werden
+            logger.critical(f"Batch mit {len(stored)} Transaktionen gespeichert, aber nicht eingeplant: {e}")
+    
+    stored_results = iter(stored)
+    for index, result in enumerate(results):
+        if result is not None:
+            continue
+        file, (transaction_id, _, upload) = next(stored_results)
+        if committed:
+            results[index] = {
+                "filename": file.filename,
+                "status": "success",
+                "transaction_id": str(transaction_id),
+                "file_size_bytes": upload.size_bytes,
+                "content_hash": upload.content_hash,
+                "deduplicated": upload.deduplicated,
+                "queued": queued,
+                "message": "Erfolgreich hochgeladen"
+            }
+        else:
+            results[index] = {
+                "filename": file.filename,
+                "status": "failed",
+                "error_code": 503,
+                "error_message": "Datenbank temporär nicht verfügbar"
+            }
+    
+    successful_uploads = sum(1 for result in results if result["status"] == "success")
+    failed_uploads = len(results) - successful_uploads
     
     logger.info(f"📦 Batch-Upload abgeschlossen: {successful_uploads} erfolgreich, {failed_uploads} fehlgeschlagen")
     
@@ -204,7 +338,8 @@ async def upload_batch(
         "batch_summary": {
             "total_files": len(files),
             "successful_uploads": successful_uploads,
-            "failed_uploads": failed_uploads
+            "failed_uploads": failed_uploads,
+            "queued": queued
         },
         "results": results,
         "timestamp": datetime.now().isoformat()
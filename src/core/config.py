@@ -30,14 +30,56 @@ class Settings(BaseSettings):
     
     # Datenbank Konfiguration (Metadaten)
     database_url: str = Field(...)
+    # Lesereplikat für die GET-Endpunkte der Status API (Standard: eigener Pool auf database_url)
+    database_read_url: Optional[str] = Field(default=None)
+    database_read_pool_size: int = Field(default=5)
+    database_read_max_overflow: int = Field(default=5)
+    # Innerhalb dieses Fensters erstellte oder geänderte Transaktionen werden vom Primary gelesen (Replikations-Lag)
+    database_read_staleness_seconds: int = Field(default=10)
     
     # ERP Datenbank Konfiguration (Read-Only)
     erp_database_url: str = Field(...)
+    # Async Treiber für den asyncio API-Pfad (Standard: abgeleitet aus erp_database_url, pyodbc -> aioodbc)
+    erp_async_database_url: Optional[str] = Field(default=None)
+    erp_async_pool_size: int = Field(default=5)
     
     # Azure Storage
     azure_storage_connection_string: str = Field(...)
     blob_container_raw: str = Field(default="invoices-raw")
     blob_container_processed: str = Field(default="invoices-processed")
+    blob_container_exports: str = Field(default="invoices-exports")
+    # HTTP Verbindungspool des SyncStorageService (Verbindungen pro Host >= parallele Threads pro Worker-Prozess)
+    azure_storage_pool_connections: int = Field(default=10)
+    azure_storage_pool_maxsize: int = Field(default=64)
+    azure_storage_connection_timeout_seconds: int = Field(default=20)
+    # Kompression von processed.xml im Processed-Container: "none", "gzip" oder "zstd" (Content-Encoding am Blob)
+    processed_xml_compression: str = Field(default="gzip")
+    # Migration bestehender Blobs: Blobs pro Seite (ein Task-Durchlauf) und parallele Threads
+    processed_xml_recompress_page_size: int = Field(default=500)
+    processed_xml_recompress_workers: int = Field(default=8)
+    
+    # GoBD Massenexport: parallele Listings/Downloads und Zeitlimit des Export-Tasks
+    export_max_workers: int = Field(default=16)
+    export_time_limit_seconds: int = Field(default=3600)
+    
+    # Download-Links (SAS): Ablauf-Bucket der Token-Wiederverwendung, Lebensdauer und Erneuerungsmarge des
+    # User Delegation Keys, Größe des Token-Caches und maximale Anzahl Blobs pro Bulk-Anfrage
+    sas_expiry_bucket_minutes: int = Field(default=15)
+    sas_delegation_key_lifetime_hours: int = Field(default=24)
+    sas_delegation_key_refresh_minutes: int = Field(default=30)
+    sas_cache_max_entries: int = Field(default=10000)
+    sas_bulk_max_urls: int = Field(default=500)
+    
+    # Storage Backend der Worker: "azure" (Blob Storage/Azurite) oder "local" (Dateisystem, file:// URIs, ohne Netzwerk)
+    storage_backend: str = Field(default="azure")
+    local_storage_root: str = Field(default="/var/lib/iiev/storage")
+    local_storage_mmap_reads: bool = Field(default=False)
+    # Ablage der Rohdateien: "transaction" ({transaction_id}/{filename}) oder "cas" (sha256/<hash>, dedupliziert)
+    raw_storage_layout: str = Field(default="transaction")
+    # Worker-lokaler LRU Disk Cache für Raw-Downloads (Schlüssel: Blob URI + ETag)
+    raw_blob_cache_enabled: bool = Field(default=True)
+    raw_blob_cache_dir: str = Field(default="/tmp/iiev-blob-cache")
+    raw_blob_cache_max_mb: int = Field(default=2048)
     
     # Azure Service Bus (für Produktion)
     azure_servicebus_connection_string: Optional[str] = Field(default=None)
@@ -59,6 +101,64 @@ class Settings(BaseSettings):
     # Validierung Einstellungen
     calculation_tolerance_euro: float = Field(default=0.02)
     max_file_size_mb: int = Field(default=10)
+    # Chunkgröße des gestreamten Uploads (ein Azure Block pro Chunk)
+    upload_chunk_size_bytes: int = Field(default=4 * 1024 * 1024)
+    # Batch-Upload: maximale Dateien pro Request und parallele Blob Uploads
+    upload_batch_max_files: int = Field(default=100)
+    upload_batch_concurrency: int = Field(default=8)
+    
+    # Unit of Work in process_invoice_task: Claim-Commit + finaler Commit, optional Zwischen-Commits pro Abschnitt
+    processing_checkpoint_commits: bool = Field(default=False)
+    # Lease eines Claims in Sekunden (wird während der Verarbeitung per Heartbeat verlängert)
+    processing_lease_seconds: int = Field(default=300)
+    # Reaper für abgelaufene Leases: Intervall, Retry-Budget und Basis für das Backoff beim erneuten Einplanen
+    processing_reaper_interval_seconds: int = Field(default=60)
+    processing_reaper_max_attempts: int = Field(default=5)
+    processing_reaper_backoff_seconds: int = Field(default=30)
+    
+    # Validierungsberichte über der Schwelle komprimiert in den Processed-Container auslagern (gzip oder zstd)
+    validation_report_offload_threshold_bytes: int = Field(default=64 * 1024)
+    validation_report_compression: str = Field(default="gzip")
+    
+    # Stündliche Rollups für /statistics (Intervall der Neuberechnung, neu berechnete Stunden pro Lauf)
+    stats_rollup_interval_seconds: int = Field(default=300)
+    stats_rollup_refresh_hours: int = Field(default=3)
+    
+    # Archivierung abgeschlossener Transaktionen (Aufbewahrung in den Live-Tabellen, Batchgröße < 2100, Batches pro Lauf)
+    retention_days: int = Field(default=180)
+    cleanup_batch_size: int = Field(default=1000)
+    cleanup_max_batches: int = Field(default=50)
+    
+    # ERP Dubletten-Vorfilter (Bloom-Filter über das Rechnungsjournal)
+    duplicate_filter_enabled: bool = Field(default=True)
+    duplicate_filter_false_positive_rate: float = Field(default=0.001)
+    # Maximales Alter des letzten inkrementellen Syncs, bevor erneut synchronisiert wird
+    duplicate_filter_max_staleness_seconds: int = Field(default=60)
+    # Überlappung des inkrementellen Syncs (spät committete Journal-Einträge) und Intervall des vollständigen Rebuilds
+    duplicate_filter_sync_lag_seconds: int = Field(default=300)
+    duplicate_filter_rebuild_interval_seconds: int = Field(default=3600)
+    
+    # Redis für worker-übergreifenden Zustand (Standard: Celery Broker, falls Redis)
+    redis_url: Optional[str] = Field(default=None)
+    redis_socket_timeout_seconds: float = Field(default=0.5)
+    
+    # ERP Schutz: Circuit Breaker und adaptives Concurrency-Limit (AIMD)
+    erp_resilience_enabled: bool = Field(default=True)
+    erp_circuit_failure_threshold: int = Field(default=5)
+    erp_circuit_failure_window_seconds: int = Field(default=60)
+    erp_circuit_open_seconds: int = Field(default=30)
+    # Aufrufe über dieser Dauer zählen für den Circuit Breaker als Fehler
+    erp_slow_call_seconds: float = Field(default=5.0)
+    erp_concurrency_initial: int = Field(default=8)
+    erp_concurrency_min: int = Field(default=1)
+    erp_concurrency_max: int = Field(default=32)
+    erp_latency_target_seconds: float = Field(default=0.5)
+    erp_acquire_timeout_seconds: float = Field(default=2.0)
+    # Geparkte Business-Validierung (Status AWAITING_ERP): Basis-Verzögerung und maximale Anzahl
+    erp_business_requeue_delay_seconds: int = Field(default=60)
+    erp_business_max_requeues: int = Field(default=30)
+    # Karenz nach der geplanten Fortsetzung, bevor der Reaper eine geparkte Transaktion erneut einplant
+    erp_business_park_grace_seconds: int = Field(default=600)
     
     # Security
     secret_key: str = Field(default="dev-secret-key-change-in-production")
@@ -0,0 +1,42 @@
+"""
+Redis Client für worker-übergreifenden Zustand
+(z.B. Circuit Breaker und Concurrency-Limit des ERP-Zugriffs)
+"""
+
+import logging
+from typing import Optional
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_redis_client = None
+
+
+def get_redis_url() -> Optional[str]:
+    """Explizite REDIS_URL, sonst der Celery Broker (sofern Redis)."""
+    if settings.redis_url:
+        return settings.redis_url
+    if settings.celery_broker_url.startswith(("redis://", "rediss://")):
+        return settings.celery_broker_url
+    return None
+
+
+def get_redis_client():
+    """
+    Liefert den prozessweiten Redis Client (lazy) oder None, wenn kein Redis konfiguriert ist.
+    """
+    global _redis_client
+    if _redis_client is None:
+        url = get_redis_url()
+        if url is None:
+            return None
+        import redis
+        _redis_client = redis.Redis.from_url(
+            url,
+            decode_responses=True,
+            socket_timeout=settings.redis_socket_timeout_seconds,
+            socket_connect_timeout=settings.redis_socket_timeout_seconds,
+        )
+        logger.info(f"🔌 Redis Client initialisiert: {url.split('@')[-1]}")
+    return _redis_client
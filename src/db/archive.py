@@ -0,0 +1,132 @@
+"""
+Archivierung abgeschlossener Transaktionen
+Verschiebt Transaktionen außerhalb des Aufbewahrungsfensters samt Processing Logs in die Archivtabellen.
+Batchweise (ein kurzer DB-Transaktionsblock pro Batch), damit Sperren auf den Live-Tabellen kurz bleiben.
+Die Rohdateien im Blob Storage bleiben unverändert (GoBD Aufbewahrung).
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import delete, insert, select, text
+from sqlalchemy.orm import Session
+
+from .models import (
+    InvoiceTransaction, ProcessingLog, TransactionStatus, ValidationFinding,
+    invoice_transactions_archive, processing_logs_archive,
+)
+
+logger = logging.getLogger(__name__)
+
+# Nur Transaktionen in Endzuständen werden archiviert (RECEIVED/PROCESSING/AWAITING_ERP bleiben live)
+ARCHIVABLE_STATUSES = (
+    TransactionStatus.VALID,
+    TransactionStatus.INVALID,
+    TransactionStatus.MANUAL_REVIEW,
+    TransactionStatus.ERROR,
+)
+
+# Partitionierung der Archivtabellen auf MSSQL (siehe Migration 7b2e4d1a5c02)
+ARCHIVE_PARTITION_FUNCTION = "pf_iiev_archive_monthly"
+ARCHIVE_PARTITION_SCHEME = "ps_iiev_archive_monthly"
+
+
+@dataclass
+class ArchiveBatchResult:
+    transactions: int = 0
+    processing_logs: int = 0
+    findings_deleted: int = 0
+
+
+def select_archivable_ids(db: Session, cutoff: datetime, batch_size: int) -> List:
+    """Die ältesten archivierbaren Transaktionen vor cutoff (Index auf created_at, id)."""
+    rows = db.execute(
+        select(InvoiceTransaction.id)
+        .where(
+            InvoiceTransaction.created_at < cutoff,
+            InvoiceTransaction.status.in_(ARCHIVABLE_STATUSES),
+        )
+        .order_by(InvoiceTransaction.created_at, InvoiceTransaction.id)
+        .limit(batch_size)
+    ).all()
+    return [row[0] for row in rows]
+
+
+def archive_batch(db: Session, cutoff: datetime, batch_size: int) -> ArchiveBatchResult:
+    """
+    Verschiebt einen Batch: INSERT ... SELECT in die Archivtabellen, danach DELETE aus den Live-Tabellen.
+    Kein Commit (ein Commit pro Batch durch den Aufrufer). batch_size unter 2100 halten (MSSQL Parameterlimit).
+    """
+    ids = select_archivable_ids(db, cutoff, batch_size)
+    result = ArchiveBatchResult()
+    if not ids:
+        return result
+
+    transaction_table = InvoiceTransaction.__table__
+    log_table = ProcessingLog.__table__
+
+    db.execute(
+        insert(invoice_transactions_archive).from_select(
+            [column.name for column in transaction_table.columns],
+            select(*transaction_table.columns).where(transaction_table.c.id.in_(ids)),
+        )
+    )
+    db.execute(
+        insert(processing_logs_archive).from_select(
+            [column.name for column in log_table.columns],
+            select(*log_table.columns).where(log_table.c.transaction_id.in_(ids)),
+        )
+    )
+
+    # Findings sind aus dem (ausgelagerten) Bericht rekonstruierbar und werden nicht archiviert
+    result.findings_deleted = db.execute(
+        delete(ValidationFinding).where(ValidationFinding.transaction_id.in_(ids))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    result.processing_logs = db.execute(
+        delete(ProcessingLog).where(ProcessingLog.transaction_id.in_(ids))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    result.transactions = db.execute(
+        delete(InvoiceTransaction).where(InvoiceTransaction.id.in_(ids))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    return result
+
+
+def ensure_archive_partitions(db: Session, months_ahead: int = 3, now: Optional[datetime] = None) -> int:
+    """
+    Nur MSSQL: legt fehlende Monatsgrenzen der Partitionsfunktion bis `months_ahead` Monate im Voraus an
+    (SPLIT RANGE auf leeren Partitionen, daher ohne Datenbewegung). Gibt die Anzahl neuer Grenzen zurück. Kein Commit.
+    """
+    if db.get_bind().dialect.name != "mssql":
+        return 0
+
+    now = now or datetime.now()
+    existing = set(
+        db.execute(text(
+            "SELECT CAST(prv.value AS date) FROM sys.partition_range_values prv "
+            "JOIN sys.partition_functions pf ON pf.function_id = prv.function_id WHERE pf.name = :name"
+        ), {"name": ARCHIVE_PARTITION_FUNCTION}).scalars()
+    )
+    if not existing:
+        logger.warning(f"⚠️ Partitionsfunktion {ARCHIVE_PARTITION_FUNCTION} nicht gefunden (Migration 7b2e4d1a5c02 ausgeführt?).")
+        return 0
+
+    added = 0
+    year, month = now.year, now.month
+    for _ in range(months_ahead + 1):
+        boundary = datetime(year, month, 1)
+        if boundary.date() not in existing and boundary.date() > max(existing):
+            db.execute(text(f"ALTER PARTITION SCHEME {ARCHIVE_PARTITION_SCHEME} NEXT USED [PRIMARY]"))
+            db.execute(text(
+                f"ALTER PARTITION FUNCTION {ARCHIVE_PARTITION_FUNCTION}() "
+                f"SPLIT RANGE ('{boundary:%Y-%m-%d}T00:00:00+00:00')"
+            ))
+            added += 1
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    if added:
+        logger.info(f"🗂️ {added} neue Monatspartitionen für das Archiv angelegt.")
+    return added
@@ -0,0 +1,210 @@
+"""
+Atomarer Claim von Transaktionen (Compare-and-Set) mit Lease
+Verhindert, dass zwei Worker dieselbe Transaktion verarbeiten (z.B. bei acks_late und Redelivery).
+"""
+
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.orm import Session
+
+from .models import InvoiceTransaction, TransactionStatus
+
+logger = logging.getLogger(__name__)
+
+
+class ClaimLostError(Exception):
+    """Der Lease ist abgelaufen und die Transaktion wurde zurückgesetzt oder von einem anderen Worker übernommen."""
+
+
+def current_worker_id(hostname: Optional[str] = None) -> str:
+    """Kennung des Workers für claimed_by (Celery Hostname bzw. Rechnername + PID)."""
+    return f"{hostname or socket.gethostname()}:{os.getpid()}"[:255]
+
+
+class TransactionClaim:
+    """
+    Claim einer Transaktion durch einen Worker.
+    Alle Methoden führen genau ein UPDATE aus und committen nicht (Commit durch den Aufrufer).
+    """
+
+    def __init__(self, transaction_id: uuid.UUID, worker_id: str, lease_seconds: int):
+        self.transaction_id = transaction_id
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.acquired = False
+        self._renewed_at: Optional[float] = None
+
+    def _lease_expires_at(self, now: datetime) -> datetime:
+        return now + timedelta(seconds=self.lease_seconds)
+
+    def acquire(self, db: Session, from_statuses: Iterable[TransactionStatus]) -> bool:
+        """
+        UPDATE ... SET status='PROCESSING', claimed_by, claimed_at, lease_expires_at
+        WHERE id=? AND status IN (...). Nur bei rowcount == 1 gehört die Transaktion diesem Worker.
+        """
+        now = datetime.now()
+        result = db.execute(
+            update(InvoiceTransaction)
+            .where(
+                InvoiceTransaction.id == self.transaction_id,
+                InvoiceTransaction.status.in_(list(from_statuses)),
+            )
+            .values(
+                status=TransactionStatus.PROCESSING,
+                claimed_by=self.worker_id,
+                claimed_at=now,
+                lease_expires_at=self._lease_expires_at(now),
+                updated_at=now,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        self.acquired = result.rowcount == 1
+        if self.acquired:
+            self._renewed_at = time.monotonic()
+        return self.acquired
+
+    def renewal_due(self) -> bool:
+        """Heartbeat nach einem Drittel der Lease-Dauer (spart ein UPDATE pro Verarbeitungsschritt)."""
+        return self._renewed_at is None or time.monotonic() - self._renewed_at >= self.lease_seconds / 3
+
+    def renew(self, db: Session) -> None:
+        """Verlängert den Lease. Löst ClaimLostError aus, wenn der Claim nicht mehr diesem Worker gehört."""
+        now = datetime.now()
+        result = db.execute(
+            self._owned_update().values(lease_expires_at=self._lease_expires_at(now))
+        )
+        if result.rowcount != 1:
+            raise ClaimLostError(f"Claim für Transaction {self.transaction_id} verloren (Worker {self.worker_id}).")
+        self._renewed_at = time.monotonic()
+        logger.debug(f"💓 Lease für {self.transaction_id} verlängert.")
+
+    def release(self, db: Session, status: TransactionStatus, **values: Any) -> bool:
+        """
+        Gibt den Claim mit neuem Status frei (finaler Status, ERROR vor einem Celery Retry, AWAITING_ERP).
+        values überschreiben die Standardwerte (lease_expires_at=None, updated_at=jetzt).
+        """
+        values = {"lease_expires_at": None, "updated_at": datetime.now(), **values}
+        result = db.execute(self._owned_update().values(status=status, **values))
+        return result.rowcount == 1
+
+    def _owned_update(self):
+        return (
+            update(InvoiceTransaction)
+            .where(
+                InvoiceTransaction.id == self.transaction_id,
+                InvoiceTransaction.claimed_by == self.worker_id,
+                InvoiceTransaction.status == TransactionStatus.PROCESSING,
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+
+def _expired_claim_condition(now: datetime, lease_seconds: int):
+    """PROCESSING mit abgelaufenem Lease (bzw. ohne Lease und seit einer Lease-Dauer unverändert)."""
+    return and_(
+        InvoiceTransaction.status == TransactionStatus.PROCESSING,
+        or_(
+            InvoiceTransaction.lease_expires_at < now,
+            and_(
+                InvoiceTransaction.lease_expires_at.is_(None),
+                InvoiceTransaction.updated_at < now - timedelta(seconds=lease_seconds),
+            ),
+        ),
+    )
+
+
+def reap_expired_claims(db: Session, max_attempts: int, lease_seconds: int,
+                        now: Optional[datetime] = None) -> Tuple[List[Tuple[uuid.UUID, int]], int]:
+    """
+    Setzt hängende Verarbeitungen (z.B. nach Hard-Kill/OOM des Workers) mit zwei mengenbasierten UPDATEs zurück:
+    - Retry-Budget erschöpft (retry_count >= max_attempts): Status ERROR
+    - sonst: Status RECEIVED, retry_count + 1 (IDs per RETURNING/OUTPUT für das erneute Einplanen)
+    Gibt ([(id, retry_count), ...], Anzahl ERROR) zurück. Kein Commit.
+    """
+    now = now or datetime.now()
+    expired = _expired_claim_condition(now, lease_seconds)
+    release_values = dict(claimed_by=None, lease_expires_at=None, updated_at=now)
+
+    failed = db.execute(
+        update(InvoiceTransaction)
+        .where(expired, InvoiceTransaction.retry_count >= max_attempts)
+        .values(
+            status=TransactionStatus.ERROR,
+            error_message=f"Verarbeitung hängengeblieben (Lease abgelaufen), Retry-Budget ({max_attempts}) erschöpft.",
+            **release_values,
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    requeued = db.execute(
+        update(InvoiceTransaction)
+        .where(expired)
+        .values(status=TransactionStatus.RECEIVED, retry_count=func.coalesce(InvoiceTransaction.retry_count, 0) + 1, **release_values)
+        .returning(InvoiceTransaction.id, InvoiceTransaction.retry_count)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    return [(row[0], row[1]) for row in requeued], failed
+
+
+def _overdue_parked_condition(now: datetime, grace_seconds: int):
+    """
+    AWAITING_ERP nach Ablauf der Fälligkeit (lease_expires_at = geplante Fortsetzung + Karenz),
+    d.h. die eingeplante Business Validierung ist verloren gegangen (Publish fehlgeschlagen, Nachricht verloren).
+    Ohne Fälligkeit (vor Einführung geparkt): seit der Karenzzeit unverändert.
+    """
+    return and_(
+        InvoiceTransaction.status == TransactionStatus.AWAITING_ERP,
+        or_(
+            InvoiceTransaction.lease_expires_at < now,
+            and_(
+                InvoiceTransaction.lease_expires_at.is_(None),
+                InvoiceTransaction.updated_at < now - timedelta(seconds=grace_seconds),
+            ),
+        ),
+    )
+
+
+def reap_overdue_parked(db: Session, max_attempts: int, grace_seconds: int,
+                        now: Optional[datetime] = None) -> Tuple[List[Tuple[uuid.UUID, int]], int]:
+    """
+    Geparkte Transaktionen (AWAITING_ERP), deren Fortsetzung überfällig ist:
+    - Retry-Budget erschöpft: Status ERROR
+    - sonst: neue Fälligkeit (jetzt + Karenz), retry_count + 1 (IDs für das erneute Einplanen)
+    Gibt ([(id, business_validation_attempt), ...], Anzahl ERROR) zurück (Versuch 1, falls nicht persistiert). Kein Commit.
+    """
+    now = now or datetime.now()
+    overdue = _overdue_parked_condition(now, grace_seconds)
+
+    failed = db.execute(
+        update(InvoiceTransaction)
+        .where(overdue, InvoiceTransaction.retry_count >= max_attempts)
+        .values(
+            status=TransactionStatus.ERROR,
+            error_message=f"Geparkte Business Validierung nicht fortgesetzt, Retry-Budget ({max_attempts}) erschöpft.",
+            lease_expires_at=None,
+            updated_at=now,
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    requeued = db.execute(
+        update(InvoiceTransaction)
+        .where(overdue)
+        .values(
+            lease_expires_at=now + timedelta(seconds=grace_seconds),
+            retry_count=func.coalesce(InvoiceTransaction.retry_count, 0) + 1,
+            updated_at=now,
+        )
+        .returning(InvoiceTransaction.id, InvoiceTransaction.business_validation_attempt)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    return [(row[0], row[1] or 1) for row in requeued], failed
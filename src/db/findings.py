@@ -0,0 +1,49 @@
+"""
+Validierungs-Findings
+Schreibt die Fehler/Warnungen eines ValidationReports in die schmale Tabelle validation_findings,
+damit Auswertungen nach Regel-Code nicht jeden JSON-Bericht deserialisieren müssen.
+"""
+
+import logging
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import delete, insert
+from sqlalchemy.orm import Session
+
+from .models import ValidationFinding
+from ..schemas.validation_report import ValidationReport
+
+logger = logging.getLogger(__name__)
+
+
+def findings_from_report(transaction_id: uuid.UUID, report: ValidationReport,
+                         seller_vat_id: Optional[str] = None, created_at: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Eine Zeile pro ValidationError (Fehler und Warnungen) aller Schritte."""
+    created_at = created_at or datetime.now()
+    rows = []
+    for step in report.steps:
+        for finding in list(step.errors) + list(step.warnings):
+            rows.append({
+                "transaction_id": transaction_id,
+                "code": finding.code,
+                "category": getattr(finding.category, "value", finding.category),
+                "severity": getattr(finding.severity, "value", finding.severity),
+                "step_name": step.step_name,
+                "seller_vat_id": seller_vat_id,
+                "created_at": created_at,
+            })
+    return rows
+
+
+def replace_validation_findings(db: Session, transaction_id: uuid.UUID, rows: List[Dict[str, Any]]) -> int:
+    """
+    Ersetzt die Findings einer Transaktion (idempotent bei Retry/Fortsetzung).
+    Ein DELETE und ein executemany-INSERT, ohne Commit.
+    """
+    db.execute(delete(ValidationFinding).where(ValidationFinding.transaction_id == transaction_id))
+    if rows:
+        db.execute(insert(ValidationFinding.__table__), rows)
+    logger.debug(f"🔎 {len(rows)} Validation Findings für {transaction_id} geschrieben.")
+    return len(rows)
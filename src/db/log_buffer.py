@@ -0,0 +1,96 @@
+"""
+Gepufferte ProcessingLog Einträge
+Sammelt die Logs eines Tasks im Speicher und schreibt sie gesammelt (ein INSERT, ein Commit).
+"""
+
+import logging
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from .models import ProcessingLog
+
+logger = logging.getLogger(__name__)
+
+
+class ProcessingLogBuffer:
+    """
+    Log-Puffer für genau eine Transaktion.
+    flush() fügt die Einträge per executemany in die laufende DB-Transaktion ein, der Commit erfolgt
+    gemeinsam mit dem Status-Update des Aufrufers (z.B. in _finalize_processing).
+    """
+
+    def __init__(self, transaction_id: uuid.UUID):
+        self.transaction_id = transaction_id
+        self._entries: List[Dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, step_name: str, step_status: str, message: str,
+            details: Optional[Dict[str, Any]] = None, duration: Optional[float] = None) -> None:
+        self._entries.append({
+            "id": uuid.uuid4(),
+            "transaction_id": self.transaction_id,
+            "step_name": step_name,
+            "step_status": step_status,
+            "message": message,
+            "details": details,
+            "duration_seconds": duration,
+            # Explizit setzen: Bei einem gemeinsamen INSERT hätten sonst alle Einträge denselben Zeitstempel
+            "created_at": datetime.now(),
+        })
+
+    def flush(self, db: Session) -> int:
+        """Schreibt alle Einträge (ohne Commit). Gibt die Anzahl zurück."""
+        if not self._entries:
+            return 0
+        count = len(self._entries)
+        # Core-Insert auf die Tabelle: ein executemany (ORM-Bulk würde nach NULL-Spalten gruppieren)
+        db.execute(insert(ProcessingLog.__table__), self._entries)
+        self._entries = []
+        logger.debug(f"📝 {count} Processing Logs für {self.transaction_id} geschrieben.")
+        return count
+
+
+class ProcessingLogBufferRegistry:
+    """Aktive Puffer pro Transaktion (ein Task verarbeitet eine Transaktion)."""
+
+    def __init__(self):
+        self._buffers: Dict[str, ProcessingLogBuffer] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(transaction_id) -> str:
+        return str(transaction_id)
+
+    def open(self, transaction_id) -> ProcessingLogBuffer:
+        """Öffnet einen Puffer. Nicht geschriebene Einträge eines vorherigen Versuchs bleiben erhalten."""
+        with self._lock:
+            key = self._key(transaction_id)
+            if key not in self._buffers:
+                self._buffers[key] = ProcessingLogBuffer(uuid.UUID(key))
+            return self._buffers[key]
+
+    def get(self, transaction_id) -> Optional[ProcessingLogBuffer]:
+        return self._buffers.get(self._key(transaction_id))
+
+    def pop(self, transaction_id) -> Optional[ProcessingLogBuffer]:
+        with self._lock:
+            return self._buffers.pop(self._key(transaction_id), None)
+
+    def release(self, transaction_id) -> None:
+        """Entfernt den Puffer, sofern er leer ist (sonst bleibt er für on_failure bzw. den nächsten Versuch)."""
+        with self._lock:
+            key = self._key(transaction_id)
+            buffer = self._buffers.get(key)
+            if buffer is not None and len(buffer) == 0:
+                del self._buffers[key]
+
+
+# Singleton pro Worker-Prozess
+processing_log_buffers = ProcessingLogBufferRegistry()
@@ -6,17 +6,25 @@ Verfolgt den Status jeder eingehenden Rechnung
 import enum
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Enum, JSON, DateTime, func, Text, Integer, Numeric, Boolean, ForeignKey
+from sqlalchemy import Column, String, Enum, JSON, DateTime, func, Text, Integer, BigInteger, Numeric, Boolean, ForeignKey, Index, Table
 from sqlalchemy.dialects.mssql import UNIQUEIDENTIFIER
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import declarative_base
 
 Base = declarative_base()
 
 
+@compiles(UNIQUEIDENTIFIER, "sqlite")
+def _compile_uniqueidentifier_sqlite(type_, compiler, **kw):
+    """UNIQUEIDENTIFIER als CHAR(36) für SQLite (Tests und lokale Benchmarks)."""
+    return "CHAR(36)"
+
+
 class TransactionStatus(str, enum.Enum):
     """Status der Rechnungsverarbeitung"""
     RECEIVED = "RECEIVED"
     PROCESSING = "PROCESSING"
+    AWAITING_ERP = "AWAITING_ERP"  # Geparkt bis das ERP wieder verfügbar ist (Business-Validierung ausstehend)
     VALID = "VALID"
     INVALID = "INVALID"
     MANUAL_REVIEW = "MANUAL_REVIEW"  # Für nicht-strukturierte Daten
@@ -58,6 +66,8 @@ class InvoiceTransaction(Base):
     original_filename = Column(String(255), nullable=True)
     file_size_bytes = Column(Integer, nullable=True)
     content_type = Column(String(100), nullable=True)
+    # SHA-256 der Rohdatei; im CAS-Layout (sha256/<hash>) die Referenz auf den geteilten Blob
+    content_hash = Column(String(64), nullable=True, index=True)
     
     # Azure Blob Storage URIs
     storage_uri_raw = Column(String(1024), nullable=True)
@@ -89,14 +99,32 @@ class InvoiceTransaction(Base):
     error_details = Column(JSON, nullable=True)
     retry_count = Column(Integer, default=0)
     
+    # Claim durch einen Worker (atomares UPDATE) und Lease für das Aufräumen hängender Verarbeitungen
+    # (bei AWAITING_ERP: Fälligkeit der eingeplanten Business Validierung)
+    claimed_by = Column(String(255), nullable=True)
+    claimed_at = Column(DateTime(timezone=True), nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    # Versuch, mit dem die eingeplante Business Validierung läuft (AWAITING_ERP); der Reaper setzt damit fort
+    business_validation_attempt = Column(Integer, nullable=True)
+    
     # Zeitstempel (mit Index für Performance bei Zeitbereichsabfragen)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Index: Der Statistik-Refresh sucht seit dem letzten Lauf geänderte Transaktionen
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), index=True)
     processed_at = Column(DateTime(timezone=True), nullable=True)
     
     # Verarbeitungszeiten (für Performance-Monitoring)
     processing_time_seconds = Column(Numeric(precision=8, scale=3), nullable=True)
     
+    __table_args__ = (
+        # Composite Index für die interne Dublettenprüfung (Lieferant + Rechnungsnummer)
+        Index('ix_invoice_transactions_seller_invoice', 'seller_vat_id', 'invoice_number'),
+        # Keyset-Paginierung der Transaktionsliste (ORDER BY created_at DESC, id DESC)
+        Index('ix_invoice_transactions_created_id', 'created_at', 'id'),
+        # Suche nach abgelaufenen Leases bzw. überfälligen geparkten Transaktionen (status = ... AND lease_expires_at < now)
+        Index('ix_invoice_transactions_status_lease', 'status', 'lease_expires_at'),
+    )
+    
     def __repr__(self):
         return f"<InvoiceTransaction(id={self.id}, status={self.status}, invoice_number={self.invoice_number})>"
     
@@ -108,6 +136,7 @@ class InvoiceTransaction(Base):
             'format_detected': self.format_detected.value if self.format_detected else None,
             'original_filename': self.original_filename,
             'file_size_bytes': self.file_size_bytes,
+            'content_hash': self.content_hash,
             'invoice_number': self.invoice_number,
             'issue_date': self.issue_date.isoformat() if self.issue_date else None,
             'total_amount': float(self.total_amount) if self.total_amount else None,
@@ -148,3 +177,75 @@ class ProcessingLog(Base):
     
     def __repr__(self):
         return f"<ProcessingLog(transaction_id={self.transaction_id}, step={self.step_name}, status={self.step_status})>"
+
+
+class TransactionStatsHourly(Base):
+    """
+    Stündliche Rollups für /statistics (pro Stunde, Status, Format und Latenz-Bucket).
+    Wird periodisch aus invoice_transactions neu berechnet (refresh_transaction_stats_task).
+    """
+    __tablename__ = 'transaction_stats_hourly'
+    
+    # Beginn der Stunde (bezogen auf created_at der Transaktionen)
+    bucket_start = Column(DateTime, primary_key=True)
+    status = Column(Enum(TransactionStatus), primary_key=True)
+    # InvoiceFormat Wert bzw. "NONE" (Format noch nicht erkannt)
+    format_detected = Column(String(20), primary_key=True)
+    # Index in LATENCY_BUCKET_BOUNDS (services/statistics.py), -1 = ohne Verarbeitungszeit
+    latency_bucket = Column(Integer, primary_key=True)
+    
+    transaction_count = Column(Integer, nullable=False, default=0)
+    processing_time_sum = Column(Numeric(precision=18, scale=3), nullable=False, default=0)
+    
+    refreshed_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self):
+        return f"<TransactionStatsHourly(bucket={self.bucket_start}, status={self.status}, format={self.format_detected}, count={self.transaction_count})>"
+
+
+class ValidationFinding(Base):
+    """
+    Einzelne Validierungsfehler/-warnungen (schmale Tabelle für Auswertungen nach Regel-Code).
+    Wird beim Abschluss der Verarbeitung per Bulk-Insert aus dem ValidationReport befüllt.
+    """
+    __tablename__ = 'validation_findings'
+    
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    transaction_id = Column(UNIQUEIDENTIFIER, ForeignKey('invoice_transactions.id'), nullable=False)
+    
+    code = Column(String(100), nullable=True)  # z.B. "BR-DE-15"
+    category = Column(String(20), nullable=False)  # ValidationCategory
+    severity = Column(String(10), nullable=False)  # ValidationSeverity
+    step_name = Column(String(100), nullable=False)
+    # Denormalisiert für Auswertungen pro Lieferant ohne Join
+    seller_vat_id = Column(String(50), nullable=True)
+    
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    
+    __table_args__ = (
+        Index('ix_validation_findings_code_created', 'code', 'created_at'),
+        Index('ix_validation_findings_transaction', 'transaction_id'),
+        Index('ix_validation_findings_seller_created', 'seller_vat_id', 'created_at'),
+    )
+    
+    def __repr__(self):
+        return f"<ValidationFinding(transaction_id={self.transaction_id}, code={self.code}, severity={self.severity})>"
+
+
+def _archive_table(source, name: str) -> Table:
+    """
+    Archivtabelle mit den Spalten der Quelle (ohne Primärschlüssel, Fremdschlüssel und Defaults) plus archived_at.
+    Auf MSSQL wird sie per Migration nach Monat (created_at) partitioniert angelegt.
+    """
+    columns = [Column(column.name, column.type, nullable=column.nullable) for column in source.columns]
+    return Table(
+        name, Base.metadata,
+        *columns,
+        Column('archived_at', DateTime(timezone=True), nullable=False, server_default=func.now()),
+        Index(f'ix_{name}_created_id', 'created_at', 'id', mssql_clustered=True),
+    )
+
+
+# Archiv für abgeschlossene Transaktionen außerhalb des Aufbewahrungsfensters (cleanup_old_results_task)
+invoice_transactions_archive = _archive_table(InvoiceTransaction.__table__, 'invoice_transactions_archive')
+processing_logs_archive = _archive_table(ProcessingLog.__table__, 'processing_logs_archive')
@@ -3,11 +3,14 @@ Datenbank Session Management
 Getrennte Sessions für Metadaten-DB und ERP-DB
 """
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from contextlib import contextmanager
-from typing import Generator
+from datetime import datetime, timedelta
+from typing import Generator, Optional
 import logging
 
 from ..core.config import settings
@@ -22,6 +25,21 @@ metadata_engine = create_engine(
     pool_recycle=3600,
 )
 
+# Lese-Engine für die Status API: Replikat (database_read_url) oder eigener Pool auf dem Primary,
+# damit pollende Dashboards nicht mit den Workern um Verbindungen konkurrieren
+_metadata_read_url = make_url(settings.database_read_url or settings.database_url)
+metadata_read_engine = create_engine(
+    _metadata_read_url,
+    echo=settings.debug,
+    pool_pre_ping=True,
+    pool_recycle=3600,
+    # SQLite (Tests/Entwicklung) nutzt eigene Pool-Klassen ohne Größenbegrenzung
+    **({} if _metadata_read_url.get_backend_name() == "sqlite" else {
+        "pool_size": settings.database_read_pool_size,
+        "max_overflow": settings.database_read_max_overflow,
+    }),
+)
+
 # ERP-Datenbank Engine (MSSQL - Read Only)
 erp_engine = create_engine(
     settings.erp_database_url,
@@ -31,8 +49,12 @@ erp_engine = create_engine(
     poolclass=NullPool,  # Keine Connection Pooling für ERP DB
 )
 
+# Asynchrone ERP Engine (aioodbc) - wird erst bei Bedarf erstellt (nur API-Prozess)
+_async_erp_engine: Optional[AsyncEngine] = None
+
 # Session Factories
 MetadataSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=metadata_engine)
+MetadataReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=metadata_read_engine)
 ERPSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=erp_engine)
 
 
@@ -54,6 +76,45 @@ def get_metadata_session() -> Generator[Session, None, None]:
         session.close()
 
 
+@contextmanager
+def get_metadata_read_session() -> Generator[Session, None, None]:
+    """
+    Context Manager für lesende Metadaten-Sessions (Replikat bzw. Lese-Pool)
+    Kein Commit, die Transaktion wird am Ende zurückgerollt
+    """
+    session = MetadataReadSessionLocal()
+    try:
+        yield session
+    except Exception as e:
+        logger.error(f"Datenbank-Fehler in Metadaten-Lese-Session: {e}")
+        raise
+    finally:
+        session.rollback()
+        session.close()
+
+
+def read_replica_configured() -> bool:
+    return bool(settings.database_read_url)
+
+
+def may_be_stale_on_replica(*timestamps: Optional[datetime]) -> bool:
+    """
+    True, wenn einer der Zeitstempel (z.B. created_at, updated_at) im Staleness-Fenster liegt
+    und das Replikat den aktuellen Stand daher evtl. noch nicht kennt.
+    """
+    if not read_replica_configured():
+        return False
+    window_start = datetime.now() - timedelta(seconds=settings.database_read_staleness_seconds)
+    for timestamp in timestamps:
+        if timestamp is None:
+            continue
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone().replace(tzinfo=None)
+        if timestamp >= window_start:
+            return True
+    return False
+
+
 @contextmanager
 def get_erp_session() -> Generator[Session, None, None]:
     """
@@ -71,6 +132,40 @@ def get_erp_session() -> Generator[Session, None, None]:
         session.close()
 
 
+def _get_async_erp_database_url() -> str:
+    """Leitet die Async URL aus der ERP URL ab, falls keine explizite URL konfiguriert ist."""
+    if settings.erp_async_database_url:
+        return settings.erp_async_database_url
+    return settings.erp_database_url.replace("mssql+pyodbc://", "mssql+aioodbc://", 1)
+
+
+def get_async_erp_engine() -> AsyncEngine:
+    """
+    Liefert die asynchrone ERP Engine (Read-Only).
+    Im Gegensatz zur synchronen Engine mit kleinem Pool, da der async Adapter
+    unabhängige Lookups parallel auf eigenen Verbindungen ausführt.
+    """
+    global _async_erp_engine
+    if _async_erp_engine is None:
+        _async_erp_engine = create_async_engine(
+            _get_async_erp_database_url(),
+            echo=settings.debug,
+            pool_pre_ping=True,
+            pool_recycle=3600,
+            pool_size=settings.erp_async_pool_size,
+            max_overflow=0,
+        )
+    return _async_erp_engine
+
+
+async def dispose_async_erp_engine() -> None:
+    """Schließt den Pool der asynchronen ERP Engine (Shutdown)."""
+    global _async_erp_engine
+    if _async_erp_engine is not None:
+        await _async_erp_engine.dispose()
+        _async_erp_engine = None
+
+
 def get_metadata_session_dependency() -> Generator[Session, None, None]:
     """
     Dependency für FastAPI Dependency Injection
@@ -79,6 +174,14 @@ def get_metadata_session_dependency() -> Generator[Session, None, None]:
         yield session
 
 
+def get_metadata_read_session_dependency() -> Generator[Session, None, None]:
+    """
+    Dependency für lesende Endpunkte (Replikat bzw. Lese-Pool)
+    """
+    with get_metadata_read_session() as session:
+        yield session
+
+
 def get_erp_session_dependency() -> Generator[Session, None, None]:
     """
     Dependency für FastAPI Dependency Injection (ERP)
@@ -105,6 +208,17 @@ def health_check_databases() -> dict:
     except Exception as e:
         logger.error(f"Metadaten-DB Verbindungsfehler: {e}")
     
+    # Test Lesereplikat (nur wenn separat konfiguriert)
+    if read_replica_configured():
+        health["metadata_read_db"] = False
+        try:
+            with get_metadata_read_session() as session:
+                session.execute(text("SELECT 1"))
+                health["metadata_read_db"] = True
+                logger.info("Metadaten-Lesereplikat Verbindung erfolgreich")
+        except Exception as e:
+            logger.error(f"Metadaten-Lesereplikat Verbindungsfehler: {e}")
+    
     # Test ERP-DB
     try:
         with get_erp_session() as session:
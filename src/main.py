@@ -12,8 +12,9 @@ from contextlib import asynccontextmanager
 
 from .core.config import settings
 from .core.azure_clients import azure_clients
-from .db.session import health_check_databases
-from .api import upload, status, health
+from .db.session import health_check_databases, dispose_async_erp_engine
+from .services.storage_service import get_async_blob_service_client, close_async_blob_service_client
+from .api import upload, status, health, export, downloads
 
 
 # Logging konfigurieren
@@ -34,6 +35,12 @@ async def lifespan(app: FastAPI):
     logger.info(f"🚀 IIEV-Ultra {settings.app_version} startet...")
     logger.info(f"Umgebung: {settings.environment}")
     
+    # Gemeinsamer async Blob Client für alle Requests dieses Workers
+    try:
+        get_async_blob_service_client()
+    except Exception as e:
+        logger.error(f"❌ Async Blob Storage Client konnte nicht erstellt werden: {e}")
+    
     # Gesundheitsprüfung der Services
     try:
         # Azure Services prüfen
@@ -56,6 +63,8 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("🛑 IIEV-Ultra wird heruntergefahren...")
+    await dispose_async_erp_engine()
+    await close_async_blob_service_client()
 
 
 # FastAPI App erstellen
@@ -134,6 +143,8 @@ async def global_exception_handler(request: Request, exc: Exception):
 app.include_router(health.router, tags=["Health"])
 app.include_router(upload.router, prefix=settings.api_v1_prefix, tags=["Upload"])
 app.include_router(status.router, prefix=settings.api_v1_prefix, tags=["Status"])
+app.include_router(export.router, prefix=settings.api_v1_prefix, tags=["Export"])
+app.include_router(downloads.router, prefix=settings.api_v1_prefix, tags=["Downloads"])
 
 
 # Root Endpoint
@@ -0,0 +1,167 @@
+# src/services/blob_cache.py
+
+"""
+Worker-lokaler LRU Cache für heruntergeladene Raw-Blobs (auf der Festplatte)
+Schlüssel ist Blob URI + ETag: ein Retry von process_invoice_task lädt denselben Blob nicht erneut herunter,
+sondern prüft per bedingtem GET (If-None-Match) nur, ob er sich geändert hat. CAS-Blobs (sha256/<hash>)
+sind unveränderlich und werden ohne Rückfrage beim Storage aus dem Cache bedient.
+
+Layout: <verzeichnis>/<sha256(uri)>/<etag base64>. Mehrere Worker-Prozesse eines Knotens teilen sich das
+Verzeichnis; Schreiben erfolgt atomar (Temp-Datei + os.replace), die LRU-Reihenfolge ergibt sich aus der mtime.
+"""
+
+import base64
+import hashlib
+import logging
+import os
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Nach einer Verdrängung wird bis auf diesen Anteil der Maximalgröße aufgeräumt
+EVICTION_LOW_WATERMARK = 0.9
+
+
+class BlobDiskCache:
+    """Größenbegrenzter LRU Cache (Bytes auf der Festplatte) für Blob-Inhalte."""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        # Geschätzte Belegung (nur eigene Schreibvorgänge seit dem letzten Scan)
+        self._approx_bytes: Optional[int] = None
+        self._metrics = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "evicted_bytes": 0, "errors": 0}
+
+    def _entry_dir(self, uri: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(uri.encode("utf-8")).hexdigest())
+
+    def _entry_path(self, uri: str, etag: str) -> str:
+        return os.path.join(self._entry_dir(uri), base64.urlsafe_b64encode(etag.encode("utf-8")).decode("ascii"))
+
+    def cached_etag(self, uri: str) -> Optional[str]:
+        """ETag des zuletzt gespeicherten Inhalts zu einem URI (oder None)."""
+        try:
+            entries = [entry for entry in os.scandir(self._entry_dir(uri)) if not entry.name.startswith(".")]
+        except FileNotFoundError:
+            return None
+        if not entries:
+            return None
+        newest = max(entries, key=lambda entry: entry.stat().st_mtime)
+        return base64.urlsafe_b64decode(newest.name.encode("ascii")).decode("utf-8")
+
+    def get(self, uri: str, etag: str) -> Optional[bytes]:
+        """Inhalt zu (URI, ETag) oder None. Ein Treffer aktualisiert die LRU-Position."""
+        path = self._entry_path(uri, etag)
+        try:
+            with open(path, "rb") as handle:
+                data = handle.read()
+            os.utime(path)
+        except FileNotFoundError:
+            # Zwischenzeitlich von einem anderen Prozess verdrängt
+            self._metrics["misses"] += 1
+            return None
+        except OSError as e:
+            logger.warning(f"⚠️ Blob Cache Lesefehler für {uri}: {e}")
+            self._metrics["errors"] += 1
+            return None
+        self._metrics["hits"] += 1
+        return data
+
+    def record_miss(self) -> None:
+        self._metrics["misses"] += 1
+
+    def put(self, uri: str, etag: Optional[str], data: bytes) -> None:
+        """Speichert den Inhalt atomar und entfernt ältere Versionen desselben URI. Fehler werden nur geloggt."""
+        if not etag or len(data) > self.max_bytes:
+            return
+        entry_dir = self._entry_dir(uri)
+        path = self._entry_path(uri, etag)
+        try:
+            os.makedirs(entry_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=entry_dir, prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as handle:
+                    handle.write(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            for entry in os.scandir(entry_dir):
+                if entry.path != path and not entry.name.startswith("."):
+                    self._remove(entry.path)
+        except OSError as e:
+            logger.warning(f"⚠️ Blob Cache Schreibfehler für {uri}: {e}")
+            self._metrics["errors"] += 1
+            return
+
+        self._metrics["stores"] += 1
+        if self._approx_bytes is None:
+            self._approx_bytes = self._scan_size()
+        else:
+            self._approx_bytes += len(data)
+        if self._approx_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self) -> None:
+        """Verdrängt die am längsten nicht genutzten Einträge, bis die Belegung unter der Low Watermark liegt."""
+        entries = self._scan_entries()
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * EVICTION_LOW_WATERMARK)
+        if total > self.max_bytes:
+            for path, size, _ in sorted(entries, key=lambda entry: entry[2]):
+                if total <= target:
+                    break
+                if self._remove(path):
+                    total -= size
+                    self._metrics["evictions"] += 1
+                    self._metrics["evicted_bytes"] += size
+        self._approx_bytes = total
+
+    def _scan_entries(self) -> List[Tuple[str, int, float]]:
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.startswith("."):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._scan_entries())
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.unlink(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        """Metriken für Monitoring (Health Check des Workers)."""
+        stats = dict(self._metrics)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["approx_size_bytes"] = self._approx_bytes
+        stats["max_bytes"] = self.max_bytes
+        return stats
+
+
+def create_default_cache() -> Optional[BlobDiskCache]:
+    """Cache gemäß Settings (None, wenn deaktiviert oder das Verzeichnis nicht nutzbar ist)."""
+    from ..core.config import settings
+
+    if not settings.raw_blob_cache_enabled:
+        return None
+    try:
+        return BlobDiskCache(settings.raw_blob_cache_dir, settings.raw_blob_cache_max_mb * 1024 * 1024)
+    except OSError as e:
+        logger.warning(f"⚠️ Blob Cache deaktiviert, Verzeichnis {settings.raw_blob_cache_dir} nicht nutzbar: {e}")
+        return None
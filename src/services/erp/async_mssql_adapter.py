@@ -0,0 +1,120 @@
+import logging
+from typing import Optional, List, Iterable
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.exc import SQLAlchemyError
+
+from .interface import AsyncIERPAdapter, ERPVendor, ERPBankDetails, ERPPurchaseOrder
+from .duplicate_filter import DuplicateInvoiceFilter
+from .mssql_adapter import (
+    MAX_IN_PARAMETERS,
+    VENDOR_BY_VAT_ID_QUERY,
+    DUPLICATE_COUNT_QUERY,
+    BANK_DETAILS_QUERY,
+    PO_WITH_LINES_QUERY,
+    PO_HEADER_QUERY,
+    PO_LINES_QUERY,
+    normalize_item_identifiers,
+    row_to_vendor,
+    row_to_po_line,
+    rows_to_purchase_order,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncMSSQL_ERPAdapter(AsyncIERPAdapter):
+    """
+    Asynchrone Implementierung für Azure MSSQL ERP Systeme (Treiber: aioodbc).
+    Nutzt dieselben Textual-SQL Abfragen wie MSSQL_ERPAdapter.
+
+    Jede Abfrage holt sich eine eigene Verbindung aus dem Pool, da eine AsyncSession/AsyncConnection
+    keine parallelen Operationen erlaubt. So können unabhängige Lookups per asyncio.gather laufen.
+    """
+
+    def __init__(self, engine: AsyncEngine, duplicate_filter: Optional[DuplicateInvoiceFilter] = None):
+        self.engine = engine
+        # Der Filter wird im API-Prozess nur gelesen (Sync/Rebuild erfolgt im Worker)
+        self.duplicate_filter = duplicate_filter
+
+    # --------------------------------------------------------------------
+    # 4.1 Kreditor-Lookup
+    # --------------------------------------------------------------------
+    async def find_vendor_by_vat_id(self, vat_id: str) -> Optional[ERPVendor]:
+        if not vat_id:
+            return None
+
+        try:
+            async with self.engine.connect() as conn:
+                result = (await conn.execute(VENDOR_BY_VAT_ID_QUERY, {"vat_id": vat_id})).fetchone()
+            return row_to_vendor(result) if result else None
+        except SQLAlchemyError as e:
+            logger.error(f"Datenbankfehler beim Kreditor-Lookup für USt-IdNr. {vat_id}: {e}")
+            raise
+
+    # --------------------------------------------------------------------
+    # 4.2 Dublettenprüfung
+    # --------------------------------------------------------------------
+    async def is_duplicate_invoice(self, vendor_id: str, invoice_number: str) -> bool:
+        # Vorfilter nur verwenden, wenn er aktuell ist (kein Nachziehen im Event Loop)
+        use_filter = self.duplicate_filter is not None and self.duplicate_filter.is_ready and self.duplicate_filter.is_fresh()
+        if use_filter and not self.duplicate_filter.might_contain(vendor_id, invoice_number):
+            return False
+
+        try:
+            async with self.engine.connect() as conn:
+                count = (await conn.execute(DUPLICATE_COUNT_QUERY, {
+                    "vendor_id": vendor_id,
+                    "invoice_number": invoice_number
+                })).scalar()
+            is_duplicate = count > 0
+            if use_filter:
+                self.duplicate_filter.record_result(is_duplicate)
+            return is_duplicate
+        except SQLAlchemyError as e:
+            logger.error(f"Datenbankfehler bei Dublettenprüfung für {invoice_number}: {e}")
+            raise
+
+    # --------------------------------------------------------------------
+    # 4.3 Bankdaten-Validierung
+    # --------------------------------------------------------------------
+    async def get_vendor_bank_details(self, vendor_id: str) -> List[ERPBankDetails]:
+        try:
+            async with self.engine.connect() as conn:
+                results = (await conn.execute(BANK_DETAILS_QUERY, {"vendor_id": vendor_id})).fetchall()
+            return [ERPBankDetails(iban=row.IBAN) for row in results if row.IBAN]
+        except SQLAlchemyError as e:
+            logger.error(f"Datenbankfehler beim Abruf der Bankdaten für {vendor_id}: {e}")
+            raise
+
+    # --------------------------------------------------------------------
+    # 4.4 & 4.5 Bestellabgleich (Header und Positionen)
+    # --------------------------------------------------------------------
+    async def get_purchase_order_details(self, po_number: str, vendor_id: str, item_identifiers: Optional[Iterable[str]] = None) -> Optional[ERPPurchaseOrder]:
+        if not po_number:
+            return None
+
+        hans = normalize_item_identifiers(item_identifiers)
+
+        try:
+            async with self.engine.connect() as conn:
+                if hans and len(hans) <= MAX_IN_PARAMETERS:
+                    rows = (await conn.execute(PO_WITH_LINES_QUERY, {"po_number": po_number, "hans": hans})).fetchall()
+                else:
+                    rows = (await conn.execute(PO_HEADER_QUERY, {"po_number": po_number})).fetchall()
+
+                erp_po = rows_to_purchase_order(rows, po_number, vendor_id)
+                if erp_po is None:
+                    return None
+
+                # Kein Lazy Loading im async Pfad: große HAN-Listen direkt in Blöcken laden
+                if len(hans) > MAX_IN_PARAMETERS:
+                    for i in range(0, len(hans), MAX_IN_PARAMETERS):
+                        chunk = hans[i:i + MAX_IN_PARAMETERS]
+                        for row in await conn.execute(PO_LINES_QUERY, {"po_number": po_number, "hans": chunk}):
+                            erp_po.lines[row.ArtikelHAN] = row_to_po_line(row)
+
+            return erp_po
+
+        except SQLAlchemyError as e:
+            logger.error(f"Datenbankfehler beim Abruf der Bestellung {po_number}: {e}")
+            raise
@@ -0,0 +1,246 @@
+# src/services/erp/duplicate_filter.py
+
+"""
+Probabilistischer Vorfilter für die Dublettenprüfung (Bloom-Filter)
+Hält alle (KreditorID, ExterneRechnungsNr) Paare des Rechnungsjournals im Speicher,
+damit das ERP nur noch bei einem möglichen Treffer abgefragt wird.
+"""
+
+import hashlib
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Ein Journal-Eintrag: (vendor_id, invoice_number, erfasst_am)
+JournalKey = Tuple[str, str, Optional[datetime]]
+
+
+class BloomFilter:
+    """
+    Einfacher Bloom-Filter auf Basis eines bytearray (Double Hashing mit BLAKE2b).
+    Liefert niemals False Negatives, nur (konfigurierbar seltene) False Positives.
+    """
+
+    def __init__(self, capacity: int, false_positive_rate: float):
+        capacity = max(capacity, 1)
+        # Optimale Parameter: m = -n * ln(p) / ln(2)^2, k = m / n * ln(2)
+        self.num_bits = max(int(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2)), 8)
+        self.num_hashes = max(int(round(self.num_bits / capacity * math.log(2))), 1)
+        self.capacity = capacity
+        self.count = 0
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: str) -> None:
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    @property
+    def expected_false_positive_rate(self) -> float:
+        """Theoretische FP-Rate beim aktuellen Füllstand: (1 - e^(-k*n/m))^k"""
+        if self.count == 0:
+            return 0.0
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+
+def make_journal_key(vendor_id: str, invoice_number: str) -> str:
+    """
+    Normalisierter Schlüssel für den Filter.
+    ANNAHME: Das ERP vergleicht mit einer case-insensitiven Collation (MSSQL Standard).
+    Daher normalisieren wir hier ebenfalls, um False Negatives auszuschließen.
+    """
+    return f"{str(vendor_id).strip().casefold()}\x1f{str(invoice_number).strip().casefold()}"
+
+
+class DuplicateInvoiceFilter:
+    """
+    Prozessweiter Vorfilter für is_duplicate_invoice.
+
+    - Wird beim Worker-Start aus dem Rechnungsjournal aufgebaut (rebuild).
+    - Wird inkrementell anhand des Erfassungszeitpunkts nachgezogen (sync), mit Überlappung (sync_lag_seconds)
+      für Einträge, deren ErfasstAm vor dem Watermark liegt, die aber erst nach dem letzten Sync committet wurden.
+    - Wird periodisch vollständig neu aufgebaut (rebuild_interval_seconds), damit auch Einträge außerhalb
+      des Überlappungsfensters (z.B. nachträglich korrigierte Zeitstempel) aufgenommen werden.
+    - Ist der Filter nicht bereit oder veraltet, muss der Aufrufer das ERP direkt abfragen.
+    """
+
+    def __init__(self, false_positive_rate: float = 0.001, max_staleness_seconds: int = 60, min_capacity: int = 10_000,
+                 sync_lag_seconds: int = 300, rebuild_interval_seconds: int = 3600):
+        self.false_positive_rate = false_positive_rate
+        self.max_staleness_seconds = max_staleness_seconds
+        self.min_capacity = min_capacity
+        self.sync_lag_seconds = sync_lag_seconds
+        self.rebuild_interval_seconds = rebuild_interval_seconds
+
+        self._filter: Optional[BloomFilter] = None
+        self._watermark: Optional[datetime] = None
+        self._last_sync_monotonic: Optional[float] = None
+        self._last_rebuild_monotonic: Optional[float] = None
+        self._lock = threading.Lock()
+
+        # Metriken
+        self._metrics: Dict[str, Any] = {
+            "rebuild_count": 0,
+            "last_rebuild_duration_seconds": None,
+            "last_rebuild_at": None,
+            "sync_count": 0,
+            "lookups": 0,
+            "negatives": 0,
+            "possible_hits": 0,
+            "confirmed_hits": 0,
+            "false_positives": 0,
+        }
+
+    @property
+    def is_ready(self) -> bool:
+        return self._filter is not None
+
+    def is_fresh(self) -> bool:
+        """Ist der letzte Sync jünger als max_staleness_seconds?"""
+        if self._last_sync_monotonic is None:
+            return False
+        return (time.monotonic() - self._last_sync_monotonic) <= self.max_staleness_seconds
+
+    def rebuild(self, keys: Iterable[JournalKey], expected_count: Optional[int] = None) -> None:
+        """Baut den Filter vollständig neu auf (z.B. beim Worker-Start)."""
+        start = time.time()
+        entries = list(keys)
+        capacity = max(2 * max(expected_count or 0, len(entries)), self.min_capacity)
+        new_filter = BloomFilter(capacity, self.false_positive_rate)
+        watermark: Optional[datetime] = None
+
+        for vendor_id, invoice_number, erfasst_am in entries:
+            new_filter.add(make_journal_key(vendor_id, invoice_number))
+            if erfasst_am and (watermark is None or erfasst_am > watermark):
+                watermark = erfasst_am
+
+        duration = time.time() - start
+        with self._lock:
+            self._filter = new_filter
+            self._watermark = watermark
+            self._last_sync_monotonic = self._last_rebuild_monotonic = time.monotonic()
+            self._metrics["rebuild_count"] += 1
+            self._metrics["last_rebuild_duration_seconds"] = round(duration, 3)
+            self._metrics["last_rebuild_at"] = datetime.now().isoformat()
+
+        logger.info(f"🧮 Dubletten-Filter aufgebaut: {len(entries)} Einträge, {new_filter.num_bits} Bits, {new_filter.num_hashes} Hashes ({duration:.3f}s)")
+
+    def rebuild_due(self) -> bool:
+        """Ist der letzte vollständige Aufbau älter als rebuild_interval_seconds?"""
+        if self._last_rebuild_monotonic is None:
+            return True
+        return (time.monotonic() - self._last_rebuild_monotonic) >= self.rebuild_interval_seconds
+
+    def _sync_since(self) -> Optional[datetime]:
+        """Watermark abzüglich Überlappung (erneutes Hinzufügen bekannter Schlüssel ist unkritisch)."""
+        if self._watermark is None:
+            return None
+        return self._watermark - timedelta(seconds=self.sync_lag_seconds)
+
+    def sync(self, loader: Callable[[Optional[datetime]], Iterable[JournalKey]]) -> int:
+        """
+        Zieht Journal-Einträge seit dem letzten Watermark (abzüglich sync_lag_seconds) nach.
+        Ist der periodische Rebuild fällig oder läuft der Filter voll, wird vollständig neu aufgebaut.
+        """
+        if self._filter is None or self.rebuild_due():
+            self.rebuild(loader(None))
+            return self._filter.count
+
+        added = 0
+        with self._lock:
+            for vendor_id, invoice_number, erfasst_am in loader(self._sync_since()):
+                self._filter.add(make_journal_key(vendor_id, invoice_number))
+                if erfasst_am and (self._watermark is None or erfasst_am > self._watermark):
+                    self._watermark = erfasst_am
+                added += 1
+            self._last_sync_monotonic = time.monotonic()
+            self._metrics["sync_count"] += 1
+            overfull = self._filter.count > self._filter.capacity
+
+        if overfull:
+            logger.info("🧮 Dubletten-Filter hat Kapazität überschritten. Führe Rebuild durch.")
+            self.rebuild(loader(None))
+        elif added:
+            logger.debug(f"Dubletten-Filter: {added} neue Journal-Einträge synchronisiert.")
+        return added
+
+    def add(self, vendor_id: str, invoice_number: str) -> None:
+        """Fügt einen bekannten Schlüssel hinzu (z.B. nach bestätigtem Treffer)."""
+        if self._filter is not None:
+            with self._lock:
+                self._filter.add(make_journal_key(vendor_id, invoice_number))
+
+    def might_contain(self, vendor_id: str, invoice_number: str) -> bool:
+        """
+        True, wenn die Rechnung im Journal existieren KÖNNTE (ERP-Abfrage nötig).
+        False bedeutet garantiert keine Dublette (bezogen auf den Stand des letzten Syncs).
+        """
+        if self._filter is None:
+            return True
+        self._metrics["lookups"] += 1
+        if make_journal_key(vendor_id, invoice_number) in self._filter:
+            self._metrics["possible_hits"] += 1
+            return True
+        self._metrics["negatives"] += 1
+        return False
+
+    def record_result(self, is_duplicate: bool) -> None:
+        """
+        Meldet das Ergebnis der ERP-Abfrage nach einem möglichen Treffer (für die FP-Rate).
+        Nur aufrufen, wenn might_contain die Anfrage beantwortet hat (nicht bei direkter ERP-Abfrage).
+        """
+        if is_duplicate:
+            self._metrics["confirmed_hits"] += 1
+        else:
+            self._metrics["false_positives"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Metriken für Monitoring (Health Check des Workers)."""
+        stats = dict(self._metrics)
+        negatives_total = stats["false_positives"] + stats["negatives"]
+        stats["observed_false_positive_rate"] = round(stats["false_positives"] / negatives_total, 6) if negatives_total else 0.0
+        stats["ready"] = self.is_ready
+        stats["fresh"] = self.is_fresh()
+        stats["watermark"] = self._watermark.isoformat() if self._watermark else None
+        if self._filter is not None:
+            stats["entries"] = self._filter.count
+            stats["capacity"] = self._filter.capacity
+            stats["size_bytes"] = len(self._filter._bits)
+            stats["expected_false_positive_rate"] = round(self._filter.expected_false_positive_rate, 6)
+        return stats
+
+
+# Singleton Instanz pro Worker-Prozess (lazy: der Import benötigt keine App-Konfiguration, z.B. für Skripte)
+_duplicate_invoice_filter: Optional[DuplicateInvoiceFilter] = None
+_duplicate_invoice_filter_lock = threading.Lock()
+
+
+def get_duplicate_invoice_filter() -> DuplicateInvoiceFilter:
+    """Prozessweiter Dubletten-Filter, beim ersten Zugriff aus den Settings erstellt."""
+    global _duplicate_invoice_filter
+    if _duplicate_invoice_filter is None:
+        with _duplicate_invoice_filter_lock:
+            if _duplicate_invoice_filter is None:
+                from ...core.config import settings
+                _duplicate_invoice_filter = DuplicateInvoiceFilter(
+                    false_positive_rate=settings.duplicate_filter_false_positive_rate,
+                    max_staleness_seconds=settings.duplicate_filter_max_staleness_seconds,
+                    sync_lag_seconds=settings.duplicate_filter_sync_lag_seconds,
+                    rebuild_interval_seconds=settings.duplicate_filter_rebuild_interval_seconds,
+                )
+    return _duplicate_invoice_filter
@@ -1,7 +1,8 @@
 from abc import ABC, abstractmethod
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Iterator, Tuple, Iterable, Callable, Set
 from decimal import Decimal
-from pydantic import BaseModel
+from datetime import datetime
+from pydantic import BaseModel, Field, PrivateAttr
 
 # --- Datenstrukturen für ERP Antworten ---
 
@@ -25,14 +26,47 @@ class ERPPurchaseOrderLine(BaseModel):
     def quantity_open(self) -> Decimal:
         return self.quantity_ordered - self.quantity_invoiced
 
+# Lädt Bestellpositionen für eine Liste von HANs nach
+LineLoader = Callable[[List[str]], Dict[str, ERPPurchaseOrderLine]]
+
 class ERPPurchaseOrder(BaseModel):
-    """Repräsentiert die Bestellung (Kopf und Positionen) aus dem ERP."""
+    """
+    Repräsentiert die Bestellung (Kopf und Positionen) aus dem ERP.
+    Positionen werden nur teilweise geladen (die der Rechnung) und bei Bedarf nachgeladen.
+    """
     po_number: str
     vendor_id: str
     total_net_amount: Decimal
     is_open_for_invoicing: bool
-    # Dictionary keyed by HAN/EAN/GTIN für schnellen Zugriff beim Abgleich
-    lines: Dict[str, ERPPurchaseOrderLine] 
+    # Dictionary keyed by HAN/EAN/GTIN für schnellen Zugriff beim Abgleich (nur bereits geladene Positionen)
+    lines: Dict[str, ERPPurchaseOrderLine] = Field(default_factory=dict)
+
+    # Lazy Loading: Lädt Positionen für eine Liste von HANs nach (gesetzt durch den Adapter)
+    _line_loader: Optional[LineLoader] = PrivateAttr(default=None)
+    # HANs, von denen bekannt ist, dass sie nicht in der Bestellung vorkommen
+    _absent_hans: Set[str] = PrivateAttr(default_factory=set)
+
+    def set_line_loader(self, loader: LineLoader, absent_hans: Iterable[str] = ()) -> None:
+        self._line_loader = loader
+        self._absent_hans = set(absent_hans)
+
+    def wrap_line_loader(self, wrapper: Callable[[LineLoader], LineLoader]) -> None:
+        """Umhüllt den gesetzten Line-Loader (z.B. mit dem ERP-Guard). Ohne Loader keine Änderung."""
+        if self._line_loader is not None:
+            self._line_loader = wrapper(self._line_loader)
+
+    def get_line(self, han: str) -> Optional[ERPPurchaseOrderLine]:
+        """Liefert die (aggregierte) Position zur HAN, lädt sie bei Bedarf nach."""
+        if han in self.lines:
+            return self.lines[han]
+        if han in self._absent_hans or self._line_loader is None:
+            return None
+
+        loaded = self._line_loader([han])
+        self.lines.update(loaded)
+        if han not in loaded:
+            self._absent_hans.add(han)
+        return loaded.get(han)
 
 # --- Das Adapter Interface ---
 
@@ -51,14 +85,53 @@ class IERPAdapter(ABC):
         """Prüft, ob die Rechnungsnummer bereits existiert."""
         pass
 
+    @abstractmethod
+    def get_journal_keys(self, since: Optional[datetime] = None) -> Iterator[Tuple[str, str, Optional[datetime]]]:
+        """
+        Liefert (KreditorID, ExterneRechnungsNr, Erfassungszeitpunkt) aller Journal-Einträge,
+        optional nur die seit einem Zeitpunkt erfassten (für den Dubletten-Vorfilter).
+        """
+        pass
+
     @abstractmethod
     def get_vendor_bank_details(self, vendor_id: str) -> List[ERPBankDetails]:
         """Ruft die hinterlegten Bankverbindungen ab."""
         pass
 
     @abstractmethod
-    def get_purchase_order_details(self, po_number: str, vendor_id: str) -> Optional[ERPPurchaseOrder]:
+    def get_purchase_order_details(self, po_number: str, vendor_id: str, item_identifiers: Optional[Iterable[str]] = None) -> Optional[ERPPurchaseOrder]:
+        """
+        Ruft Details einer Bestellung ab und prüft die Zugehörigkeit zum Kreditor.
+        Es werden nur die Positionen zu den übergebenen HAN/EAN/GTIN geladen, weitere bei Bedarf (get_line).
+        """
+        pass
+
+class AsyncIERPAdapter(ABC):
+    """
+    Asynchrone Variante des ERP Interfaces (für den asyncio/FastAPI Pfad).
+    Implementierungen müssen nebenläufige Aufrufe erlauben (z.B. eine Verbindung pro Abfrage),
+    damit unabhängige Lookups per asyncio.gather parallel laufen können.
+    """
+
+    @abstractmethod
+    async def find_vendor_by_vat_id(self, vat_id: str) -> Optional[ERPVendor]:
+        """Sucht einen Kreditor anhand der USt-IdNr."""
+        pass
+
+    @abstractmethod
+    async def is_duplicate_invoice(self, vendor_id: str, invoice_number: str) -> bool:
+        """Prüft, ob die Rechnungsnummer bereits existiert."""
+        pass
+
+    @abstractmethod
+    async def get_vendor_bank_details(self, vendor_id: str) -> List[ERPBankDetails]:
+        """Ruft die hinterlegten Bankverbindungen ab."""
+        pass
+
+    @abstractmethod
+    async def get_purchase_order_details(self, po_number: str, vendor_id: str, item_identifiers: Optional[Iterable[str]] = None) -> Optional[ERPPurchaseOrder]:
         """
-        Ruft Details einer Bestellung ab (inkl. Positionen) und prüft die Zugehörigkeit zum Kreditor.
+        Ruft Details einer Bestellung ab und prüft die Zugehörigkeit zum Kreditor.
+        Die Positionen zu den übergebenen HAN/EAN/GTIN werden vollständig geladen (kein Lazy Loading).
         """
-        pass
\ No newline at end of file
+        pass
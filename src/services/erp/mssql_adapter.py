@@ -1,23 +1,152 @@
 import logging
-from typing import Optional, List, Dict
+from datetime import datetime
+from typing import Optional, List, Dict, Iterator, Tuple, Iterable, Sequence, Any
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import text, bindparam
 from sqlalchemy.exc import SQLAlchemyError
 
 # Importiere das Interface und die Datenstrukturen
 from .interface import IERPAdapter, ERPVendor, ERPBankDetails, ERPPurchaseOrder, ERPPurchaseOrderLine
+from .duplicate_filter import DuplicateInvoiceFilter
 
 logger = logging.getLogger(__name__)
 
+# MSSQL erlaubt max. 2100 Parameter pro Statement; IN-Listen werden daher in Blöcken abgefragt
+MAX_IN_PARAMETERS = 1000
+
+# --------------------------------------------------------------------
+# SQL Abfragen (geteilt mit dem asynchronen Adapter)
+# SICHERHEIT: Parameterisierte Abfragen verhindern SQL-Injection.
+# --------------------------------------------------------------------
+
+# ANNAHME SCHEMA: dbo.KreditorenStamm
+VENDOR_BY_VAT_ID_QUERY = text("""
+    SELECT KreditorID, UStIdNr, Status
+    FROM dbo.KreditorenStamm
+    WHERE UStIdNr = :vat_id
+""")
+
+# ANNAHME SCHEMA: dbo.RechnungsJournal
+DUPLICATE_COUNT_QUERY = text("""
+    SELECT COUNT(*)
+    FROM dbo.RechnungsJournal
+    WHERE KreditorID = :vendor_id AND ExterneRechnungsNr = :invoice_number
+""")
+
+# ANNAHME SCHEMA: dbo.RechnungsJournal.ErfasstAm (Erfassungszeitpunkt der Buchung)
+JOURNAL_KEYS_QUERY = text("""
+    SELECT KreditorID, ExterneRechnungsNr, ErfasstAm
+    FROM dbo.RechnungsJournal
+""")
+# '>=' statt '>', damit zeitgleich erfasste Einträge nicht verloren gehen (Doppeltes Hinzufügen ist unkritisch).
+# :since liegt um die Sync-Überlappung vor dem Watermark; Einträge ohne ErfasstAm werden immer mitgelesen.
+JOURNAL_KEYS_SINCE_QUERY = text("""
+    SELECT KreditorID, ExterneRechnungsNr, ErfasstAm
+    FROM dbo.RechnungsJournal
+    WHERE ErfasstAm >= :since OR ErfasstAm IS NULL
+""")
+
+# ANNAHME SCHEMA: dbo.KreditorenBanken
+BANK_DETAILS_QUERY = text("""
+    SELECT IBAN
+    FROM dbo.KreditorenBanken
+    WHERE KreditorID = :vendor_id
+""")
+
+# ANNAHME SCHEMA: dbo.Bestellungen, dbo.BestellPositionen
+# Ein Roundtrip: Bestellkopf + nur die Positionen der Rechnung, aggregiert pro HAN im ERP.
+PO_WITH_LINES_QUERY = text("""
+    SELECT b.BestellNr, b.KreditorID, b.GesamtbetragNetto, b.Status,
+           p.ArtikelHAN, p.MengeBestellt, p.MengeBerechnet
+    FROM dbo.Bestellungen b
+    LEFT JOIN (
+        SELECT ArtikelHAN, SUM(MengeBestellt) AS MengeBestellt, SUM(MengeBerechnet) AS MengeBerechnet
+        FROM dbo.BestellPositionen
+        WHERE BestellNr = :po_number AND ArtikelHAN IN :hans
+        GROUP BY ArtikelHAN
+    ) p ON 1 = 1
+    WHERE b.BestellNr = :po_number
+""").bindparams(bindparam("hans", expanding=True))
+
+PO_HEADER_QUERY = text("""
+    SELECT BestellNr, KreditorID, GesamtbetragNetto, Status
+    FROM dbo.Bestellungen
+    WHERE BestellNr = :po_number
+""")
+
+PO_LINES_QUERY = text("""
+    SELECT ArtikelHAN, SUM(MengeBestellt) AS MengeBestellt, SUM(MengeBerechnet) AS MengeBerechnet
+    FROM dbo.BestellPositionen
+    WHERE BestellNr = :po_number AND ArtikelHAN IN :hans
+    GROUP BY ArtikelHAN
+""").bindparams(bindparam("hans", expanding=True))
+
+
+# --------------------------------------------------------------------
+# Mapping der Ergebniszeilen (geteilt mit dem asynchronen Adapter)
+# --------------------------------------------------------------------
+
+def normalize_item_identifiers(item_identifiers: Optional[Iterable[str]]) -> List[str]:
+    return sorted({han for han in (item_identifiers or []) if han})
+
+
+def row_to_vendor(row: Any) -> ERPVendor:
+    return ERPVendor(
+        vendor_id=row.KreditorID,
+        vat_id=row.UStIdNr,
+        # ANNAHME: Status 'Aktiv' bedeutet aktiv
+        is_active=(row.Status == 'Aktiv')
+    )
+
+
+def row_to_po_line(row: Any) -> ERPPurchaseOrderLine:
+    return ERPPurchaseOrderLine(
+        han_ean_gtin=row.ArtikelHAN,
+        quantity_ordered=row.MengeBestellt,
+        quantity_invoiced=row.MengeBerechnet
+    )
+
+
+def rows_to_purchase_order(rows: Sequence[Any], po_number: str, vendor_id: str) -> Optional[ERPPurchaseOrder]:
+    """Baut die Bestellung aus Kopf- (und ggf. Positions-)Zeilen. None bei fremdem Kreditor."""
+    if not rows:
+        return None
+
+    header_result = rows[0]
+
+    # Sicherheitsprüfung: Gehört die Bestellung zum Kreditor der Rechnung?
+    if header_result.KreditorID != vendor_id:
+        logger.warning(f"Bestellung {po_number} gefunden, gehört aber zu Kreditor {header_result.KreditorID}, nicht zu {vendor_id}.")
+        return None # Behandle als ungültig
+
+    lines_dict: Dict[str, ERPPurchaseOrderLine] = {
+        row.ArtikelHAN: row_to_po_line(row)
+        for row in rows if getattr(row, "ArtikelHAN", None) is not None
+    }
+
+    # ANNAHME: Status 'Offen' oder 'Teilgeliefert' erlaubt Buchung
+    is_open = header_result.Status in ['Offen', 'Teilgeliefert']
+
+    return ERPPurchaseOrder(
+        po_number=header_result.BestellNr,
+        vendor_id=header_result.KreditorID,
+        total_net_amount=header_result.GesamtbetragNetto,
+        is_open_for_invoicing=is_open,
+        lines=lines_dict
+    )
+
+
 class MSSQL_ERPAdapter(IERPAdapter):
     """
     Konkrete Implementierung für Azure MSSQL ERP Systeme.
     Nutzt SQLAlchemy Textual SQL für Read-Only Zugriff.
     """
-    
-    def __init__(self, db_session: Session):
+
+    def __init__(self, db_session: Session, duplicate_filter: Optional[DuplicateInvoiceFilter] = None):
         # Der Adapter arbeitet innerhalb einer bestehenden Session.
         self.db = db_session
+        # Optionaler Bloom-Filter, der die meisten Dublettenabfragen ohne ERP-Roundtrip beantwortet
+        self.duplicate_filter = duplicate_filter
 
     # --------------------------------------------------------------------
     # 4.1 Kreditor-Lookup
@@ -25,26 +154,10 @@ class MSSQL_ERPAdapter(IERPAdapter):
     def find_vendor_by_vat_id(self, vat_id: str) -> Optional[ERPVendor]:
         if not vat_id:
             return None
-            
-        # ANNAHME SCHEMA: dbo.KreditorenStamm
-        # SICHERHEIT: Parameterisierte Abfragen verhindern SQL-Injection.
-        query = text("""
-            SELECT KreditorID, UStIdNr, Status
-            FROM dbo.KreditorenStamm
-            WHERE UStIdNr = :vat_id
-        """)
-        
+
         try:
-            result = self.db.execute(query, {"vat_id": vat_id}).fetchone()
-            
-            if result:
-                return ERPVendor(
-                    vendor_id=result.KreditorID,
-                    vat_id=result.UStIdNr,
-                    # ANNAHME: Status 'Aktiv' bedeutet aktiv
-                    is_active=(result.Status == 'Aktiv')
-                )
-            return None
+            result = self.db.execute(VENDOR_BY_VAT_ID_QUERY, {"vat_id": vat_id}).fetchone()
+            return row_to_vendor(result) if result else None
         except SQLAlchemyError as e:
             logger.error(f"Datenbankfehler beim Kreditor-Lookup für USt-IdNr. {vat_id}: {e}")
             # Werfe Exception, damit Celery Retry Mechanismus greift (bei transienten Fehlern)
@@ -54,36 +167,57 @@ class MSSQL_ERPAdapter(IERPAdapter):
     # 4.2 Dublettenprüfung
     # --------------------------------------------------------------------
     def is_duplicate_invoice(self, vendor_id: str, invoice_number: str) -> bool:
-        # ANNAHME SCHEMA: dbo.RechnungsJournal
-        query = text("""
-            SELECT COUNT(*)
-            FROM dbo.RechnungsJournal
-            WHERE KreditorID = :vendor_id AND ExterneRechnungsNr = :invoice_number
-        """)
-        
+        # Vorfilter: Ein negatives Ergebnis des Bloom-Filters ist verbindlich, das ERP wird nicht abgefragt.
+        use_filter = self.duplicate_filter is not None and self._is_duplicate_filter_usable()
+        if use_filter and not self.duplicate_filter.might_contain(vendor_id, invoice_number):
+            return False
+
         try:
-            count = self.db.execute(query, {
-                "vendor_id": vendor_id, 
+            count = self.db.execute(DUPLICATE_COUNT_QUERY, {
+                "vendor_id": vendor_id,
                 "invoice_number": invoice_number
             }).scalar()
-            return count > 0
+            is_duplicate = count > 0
+            # Nur Ergebnisse zählen, die der Filter beantwortet hat (FP-Rate), nicht direkte Abfragen
+            if use_filter:
+                self.duplicate_filter.record_result(is_duplicate)
+            return is_duplicate
         except SQLAlchemyError as e:
             logger.error(f"Datenbankfehler bei Dublettenprüfung für {invoice_number}: {e}")
             raise
 
+    def _is_duplicate_filter_usable(self) -> bool:
+        """Zieht den Filter bei Bedarf inkrementell nach. Bei Fehlern wird das ERP direkt abgefragt."""
+        if not self.duplicate_filter.is_ready:
+            return False
+        if self.duplicate_filter.is_fresh():
+            return True
+        try:
+            self.duplicate_filter.sync(self.get_journal_keys)
+            return True
+        except SQLAlchemyError as e:
+            logger.warning(f"Sync des Dubletten-Filters fehlgeschlagen, frage ERP direkt ab: {e}")
+            return False
+
+    def get_journal_keys(self, since: Optional[datetime] = None) -> Iterator[Tuple[str, str, Optional[datetime]]]:
+        if since is None:
+            query, params = JOURNAL_KEYS_QUERY, {}
+        else:
+            query, params = JOURNAL_KEYS_SINCE_QUERY, {"since": since}
+
+        try:
+            for row in self.db.execute(query, params):
+                yield row.KreditorID, row.ExterneRechnungsNr, row.ErfasstAm
+        except SQLAlchemyError as e:
+            logger.error(f"Datenbankfehler beim Lesen des Rechnungsjournals: {e}")
+            raise
+
     # --------------------------------------------------------------------
     # 4.3 Bankdaten-Validierung
     # --------------------------------------------------------------------
     def get_vendor_bank_details(self, vendor_id: str) -> List[ERPBankDetails]:
-        # ANNAHME SCHEMA: dbo.KreditorenBanken
-        query = text("""
-            SELECT IBAN
-            FROM dbo.KreditorenBanken
-            WHERE KreditorID = :vendor_id
-        """)
-        
         try:
-            results = self.db.execute(query, {"vendor_id": vendor_id}).fetchall()
+            results = self.db.execute(BANK_DETAILS_QUERY, {"vendor_id": vendor_id}).fetchall()
             return [ERPBankDetails(iban=row.IBAN) for row in results if row.IBAN]
         except SQLAlchemyError as e:
             logger.error(f"Datenbankfehler beim Abruf der Bankdaten für {vendor_id}: {e}")
@@ -92,65 +226,47 @@ class MSSQL_ERPAdapter(IERPAdapter):
     # --------------------------------------------------------------------
     # 4.4 & 4.5 Bestellabgleich (Header und Positionen)
     # --------------------------------------------------------------------
-    def get_purchase_order_details(self, po_number: str, vendor_id: str) -> Optional[ERPPurchaseOrder]:
+    def get_purchase_order_details(self, po_number: str, vendor_id: str, item_identifiers: Optional[Iterable[str]] = None) -> Optional[ERPPurchaseOrder]:
         if not po_number:
             return None
 
-        # 1. Abruf Bestellkopf
-        # ANNAHME SCHEMA: dbo.Bestellungen
-        header_query = text("""
-            SELECT BestellNr, KreditorID, GesamtbetragNetto, Status
-            FROM dbo.Bestellungen
-            WHERE BestellNr = :po_number
-        """)
-        
+        hans = normalize_item_identifiers(item_identifiers)
+
         try:
-            header_result = self.db.execute(header_query, {"po_number": po_number}).fetchone()
-            
-            if not header_result:
+            if hans and len(hans) <= MAX_IN_PARAMETERS:
+                rows = self.db.execute(PO_WITH_LINES_QUERY, {"po_number": po_number, "hans": hans}).fetchall()
+            else:
+                # Nur Bestellkopf, Positionen werden bei Bedarf nachgeladen
+                rows = self.db.execute(PO_HEADER_QUERY, {"po_number": po_number}).fetchall()
+
+            erp_po = rows_to_purchase_order(rows, po_number, vendor_id)
+            if erp_po is None:
                 return None
 
-            # Sicherheitsprüfung: Gehört die Bestellung zum Kreditor der Rechnung?
-            if header_result.KreditorID != vendor_id:
-                logger.warning(f"Bestellung {po_number} gefunden, gehört aber zu Kreditor {header_result.KreditorID}, nicht zu {vendor_id}.")
-                return None # Behandle als ungültig
-
-            # 2. Abruf Bestellpositionen
-            # ANNAHME SCHEMA: dbo.BestellPositionen
-            lines_query = text("""
-                SELECT ArtikelHAN, MengeBestellt, MengeBerechnet
-                FROM dbo.BestellPositionen
-                WHERE BestellNr = :po_number
-            """)
-            
-            lines_result = self.db.execute(lines_query, {"po_number": po_number}).fetchall()
-            
-            # Map Positionen in ein Dictionary (Key = HAN)
-            lines_dict: Dict[str, ERPPurchaseOrderLine] = {}
-            for row in lines_result:
-                han = row.ArtikelHAN
-                # Aggregation bei doppelten HANs in der Bestellung (falls vorkommt)
-                if han in lines_dict:
-                    lines_dict[han].quantity_ordered += row.MengeBestellt
-                    lines_dict[han].quantity_invoiced += row.MengeBerechnet
-                else:
-                    lines_dict[han] = ERPPurchaseOrderLine(
-                        han_ean_gtin=han,
-                        quantity_ordered=row.MengeBestellt,
-                        quantity_invoiced=row.MengeBerechnet
-                    )
-
-            # ANNAHME: Status 'Offen' oder 'Teilgeliefert' erlaubt Buchung
-            is_open = header_result.Status in ['Offen', 'Teilgeliefert']
-
-            return ERPPurchaseOrder(
-                po_number=header_result.BestellNr,
-                vendor_id=header_result.KreditorID,
-                total_net_amount=header_result.GesamtbetragNetto,
-                is_open_for_invoicing=is_open,
-                lines=lines_dict
+            # Sehr viele HANs: Parameterlimit von MSSQL (2100) einhalten und in Blöcken laden
+            if len(hans) > MAX_IN_PARAMETERS:
+                erp_po.lines.update(self._load_purchase_order_lines(po_number, hans))
+
+            # Angefragte, aber nicht gefundene HANs sind bekannt abwesend (kein erneuter Roundtrip)
+            erp_po.set_line_loader(
+                lambda requested: self._load_purchase_order_lines(po_number, requested),
+                absent_hans=set(hans) - erp_po.lines.keys()
             )
+            return erp_po
 
         except SQLAlchemyError as e:
             logger.error(f"Datenbankfehler beim Abruf der Bestellung {po_number}: {e}")
-            raise
\ No newline at end of file
+            raise
+
+    def _load_purchase_order_lines(self, po_number: str, hans: List[str]) -> Dict[str, ERPPurchaseOrderLine]:
+        """Lädt Bestellpositionen für die angegebenen HANs, aggregiert per GROUP BY im ERP."""
+        lines: Dict[str, ERPPurchaseOrderLine] = {}
+        try:
+            for i in range(0, len(hans), MAX_IN_PARAMETERS):
+                chunk = hans[i:i + MAX_IN_PARAMETERS]
+                for row in self.db.execute(PO_LINES_QUERY, {"po_number": po_number, "hans": chunk}):
+                    lines[row.ArtikelHAN] = row_to_po_line(row)
+            return lines
+        except SQLAlchemyError as e:
+            logger.error(f"Datenbankfehler beim Abruf der Positionen von Bestellung {po_number}: {e}")
+            raise
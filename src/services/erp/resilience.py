@@ -0,0 +1,546 @@
+# src/services/erp/resilience.py
+
+"""
+Schutz des ERP vor Überlast: Circuit Breaker und adaptives Concurrency-Limit (AIMD)
+Der Zustand wird über Redis zwischen allen Celery Workern geteilt.
+Ist Redis nicht konfiguriert oder nicht erreichbar, gilt der Zustand nur prozesslokal.
+"""
+
+import functools
+import logging
+import random
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy.exc import OperationalError, InterfaceError, TimeoutError as SQLAlchemyTimeoutError
+
+from .interface import IERPAdapter, ERPVendor, ERPBankDetails, ERPPurchaseOrder
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "iiev:erp:"
+
+# Fehler, die auf ein nicht erreichbares/überlastetes ERP hindeuten (zählen für den Circuit Breaker)
+TRANSIENT_ERP_ERRORS = (OperationalError, InterfaceError, SQLAlchemyTimeoutError, ConnectionError, TimeoutError)
+
+# Maximale Haltedauer eines Slots; danach gilt er als verwaist (z.B. abgestürzter Worker)
+LEASE_SECONDS = 120
+
+
+class ERPUnavailableError(Exception):
+    """
+    Das ERP ist derzeit nicht nutzbar (Circuit offen, Concurrency-Limit erreicht oder transienter Fehler).
+    Der Aufrufer soll die Business-Validierung später erneut einplanen, statt Retries zu verbrauchen.
+    """
+
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# --------------------------------------------------------------------
+# Zustandsspeicher (Redis oder prozesslokal)
+# --------------------------------------------------------------------
+
+class ResilienceStateStore(ABC):
+    """Minimale Schlüssel-Wert Operationen, die Circuit Breaker und Limiter benötigen."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, nx: bool = False) -> bool:
+        """Setzt den Wert (optional nur, falls nicht vorhanden). True, wenn gesetzt."""
+        pass
+
+    @abstractmethod
+    def delete(self, *keys: str) -> None:
+        pass
+
+    @abstractmethod
+    def ttl(self, key: str) -> float:
+        """Restlaufzeit in Sekunden (0, wenn der Schlüssel nicht existiert)."""
+        pass
+
+    @abstractmethod
+    def incr_window(self, key: str, window_seconds: float) -> int:
+        """Zähler, der window_seconds nach dem ersten Inkrement verfällt."""
+        pass
+
+    @abstractmethod
+    def incrbyfloat(self, key: str, amount: float) -> float:
+        pass
+
+    @abstractmethod
+    def lease_acquire(self, key: str, token: str, lease_seconds: float, max_leases: int) -> bool:
+        """Belegt einen Slot, sofern weniger als max_leases aktive Slots existieren."""
+        pass
+
+    @abstractmethod
+    def lease_release(self, key: str, token: str) -> None:
+        pass
+
+    @abstractmethod
+    def lease_count(self, key: str) -> int:
+        pass
+
+
+class LocalStateStore(ResilienceStateStore):
+    """Prozesslokaler Zustand (Fallback ohne Redis, Tests)."""
+
+    def __init__(self):
+        self._values: Dict[str, Tuple[Any, Optional[float]]] = {}
+        self._leases: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def _get_entry(self, key: str):
+        entry = self._values.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del self._values[key]
+            return None
+        return entry
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._get_entry(key)
+            return str(entry[0]) if entry is not None else None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, nx: bool = False) -> bool:
+        with self._lock:
+            if nx and self._get_entry(key) is not None:
+                return False
+            self._values[key] = (value, time.monotonic() + ttl if ttl else None)
+            return True
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._values.pop(key, None)
+                self._leases.pop(key, None)
+
+    def ttl(self, key: str) -> float:
+        with self._lock:
+            entry = self._get_entry(key)
+            if entry is None or entry[1] is None:
+                return 0.0
+            return max(entry[1] - time.monotonic(), 0.0)
+
+    def incr_window(self, key: str, window_seconds: float) -> int:
+        with self._lock:
+            entry = self._get_entry(key)
+            if entry is None:
+                self._values[key] = (1, time.monotonic() + window_seconds)
+                return 1
+            self._values[key] = (int(entry[0]) + 1, entry[1])
+            return int(entry[0]) + 1
+
+    def incrbyfloat(self, key: str, amount: float) -> float:
+        with self._lock:
+            entry = self._get_entry(key)
+            value = float(entry[0]) + amount if entry is not None else amount
+            self._values[key] = (value, entry[1] if entry is not None else None)
+            return value
+
+    def _active_leases(self, key: str) -> Dict[str, float]:
+        now = time.monotonic()
+        leases = {token: expires for token, expires in self._leases.get(key, {}).items() if expires > now}
+        self._leases[key] = leases
+        return leases
+
+    def lease_acquire(self, key: str, token: str, lease_seconds: float, max_leases: int) -> bool:
+        with self._lock:
+            leases = self._active_leases(key)
+            if len(leases) >= max_leases:
+                return False
+            leases[token] = time.monotonic() + lease_seconds
+            return True
+
+    def lease_release(self, key: str, token: str) -> None:
+        with self._lock:
+            self._leases.get(key, {}).pop(token, None)
+
+    def lease_count(self, key: str) -> int:
+        with self._lock:
+            return len(self._active_leases(key))
+
+
+# Nach einem Redis-Fehler wird Redis für diese Dauer nicht erneut versucht (kein Timeout pro ERP-Aufruf)
+REDIS_RETRY_INTERVAL_SECONDS = 30
+
+
+def _with_local_fallback(func):
+    """Bei Redis-Fehlern auf den prozesslokalen Zustand ausweichen (ERP-Zugriff nicht blockieren)."""
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        fallback = getattr(self._fallback, func.__name__)
+        if time.monotonic() < self._degraded_until:
+            return fallback(*args, **kwargs)
+        try:
+            return func(self, *args, **kwargs)
+        except self._redis_error as e:
+            logger.warning(f"⚠️  Redis nicht erreichbar, ERP-Schutz nutzt {REDIS_RETRY_INTERVAL_SECONDS}s prozesslokalen Zustand: {e}")
+            self._degraded_until = time.monotonic() + REDIS_RETRY_INTERVAL_SECONDS
+            return fallback(*args, **kwargs)
+    return wrapper
+
+
+class RedisStateStore(ResilienceStateStore):
+    """Worker-übergreifender Zustand in Redis."""
+
+    def __init__(self, client):
+        import redis
+        self._redis = client
+        self._redis_error = redis.RedisError
+        self._fallback = LocalStateStore()
+        self._degraded_until = 0.0
+
+    @_with_local_fallback
+    def get(self, key: str) -> Optional[str]:
+        return self._redis.get(key)
+
+    @_with_local_fallback
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, nx: bool = False) -> bool:
+        return bool(self._redis.set(key, value, px=int(ttl * 1000) if ttl else None, nx=nx))
+
+    @_with_local_fallback
+    def delete(self, *keys: str) -> None:
+        self._redis.delete(*keys)
+
+    @_with_local_fallback
+    def ttl(self, key: str) -> float:
+        remaining_ms = self._redis.pttl(key)
+        return remaining_ms / 1000 if remaining_ms and remaining_ms > 0 else 0.0
+
+    @_with_local_fallback
+    def incr_window(self, key: str, window_seconds: float) -> int:
+        pipe = self._redis.pipeline()
+        pipe.incr(key)
+        # NX: Das Fenster beginnt mit dem ersten Fehler und wird nicht verlängert
+        pipe.pexpire(key, int(window_seconds * 1000), nx=True)
+        count, _ = pipe.execute()
+        return int(count)
+
+    @_with_local_fallback
+    def incrbyfloat(self, key: str, amount: float) -> float:
+        return float(self._redis.incrbyfloat(key, amount))
+
+    @_with_local_fallback
+    def lease_acquire(self, key: str, token: str, lease_seconds: float, max_leases: int) -> bool:
+        # Optimistisch: Slot eintragen, dann zählen; bei Überschreitung wieder entfernen.
+        # Das Limit wird so nie überschritten (im Konfliktfall höchstens zu streng).
+        now = time.time()
+        pipe = self._redis.pipeline()
+        pipe.zremrangebyscore(key, "-inf", now)
+        pipe.zadd(key, {token: now + lease_seconds})
+        pipe.zcard(key)
+        pipe.expire(key, int(lease_seconds) * 2)
+        _, _, count, _ = pipe.execute()
+        if count > max_leases:
+            self._redis.zrem(key, token)
+            return False
+        return True
+
+    @_with_local_fallback
+    def lease_release(self, key: str, token: str) -> None:
+        self._redis.zrem(key, token)
+
+    @_with_local_fallback
+    def lease_count(self, key: str) -> int:
+        self._redis.zremrangebyscore(key, "-inf", time.time())
+        return int(self._redis.zcard(key))
+
+
+# --------------------------------------------------------------------
+# Circuit Breaker
+# --------------------------------------------------------------------
+
+class ERPCircuitBreaker:
+    """
+    CLOSED -> OPEN nach failure_threshold Fehlern (oder langsamen Aufrufen) innerhalb des Zeitfensters.
+    OPEN -> HALF_OPEN nach open_seconds. Im HALF_OPEN darf genau ein Aufruf (Probe) das ERP testen:
+    Erfolg schließt den Circuit, ein Fehler öffnet ihn erneut.
+    """
+
+    CLOSED = "CLOSED"
+    OPEN = "OPEN"
+    HALF_OPEN = "HALF_OPEN"
+
+    def __init__(self, store: ResilienceStateStore, failure_threshold: int = 5, failure_window_seconds: float = 60,
+                 open_seconds: float = 30, probe_timeout_seconds: float = 30, key_prefix: str = KEY_PREFIX):
+        self.store = store
+        self.failure_threshold = failure_threshold
+        self.failure_window_seconds = failure_window_seconds
+        self.open_seconds = open_seconds
+        self.probe_timeout_seconds = probe_timeout_seconds
+        self._key_open = f"{key_prefix}circuit:open"
+        self._key_tripped = f"{key_prefix}circuit:tripped"
+        self._key_probe = f"{key_prefix}circuit:probe"
+        self._key_failures = f"{key_prefix}circuit:failures"
+
+    def state(self) -> str:
+        if self.store.get(self._key_open) is not None:
+            return self.OPEN
+        if self.store.get(self._key_tripped) is not None:
+            return self.HALF_OPEN
+        return self.CLOSED
+
+    def is_open(self) -> bool:
+        return self.store.get(self._key_open) is not None
+
+    def retry_after(self) -> float:
+        """Sekunden bis der Circuit wieder eine Probe zulässt."""
+        return self.store.ttl(self._key_open)
+
+    def before_call(self) -> bool:
+        """Prüft, ob ein Aufruf erlaubt ist. Gibt True zurück, wenn dieser Aufruf die Probe ist."""
+        state = self.state()
+        if state == self.CLOSED:
+            return False
+        if state == self.HALF_OPEN and self.store.set(self._key_probe, "1", ttl=self.probe_timeout_seconds, nx=True):
+            logger.info("🔌 ERP Circuit HALF_OPEN: Probe-Aufruf wird durchgelassen.")
+            return True
+        raise ERPUnavailableError(f"ERP Circuit ist {state}.", retry_after=max(self.retry_after(), 1.0))
+
+    def release_probe(self) -> None:
+        self.store.delete(self._key_probe)
+
+    def record_success(self, is_probe: bool = False) -> None:
+        if is_probe:
+            self.store.delete(self._key_tripped, self._key_probe, self._key_failures)
+            logger.info("✅ ERP Circuit geschlossen (Probe erfolgreich).")
+
+    def record_failure(self, is_probe: bool = False) -> None:
+        if is_probe:
+            self._open("Probe fehlgeschlagen")
+            return
+        failures = self.store.incr_window(self._key_failures, self.failure_window_seconds)
+        if failures >= self.failure_threshold and not self.is_open():
+            self._open(f"{failures} Fehler in {self.failure_window_seconds}s")
+
+    def _open(self, reason: str) -> None:
+        self.store.set(self._key_open, datetime.now().isoformat(), ttl=self.open_seconds)
+        self.store.set(self._key_tripped, "1")
+        self.store.delete(self._key_probe, self._key_failures)
+        logger.warning(f"🚧 ERP Circuit geöffnet für {self.open_seconds}s: {reason}")
+
+
+# --------------------------------------------------------------------
+# Adaptives Concurrency-Limit (AIMD)
+# --------------------------------------------------------------------
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Begrenzt die gleichzeitigen ERP-Aufrufe aller Worker.
+    Additive Increase: +1/limit pro schnellem Aufruf (≈ +1 je "Runde").
+    Multiplicative Decrease: limit * decrease_factor bei Latenz über Ziel oder Fehler,
+    höchstens einmal pro decrease_cooldown_seconds (viele gleichzeitige langsame Aufrufe zählen einmal).
+    """
+
+    def __init__(self, store: ResilienceStateStore, initial_limit: int = 8, min_limit: int = 1, max_limit: int = 32,
+                 latency_target_seconds: float = 0.5, decrease_factor: float = 0.7, decrease_cooldown_seconds: float = 2.0,
+                 acquire_timeout_seconds: float = 2.0, key_prefix: str = KEY_PREFIX):
+        self.store = store
+        self.initial_limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target_seconds = latency_target_seconds
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown_seconds = decrease_cooldown_seconds
+        self.acquire_timeout_seconds = acquire_timeout_seconds
+        self._key_limit = f"{key_prefix}limiter:limit"
+        self._key_leases = f"{key_prefix}limiter:leases"
+        self._key_cooldown = f"{key_prefix}limiter:decrease_cooldown"
+
+    def limit(self) -> float:
+        value = self.store.get(self._key_limit)
+        if value is None:
+            self.store.set(self._key_limit, float(self.initial_limit), nx=True)
+            return float(self.initial_limit)
+        return min(max(float(value), self.min_limit), self.max_limit)
+
+    def in_flight(self) -> int:
+        return self.store.lease_count(self._key_leases)
+
+    def acquire(self) -> str:
+        """Belegt einen Slot oder wirft ERPUnavailableError nach acquire_timeout_seconds."""
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.acquire_timeout_seconds
+        while True:
+            if self.store.lease_acquire(self._key_leases, token, LEASE_SECONDS, int(self.limit())):
+                return token
+            if time.monotonic() >= deadline:
+                raise ERPUnavailableError(
+                    f"ERP Concurrency-Limit ({int(self.limit())}) erreicht.",
+                    retry_after=self.latency_target_seconds
+                )
+            time.sleep(random.uniform(0.02, 0.1))
+
+    def release(self, token: str, latency_seconds: float, success: bool) -> None:
+        self.store.lease_release(self._key_leases, token)
+        if success and latency_seconds <= self.latency_target_seconds:
+            current = self.limit()
+            if current < self.max_limit:
+                new_limit = self.store.incrbyfloat(self._key_limit, 1.0 / current)
+                if new_limit > self.max_limit:
+                    self.store.set(self._key_limit, float(self.max_limit))
+        elif self.store.set(self._key_cooldown, "1", ttl=self.decrease_cooldown_seconds, nx=True):
+            new_limit = max(self.limit() * self.decrease_factor, float(self.min_limit))
+            self.store.set(self._key_limit, new_limit)
+            logger.info(f"📉 ERP Concurrency-Limit reduziert auf {new_limit:.1f} (Latenz {latency_seconds:.2f}s, Erfolg: {success}).")
+
+
+# --------------------------------------------------------------------
+# Guard und Adapter-Wrapper
+# --------------------------------------------------------------------
+
+class ERPGuard:
+    """Kombiniert Circuit Breaker und Limiter für einen einzelnen ERP-Aufruf."""
+
+    def __init__(self, breaker: ERPCircuitBreaker, limiter: AdaptiveConcurrencyLimiter, slow_call_seconds: float = 5.0):
+        self.breaker = breaker
+        self.limiter = limiter
+        self.slow_call_seconds = slow_call_seconds
+
+    def is_open(self) -> bool:
+        return self.breaker.is_open()
+
+    def retry_after(self) -> float:
+        return self.breaker.retry_after()
+
+    @contextmanager
+    def call(self, operation: str):
+        is_probe = self.breaker.before_call()
+        try:
+            token = self.limiter.acquire()
+        except ERPUnavailableError:
+            if is_probe:
+                self.breaker.release_probe()
+            raise
+
+        start = time.monotonic()
+        try:
+            yield
+        except TRANSIENT_ERP_ERRORS as e:
+            self.limiter.release(token, time.monotonic() - start, success=False)
+            self.breaker.record_failure(is_probe)
+            raise ERPUnavailableError(f"ERP Fehler bei {operation}: {e}", retry_after=self.breaker.retry_after()) from e
+        except BaseException:
+            # Keine Verfügbarkeitsprobleme (z.B. Programmierfehler): Zustand nicht verändern
+            self.limiter.release(token, time.monotonic() - start, success=True)
+            if is_probe:
+                self.breaker.release_probe()
+            raise
+        else:
+            latency = time.monotonic() - start
+            self.limiter.release(token, latency, success=True)
+            if latency > self.slow_call_seconds:
+                logger.warning(f"🐢 Langsamer ERP-Aufruf {operation}: {latency:.2f}s")
+                self.breaker.record_failure(is_probe)
+            else:
+                self.breaker.record_success(is_probe)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "circuit_state": self.breaker.state(),
+            "retry_after_seconds": round(self.breaker.retry_after(), 1),
+            "concurrency_limit": round(self.limiter.limit(), 2),
+            "in_flight": self.limiter.in_flight(),
+        }
+
+
+class ResilientERPAdapter(IERPAdapter):
+    """
+    Wrapper um einen IERPAdapter: Jeder Aufruf läuft durch den ERPGuard.
+    Wirft ERPUnavailableError statt die Worker am überlasteten ERP blockieren zu lassen.
+    Ohne expliziten Guard wird der prozessweite Guard (get_erp_guard) verwendet.
+    """
+
+    def __init__(self, inner: IERPAdapter, guard: Optional[ERPGuard] = None):
+        self.inner = inner
+        self.guard = guard if guard is not None else get_erp_guard()
+
+    def _guarded(self, operation: str, func, *args):
+        with self.guard.call(operation):
+            return func(*args)
+
+    def find_vendor_by_vat_id(self, vat_id: str) -> Optional[ERPVendor]:
+        return self._guarded("find_vendor_by_vat_id", self.inner.find_vendor_by_vat_id, vat_id)
+
+    def is_duplicate_invoice(self, vendor_id: str, invoice_number: str) -> bool:
+        return self._guarded("is_duplicate_invoice", self.inner.is_duplicate_invoice, vendor_id, invoice_number)
+
+    def get_journal_keys(self, since: Optional[datetime] = None) -> Iterator[Tuple[str, str, Optional[datetime]]]:
+        keys = self._guarded("get_journal_keys", lambda: list(self.inner.get_journal_keys(since)))
+        return iter(keys)
+
+    def get_vendor_bank_details(self, vendor_id: str) -> List[ERPBankDetails]:
+        return self._guarded("get_vendor_bank_details", self.inner.get_vendor_bank_details, vendor_id)
+
+    def get_purchase_order_details(self, po_number: str, vendor_id: str, item_identifiers: Optional[Iterable[str]] = None) -> Optional[ERPPurchaseOrder]:
+        erp_po = self._guarded("get_purchase_order_details", self.inner.get_purchase_order_details, po_number, vendor_id, item_identifiers)
+        # Auch das Nachladen von Positionen läuft durch den Guard
+        if erp_po is not None:
+            erp_po.wrap_line_loader(lambda loader: functools.partial(self._guarded, "load_purchase_order_lines", loader))
+        return erp_po
+
+
+# Prozessweiter Zustandsspeicher (lazy): Redis, falls konfiguriert, sonst prozesslokal
+_state_store: Optional[ResilienceStateStore] = None
+_state_store_lock = threading.Lock()
+
+
+def get_state_store() -> ResilienceStateStore:
+    """Worker-übergreifender Zustandsspeicher (auch für Kennzahlen anderer Komponenten, z.B. des Reapers)."""
+    global _state_store
+    if _state_store is None:
+        with _state_store_lock:
+            if _state_store is None:
+                from ...core.redis_client import get_redis_client
+                client = get_redis_client()
+                _state_store = RedisStateStore(client) if client is not None else LocalStateStore()
+    return _state_store
+
+
+def _create_default_guard() -> ERPGuard:
+    from ...core.config import settings
+
+    store = get_state_store()
+    return ERPGuard(
+        breaker=ERPCircuitBreaker(
+            store,
+            failure_threshold=settings.erp_circuit_failure_threshold,
+            failure_window_seconds=settings.erp_circuit_failure_window_seconds,
+            open_seconds=settings.erp_circuit_open_seconds,
+        ),
+        limiter=AdaptiveConcurrencyLimiter(
+            store,
+            initial_limit=settings.erp_concurrency_initial,
+            min_limit=settings.erp_concurrency_min,
+            max_limit=settings.erp_concurrency_max,
+            latency_target_seconds=settings.erp_latency_target_seconds,
+            acquire_timeout_seconds=settings.erp_acquire_timeout_seconds,
+        ),
+        slow_call_seconds=settings.erp_slow_call_seconds,
+    )
+
+
+# Singleton Instanz pro Worker-Prozess (Zustand selbst liegt in Redis).
+# Lazy: Der Import benötigt weder App-Konfiguration noch Redis-Verbindung (z.B. für Skripte und Tests).
+_erp_guard: Optional[ERPGuard] = None
+_erp_guard_lock = threading.Lock()
+
+
+def get_erp_guard() -> ERPGuard:
+    """Prozessweiter ERPGuard, beim ersten Zugriff aus den Settings erstellt."""
+    global _erp_guard
+    if _erp_guard is None:
+        with _erp_guard_lock:
+            if _erp_guard is None:
+                _erp_guard = _create_default_guard()
+    return _erp_guard
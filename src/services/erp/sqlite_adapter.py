@@ -0,0 +1,114 @@
+"""
+SQLite Stand-in für das ERP (Lasttests und Benchmarks ohne Produktions-ERP)
+Bildet das Schema nach, das MSSQL_ERPAdapter annimmt (dbo.KreditorenStamm, ...).
+Das Schema 'dbo' wird per ATTACH DATABASE emuliert, daher laufen die SQL-Abfragen unverändert.
+"""
+
+import logging
+from datetime import datetime
+from typing import Optional, Iterator, Tuple
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import StaticPool, QueuePool
+
+from .mssql_adapter import MSSQL_ERPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Schema gemäß den ANNAHME SCHEMA Kommentaren in mssql_adapter.py, inkl. der Indizes,
+# die die Abfragen des Adapters benötigen (gleiche Indizes sollten im Produktions-ERP existieren).
+ERP_SCHEMA_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS dbo.KreditorenStamm (
+        KreditorID TEXT PRIMARY KEY,
+        UStIdNr TEXT,
+        Name TEXT,
+        Status TEXT NOT NULL DEFAULT 'Aktiv'
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS dbo.ix_KreditorenStamm_UStIdNr ON KreditorenStamm (UStIdNr)",
+    """
+    CREATE TABLE IF NOT EXISTS dbo.KreditorenBanken (
+        KreditorID TEXT NOT NULL REFERENCES KreditorenStamm (KreditorID),
+        IBAN TEXT NOT NULL,
+        PRIMARY KEY (KreditorID, IBAN)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS dbo.RechnungsJournal (
+        JournalID INTEGER PRIMARY KEY AUTOINCREMENT,
+        KreditorID TEXT NOT NULL,
+        ExterneRechnungsNr TEXT NOT NULL COLLATE NOCASE,
+        ErfasstAm TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS dbo.ix_RechnungsJournal_Kreditor_RechnungsNr ON RechnungsJournal (KreditorID, ExterneRechnungsNr)",
+    "CREATE INDEX IF NOT EXISTS dbo.ix_RechnungsJournal_ErfasstAm ON RechnungsJournal (ErfasstAm)",
+    """
+    CREATE TABLE IF NOT EXISTS dbo.Bestellungen (
+        BestellNr TEXT PRIMARY KEY,
+        KreditorID TEXT NOT NULL,
+        GesamtbetragNetto NUMERIC NOT NULL,
+        Status TEXT NOT NULL DEFAULT 'Offen'
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS dbo.BestellPositionen (
+        BestellNr TEXT NOT NULL REFERENCES Bestellungen (BestellNr),
+        PositionNr INTEGER NOT NULL,
+        ArtikelHAN TEXT NOT NULL,
+        MengeBestellt NUMERIC NOT NULL,
+        MengeBerechnet NUMERIC NOT NULL DEFAULT 0,
+        PRIMARY KEY (BestellNr, PositionNr)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS dbo.ix_BestellPositionen_BestellNr_HAN ON BestellPositionen (BestellNr, ArtikelHAN)",
+]
+
+
+def create_sqlite_erp_engine(path: str = ":memory:", echo: bool = False) -> Engine:
+    """
+    Erstellt eine Engine, deren Verbindungen die ERP-Datei als Schema 'dbo' einbinden.
+    ':memory:' nutzt eine einzige geteilte Verbindung (StaticPool), sonst einen Pool.
+    """
+    in_memory = path == ":memory:"
+    engine = create_engine(
+        "sqlite://",
+        echo=echo,
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool if in_memory else QueuePool,
+    )
+
+    @event.listens_for(engine, "connect")
+    def _attach_dbo_schema(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("ATTACH DATABASE ? AS dbo", (path,))
+        if not in_memory:
+            # WAL erlaubt parallele Leser während des Seedings/Benchmarks
+            cursor.execute("PRAGMA dbo.journal_mode=WAL")
+        cursor.close()
+
+    return engine
+
+
+def create_erp_schema(engine: Engine) -> None:
+    """Legt Tabellen und Indizes an (idempotent)."""
+    with engine.begin() as conn:
+        for statement in ERP_SCHEMA_DDL:
+            conn.execute(text(statement))
+    logger.info("🗄️ SQLite ERP Schema angelegt.")
+
+
+class SQLiteERPAdapter(MSSQL_ERPAdapter):
+    """
+    ERP Adapter für die SQLite Stand-in Datenbank.
+    Nutzt die identischen Abfragen des MSSQL Adapters, damit Benchmarks denselben Code messen.
+    """
+
+    def get_journal_keys(self, since: Optional[datetime] = None) -> Iterator[Tuple[str, str, Optional[datetime]]]:
+        # SQLite liefert ErfasstAm als String ('YYYY-MM-DD HH:MM:SS'), der Dubletten-Filter erwartet datetime
+        for vendor_id, invoice_number, erfasst_am in super().get_journal_keys(since):
+            if isinstance(erfasst_am, str):
+                erfasst_am = datetime.fromisoformat(erfasst_am)
+            yield vendor_id, invoice_number, erfasst_am
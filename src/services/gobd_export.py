@@ -0,0 +1,326 @@
+# src/services/gobd_export.py
+
+"""
+GoBD Massenexport für Prüfer
+Wählt Transaktionen (live und archiviert) per Filter aus, listet ihre Blobs parallel (list_blobs mit
+name_starts_with=<transaction_id>/), lädt sie mit begrenzter Parallelität herunter und schreibt alles
+gestreamt in ein ZIP/TAR (temporäre Datei, danach Upload in den Export-Container).
+Das Archiv enthält ein manifest.json mit den SHA-256 Hashes (aus den Blob-Metadaten content_hash bzw.
+der Transaktion, beim Export nachgerechnet) und den Validierungsberichten.
+"""
+
+import hashlib
+import io
+import json
+import logging
+import tarfile
+import tempfile
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from ..db.models import InvoiceTransaction, TransactionStatus, invoice_transactions_archive
+from . import report_storage
+
+logger = logging.getLogger(__name__)
+
+ZIP = "zip"
+TAR = "tar"
+ARCHIVE_CONTENT_TYPES = {ZIP: "application/zip", TAR: "application/gzip"}
+ARCHIVE_SUFFIX = {ZIP: "zip", TAR: "tar.gz"}
+
+# Spalten für Auswahl und Manifest (identisch in Live- und Archivtabelle)
+EXPORT_COLUMNS = (
+    "id", "status", "original_filename", "content_hash", "storage_uri_raw", "validation_report",
+    "invoice_number", "erp_vendor_id", "seller_vat_id", "seller_name", "created_at",
+)
+
+# Fortschritt im Log alle N Dateien
+PROGRESS_LOG_INTERVAL = 1000
+
+
+@dataclass
+class ExportFilter:
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+    # ERP Kreditor-ID oder USt-IdNr. des Verkäufers
+    vendor: Optional[str] = None
+    statuses: Optional[List[TransactionStatus]] = None
+    include_archive: bool = True
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "created_from": self.created_from.isoformat() if self.created_from else None,
+            "created_to": self.created_to.isoformat() if self.created_to else None,
+            "vendor": self.vendor,
+            "statuses": [status.value for status in self.statuses] if self.statuses else None,
+            "include_archive": self.include_archive,
+        }
+
+
+@dataclass
+class ExportEntry:
+    """Eine Datei im Archiv: Blob (container, blob_name) oder bereits vorliegende Daten (data)."""
+    transaction_id: str
+    archive_path: str
+    container: Optional[str] = None
+    blob_name: Optional[str] = None
+    expected_hash: Optional[str] = None
+    data: Optional[bytes] = None
+
+
+@dataclass
+class ExportStats:
+    transactions: int = 0
+    files: int = 0
+    bytes: int = 0
+    missing: int = 0
+    hash_mismatches: int = 0
+    list_seconds: float = 0.0
+    transfer_seconds: float = 0.0
+    records: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+
+    def throughput(self) -> Dict[str, Any]:
+        seconds = self.transfer_seconds or 1e-9
+        return {
+            "transactions": self.transactions,
+            "files": self.files,
+            "bytes": self.bytes,
+            "missing": self.missing,
+            "hash_mismatches": self.hash_mismatches,
+            "list_seconds": round(self.list_seconds, 3),
+            "transfer_seconds": round(self.transfer_seconds, 3),
+            "files_per_second": round(self.files / seconds, 1),
+            "megabytes_per_second": round(self.bytes / seconds / (1024 * 1024), 2),
+        }
+
+
+def select_export_transactions(db: Session, export_filter: ExportFilter) -> List[Dict[str, Any]]:
+    """Transaktionen gemäß Filter aus Live- und (optional) Archivtabelle, nur die Export-Spalten."""
+    tables = [InvoiceTransaction.__table__]
+    if export_filter.include_archive:
+        tables.append(invoice_transactions_archive)
+
+    rows: List[Dict[str, Any]] = []
+    for table in tables:
+        conditions = []
+        if export_filter.created_from:
+            conditions.append(table.c.created_at >= export_filter.created_from)
+        if export_filter.created_to:
+            conditions.append(table.c.created_at < export_filter.created_to)
+        if export_filter.vendor:
+            conditions.append(or_(table.c.erp_vendor_id == export_filter.vendor, table.c.seller_vat_id == export_filter.vendor))
+        if export_filter.statuses:
+            conditions.append(table.c.status.in_(export_filter.statuses))
+        statement = select(*[table.c[name] for name in EXPORT_COLUMNS]).where(*conditions).order_by(table.c.created_at, table.c.id)
+        rows.extend(dict(row._mapping) for row in db.execute(statement))
+    return rows
+
+
+def _strip_encoding_suffix(name: str) -> str:
+    """validation_report.json.gz -> validation_report.json (der Download liefert dekodierte Daten)."""
+    for suffix in report_storage.REPORT_BLOB_SUFFIX.values():
+        if name.endswith(suffix):
+            return name[: -len(suffix)] + "json"
+    return name
+
+
+def plan_transaction_entries(storage, transaction: Dict[str, Any]) -> List[ExportEntry]:
+    """Alle Dateien einer Transaktion: Raw- und Processed-Blobs unter <id>/, CAS-Blob, Bericht aus der DB."""
+    transaction_id = str(transaction["id"])
+    prefix = f"{transaction_id}/"
+    entries: List[ExportEntry] = []
+    raw_blob_names = set()
+
+    for container, folder in ((storage.raw_container_name, "raw"), (storage.processed_container_name, "processed")):
+        for blob in storage.list_blobs_by_prefix(container, prefix):
+            if container == storage.raw_container_name:
+                raw_blob_names.add(blob.name)
+            entries.append(ExportEntry(
+                transaction_id=transaction_id,
+                archive_path=f"{transaction_id}/{folder}/{_strip_encoding_suffix(blob.name[len(prefix):])}",
+                container=container,
+                blob_name=blob.name,
+                expected_hash=(blob.metadata or {}).get("content_hash"),
+            ))
+
+    # CAS-Layout: Inhalt liegt unter sha256/<hash>, nicht unter dem Präfix der Transaktion
+    if transaction["storage_uri_raw"]:
+        container, blob_name = storage.parse_uri(transaction["storage_uri_raw"])
+        if blob_name not in raw_blob_names:
+            entries.append(ExportEntry(
+                transaction_id=transaction_id,
+                archive_path=f"{transaction_id}/raw/{transaction['original_filename'] or blob_name.rsplit('/', 1)[-1]}",
+                container=container,
+                blob_name=blob_name,
+                expected_hash=transaction["content_hash"],
+            ))
+
+    # Nicht ausgelagerter Validierungsbericht steht vollständig in der Tabelle
+    report = transaction["validation_report"]
+    if report and report_storage.get_offload_pointer(report) is None:
+        entries.append(ExportEntry(
+            transaction_id=transaction_id,
+            archive_path=f"{transaction_id}/validation_report.json",
+            data=json.dumps(report, ensure_ascii=False, indent=2, default=str).encode("utf-8"),
+        ))
+    return entries
+
+
+class _ArchiveWriter:
+    """Schreibt Dateien nacheinander in ein ZIP (Deflate, ZIP64) oder TAR (gzip, Stream-Modus)."""
+
+    def __init__(self, fileobj, archive_format: str):
+        self.archive_format = archive_format
+        if archive_format == ZIP:
+            self._archive = zipfile.ZipFile(fileobj, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True)
+        else:
+            self._archive = tarfile.open(fileobj=fileobj, mode="w|gz")
+
+    def add(self, path: str, data: bytes) -> None:
+        if self.archive_format == ZIP:
+            self._archive.writestr(zipfile.ZipInfo(path, date_time=datetime.now().timetuple()[:6]), data, compress_type=zipfile.ZIP_DEFLATED)
+        else:
+            info = tarfile.TarInfo(path)
+            info.size = len(data)
+            info.mtime = int(time.time())
+            self._archive.addfile(info, io.BytesIO(data))
+
+    def close(self) -> None:
+        self._archive.close()
+
+
+def _fetch(storage, entry: ExportEntry) -> Tuple[ExportEntry, Optional[bytes]]:
+    if entry.data is not None:
+        return entry, entry.data
+    try:
+        return entry, storage.download_blob_decoded(entry.container, entry.blob_name)
+    except FileNotFoundError:
+        return entry, None
+
+
+def _bounded_map(executor: ThreadPoolExecutor, func, items, window: int) -> Iterator:
+    """Wie executor.map, aber höchstens window Aufträge gleichzeitig (begrenzter Speicher), Reihenfolge bleibt."""
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(func, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def write_export_archive(
+    storage,
+    transactions: List[Dict[str, Any]],
+    fileobj,
+    archive_format: str,
+    max_workers: int,
+    export_filter: ExportFilter
+) -> ExportStats:
+    """Listet, lädt (parallel, begrenzt) und schreibt alle Dateien samt manifest.json in fileobj."""
+    stats = ExportStats(transactions=len(transactions))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        start = time.perf_counter()
+        planned = list(executor.map(lambda transaction: plan_transaction_entries(storage, transaction), transactions))
+        stats.list_seconds = time.perf_counter() - start
+
+        writer = _ArchiveWriter(fileobj, archive_format)
+        start = time.perf_counter()
+        entries = (entry for transaction_entries in planned for entry in transaction_entries)
+        for entry, data in _bounded_map(executor, lambda entry: _fetch(storage, entry), entries, window=2 * max_workers):
+            record = {"path": entry.archive_path, "source": f"{entry.container}/{entry.blob_name}" if entry.blob_name else "database"}
+            if data is None:
+                stats.missing += 1
+                record["missing"] = True
+                logger.warning(f"⚠️ Export: Blob fehlt: {entry.container}/{entry.blob_name}")
+            else:
+                writer.add(entry.archive_path, data)
+                sha256 = hashlib.sha256(data).hexdigest()
+                record.update(size_bytes=len(data), sha256=sha256, expected_sha256=entry.expected_hash)
+                if entry.expected_hash:
+                    record["hash_verified"] = entry.expected_hash == sha256
+                    if not record["hash_verified"]:
+                        stats.hash_mismatches += 1
+                stats.files += 1
+                stats.bytes += len(data)
+                if stats.files % PROGRESS_LOG_INTERVAL == 0:
+                    logger.info(f"📦 Export: {stats.files} Dateien, {stats.bytes / (1024 * 1024):.1f} MB")
+            stats.records.setdefault(entry.transaction_id, []).append(record)
+        stats.transfer_seconds = time.perf_counter() - start
+
+        writer.add("manifest.json", _build_manifest(transactions, stats, export_filter))
+        writer.close()
+    return stats
+
+
+def _build_manifest(transactions: List[Dict[str, Any]], stats: ExportStats, export_filter: ExportFilter) -> bytes:
+    manifest = {
+        "created_at": datetime.now().isoformat(),
+        "filter": export_filter.to_dict(),
+        "summary": stats.throughput(),
+        "transactions": [
+            {
+                "transaction_id": str(transaction["id"]),
+                "status": transaction["status"].value if isinstance(transaction["status"], TransactionStatus) else transaction["status"],
+                "invoice_number": transaction["invoice_number"],
+                "erp_vendor_id": transaction["erp_vendor_id"],
+                "seller_vat_id": transaction["seller_vat_id"],
+                "seller_name": transaction["seller_name"],
+                "original_filename": transaction["original_filename"],
+                "content_hash": transaction["content_hash"],
+                "created_at": transaction["created_at"].isoformat() if transaction["created_at"] else None,
+                "files": stats.records.get(str(transaction["id"]), []),
+            }
+            for transaction in transactions
+        ],
+    }
+    return json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def run_export(
+    storage,
+    transactions: List[Dict[str, Any]],
+    export_filter: ExportFilter,
+    archive_format: str,
+    max_workers: int,
+    export_id: str
+) -> Dict[str, Any]:
+    """Archiv in einer temporären Datei erstellen und in den Export-Container hochladen."""
+    start = time.perf_counter()
+    logger.info(f"📦 GoBD Export {export_id}: {len(transactions)} Transaktionen ausgewählt")
+
+    with tempfile.TemporaryFile() as archive_file:
+        stats = write_export_archive(storage, transactions, archive_file, archive_format, max_workers, export_filter)
+        archive_size = archive_file.tell()
+        archive_file.seek(0)
+        blob_name = f"gobd/{export_id}.{ARCHIVE_SUFFIX[archive_format]}"
+        uri = storage.upload_export_file(blob_name, archive_file, ARCHIVE_CONTENT_TYPES[archive_format], {
+            "export_id": export_id,
+            "transactions": str(stats.transactions),
+            "files": str(stats.files),
+        })
+
+    throughput = stats.throughput()
+    duration = time.perf_counter() - start
+    logger.info(
+        f"✅ GoBD Export {export_id}: {stats.files} Dateien ({stats.bytes / (1024 * 1024):.1f} MB) in {duration:.1f}s, "
+        f"{throughput['megabytes_per_second']} MB/s, {throughput['files_per_second']} Dateien/s, "
+        f"{stats.missing} fehlend, {stats.hash_mismatches} Hash-Abweichungen"
+    )
+    return {
+        "export_id": export_id,
+        "uri": uri,
+        "archive_format": archive_format,
+        "archive_size_bytes": archive_size,
+        "duration_seconds": round(duration, 3),
+        **throughput,
+    }
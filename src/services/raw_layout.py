@@ -0,0 +1,71 @@
+# src/services/raw_layout.py
+
+"""
+Ablage-Layout des Raw-Containers
+- "transaction": eine Kopie pro Transaktion unter {transaction_id}/{filename} (bisheriges Verhalten)
+- "cas": Content-Addressable Storage, der Inhalt liegt genau einmal unter sha256/<hash>.
+  Die Transaktion referenziert den Blob über storage_uri_raw und content_hash; die GoBD-relevanten
+  Metadaten pro Transaktion (Dateiname, Quelle, Eingangszeitpunkt) stehen in {transaction_id}/manifest.json.
+"""
+
+import json
+from datetime import datetime
+from typing import Any, Dict, NamedTuple, Optional
+
+from ..core.config import settings
+
+LAYOUT_TRANSACTION = "transaction"
+LAYOUT_CAS = "cas"
+
+CAS_PREFIX = "sha256"
+MANIFEST_FILENAME = "manifest.json"
+
+
+class RawUploadResult(NamedTuple):
+    uri: str
+    size_bytes: int
+    content_hash: str
+    # True, wenn der Inhalt im CAS-Layout bereits vorhanden war und nicht erneut übertragen wurde
+    deduplicated: bool = False
+
+
+def content_addressed_layout() -> bool:
+    return settings.raw_storage_layout == LAYOUT_CAS
+
+
+def transaction_blob_name(transaction_id: str, filename: str) -> str:
+    return f"{transaction_id}/{filename}"
+
+
+def cas_blob_name(content_hash: str) -> str:
+    return f"{CAS_PREFIX}/{content_hash}"
+
+
+def manifest_blob_name(transaction_id: str) -> str:
+    return f"{transaction_id}/{MANIFEST_FILENAME}"
+
+
+def build_manifest(
+    transaction_id: str,
+    filename: str,
+    content_type: str,
+    content_hash: str,
+    size_bytes: int,
+    uri: str,
+    source: str,
+    extra: Optional[Dict[str, Any]] = None
+) -> bytes:
+    """Metadaten einer Transaktion zum geteilten CAS-Blob (GoBD: Eingang, Originalname, Quelle, Hash)."""
+    manifest = {
+        "transaction_id": transaction_id,
+        "original_filename": filename,
+        "content_type": content_type,
+        "content_hash": content_hash,
+        "file_size_bytes": size_bytes,
+        "storage_uri_raw": uri,
+        "source": source,
+        "received_at": datetime.now().isoformat(),
+    }
+    if extra:
+        manifest.update(extra)
+    return json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8")
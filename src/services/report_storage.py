@@ -0,0 +1,99 @@
+# src/services/report_storage.py
+
+"""
+Auslagerung großer Validierungsberichte
+Berichte über der Schwelle werden komprimiert im Processed-Container abgelegt (neben processed.xml),
+in der Tabelle bleiben nur die Zusammenfassung und ein Verweis auf den Blob.
+"""
+
+import json
+import logging
+import zlib
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, Optional
+
+try:
+    import zstandard  # Optional: bessere Kompression/Geschwindigkeit als gzip
+except ImportError:  # pragma: no cover - abhängig von der Umgebung
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+GZIP = "gzip"
+ZSTD = "zstd"
+
+# Dateiendungen der ausgelagerten Berichte
+REPORT_BLOB_SUFFIX = {GZIP: "json.gz", ZSTD: "json.zst"}
+
+# Schlüssel der Zusammenfassung, die in der Tabelle verbleiben
+STUB_KEYS = ("transaction_id", "invoice_number", "validation_timestamp", "detected_format", "summary", "total_duration_seconds")
+
+
+def resolve_encoding(requested: str) -> str:
+    """zstd nur, wenn das Paket zstandard installiert ist, sonst gzip."""
+    if requested == ZSTD and zstandard is None:
+        logger.warning("⚠️ zstandard ist nicht installiert, es wird mit gzip komprimiert.")
+        return GZIP
+    return ZSTD if requested == ZSTD else GZIP
+
+
+def serialize_report(report_json: Dict[str, Any]) -> bytes:
+    return json.dumps(report_json, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == ZSTD:
+        return zstandard.ZstdCompressor(level=6).compress(data)
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip Container
+    return compressor.compress(data) + compressor.flush()
+
+
+def iter_decompress(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    """Dekomprimiert gestreamt (Chunk für Chunk), ohne den ganzen Bericht im Speicher zu halten."""
+    if encoding == ZSTD:
+        decompressor = zstandard.ZstdDecompressor().decompressobj()
+        for chunk in chunks:
+            data = decompressor.decompress(chunk)
+            if data:
+                yield data
+        return
+
+    decompressor = zlib.decompressobj(31)
+    for chunk in chunks:
+        data = decompressor.decompress(chunk)
+        if data:
+            yield data
+    tail = decompressor.flush()
+    if tail:
+        yield tail
+
+
+async def aiter_decompress(chunks: AsyncIterable[bytes], encoding: str) -> AsyncIterator[bytes]:
+    """Wie iter_decompress, für async Downloads (StorageService)."""
+    decompressor = zstandard.ZstdDecompressor().decompressobj() if encoding == ZSTD else zlib.decompressobj(31)
+    async for chunk in chunks:
+        data = decompressor.decompress(chunk)
+        if data:
+            yield data
+    if encoding != ZSTD:
+        tail = decompressor.flush()
+        if tail:
+            yield tail
+
+
+def build_report_stub(report_json: Dict[str, Any], uri: str, encoding: str, size_bytes: int, compressed_size_bytes: int) -> Dict[str, Any]:
+    """Zusammenfassung + Verweis für die JSON-Spalte validation_report."""
+    stub = {key: report_json.get(key) for key in STUB_KEYS if key in report_json}
+    stub["offloaded"] = {
+        "uri": uri,
+        "content_encoding": encoding,
+        "size_bytes": size_bytes,
+        "compressed_size_bytes": compressed_size_bytes,
+    }
+    return stub
+
+
+def get_offload_pointer(report_json: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Verweis auf den ausgelagerten Bericht oder None (Bericht liegt vollständig in der Tabelle)."""
+    if not report_json:
+        return None
+    return report_json.get("offloaded")
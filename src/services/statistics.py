@@ -0,0 +1,207 @@
+# src/services/statistics.py
+
+"""
+Statistiken über die Rechnungsverarbeitung
+Eine gruppierte Abfrage (Status x Format x Latenz-Bucket) statt einer Abfrage pro Kennzahl.
+Für Zeiträume über einer Stunde werden nur die stündlichen Rollups (transaction_stats_hourly) gelesen.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+from sqlalchemy import case, delete, func, insert
+from sqlalchemy.orm import Session
+
+from ..db.models import InvoiceTransaction, TransactionStatsHourly, TransactionStatus
+
+logger = logging.getLogger(__name__)
+
+# Obergrenzen der Latenz-Buckets in Sekunden (Bucket i: LATENCY_BUCKET_BOUNDS[i-1] < t <= LATENCY_BUCKET_BOUNDS[i]).
+# Der letzte Bucket (Index len(...)) sammelt alles darüber.
+LATENCY_BUCKET_BOUNDS: Sequence[float] = (
+    0.05, 0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 3, 5, 7.5, 10, 15, 20, 30, 45, 60, 90, 120, 180, 300, 600,
+)
+NO_LATENCY_BUCKET = -1
+NO_FORMAT = "NONE"
+PERCENTILES = (("p50", 0.50), ("p95", 0.95), ("p99", 0.99))
+
+
+class StatsRow(NamedTuple):
+    """Eine Gruppe der aggregierten Abfrage (live oder Rollup)."""
+    status: TransactionStatus
+    format_detected: str
+    latency_bucket: int
+    transaction_count: int
+    processing_time_sum: float
+
+
+def _latency_bucket_expression():
+    """SQL CASE Ausdruck: Verarbeitungszeit -> Bucket-Index."""
+    column = InvoiceTransaction.processing_time_seconds
+    whens = [(column.is_(None), NO_LATENCY_BUCKET)]
+    whens += [(column <= bound, index) for index, bound in enumerate(LATENCY_BUCKET_BOUNDS)]
+    return case(*whens, else_=len(LATENCY_BUCKET_BOUNDS))
+
+
+def _format_value(format_detected) -> str:
+    if format_detected is None:
+        return NO_FORMAT
+    return getattr(format_detected, "value", format_detected)
+
+
+def query_live_stats(db: Session, start: datetime, end: Optional[datetime] = None) -> List[StatsRow]:
+    """Eine gruppierte Abfrage über invoice_transactions (Index auf created_at)."""
+    bucket = _latency_bucket_expression().label("latency_bucket")
+    query = db.query(
+        InvoiceTransaction.status,
+        InvoiceTransaction.format_detected,
+        bucket,
+        func.count(InvoiceTransaction.id),
+        func.coalesce(func.sum(InvoiceTransaction.processing_time_seconds), 0),
+    ).filter(InvoiceTransaction.created_at >= start)
+    if end is not None:
+        query = query.filter(InvoiceTransaction.created_at < end)
+    rows = query.group_by(InvoiceTransaction.status, InvoiceTransaction.format_detected, bucket).all()
+    return [
+        StatsRow(status, _format_value(format_detected), int(latency_bucket), int(count), float(time_sum or 0))
+        for status, format_detected, latency_bucket, count, time_sum in rows
+    ]
+
+
+def query_rollup_stats(db: Session, start: datetime) -> List[StatsRow]:
+    """Liest die stündlichen Rollups ab der Stunde von start (eine gruppierte Abfrage)."""
+    rows = db.query(
+        TransactionStatsHourly.status,
+        TransactionStatsHourly.format_detected,
+        TransactionStatsHourly.latency_bucket,
+        func.sum(TransactionStatsHourly.transaction_count),
+        func.sum(TransactionStatsHourly.processing_time_sum),
+    ).filter(
+        TransactionStatsHourly.bucket_start >= floor_hour(start)
+    ).group_by(
+        TransactionStatsHourly.status, TransactionStatsHourly.format_detected, TransactionStatsHourly.latency_bucket
+    ).all()
+    return [
+        StatsRow(status, format_detected, int(latency_bucket), int(count or 0), float(time_sum or 0))
+        for status, format_detected, latency_bucket, count, time_sum in rows
+    ]
+
+
+def floor_hour(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def refresh_hourly_rollups(db: Session, hours: int, now: Optional[datetime] = None) -> int:
+    """
+    Berechnet die Rollups der letzten `hours` Stunden (inkl. der laufenden) neu, dazu ältere Stunden mit
+    Transaktionen, die sich seit dem letzten Refresh geändert haben (z.B. spät abgeschlossene geparkte Rechnungen).
+    Idempotent: Pro Stunde werden die Rollup-Zeilen ersetzt. Kein Commit. Gibt die Anzahl Zeilen zurück.
+    """
+    now = now or datetime.now()
+    current_hour = floor_hour(now)
+    window_start = current_hour - timedelta(hours=hours - 1)
+    buckets = _changed_buckets_before(db, window_start)
+    buckets += [current_hour - timedelta(hours=offset) for offset in range(hours - 1, -1, -1)]
+
+    written = 0
+    for bucket_start in buckets:
+        written += _write_hourly_rollup(db, bucket_start, now)
+    return written
+
+
+def _changed_buckets_before(db: Session, window_start: datetime) -> List[datetime]:
+    """Stunden vor dem Refresh-Fenster, deren Transaktionen seit dem letzten Refresh aktualisiert wurden."""
+    last_refreshed_at = db.query(func.max(TransactionStatsHourly.refreshed_at)).scalar()
+    if last_refreshed_at is None:
+        return []
+    created = db.query(InvoiceTransaction.created_at).filter(
+        InvoiceTransaction.updated_at >= last_refreshed_at,
+        InvoiceTransaction.created_at < window_start,
+    ).distinct()
+    return sorted({floor_hour(created_at) for (created_at,) in created if created_at is not None})
+
+
+def _write_hourly_rollup(db: Session, bucket_start: datetime, refreshed_at: datetime) -> int:
+    """Ersetzt die Rollup-Zeilen einer Stunde durch die aktuellen Live-Werte."""
+    rows = query_live_stats(db, bucket_start, bucket_start + timedelta(hours=1))
+    db.execute(delete(TransactionStatsHourly).where(TransactionStatsHourly.bucket_start == bucket_start))
+    if rows:
+        db.execute(insert(TransactionStatsHourly.__table__), [
+            {
+                "bucket_start": bucket_start,
+                "status": row.status,
+                "format_detected": row.format_detected,
+                "latency_bucket": row.latency_bucket,
+                "transaction_count": row.transaction_count,
+                "processing_time_sum": row.processing_time_sum,
+                "refreshed_at": refreshed_at,
+            }
+            for row in rows
+        ])
+    return len(rows)
+
+
+def estimate_percentile(histogram: Dict[int, int], quantile: float) -> Optional[float]:
+    """
+    Perzentil aus dem Latenz-Histogramm (lineare Interpolation innerhalb des Buckets).
+    Genauigkeit: Breite des Buckets; über der letzten Grenze wird die letzte Grenze geliefert.
+    """
+    total = sum(count for bucket, count in histogram.items() if bucket != NO_LATENCY_BUCKET)
+    if total == 0:
+        return None
+    rank = quantile * total
+    cumulative = 0
+    for index in range(len(LATENCY_BUCKET_BOUNDS) + 1):
+        count = histogram.get(index, 0)
+        if count and cumulative + count >= rank:
+            if index == len(LATENCY_BUCKET_BOUNDS):
+                return float(LATENCY_BUCKET_BOUNDS[-1])
+            lower = LATENCY_BUCKET_BOUNDS[index - 1] if index > 0 else 0.0
+            upper = LATENCY_BUCKET_BOUNDS[index]
+            return round(lower + (upper - lower) * (rank - cumulative) / count, 3)
+        cumulative += count
+    return float(LATENCY_BUCKET_BOUNDS[-1])
+
+
+def summarize(rows: Iterable[StatsRow]) -> Dict[str, Any]:
+    """Baut overview, Status-/Formatverteilung und Perzentile pro Format aus den gruppierten Zeilen."""
+    status_counts = {status.value: 0 for status in TransactionStatus}
+    format_counts: Dict[str, int] = defaultdict(int)
+    histograms: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+    total = 0
+    time_sum = 0.0
+    time_count = 0
+
+    for row in rows:
+        status = getattr(row.status, "value", row.status)
+        status_counts[status] = status_counts.get(status, 0) + row.transaction_count
+        total += row.transaction_count
+        if row.format_detected != NO_FORMAT:
+            format_counts[row.format_detected] += row.transaction_count
+        if row.latency_bucket != NO_LATENCY_BUCKET:
+            time_sum += row.processing_time_sum
+            time_count += row.transaction_count
+            histograms[row.format_detected][row.latency_bucket] += row.transaction_count
+
+    error_count = status_counts[TransactionStatus.ERROR.value] + status_counts[TransactionStatus.INVALID.value]
+    success_count = status_counts[TransactionStatus.VALID.value]
+
+    percentiles = {}
+    for format_value, histogram in histograms.items():
+        entry: Dict[str, Any] = {name: estimate_percentile(histogram, quantile) for name, quantile in PERCENTILES}
+        entry["count"] = sum(histogram.values())
+        percentiles[format_value] = entry
+
+    return {
+        "overview": {
+            "total_transactions": total,
+            "success_rate_percent": round(success_count / total * 100, 2) if total else 0,
+            "error_rate_percent": round(error_count / total * 100, 2) if total else 0,
+            "avg_processing_time_seconds": round(time_sum / time_count, 3) if time_count else None,
+        },
+        "status_distribution": status_counts,
+        "format_distribution": dict(format_counts),
+        "processing_time_percentiles": percentiles,
+    }
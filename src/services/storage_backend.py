@@ -0,0 +1,69 @@
+# src/services/storage_backend.py
+
+"""
+Storage Backend der Worker (synchron)
+Der Celery Worker (process_invoice_task, E-Mail Eingang, ausgelagerte Berichte) arbeitet nur gegen das
+StorageBackend Protokoll. settings.storage_backend wählt die Implementierung:
+- "azure": SyncStorageService (Azure Blob Storage bzw. Azurite)
+- "local": LocalFSStorageBackend (lokales Dateisystem, file:// URIs, ohne Netzwerk - Benchmarks, Air-Gapped)
+"""
+
+import logging
+from typing import Dict, Iterator, Optional, Protocol, runtime_checkable
+import uuid
+
+from ..core.config import settings
+from .raw_layout import RawUploadResult
+
+logger = logging.getLogger(__name__)
+
+BACKEND_AZURE = "azure"
+BACKEND_LOCAL = "local"
+
+
+@runtime_checkable
+class StorageBackend(Protocol):
+    """Storage-Operationen, die die Verarbeitungspipeline benötigt."""
+
+    def download_blob_by_uri(self, uri: str) -> bytes:
+        ...
+
+    def iter_blob_chunks_by_uri(self, uri: str) -> Iterator[bytes]:
+        ...
+
+    def upload_raw_bytes(
+        self,
+        transaction_id: str | uuid.UUID,
+        filename: str,
+        data: bytes,
+        content_type: str,
+        source: str,
+        manifest_extra: Optional[Dict[str, str]] = None
+    ) -> RawUploadResult:
+        ...
+
+    def upload_processed_xml(self, transaction_id: str | uuid.UUID, xml_content: bytes, format_type: str) -> str:
+        ...
+
+    def upload_validation_report(self, transaction_id: str | uuid.UUID, data: bytes, content_encoding: str, suffix: str) -> str:
+        ...
+
+
+def create_storage_backend() -> StorageBackend:
+    """Backend gemäß settings.storage_backend."""
+    if settings.storage_backend == BACKEND_LOCAL:
+        from .storage_service_local import LocalFSStorageBackend
+        return LocalFSStorageBackend(settings.local_storage_root, use_mmap=settings.local_storage_mmap_reads)
+    if settings.storage_backend != BACKEND_AZURE:
+        raise ValueError(f"Unbekanntes Storage Backend: {settings.storage_backend}")
+    from .storage_service_sync import SyncStorageService
+    return SyncStorageService()
+
+
+# Singleton Instanz für die Celery Worker
+try:
+    sync_storage_service: Optional[StorageBackend] = create_storage_backend()
+    logger.info(f"📦 Storage Backend: {settings.storage_backend}")
+except Exception as e:
+    logger.warning(f"Storage Backend konnte nicht initialisiert werden (z.B. während Build/Tests): {e}")
+    sync_storage_service = None
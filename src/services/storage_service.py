@@ -1,26 +1,118 @@
 """
 Azure Blob Storage Service
-Abstraktion für alle Storage-Operationen
+Abstraktion für alle Storage-Operationen (asyncio, für den FastAPI Prozess)
+Der Celery Worker nutzt den synchronen SyncStorageService.
 """
 
-from azure.storage.blob import BlobServiceClient, BlobClient
-from azure.core.exceptions import AzureError
+from azure.storage.blob import BlobBlock, ContentSettings
+from azure.storage.blob.aio import BlobServiceClient
+from azure.core.exceptions import AzureError, ResourceNotFoundError
 import logging
-from typing import Optional, Dict, Any
+from typing import AsyncIterator, Optional, Dict, Any, List, Tuple
+from collections import OrderedDict
 from datetime import datetime, timedelta
+import asyncio
+import base64
 import hashlib
 
-from ..core.azure_clients import azure_clients
 from ..core.config import settings
+from . import report_storage
+from .raw_layout import RawUploadResult, build_manifest, cas_blob_name, manifest_blob_name, transaction_blob_name
+from .storage_service_sync import DECODABLE_ENCODINGS, encode_processed_xml, parse_blob_uri
 
 logger = logging.getLogger(__name__)
 
+# Gemeinsamer async Client (aiohttp Session mit Verbindungspool) - wird im lifespan Hook erstellt und geschlossen
+_async_blob_client: Optional[BlobServiceClient] = None
+_async_credential = None
+
+# SAS Caches (API-Prozess): User Delegation Key bis kurz vor Ablauf, SAS Tokens pro (Container, Blob, Ablauf-Bucket)
+MAX_DELEGATION_KEY_LIFETIME = timedelta(days=7)  # Obergrenze von Azure für User Delegation Keys
+_delegation_key = None
+_delegation_key_expiry: Optional[datetime] = None
+_delegation_key_lock = asyncio.Lock()
+_sas_token_cache: "OrderedDict[Tuple[str, str, datetime], str]" = OrderedDict()
+
+
+def sas_expiry_bucket(now: datetime, expiry_hours: int) -> datetime:
+    """
+    Ablaufzeit eines SAS Tokens, aufgerundet auf die nächste Bucket-Grenze.
+    Alle Anfragen im selben Bucket teilen sich einen Token; die Gültigkeit ist nie kürzer als angefordert.
+    """
+    bucket = timedelta(minutes=settings.sas_expiry_bucket_minutes)
+    target = now + timedelta(hours=expiry_hours)
+    remainder = (target - datetime.min) % bucket
+    return target + (bucket - remainder) if remainder else target
+
+
+def _remember_sas_token(cache_key: Tuple[str, str, datetime], sas_token: str) -> None:
+    _sas_token_cache[cache_key] = sas_token
+    while len(_sas_token_cache) > settings.sas_cache_max_entries:
+        _sas_token_cache.popitem(last=False)
+
+
+def reset_sas_caches() -> None:
+    """Verwirft gecachte Delegation Keys und SAS Tokens (Shutdown, Wechsel der Credentials)."""
+    global _delegation_key, _delegation_key_expiry, _delegation_key_lock
+    _delegation_key = None
+    _delegation_key_expiry = None
+    _delegation_key_lock = asyncio.Lock()
+    _sas_token_cache.clear()
+
+
+def get_async_blob_service_client() -> BlobServiceClient:
+    """
+    Liefert den gemeinsamen async BlobServiceClient (nur API-Prozess).
+    Entwicklung: Connection String (Azurite), sonst Managed Identity.
+    """
+    global _async_blob_client, _async_credential
+    if _async_blob_client is None:
+        if settings.environment == "development":
+            _async_blob_client = BlobServiceClient.from_connection_string(settings.azure_storage_connection_string)
+        else:
+            from azure.identity.aio import DefaultAzureCredential
+            _async_credential = DefaultAzureCredential()
+            _async_blob_client = BlobServiceClient(
+                account_url=f"https://{_extract_account_name()}.blob.core.windows.net",
+                credential=_async_credential,
+            )
+        logger.info("📦 Async Blob Storage Client erstellt.")
+    return _async_blob_client
+
+
+async def close_async_blob_service_client() -> None:
+    """Schließt den async Client und seine HTTP Session (Shutdown)."""
+    global _async_blob_client, _async_credential
+    if _async_blob_client is not None:
+        await _async_blob_client.close()
+        _async_blob_client = None
+    if _async_credential is not None:
+        await _async_credential.close()
+        _async_credential = None
+    reset_sas_caches()
+
+
+def _extract_account_name() -> str:
+    for part in settings.azure_storage_connection_string.split(';'):
+        if part.startswith('AccountName='):
+            return part.split('=', 1)[1]
+    raise ValueError("AccountName nicht in Connection String gefunden")
+
+
+class FileTooLargeError(Exception):
+    """Upload überschreitet die maximale Dateigröße (Abbruch während des Streamings)."""
+
+
+def get_storage_service() -> "StorageService":
+    """StorageService auf dem gemeinsamen async Client."""
+    return StorageService(get_async_blob_service_client())
+
 
 class StorageService:
-    """Service für Azure Blob Storage Operationen"""
+    """Service für Azure Blob Storage Operationen (blockiert den Event Loop nicht)"""
     
-    def __init__(self):
-        self.blob_client = azure_clients.blob_client
+    def __init__(self, blob_client: Optional[BlobServiceClient] = None):
+        self.blob_client = blob_client or get_async_blob_service_client()
     
     async def upload_raw_file(
         self, 
@@ -64,9 +156,9 @@ class StorageService:
                 blob=blob_name
             )
             
-            blob_client.upload_blob(
+            await blob_client.upload_blob(
                 data=content,
-                content_type=content_type,
+                content_settings=ContentSettings(content_type=content_type),
                 metadata=metadata,
                 overwrite=True  # Überschreiben falls bereits vorhanden
             )
@@ -84,6 +176,157 @@ class StorageService:
             logger.error(f"❌ Unerwarteter Fehler beim Upload von {filename}: {e}")
             raise
     
+    async def upload_raw_stream(
+        self,
+        transaction_id: str,
+        filename: str,
+        chunks: AsyncIterator[bytes],
+        content_type: str,
+        max_size_bytes: Optional[int] = None
+    ) -> RawUploadResult:
+        """
+        Lade Rohdatei gestreamt in den Raw-Container hoch (Put Block pro Chunk, danach Put Block List)
+        
+        SHA-256 und Größe werden fortlaufend berechnet; beim Überschreiten von max_size_bytes wird abgebrochen,
+        bevor weitere Blöcke übertragen werden (nicht committete Blöcke verwirft Azure automatisch).
+        Speicherbedarf: ein Chunk pro Upload.
+        
+        Returns:
+            RawUploadResult (Blob URI, Größe, SHA-256)
+        """
+        
+        blob_name = transaction_blob_name(transaction_id, filename)
+        blob_client = self.blob_client.get_blob_client(
+            container=settings.blob_container_raw,
+            blob=blob_name
+        )
+        
+        try:
+            block_list, size, content_hash = await self._stage_blocks(blob_client, chunks, filename, max_size_bytes)
+            await blob_client.commit_block_list(
+                block_list,
+                content_settings=ContentSettings(content_type=content_type),
+                metadata={
+                    "transaction_id": transaction_id,
+                    "original_filename": filename,
+                    "upload_timestamp": datetime.now().isoformat(),
+                    "content_hash": content_hash,
+                    "file_size_bytes": str(size)
+                },
+            )
+            
+            logger.info(f"📁 Raw-Datei gestreamt hochgeladen: {blob_name} ({size} bytes, {len(block_list)} Blöcke)")
+            
+            return RawUploadResult(uri=blob_client.url, size_bytes=size, content_hash=content_hash)
+            
+        except AzureError as e:
+            logger.error(f"❌ Azure Storage Fehler beim Upload von {filename}: {e}")
+            raise Exception(f"Storage Upload fehlgeschlagen: {str(e)}")
+    
+    async def upload_raw_content_addressed(
+        self,
+        transaction_id: str,
+        filename: str,
+        chunks: AsyncIterator[bytes],
+        content_type: str,
+        content_hash: str,
+        size_bytes: int,
+        source: str = "API"
+    ) -> RawUploadResult:
+        """
+        Lade Rohdatei im CAS-Layout hoch (sha256/<hash>, Hash vorab berechnet)
+        
+        Existiert der Blob bereits (HEAD), wird nichts übertragen. Die Metadaten der Transaktion
+        landen in jedem Fall in {transaction_id}/manifest.json.
+        
+        Returns:
+            RawUploadResult (URI des geteilten Blobs, Größe, SHA-256, dedupliziert ja/nein)
+        """
+        
+        blob_name = cas_blob_name(content_hash)
+        blob_client = self.blob_client.get_blob_client(
+            container=settings.blob_container_raw,
+            blob=blob_name
+        )
+        
+        try:
+            deduplicated = await blob_client.exists()
+            if deduplicated:
+                logger.info(f"♻️ Raw-Datei bereits vorhanden, Upload übersprungen: {blob_name} ({filename})")
+            else:
+                block_list, size, actual_hash = await self._stage_blocks(blob_client, chunks, filename, None)
+                if actual_hash != content_hash or size != size_bytes:
+                    # Datei hat sich zwischen Hash-Berechnung und Upload geändert: nicht committen
+                    raise Exception(f"Storage Upload fehlgeschlagen: Inhalt von {filename} entspricht nicht dem Hash {content_hash}")
+                # Gleicher Name = gleicher Inhalt, ein paralleler Upload desselben Hashes überschreibt identische Daten
+                await blob_client.commit_block_list(
+                    block_list,
+                    content_settings=ContentSettings(content_type=content_type),
+                    metadata={
+                        "content_hash": content_hash,
+                        "file_size_bytes": str(size),
+                        "first_transaction_id": transaction_id,
+                        "upload_timestamp": datetime.now().isoformat()
+                    },
+                )
+                logger.info(f"📁 Raw-Datei gestreamt hochgeladen (CAS): {blob_name} ({size} bytes, {len(block_list)} Blöcke)")
+            
+            uri = blob_client.url
+            await self._upload_manifest(transaction_id, filename, content_type, content_hash, size_bytes, uri, source)
+            
+            return RawUploadResult(uri=uri, size_bytes=size_bytes, content_hash=content_hash, deduplicated=deduplicated)
+            
+        except AzureError as e:
+            logger.error(f"❌ Azure Storage Fehler beim Upload von {filename}: {e}")
+            raise Exception(f"Storage Upload fehlgeschlagen: {str(e)}")
+    
+    async def _upload_manifest(
+        self,
+        transaction_id: str,
+        filename: str,
+        content_type: str,
+        content_hash: str,
+        size_bytes: int,
+        uri: str,
+        source: str
+    ) -> None:
+        manifest_client = self.blob_client.get_blob_client(
+            container=settings.blob_container_raw,
+            blob=manifest_blob_name(transaction_id)
+        )
+        await manifest_client.upload_blob(
+            data=build_manifest(transaction_id, filename, content_type, content_hash, size_bytes, uri, source),
+            content_settings=ContentSettings(content_type="application/json"),
+            metadata={"transaction_id": transaction_id, "referenced_content_hash": content_hash},
+            overwrite=True
+        )
+    
+    async def _stage_blocks(
+        self,
+        blob_client,
+        chunks: AsyncIterator[bytes],
+        filename: str,
+        max_size_bytes: Optional[int]
+    ) -> Tuple[List[BlobBlock], int, str]:
+        """Put Block pro Chunk. Gibt Blockliste, Größe und SHA-256 zurück (Commit macht der Aufrufer)."""
+        sha256 = hashlib.sha256()
+        size = 0
+        block_list: List[BlobBlock] = []
+        
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            size += len(chunk)
+            if max_size_bytes is not None and size > max_size_bytes:
+                raise FileTooLargeError(f"{filename} überschreitet das Maximum von {max_size_bytes} Bytes")
+            sha256.update(chunk)
+            # Block IDs müssen innerhalb eines Blobs gleich lang sein
+            block_id = base64.b64encode(f"{len(block_list):08d}".encode()).decode()
+            await blob_client.stage_block(block_id=block_id, data=chunk, length=len(chunk))
+            block_list.append(BlobBlock(block_id=block_id))
+        
+        return block_list, size, sha256.hexdigest()
+    
     async def upload_processed_xml(
         self, 
         transaction_id: str, 
@@ -106,7 +349,7 @@ class StorageService:
             # Blob-Name: transaction_id/processed.xml
             blob_name = f"{transaction_id}/processed.xml"
             
-            # Metadaten
+            # Metadaten (Hash und Größe des unkomprimierten XML)
             metadata = {
                 "transaction_id": transaction_id,
                 "format_type": format_type,
@@ -114,6 +357,8 @@ class StorageService:
                 "content_hash": hashlib.sha256(xml_content).hexdigest(),
                 "file_size_bytes": str(len(xml_content))
             }
+            # Transparente Kompression (Content-Encoding am Blob)
+            data, content_settings = encode_processed_xml(xml_content, metadata)
             
             # Upload
             blob_client = self.blob_client.get_blob_client(
@@ -121,16 +366,16 @@ class StorageService:
                 blob=blob_name
             )
             
-            blob_client.upload_blob(
-                data=xml_content,
-                content_type="application/xml",
+            await blob_client.upload_blob(
+                data=data,
+                content_settings=content_settings,
                 metadata=metadata,
                 overwrite=True
             )
             
             blob_uri = blob_client.url
             
-            logger.info(f"📁 Verarbeitete XML hochgeladen: {blob_name} ({len(xml_content)} bytes)")
+            logger.info(f"📁 Verarbeitete XML hochgeladen: {blob_name} ({len(xml_content)} bytes, gespeichert {len(data)} bytes)")
             
             return blob_uri
             
@@ -158,8 +403,8 @@ class StorageService:
                 blob=blob_name
             )
             
-            download_stream = blob_client.download_blob()
-            content = download_stream.readall()
+            download_stream = await blob_client.download_blob()
+            content = await download_stream.readall()
             
             logger.info(f"📥 Raw-Datei heruntergeladen: {blob_name} ({len(content)} bytes)")
             
@@ -171,7 +416,7 @@ class StorageService:
     
     async def download_processed_xml(self, transaction_id: str) -> bytes:
         """
-        Lade verarbeitete XML-Datei herunter
+        Lade verarbeitete XML-Datei herunter (komprimierte Blobs werden gestreamt dekomprimiert)
         """
         
         try:
@@ -182,8 +427,12 @@ class StorageService:
                 blob=blob_name
             )
             
-            download_stream = blob_client.download_blob()
-            content = download_stream.readall()
+            download_stream = await blob_client.download_blob(decompress=False)
+            encoding = download_stream.properties.content_settings.content_encoding
+            if encoding in DECODABLE_ENCODINGS:
+                content = b"".join([chunk async for chunk in report_storage.aiter_decompress(download_stream.chunks(), encoding)])
+            else:
+                content = await download_stream.readall()
             
             logger.info(f"📥 Verarbeitete XML heruntergeladen: {blob_name}")
             
@@ -193,6 +442,21 @@ class StorageService:
             logger.error(f"❌ Fehler beim XML Download für {transaction_id}: {e}")
             raise
     
+    async def open_blob_chunks_by_uri(self, uri: str) -> AsyncIterator[bytes]:
+        """
+        Startet den Download eines Blobs anhand seines URI und liefert die (unveränderten) Chunks.
+        Fehler beim Öffnen kommen hier an: FileNotFoundError (Blob fehlt) bzw. IOError.
+        """
+        container, blob_name = parse_blob_uri(uri, self.blob_client.account_name)
+        blob_client = self.blob_client.get_blob_client(container=container, blob=blob_name)
+        try:
+            download_stream = await blob_client.download_blob(decompress=False)
+        except ResourceNotFoundError:
+            raise FileNotFoundError(f"Blob nicht gefunden: {uri}")
+        except AzureError as e:
+            raise IOError(f"Download fehlgeschlagen: {uri}: {e}") from e
+        return download_stream.chunks()
+    
     async def get_file_metadata(self, container: str, blob_name: str) -> Dict[str, Any]:
         """
         Hole Metadaten einer Datei
@@ -204,7 +468,7 @@ class StorageService:
                 blob=blob_name
             )
             
-            properties = blob_client.get_blob_properties()
+            properties = await blob_client.get_blob_properties()
             
             return {
                 "size_bytes": properties.size,
@@ -221,6 +485,7 @@ class StorageService:
     async def delete_transaction_files(self, transaction_id: str) -> bool:
         """
         Lösche alle Dateien einer Transaction (Raw + Processed)
+        Geteilte CAS-Blobs (sha256/<hash>) bleiben erhalten, gelöscht wird nur das Manifest der Transaction.
         ACHTUNG: Nur für Development/Testing verwenden!
         """
         
@@ -232,12 +497,12 @@ class StorageService:
                 settings.blob_container_raw
             ).list_blobs(name_starts_with=f"{transaction_id}/")
             
-            for blob in raw_blobs:
+            async for blob in raw_blobs:
                 blob_client = self.blob_client.get_blob_client(
                     container=settings.blob_container_raw,
                     blob=blob.name
                 )
-                blob_client.delete_blob()
+                await blob_client.delete_blob()
                 deleted_count += 1
                 logger.info(f"🗑️ Gelöscht: {blob.name}")
             
@@ -246,12 +511,12 @@ class StorageService:
                 settings.blob_container_processed
             ).list_blobs(name_starts_with=f"{transaction_id}/")
             
-            for blob in processed_blobs:
+            async for blob in processed_blobs:
                 blob_client = self.blob_client.get_blob_client(
                     container=settings.blob_container_processed,
                     blob=blob.name
                 )
-                blob_client.delete_blob()
+                await blob_client.delete_blob()
                 deleted_count += 1
                 logger.info(f"🗑️ Gelöscht: {blob.name}")
             
@@ -272,73 +537,103 @@ class StorageService:
         """
         Generiere temporäre Download-URL mit SAS Token
         
+        SAS Tokens werden pro (Container, Blob, Ablauf-Bucket) gecacht, der User Delegation Key
+        (Produktion) bis kurz vor seinem Ablauf - wiederholte Links kosten keinen Azure Roundtrip.
+        
         Args:
             container: Container Name
             blob_name: Blob Name
-            expiry_hours: Gültigkeit in Stunden
+            expiry_hours: Gültigkeit in Stunden (mindestens, aufgerundet auf den Ablauf-Bucket)
             
         Returns:
             Temporäre Download-URL
         """
         
+        blob_client = self.blob_client.get_blob_client(container=container, blob=blob_name)
+        
         try:
-            from azure.storage.blob import generate_blob_sas, BlobSasPermissions
-            from datetime import datetime, timedelta
-            
-            blob_client = self.blob_client.get_blob_client(
-                container=container,
-                blob=blob_name
-            )
-            
-            # Entwicklung: Connection String basierte SAS
-            if settings.environment == "development":
-                # Account Key aus Connection String extrahieren
-                account_key = self._extract_account_key_from_connection_string()
-                if account_key:
-                    sas_token = generate_blob_sas(
-                        account_name=self.blob_client.account_name,
-                        container_name=container,
-                        blob_name=blob_name,
-                        account_key=account_key,
-                        permission=BlobSasPermissions(read=True),
-                        expiry=datetime.utcnow() + timedelta(hours=expiry_hours)
-                    )
-                    
-                    download_url = f"{blob_client.url}?{sas_token}"
-                    logger.info(f"🔗 Development SAS URL generiert für {blob_name}")
-                    return download_url
-            
-            # Produktion: User Delegation SAS (für Managed Identity)
-            else:
-                # User Delegation Key holen (erfordert Managed Identity mit entsprechenden Rechten)
-                delegation_key = self.blob_client.get_user_delegation_key(
-                    key_start_time=datetime.utcnow(),
-                    key_expiry_time=datetime.utcnow() + timedelta(hours=expiry_hours)
-                )
-                
-                sas_token = generate_blob_sas(
-                    account_name=self.blob_client.account_name,
-                    container_name=container,
-                    blob_name=blob_name,
-                    user_delegation_key=delegation_key,
-                    permission=BlobSasPermissions(read=True),
-                    expiry=datetime.utcnow() + timedelta(hours=expiry_hours)
-                )
-                
-                download_url = f"{blob_client.url}?{sas_token}"
-                logger.info(f"🔗 Production SAS URL generiert für {blob_name}")
-                return download_url
-            
-            # Fallback: Direkte URL ohne SAS (nur für Development)
-            logger.warning(f"⚠️ SAS-Generierung fehlgeschlagen, verwende direkte URL für {blob_name}")
-            return blob_client.url
+            expiry = sas_expiry_bucket(datetime.utcnow(), expiry_hours)
+            cache_key = (container, blob_name, expiry)
+            sas_token = _sas_token_cache.get(cache_key)
+            if sas_token is not None:
+                _sas_token_cache.move_to_end(cache_key)
+                return f"{blob_client.url}?{sas_token}"
+            
+            sas_token = await self._generate_blob_sas(container, blob_name, expiry)
+            if sas_token is None:
+                # Fallback: Direkte URL ohne SAS (nur für Development)
+                logger.warning(f"⚠️ SAS-Generierung fehlgeschlagen, verwende direkte URL für {blob_name}")
+                return blob_client.url
+            
+            _remember_sas_token(cache_key, sas_token)
+            logger.debug(f"🔗 SAS URL generiert für {blob_name} (gültig bis {expiry.isoformat()})")
+            return f"{blob_client.url}?{sas_token}"
             
         except Exception as e:
             logger.error(f"❌ Fehler beim Generieren der Download-URL für {blob_name}: {e}")
             # Fallback: Direkte URL
-            blob_client = self.blob_client.get_blob_client(container=container, blob=blob_name)
             return blob_client.url
     
+    async def generate_download_urls(
+        self,
+        blobs: List[Tuple[str, str]],
+        expiry_hours: int = 24
+    ) -> List[str]:
+        """Download-URLs für viele (Container, Blob) Paare (Listenansichten); teilt sich Delegation Key und Token-Cache."""
+        return list(await asyncio.gather(
+            *(self.generate_download_url(container, blob_name, expiry_hours) for container, blob_name in blobs)
+        ))
+    
+    async def _generate_blob_sas(self, container: str, blob_name: str, expiry: datetime) -> Optional[str]:
+        """Read-only SAS Token: Entwicklung mit Account Key, Produktion als User Delegation SAS (Managed Identity)."""
+        from azure.storage.blob import generate_blob_sas, BlobSasPermissions
+        
+        sas_args = dict(
+            account_name=self.blob_client.account_name,
+            container_name=container,
+            blob_name=blob_name,
+            permission=BlobSasPermissions(read=True),
+            expiry=expiry
+        )
+        
+        if settings.environment == "development":
+            account_key = self._extract_account_key_from_connection_string()
+            if not account_key:
+                return None
+            return generate_blob_sas(account_key=account_key, **sas_args)
+        
+        delegation_key = await self._get_user_delegation_key(expiry)
+        return generate_blob_sas(user_delegation_key=delegation_key, **sas_args)
+    
+    async def _get_user_delegation_key(self, valid_until: datetime):
+        """
+        Gecachter User Delegation Key, der mindestens bis valid_until (plus Erneuerungsmarge) gültig ist.
+        Parallele Anfragen (Bulk-Signierung) warten auf einen einzigen Abruf.
+        """
+        global _delegation_key, _delegation_key_expiry
+        margin = timedelta(minutes=settings.sas_delegation_key_refresh_minutes)
+        
+        if _delegation_key is not None and _delegation_key_expiry - margin >= valid_until:
+            return _delegation_key
+        
+        async with _delegation_key_lock:
+            if _delegation_key is not None and _delegation_key_expiry - margin >= valid_until:
+                return _delegation_key
+            
+            now = datetime.utcnow()
+            key_expiry = max(now + timedelta(hours=settings.sas_delegation_key_lifetime_hours), valid_until + margin)
+            key_expiry = min(key_expiry, now + MAX_DELEGATION_KEY_LIFETIME)
+            if key_expiry < valid_until:
+                raise ValueError(f"SAS Ablauf {valid_until.isoformat()} überschreitet die maximale Gültigkeit des User Delegation Keys")
+            
+            _delegation_key = await self.blob_client.get_user_delegation_key(
+                key_start_time=now,
+                key_expiry_time=key_expiry
+            )
+            _delegation_key_expiry = key_expiry
+            logger.info(f"🔑 User Delegation Key abgerufen (gültig bis {key_expiry.isoformat()})")
+            return _delegation_key
+    
     def _extract_account_key_from_connection_string(self) -> Optional[str]:
         """Extrahiere Account Key aus Azure Storage Connection String"""
         try:
@@ -351,7 +646,7 @@ class StorageService:
             logger.error(f"Fehler beim Extrahieren des Account Keys: {e}")
             return None
     
-    def health_check(self) -> Dict[str, Any]:
+    async def health_check(self) -> Dict[str, Any]:
         """
         Storage Service Gesundheitsprüfung
         """
@@ -366,14 +661,14 @@ class StorageService:
         
         try:
             # Blob Service Test
-            self.blob_client.get_account_information()
+            await self.blob_client.get_account_information()
             health["blob_service"] = True
             
             # Container Tests
             for container_name in [settings.blob_container_raw, settings.blob_container_processed]:
                 try:
                     container_client = self.blob_client.get_container_client(container_name)
-                    container_client.get_container_properties()
+                    await container_client.get_container_properties()
                     health["containers"][container_name.replace("invoices-", "")] = True
                 except Exception:
                     logger.warning(f"Container {container_name} nicht verfügbar")
@@ -0,0 +1,163 @@
+# src/services/storage_service_local.py
+
+"""
+Lokales Dateisystem als Storage Backend (ohne Azure/Azurite)
+Container sind Unterverzeichnisse von root, Blobs Dateien darunter; URIs sind file:// URIs.
+Schreiben ist atomar (Temp-Datei im Zielverzeichnis, fsync, os.replace), Leser sehen nie halbe Dateien.
+Blob-Metadaten gibt es lokal nicht; im CAS-Layout stehen die Transaktions-Metadaten wie bei Azure im Manifest.
+Komprimiertes processed.xml wird beim Lesen an der Magic Number erkannt (statt am Content-Encoding).
+"""
+
+import hashlib
+import logging
+import mmap
+import os
+import tempfile
+import uuid
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+from urllib.parse import unquote, urlsplit
+
+from ..core.config import settings
+from . import report_storage
+from .raw_layout import RawUploadResult, build_manifest, cas_blob_name, content_addressed_layout, manifest_blob_name, transaction_blob_name
+from .storage_service_sync import encode_processed_xml
+
+logger = logging.getLogger(__name__)
+
+# Chunkgröße für gestreamte Reads (wie der Azure Download in Chunks)
+READ_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Magic Numbers der komprimierten Formate
+MAGIC_NUMBERS = {report_storage.GZIP: b"\x1f\x8b", report_storage.ZSTD: b"\x28\xb5\x2f\xfd"}
+
+
+class LocalFSStorageBackend:
+    """StorageBackend auf dem lokalen Dateisystem (file:// URIs, atomare Writes, optional mmap Reads)."""
+
+    def __init__(self, root: str, use_mmap: bool = False):
+        self.root = Path(root).resolve()
+        self.use_mmap = use_mmap
+        self.raw_container_name = settings.blob_container_raw
+        self.processed_container_name = settings.blob_container_processed
+        for container in (self.raw_container_name, self.processed_container_name):
+            (self.root / container).mkdir(parents=True, exist_ok=True)
+
+    def _path(self, container: str, blob_name: str) -> Path:
+        path = (self.root / container / blob_name).resolve()
+        # Blob Namen stammen u.a. aus Dateinamen von E-Mail Anhängen: kein Ausbruch aus root
+        if self.root not in path.parents:
+            raise ValueError(f"Ungültiger Blob Name: {blob_name}")
+        return path
+
+    def _path_from_uri(self, uri: str) -> Path:
+        parts = urlsplit(uri)
+        if parts.scheme != "file":
+            raise ValueError(f"Kein file:// URI: {uri}")
+        path = Path(unquote(parts.path)).resolve()
+        if self.root not in path.parents:
+            raise ValueError(f"URI liegt außerhalb des Storage Verzeichnisses: {uri}")
+        return path
+
+    def _write_atomic(self, path: Path, data: bytes) -> str:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(data)
+                handle.flush()
+                os.fsync(handle.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return path.as_uri()
+
+    def download_blob_by_uri(self, uri: str) -> bytes:
+        """Liest eine Datei anhand ihres file:// URI (optional über mmap); komprimiertes XML wird gestreamt dekodiert."""
+        path = self._path_from_uri(uri)
+        encoding = self._processed_encoding(path)
+        if encoding:
+            return b"".join(report_storage.iter_decompress(self.iter_blob_chunks_by_uri(uri), encoding))
+        try:
+            with open(path, "rb") as handle:
+                if self.use_mmap and os.fstat(handle.fileno()).st_size > 0:
+                    with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                        return mapped[:]
+                return handle.read()
+        except FileNotFoundError:
+            logger.error(f"Blob nicht gefunden: {uri}")
+            raise FileNotFoundError(f"Blob nicht gefunden: {uri}")
+
+    def _processed_encoding(self, path: Path) -> Optional[str]:
+        """Encoding eines komprimierten processed.xml (nur im Processed-Container), sonst None."""
+        if path.name != "processed.xml" or (self.root / self.processed_container_name) not in path.parents:
+            return None
+        try:
+            with open(path, "rb") as handle:
+                head = handle.read(4)
+        except FileNotFoundError:
+            return None
+        for encoding, magic in MAGIC_NUMBERS.items():
+            if head.startswith(magic):
+                return encoding
+        return None
+
+    def iter_blob_chunks_by_uri(self, uri: str) -> Iterator[bytes]:
+        """Liest eine Datei gestreamt (Chunk für Chunk)."""
+        path = self._path_from_uri(uri)
+        try:
+            handle = open(path, "rb")
+        except FileNotFoundError:
+            logger.error(f"Blob nicht gefunden: {uri}")
+            raise FileNotFoundError(f"Blob nicht gefunden: {uri}")
+        with handle:
+            if self.use_mmap and os.fstat(handle.fileno()).st_size > 0:
+                with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    for offset in range(0, len(mapped), READ_CHUNK_SIZE):
+                        yield mapped[offset:offset + READ_CHUNK_SIZE]
+                return
+            while True:
+                chunk = handle.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+    def upload_raw_bytes(
+        self,
+        transaction_id: str | uuid.UUID,
+        filename: str,
+        data: bytes,
+        content_type: str,
+        source: str,
+        manifest_extra: Optional[Dict[str, str]] = None
+    ) -> RawUploadResult:
+        """Speichert eine Rohdatei (Layout gemäß settings.raw_storage_layout)."""
+        str_transaction_id = str(transaction_id)
+        content_hash = hashlib.sha256(data).hexdigest()
+
+        if not content_addressed_layout():
+            uri = self._write_atomic(self._path(self.raw_container_name, transaction_blob_name(str_transaction_id, filename)), data)
+            return RawUploadResult(uri=uri, size_bytes=len(data), content_hash=content_hash)
+
+        path = self._path(self.raw_container_name, cas_blob_name(content_hash))
+        deduplicated = path.exists()
+        if deduplicated:
+            logger.info(f"♻️ Raw-Datei bereits vorhanden, Speichern übersprungen: {path.name} ({filename})")
+            uri = path.as_uri()
+        else:
+            uri = self._write_atomic(path, data)
+        self._write_atomic(
+            self._path(self.raw_container_name, manifest_blob_name(str_transaction_id)),
+            build_manifest(str_transaction_id, filename, content_type, content_hash, len(data), uri, source, manifest_extra),
+        )
+        return RawUploadResult(uri=uri, size_bytes=len(data), content_hash=content_hash, deduplicated=deduplicated)
+
+    def upload_processed_xml(self, transaction_id: str | uuid.UUID, xml_content: bytes, format_type: str) -> str:
+        """Speichert extrahiertes XML unter transaction_id/processed.xml (komprimiert wie im Azure Backend)."""
+        data, _ = encode_processed_xml(xml_content, {})
+        return self._write_atomic(self._path(self.processed_container_name, f"{transaction_id}/processed.xml"), data)
+
+    def upload_validation_report(self, transaction_id: str | uuid.UUID, data: bytes, content_encoding: str, suffix: str) -> str:
+        """Speichert einen komprimierten Validierungsbericht neben processed.xml."""
+        return self._write_atomic(self._path(self.processed_container_name, f"{transaction_id}/validation_report.{suffix}"), data)
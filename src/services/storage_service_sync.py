@@ -1,22 +1,99 @@
 # src/services/storage_service_sync.py
 
 import logging
-from azure.storage.blob import BlobServiceClient, BlobClient
-from azure.core.exceptions import ResourceNotFoundError, AzureError
+from azure.storage.blob import BlobServiceClient, BlobClient, ContainerClient, ContentSettings
+from azure.core import MatchConditions
+from azure.core.exceptions import HttpResponseError, ResourceExistsError, ResourceModifiedError, ResourceNotFoundError, AzureError
+from concurrent.futures import ThreadPoolExecutor
+from azure.core.pipeline.transport import RequestsTransport
 import hashlib
+import json
+import requests
 from datetime import datetime
+from functools import lru_cache
+from requests.adapters import HTTPAdapter
+from urllib.parse import unquote, urlsplit
+from urllib3.util.retry import Retry
 import uuid
-from typing import Optional
+from typing import Any, Dict, Iterator, Optional, Tuple
 
 # Importiere die Settings aus Ihrer config.py
 from ..core.config import settings
+from . import report_storage
+from .blob_cache import create_default_cache
+from .raw_layout import CAS_PREFIX, RawUploadResult, build_manifest, cas_blob_name, content_addressed_layout, manifest_blob_name, transaction_blob_name
 
 logger = logging.getLogger(__name__)
 
+# Komprimierte Blobs erkennt der Download am Content-Encoding und dekomprimiert gestreamt
+DECODABLE_ENCODINGS = (report_storage.GZIP, report_storage.ZSTD)
+
+
+@lru_cache(maxsize=4096)
+def parse_blob_uri(uri: str, account_name: Optional[str] = None) -> Tuple[str, str]:
+    """
+    (Container, Blob Name) aus einem Blob URI, gecacht.
+    Unterstützt https://account.blob.core.windows.net/container/blob und Path-Style URIs
+    (Azurite/Emulator: http://127.0.0.1:10000/account/container/blob). Der Blob Name wird URL-dekodiert.
+    """
+    parts = urlsplit(uri)
+    segments = parts.path.lstrip('/').split('/')
+    if account_name and segments[0] == account_name and not parts.netloc.startswith(f"{account_name}."):
+        segments = segments[1:]
+    if len(segments) < 2 or not segments[0] or not segments[-1]:
+        raise ValueError(f"Ungültiger Blob URI: {uri}")
+    return segments[0], unquote('/'.join(segments[1:]))
+
+
+def build_pooled_transport() -> RequestsTransport:
+    """
+    Gemeinsamer HTTP Transport (requests Session mit Keep-Alive) für alle Clients eines Prozesses.
+    Die Poolgröße pro Host muss mindestens der Anzahl paralleler Threads/Worker im Prozess entsprechen,
+    sonst werden Verbindungen nach jedem Request verworfen statt wiederverwendet.
+    """
+    session = requests.Session()
+    # Retries übernimmt die Azure Pipeline (wie im Standard-Transport)
+    adapter = HTTPAdapter(
+        pool_connections=settings.azure_storage_pool_connections,
+        pool_maxsize=settings.azure_storage_pool_maxsize,
+        max_retries=Retry(total=False, redirect=False, raise_on_status=False),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return RequestsTransport(
+        session=session,
+        session_owner=False,
+        connection_timeout=settings.azure_storage_connection_timeout_seconds,
+    )
+
+
+def encode_processed_xml(xml_content: bytes, metadata: Dict[str, str]) -> Tuple[bytes, ContentSettings]:
+    """
+    Komprimiert XML für den Processed-Container gemäß settings.processed_xml_compression ("none", "gzip", "zstd").
+    Ergänzt die Metadaten um Encoding und Größen; Content-Encoding wird am Blob gesetzt.
+    """
+    metadata["uncompressed_size_bytes"] = str(len(xml_content))
+    if settings.processed_xml_compression == "none":
+        return xml_content, ContentSettings(content_type="application/xml")
+    encoding = report_storage.resolve_encoding(settings.processed_xml_compression)
+    data = report_storage.compress(xml_content, encoding)
+    metadata["content_encoding"] = encoding
+    metadata["compressed_size_bytes"] = str(len(data))
+    return data, ContentSettings(content_type="application/xml", content_encoding=encoding)
+
+
+def _read_decoded(stream) -> bytes:
+    """Liest einen Download (decompress=False) und dekomprimiert gzip/zstd gestreamt anhand des Content-Encoding."""
+    encoding = stream.properties.content_settings.content_encoding
+    if encoding in DECODABLE_ENCODINGS:
+        return b"".join(report_storage.iter_decompress(stream.chunks(), encoding))
+    return stream.readall()
+
+
 class SyncStorageService:
     """
     Synchroner Service für Azure Blob Storage Operationen.
-    Speziell für die Verwendung in synchronen Celery Tasks.
+    Speziell für die Verwendung in synchronen Celery Tasks (Azure Implementierung von StorageBackend).
     """
     
     def __init__(self):
@@ -24,31 +101,41 @@ class SyncStorageService:
         if not settings.azure_storage_connection_string:
              raise ConnectionError("AZURE_STORAGE_CONNECTION_STRING ist nicht gesetzt.")
              
+        # Ein Client (und damit eine Pipeline mit Verbindungspool) pro Prozess; Container- und Blob-Clients
+        # werden davon abgeleitet und teilen sich Transport und Keep-Alive Verbindungen
         self.blob_service_client = BlobServiceClient.from_connection_string(
-            settings.azure_storage_connection_string
+            settings.azure_storage_connection_string,
+            transport=build_pooled_transport(),
         )
         # Nutze die Namen aus Ihrer config.py
         self.raw_container_name = settings.blob_container_raw
         self.processed_container_name = settings.blob_container_processed
+        self._container_clients: Dict[str, ContainerClient] = {}
+        # Worker-lokaler Disk Cache für Raw-Downloads (URI + ETag), None wenn deaktiviert
+        self.blob_cache = create_default_cache()
+
+    def _get_container_client(self, container_name: str) -> ContainerClient:
+        container_client = self._container_clients.get(container_name)
+        if container_client is None:
+            container_client = self.blob_service_client.get_container_client(container_name)
+            self._container_clients[container_name] = container_client
+        return container_client
 
     def _get_blob_client_from_uri(self, uri: str) -> BlobClient:
-        """Helper, um einen Client aus einem URI zu erstellen."""
-        # Erstellt einen Client aus der URL unter Verwendung des Connection Strings für die Authentifizierung.
-        return BlobClient.from_connection_string(
-            conn_str=settings.azure_storage_connection_string,
-            container_name=self._get_container_name_from_uri(uri),
-            blob_name=self._get_blob_name_from_uri(uri)
-        )
+        """Blob Client zu einem URI, abgeleitet vom gemeinsamen Service Client (kein neuer HTTP Pool)."""
+        container_name, blob_name = parse_blob_uri(uri, self.blob_service_client.account_name)
+        return self._get_container_client(container_name).get_blob_client(blob_name)
 
     def download_blob_by_uri(self, uri: str) -> bytes:
-        """Lädt Daten anhand eines Blob Storage URI synchron herunter."""
+        """Lädt Daten anhand eines Blob Storage URI synchron herunter (über den Disk Cache, falls aktiv)."""
         logger.debug(f"Lade Blob synchron herunter von: {uri}")
 
         try:
             blob_client = self._get_blob_client_from_uri(uri)
+            if self.blob_cache is not None:
+                return self._download_cached(blob_client, uri)
             # Synchroner Download
-            stream = blob_client.download_blob()
-            return stream.readall()
+            return _read_decoded(blob_client.download_blob(decompress=False))
         except ResourceNotFoundError:
             logger.error(f"Blob nicht gefunden: {uri}")
             raise FileNotFoundError(f"Blob nicht gefunden: {uri}")
@@ -57,55 +144,278 @@ class SyncStorageService:
             # Werfe IOError, damit Celery Retry greift
             raise IOError(f"Download fehlgeschlagen: {e}")
 
+    def _download_cached(self, blob_client: BlobClient, uri: str) -> bytes:
+        """
+        Download mit Disk Cache: CAS-Blobs direkt aus dem Cache, sonst bedingter GET mit dem gecachten ETag
+        (304 = Inhalt aus dem Cache, 200 = neue Version wird übernommen). Gecacht wird der dekodierte Inhalt.
+        """
+        cache = self.blob_cache
+        etag = cache.cached_etag(uri)
+        if etag is None:
+            cache.record_miss()
+        elif blob_client.blob_name.startswith(f"{CAS_PREFIX}/"):
+            # Unveränderlich: Name = Inhalt
+            data = cache.get(uri, etag)
+            if data is not None:
+                return data
+        else:
+            try:
+                stream = blob_client.download_blob(etag=etag, match_condition=MatchConditions.IfModified, decompress=False)
+            except HttpResponseError as e:
+                if e.status_code != 304:
+                    raise
+                data = cache.get(uri, etag)
+                if data is not None:
+                    logger.debug(f"Blob unverändert, aus dem Cache geladen: {uri}")
+                    return data
+            else:
+                # Blob wurde seit dem Caching geändert
+                cache.record_miss()
+                data = _read_decoded(stream)
+                cache.put(uri, stream.properties.etag, data)
+                return data
+
+        stream = blob_client.download_blob(decompress=False)
+        data = _read_decoded(stream)
+        cache.put(uri, stream.properties.etag, data)
+        return data
+
+    def upload_raw_bytes(
+        self,
+        transaction_id: str | uuid.UUID,
+        filename: str,
+        data: bytes,
+        content_type: str,
+        source: str,
+        manifest_extra: Optional[Dict[str, str]] = None
+    ) -> RawUploadResult:
+        """
+        Lädt eine Rohdatei synchron in den Raw-Container (Layout gemäß settings.raw_storage_layout).
+        Im CAS-Layout wird der Upload übersprungen, wenn sha256/<hash> bereits existiert; manifest_extra
+        landet im Manifest der Transaktion (Blob-Metadaten erlauben nur ASCII).
+        """
+        str_transaction_id = str(transaction_id)
+        content_hash = hashlib.sha256(data).hexdigest()
+        container_client = self._get_container_client(self.raw_container_name)
+
+        try:
+            if not content_addressed_layout():
+                blob_client = container_client.get_blob_client(transaction_blob_name(str_transaction_id, filename))
+                metadata = {
+                    "transaction_id": str_transaction_id,
+                    "source": source,
+                    "content_hash": content_hash,
+                }
+                blob_client.upload_blob(data, overwrite=True, content_settings=ContentSettings(content_type=content_type), metadata=metadata)
+                return RawUploadResult(uri=blob_client.url, size_bytes=len(data), content_hash=content_hash)
+
+            blob_client = container_client.get_blob_client(cas_blob_name(content_hash))
+            deduplicated = blob_client.exists()
+            if deduplicated:
+                logger.info(f"♻️ Raw-Datei bereits vorhanden, Upload übersprungen: {blob_client.blob_name} ({filename})")
+            else:
+                try:
+                    blob_client.upload_blob(
+                        data,
+                        overwrite=False,
+                        content_settings=ContentSettings(content_type=content_type),
+                        metadata={
+                            "content_hash": content_hash,
+                            "file_size_bytes": str(len(data)),
+                            "first_transaction_id": str_transaction_id,
+                            "upload_timestamp": datetime.now().isoformat(),
+                        },
+                    )
+                except ResourceExistsError:
+                    # Paralleler Upload desselben Inhalts
+                    deduplicated = True
+
+            manifest_client = container_client.get_blob_client(manifest_blob_name(str_transaction_id))
+            manifest_client.upload_blob(
+                build_manifest(str_transaction_id, filename, content_type, content_hash, len(data), blob_client.url, source, manifest_extra),
+                overwrite=True,
+                content_settings=ContentSettings(content_type="application/json"),
+                metadata={"transaction_id": str_transaction_id, "referenced_content_hash": content_hash},
+            )
+            return RawUploadResult(uri=blob_client.url, size_bytes=len(data), content_hash=content_hash, deduplicated=deduplicated)
+        except AzureError as e:
+            logger.error(f"Azure Fehler beim synchronen Upload der Rohdatei: {e}")
+            raise IOError(f"Upload fehlgeschlagen: {e}")
+
     def upload_processed_xml(
         self, 
         transaction_id: str | uuid.UUID,
         xml_content: bytes, 
         format_type: str
     ) -> str:
-        """Lädt extrahiertes XML synchron hoch."""
+        """Lädt extrahiertes XML synchron hoch (komprimiert gemäß settings.processed_xml_compression)."""
         
         str_transaction_id = str(transaction_id)
         # Blob-Name gemäß der Konvention in Ihrem async Service: transaction_id/processed.xml
         blob_name = f"{str_transaction_id}/processed.xml"
 
         try:
-            # Metadaten analog zu Ihrem async Service
+            # Metadaten analog zu Ihrem async Service (Hash über das unkomprimierte XML)
             metadata = {
                 "transaction_id": str_transaction_id,
                 "format_type": format_type,
                 "processing_timestamp": datetime.now().isoformat(),
                 "content_hash": hashlib.sha256(xml_content).hexdigest(),
             }
+            data, content_settings = encode_processed_xml(xml_content, metadata)
             
-            blob_client = self.blob_service_client.get_blob_client(
-                container=self.processed_container_name, 
-                blob=blob_name
-            )
+            blob_client = self._get_container_client(self.processed_container_name).get_blob_client(blob_name)
             # Synchroner Upload
-            blob_client.upload_blob(xml_content, overwrite=True, content_type="application/xml", metadata=metadata)
+            blob_client.upload_blob(data, overwrite=True, content_settings=content_settings, metadata=metadata)
             return blob_client.url
         except AzureError as e:
             logger.error(f"Azure Fehler beim synchronen Upload: {e}")
             raise IOError(f"Upload fehlgeschlagen: {e}")
 
+    def upload_validation_report(self, transaction_id: str | uuid.UUID, data: bytes, content_encoding: str, suffix: str) -> str:
+        """Lädt einen komprimierten Validierungsbericht neben processed.xml hoch."""
+        str_transaction_id = str(transaction_id)
+        blob_name = f"{str_transaction_id}/validation_report.{suffix}"
+        try:
+            blob_client = self._get_container_client(self.processed_container_name).get_blob_client(blob_name)
+            blob_client.upload_blob(
+                data,
+                overwrite=True,
+                content_settings=ContentSettings(content_type="application/json", content_encoding=content_encoding),
+                metadata={"transaction_id": str_transaction_id, "content_encoding": content_encoding},
+            )
+            return blob_client.url
+        except AzureError as e:
+            logger.error(f"Azure Fehler beim Upload des Validierungsberichts: {e}")
+            raise IOError(f"Upload fehlgeschlagen: {e}")
+
+    def iter_blob_chunks_by_uri(self, uri: str) -> Iterator[bytes]:
+        """Lädt einen Blob gestreamt (Chunk für Chunk) herunter."""
+        try:
+            blob_client = self._get_blob_client_from_uri(uri)
+            # Gespeicherte Bytes (ggf. komprimiert), der Aufrufer dekodiert selbst
+            yield from blob_client.download_blob(decompress=False).chunks()
+        except ResourceNotFoundError:
+            logger.error(f"Blob nicht gefunden: {uri}")
+            raise FileNotFoundError(f"Blob nicht gefunden: {uri}")
+        except AzureError as e:
+            logger.error(f"Azure Fehler beim gestreamten Download: {e}")
+            raise IOError(f"Download fehlgeschlagen: {e}")
+
+    def recompress_processed_page(
+        self,
+        continuation_token: Optional[str],
+        page_size: int,
+        max_workers: int
+    ) -> Tuple[Optional[str], Dict[str, int]]:
+        """
+        Komprimiert eine Seite unkomprimierter processed.xml Blobs (parallel, max_workers Threads).
+        Gibt den Continuation Token der nächsten Seite (None = fertig) und Zähler zurück.
+        Idempotent: bereits komprimierte Blobs werden übersprungen, parallel geänderte (ETag) nicht überschrieben.
+        """
+        container_client = self._get_container_client(self.processed_container_name)
+        pager = container_client.list_blobs(include=["metadata"], results_per_page=page_size).by_page(continuation_token=continuation_token)
+        blobs = [blob for blob in next(pager, []) if blob.name.endswith("/processed.xml")]
+
+        counts = {"compressed": 0, "skipped": 0, "changed": 0, "failed": 0, "bytes_before": 0, "bytes_after": 0}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for outcome, before, after in executor.map(lambda blob: self._recompress_blob(container_client, blob), blobs):
+                counts[outcome] += 1
+                counts["bytes_before"] += before
+                counts["bytes_after"] += after
+        return pager.continuation_token, counts
+
+    def _recompress_blob(self, container_client: ContainerClient, blob) -> Tuple[str, int, int]:
+        if blob.content_settings.content_encoding:
+            return "skipped", 0, 0
+        blob_client = container_client.get_blob_client(blob.name)
+        try:
+            stream = blob_client.download_blob(decompress=False)
+            xml_content = stream.readall()
+            metadata = dict(stream.properties.metadata or {})
+            data, content_settings = encode_processed_xml(xml_content, metadata)
+            if content_settings.content_encoding is None:
+                return "skipped", 0, 0
+            # Nur überschreiben, wenn der Blob seit dem Download unverändert ist
+            blob_client.upload_blob(
+                data,
+                overwrite=True,
+                content_settings=content_settings,
+                metadata=metadata,
+                etag=stream.properties.etag,
+                match_condition=MatchConditions.IfNotModified,
+            )
+            return "compressed", len(xml_content), len(data)
+        except ResourceModifiedError:
+            return "changed", 0, 0
+        except AzureError as e:
+            logger.warning(f"⚠️ Rekomprimierung von {blob.name} fehlgeschlagen: {e}")
+            return "failed", 0, 0
+
+    def list_blobs_by_prefix(self, container_name: str, prefix: str) -> list:
+        """Alle Blobs (inkl. Metadaten) unter einem Präfix; die Seiten lädt der Pager nacheinander."""
+        try:
+            return list(self._get_container_client(container_name).list_blobs(name_starts_with=prefix, include=["metadata"]))
+        except AzureError as e:
+            logger.error(f"Azure Fehler beim Auflisten von {container_name}/{prefix}: {e}")
+            raise IOError(f"Auflisten fehlgeschlagen: {e}")
+
+    def download_blob_decoded(self, container_name: str, blob_name: str) -> bytes:
+        """Download ohne Disk Cache (Massenexport), gzip/zstd gestreamt dekodiert."""
+        try:
+            blob_client = self._get_container_client(container_name).get_blob_client(blob_name)
+            return _read_decoded(blob_client.download_blob(decompress=False))
+        except ResourceNotFoundError:
+            raise FileNotFoundError(f"Blob nicht gefunden: {container_name}/{blob_name}")
+        except AzureError as e:
+            logger.error(f"Azure Fehler beim Download von {container_name}/{blob_name}: {e}")
+            raise IOError(f"Download fehlgeschlagen: {e}")
+
+    def upload_export_file(self, blob_name: str, fileobj, content_type: str, metadata: Dict[str, str]) -> str:
+        """Lädt ein Export-Archiv gestreamt aus einer Datei in den Export-Container."""
+        container_client = self._get_container_client(settings.blob_container_exports)
+        try:
+            container_client.create_container()
+        except ResourceExistsError:
+            pass
+        try:
+            blob_client = container_client.get_blob_client(blob_name)
+            blob_client.upload_blob(
+                fileobj,
+                overwrite=True,
+                content_settings=ContentSettings(content_type=content_type),
+                metadata=metadata,
+                max_concurrency=4,
+            )
+            return blob_client.url
+        except AzureError as e:
+            logger.error(f"Azure Fehler beim Upload des Exports {blob_name}: {e}")
+            raise IOError(f"Upload fehlgeschlagen: {e}")
+
+    def parse_uri(self, uri: str) -> Tuple[str, str]:
+        """(Container, Blob Name) eines Blob URI dieses Accounts."""
+        return parse_blob_uri(uri, self.blob_service_client.account_name)
+
+    def read_json_blob(self, container_name: str, blob_name: str) -> Optional[Dict[str, Any]]:
+        """Kleines JSON-Dokument (z.B. Fortschritt einer Migration) oder None, falls nicht vorhanden."""
+        try:
+            data = self._get_container_client(container_name).get_blob_client(blob_name).download_blob().readall()
+        except ResourceNotFoundError:
+            return None
+        return json.loads(data)
+
+    def write_json_blob(self, container_name: str, blob_name: str, document: Dict[str, Any]) -> None:
+        self._get_container_client(container_name).get_blob_client(blob_name).upload_blob(
+            json.dumps(document).encode("utf-8"),
+            overwrite=True,
+            content_settings=ContentSettings(content_type="application/json"),
+        )
+
     # Hilfsfunktionen zur Extraktion von Container/Blob Name aus URI
     def _get_container_name_from_uri(self, uri: str) -> str:
-        # Simples Parsing der URL: https://account.blob.core.windows.net/container/blob...
-        parts = uri.split('/')
-        if len(parts) > 3:
-            return parts[3]
-        raise ValueError(f"Ungültiger Blob URI (Container): {uri}")
+        return parse_blob_uri(uri, self.blob_service_client.account_name)[0]
 
     def _get_blob_name_from_uri(self, uri: str) -> str:
-        parts = uri.split('/')
-        if len(parts) > 4:
-            return '/'.join(parts[4:])
-        raise ValueError(f"Ungültiger Blob URI (Blob): {uri}")
-
-# Singleton Instanz für die Celery Worker
-try:
-    sync_storage_service = SyncStorageService()
-except Exception as e:
-    logger.warning(f"SyncStorageService konnte nicht initialisiert werden (z.B. während Build/Tests): {e}")
-    sync_storage_service = None
\ No newline at end of file
+        return parse_blob_uri(uri, self.blob_service_client.account_name)[1]
+
+# Singleton Instanz für die Celery Worker: siehe storage_backend.sync_storage_service (Azure oder lokal)
@@ -1,10 +1,15 @@
+import asyncio
 import logging
-from typing import List, Optional
+from typing import List, Optional, Set
 from decimal import Decimal
+from uuid import UUID
 
+from sqlalchemy.orm import Session
+
+from ...db.models import InvoiceTransaction, TransactionStatus
 from ...schemas.canonical_model import CanonicalInvoice
 from ...schemas.validation_report import ValidationError, ValidationCategory, ValidationSeverity
-from ..erp.interface import IERPAdapter, ERPPurchaseOrder
+from ..erp.interface import IERPAdapter, AsyncIERPAdapter, ERPPurchaseOrder, ERPBankDetails
 
 logger = logging.getLogger(__name__)
 
@@ -50,38 +55,123 @@ def validate_business_rules(invoice: CanonicalInvoice, erp_adapter: IERPAdapter)
     # --------------------------------------------------------------------
     if invoice.payment_details:
         erp_bank_details = erp_adapter.get_vendor_bank_details(vendor_id)
-        validated_ibans = {details.iban for details in erp_bank_details}
-        
-        for payment in invoice.payment_details:
-            if payment.iban not in validated_ibans:
-                errors.append(_create_business_error(
-                    "ERP_BANK_DETAILS_MISMATCH",
-                    f"IBAN {payment.iban} ist nicht in den Stammdaten hinterlegt.",
-                    ValidationSeverity.ERROR # Erfordert manuelle Prüfung
-                ))
+        errors.extend(_validate_bank_details(invoice, erp_bank_details))
 
     # --------------------------------------------------------------------
     # 4.4 & 4.5 Bestellabgleich
     # --------------------------------------------------------------------
     if invoice.purchase_order_reference:
         po_number = invoice.purchase_order_reference.document_id
-        erp_po = erp_adapter.get_purchase_order_details(po_number, vendor_id)
-        
-        if not erp_po:
-            errors.append(_create_business_error(
-                "ERP_PO_NOT_FOUND_OR_INVALID",
-                f"Bestellung {po_number} nicht gefunden oder ungültig für Kreditor.",
-                ValidationSeverity.ERROR
-            ))
-        else:
-            # Bestellung gefunden, detaillierte Prüfung starten
-            errors.extend(_validate_po_details(invoice, erp_po))
+        # Nur die Positionen laden, deren HAN/EAN/GTIN auch in der Rechnung vorkommt
+        erp_po = erp_adapter.get_purchase_order_details(po_number, vendor_id, _get_item_identifiers(invoice))
+        errors.extend(_validate_purchase_order(invoice, po_number, erp_po))
 
     if not errors:
         logger.info("✅ Business Validierung (ERP) erfolgreich.")
         
     return errors
 
+async def validate_business_rules_async(invoice: CanonicalInvoice, erp_adapter: AsyncIERPAdapter) -> List[ValidationError]:
+    """
+    Asynchrone Variante von validate_business_rules (für den asyncio API-Pfad).
+    Sobald der Kreditor bekannt ist, laufen Bankdaten- und Bestellabruf parallel (asyncio.gather).
+    """
+    logger.info(f"Starte Business Validierung (ERP, async) für Rechnung {invoice.invoice_number}...")
+    errors: List[ValidationError] = []
+
+    # 4.1 Kreditor-Lookup
+    vendor_vat_id = invoice.seller.vat_id
+    if not vendor_vat_id:
+        errors.append(_create_business_error("ERP_VENDOR_ID_MISSING", "Keine USt-IdNr. vorhanden.", ValidationSeverity.ERROR))
+        return errors
+
+    erp_vendor = await erp_adapter.find_vendor_by_vat_id(vendor_vat_id)
+
+    if not erp_vendor:
+        errors.append(_create_business_error("ERP_VENDOR_NOT_FOUND", f"Kreditor mit USt-IdNr. {vendor_vat_id} nicht im ERP gefunden.", ValidationSeverity.ERROR))
+        return errors
+
+    if not erp_vendor.is_active:
+        errors.append(_create_business_error("ERP_VENDOR_INACTIVE", f"Kreditor {erp_vendor.vendor_id} ist inaktiv.", ValidationSeverity.WARNING))
+
+    vendor_id = erp_vendor.vendor_id
+
+    # 4.2 Dublettenprüfung (Stopp bei Dublette, daher vor den übrigen Abfragen)
+    if await erp_adapter.is_duplicate_invoice(vendor_id, invoice.invoice_number):
+        errors.append(_create_business_error("ERP_DUPLICATE_INVOICE", f"Rechnung {invoice.invoice_number} existiert bereits.", ValidationSeverity.FATAL))
+        return errors
+
+    # 4.3 & 4.4/4.5 Bankdaten und Bestellung sind unabhängig voneinander -> parallel abrufen
+    po_number = invoice.purchase_order_reference.document_id if invoice.purchase_order_reference else None
+    bank_details, erp_po = await asyncio.gather(
+        erp_adapter.get_vendor_bank_details(vendor_id) if invoice.payment_details else _no_result(),
+        erp_adapter.get_purchase_order_details(po_number, vendor_id, _get_item_identifiers(invoice)) if po_number else _no_result(),
+    )
+
+    if invoice.payment_details:
+        errors.extend(_validate_bank_details(invoice, bank_details))
+
+    if po_number:
+        errors.extend(_validate_purchase_order(invoice, po_number, erp_po))
+
+    if not errors:
+        logger.info("✅ Business Validierung (ERP, async) erfolgreich.")
+
+    return errors
+
+async def _no_result() -> None:
+    return None
+
+def validate_internal_duplicates(db: Session, transaction_id: UUID, invoice: CanonicalInvoice) -> List[ValidationError]:
+    """
+    Dublettenprüfung gegen Rechnungen, die IIEV bereits akzeptiert hat, die aber noch nicht
+    im ERP-Rechnungsjournal verbucht sind (Lücke zwischen Freigabe und Buchung).
+    """
+    if not invoice.invoice_number or not invoice.seller.vat_id:
+        return []
+
+    existing = db.query(InvoiceTransaction.id).filter(
+        InvoiceTransaction.seller_vat_id == invoice.seller.vat_id,
+        InvoiceTransaction.invoice_number == invoice.invoice_number,
+        InvoiceTransaction.status == TransactionStatus.VALID,
+        InvoiceTransaction.id != transaction_id
+    ).first()
+
+    if existing:
+        return [_create_business_error(
+            "IIEV_DUPLICATE_INVOICE",
+            f"Rechnung {invoice.invoice_number} wurde bereits als Transaction {existing.id} akzeptiert (noch nicht im ERP verbucht).",
+            ValidationSeverity.FATAL
+        )]
+    return []
+
+def _get_item_identifiers(invoice: CanonicalInvoice) -> Set[str]:
+    return {line.item_identifier for line in invoice.lines if line.item_identifier}
+
+def _validate_bank_details(invoice: CanonicalInvoice, erp_bank_details: List[ERPBankDetails]) -> List[ValidationError]:
+    """4.3 Abgleich der Rechnungs-IBANs mit den Stammdaten (Fraud Prevention)."""
+    validated_ibans = {details.iban for details in erp_bank_details}
+    errors: List[ValidationError] = []
+
+    for payment in invoice.payment_details:
+        if payment.iban not in validated_ibans:
+            errors.append(_create_business_error(
+                "ERP_BANK_DETAILS_MISMATCH",
+                f"IBAN {payment.iban} ist nicht in den Stammdaten hinterlegt.",
+                ValidationSeverity.ERROR # Erfordert manuelle Prüfung
+            ))
+    return errors
+
+def _validate_purchase_order(invoice: CanonicalInvoice, po_number: str, erp_po: Optional[ERPPurchaseOrder]) -> List[ValidationError]:
+    if not erp_po:
+        return [_create_business_error(
+            "ERP_PO_NOT_FOUND_OR_INVALID",
+            f"Bestellung {po_number} nicht gefunden oder ungültig für Kreditor.",
+            ValidationSeverity.ERROR
+        )]
+    # Bestellung gefunden, detaillierte Prüfung starten
+    return _validate_po_details(invoice, erp_po)
+
 def _validate_po_details(invoice: CanonicalInvoice, erp_po: ERPPurchaseOrder) -> List[ValidationError]:
     """Führt die detaillierten Prüfungen durch (Status, Beträge, Positionen - 3-Way-Match)."""
     errors: List[ValidationError] = []
@@ -115,8 +205,9 @@ def _validate_po_details(invoice: CanonicalInvoice, erp_po: ERPPurchaseOrder) ->
              continue
 
         han = inv_line.item_identifier
+        po_line = erp_po.get_line(han)
         
-        if han not in erp_po.lines:
+        if po_line is None:
             errors.append(_create_business_error(
                 "ERP_PO_LINE_ITEM_NOT_FOUND",
                 f"Position {inv_line.line_id} (HAN: {han}) nicht in Bestellung gefunden.",
@@ -125,7 +216,6 @@ def _validate_po_details(invoice: CanonicalInvoice, erp_po: ERPPurchaseOrder) ->
             continue
         
         # Artikel gefunden, Mengenprüfung
-        po_line = erp_po.lines[han]
         if inv_line.quantity > po_line.quantity_open:
             errors.append(_create_business_error(
                 "ERP_PO_LINE_QUANTITY_EXCEEDED",
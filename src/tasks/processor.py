@@ -7,22 +7,28 @@ Orchestriert den kompletten Rechnungsverarbeitungs-Workflow
 
 from celery import Task
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.exc import DatabaseError # Import für Celery Retries
 import logging
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 import traceback
 import time
 import os
+import random
 import uuid
-import hashlib
+import json
 from imap_tools import MailBox, AND, MailMessage
 
 from .worker import celery_app
-from ..db.session import get_metadata_session 
+from ..db.session import get_metadata_session, get_metadata_read_session
 from ..db.models import InvoiceTransaction, TransactionStatus, ProcessingLog, ValidationLevel, InvoiceFormat
+from ..db.log_buffer import ProcessingLogBuffer, processing_log_buffers
+from ..db.findings import findings_from_report, replace_validation_findings
+from ..db.claims import TransactionClaim, ClaimLostError, current_worker_id, reap_expired_claims, reap_overdue_parked
+from ..db.archive import archive_batch, ensure_archive_partitions
 
-from ..services.storage_service_sync import sync_storage_service
+from ..services.storage_backend import sync_storage_service
 
 from ..schemas.validation_report import ValidationReport, ValidationStep, ValidationError, ValidationCategory, ValidationSeverity
 from ..schemas.canonical_model import CanonicalInvoice
@@ -36,13 +42,28 @@ from ..services.validation.xsd_validator import validate_xsd
 from ..services.validation.kosit_validator import validate_kosit_schematron
 from ..services.validation.calculation_validator import validate_calculations
 
-from ..services.validation.business_validator import validate_business_rules
+from ..services.validation.business_validator import validate_business_rules, validate_internal_duplicates
 from ..services.erp.mssql_adapter import MSSQL_ERPAdapter
+from ..services.erp.duplicate_filter import get_duplicate_invoice_filter
+from ..services.erp.interface import IERPAdapter
+from ..services.erp.resilience import ResilientERPAdapter, ERPUnavailableError, get_erp_guard, get_state_store
+from ..services.statistics import refresh_hourly_rollups
+from ..services import report_storage
+from ..services.gobd_export import ExportFilter, run_export, select_export_transactions
 from ..db.session import get_erp_session 
 
 
 logger = logging.getLogger(__name__)
 
+# Status, aus denen process_invoice_task eine Transaktion übernehmen darf
+CLAIMABLE_STATUSES = (TransactionStatus.RECEIVED, TransactionStatus.ERROR)
+
+# Kennzahlen des Reapers im geteilten Zustandsspeicher (Redis), über health_check abrufbar.
+# Der Reaper läuft per Beat auf beliebigen Workern, prozesslokale Zähler wären nicht aussagekräftig.
+REAPER_METRICS_PREFIX = "iiev:reaper:"
+REAPER_COUNTERS = ("runs", "requeued_total", "failed_total", "parked_requeued_total", "parked_failed_total")
+REAPER_LAST_RUN_FIELDS = ("last_requeued", "last_failed", "last_run_at", "last_duration_seconds")
+
 
 class CallbackTask(Task):
     """
@@ -64,9 +85,11 @@ class CallbackTask(Task):
         if args and len(args) > 0:
             transaction_id = args[0]
             try:
+                # Noch nicht geschriebene Logs des Tasks werden zusammen mit dem Status gesichert
+                log_buffer = processing_log_buffers.pop(transaction_id)
                 with get_metadata_session() as db:
                     transaction = db.query(InvoiceTransaction).filter(
-                        InvoiceTransaction.id == transaction_id
+                        InvoiceTransaction.id == _to_uuid(transaction_id)
                     ).first()
                     
                     # Nur aktualisieren, wenn der Status nicht bereits durch Geschäftslogik gesetzt wurde
@@ -75,17 +98,26 @@ class CallbackTask(Task):
                         transaction.error_message = f"Systemfehler (nach Retries): {str(exc)}"
                         transaction.error_details = {"traceback": str(einfo)}
                         transaction.updated_at = datetime.now()
-                        db.commit()
                         
-                        _log_processing_step(db, transaction_id, "task_failure", "failed", str(exc), details={"traceback": str(einfo)})
+                        if log_buffer is None:
+                            log_buffer = ProcessingLogBuffer(transaction.id)
+                        log_buffer.add("task_failure", "failed", str(exc), details={"traceback": str(einfo)})
+                    
+                    if transaction and log_buffer is not None:
+                        log_buffer.flush(db)
+                    db.commit()
                         
             except Exception as e:
                 logger.error(f"Kritischer Fehler beim Update des Transaction Status nach Task Failure: {e}")
 
 
+# Transiente Fehler (DB/Netzwerk/Storage): automatische Wiederholung durch Celery
+TRANSIENT_ERRORS = (DatabaseError, ConnectionError, IOError)
+
+
 # Konfiguration für automatische Wiederholungen bei transienten Fehlern (DB/Netzwerk/Storage)
 @celery_app.task(bind=True, base=CallbackTask, name="process_invoice_task",
-                 autoretry_for=(DatabaseError, ConnectionError, IOError), 
+                 autoretry_for=TRANSIENT_ERRORS, 
                  retry_backoff=True, max_retries=5)
 def process_invoice_task(self, transaction_id: str) -> Dict[str, Any]:
     """
@@ -97,36 +129,40 @@ def process_invoice_task(self, transaction_id: str) -> Dict[str, Any]:
     
     # Prüfe Verfügbarkeit des synchronen Storage Service
     if sync_storage_service is None:
-        raise RuntimeError("SyncStorageService ist nicht verfügbar.")
+        raise RuntimeError("Storage Backend ist nicht verfügbar.")
 
     # Initialisiere Variablen (Kompatibel mit User-Schema)
     validation_report = ValidationReport(transaction_id=transaction_id)
     canonical_invoice: Optional[CanonicalInvoice] = None
+    # Processing Logs werden gesammelt und beim Abschluss in einem Commit geschrieben
+    processing_log_buffers.open(transaction_id)
+    claim: Optional[TransactionClaim] = None
     
     try:
         # Wir benötigen ZWEI separate Sessions: Metadata DB und ERP DB.
         with get_metadata_session() as db_meta, get_erp_session() as db_erp:
-            # Initialisiere den ERP Adapter mit der ERP Session
-            erp_adapter = MSSQL_ERPAdapter(db_session=db_erp)
+            # Initialisiere den ERP Adapter mit der ERP Session (inkl. Dubletten-Vorfilter und Überlastschutz)
+            erp_adapter = _create_erp_adapter(db_erp)
+
+            # Idempotenz: Atomarer Claim (RECEIVED/ERROR -> PROCESSING) per UPDATE mit rowcount-Prüfung.
+            # Danach wird bis zum Abschluss nur im Speicher gearbeitet (Unit of Work), optional mit Checkpoint-Commits.
+            claim = TransactionClaim(_to_uuid(transaction_id), current_worker_id(self.request.hostname), settings.processing_lease_seconds)
+            if not claim.acquire(db_meta, CLAIMABLE_STATUSES):
+                current_status = db_meta.query(InvoiceTransaction.status).filter(
+                    InvoiceTransaction.id == claim.transaction_id
+                ).scalar()
+                if current_status is None:
+                    raise Exception(f"Transaction {transaction_id} nicht gefunden")
+                claim = None
+                logger.warning(f"Transaktion {transaction_id} bereits im Status {current_status.value}. Überspringe.")
+                return {"status": "skipped", "reason": "already_processed_or_in_progress"}
+            db_meta.commit()
 
-            # Transaction laden
+            # Transaction laden (nach dem Claim, mit Status PROCESSING)
             transaction = db_meta.query(InvoiceTransaction).filter(
-                InvoiceTransaction.id == transaction_id
+                InvoiceTransaction.id == claim.transaction_id
             ).first()
             
-            if not transaction:
-                raise Exception(f"Transaction {transaction_id} nicht gefunden")
-
-            # Idempotenz-Check
-            if transaction.status not in [TransactionStatus.RECEIVED, TransactionStatus.ERROR]:
-                logger.warning(f"Transaktion {transaction_id} bereits im Status {transaction.status.value}. Überspringe.")
-                return {"status": "skipped", "reason": "already_processed_or_in_progress"}
-            
-            # Status auf PROCESSING setzen
-            transaction.status = TransactionStatus.PROCESSING
-            transaction.updated_at = datetime.now()
-            db_meta.commit()
-            
             _log_processing_step(db_meta, transaction_id, "processing_started", "started", "Verarbeitung gestartet")
             
             # --------------------------------------------------------------------
@@ -153,7 +189,6 @@ def process_invoice_task(self, transaction_id: str) -> Dict[str, Any]:
             
             transaction.format_detected = detected_format
             validation_report.detected_format = detected_format.value
-            db_meta.commit()
 
             # 1.3 Ergebnis prüfen und Workflow steuern
             format_step.duration_seconds = time.time() - step1_start
@@ -172,7 +207,7 @@ def process_invoice_task(self, transaction_id: str) -> Dict[str, Any]:
                 validation_report.add_step(format_step)
                 
                 # Workflow hier beenden
-                return _finalize_processing(db_meta, transaction, TransactionStatus.MANUAL_REVIEW, validation_report, start_time)
+                return _finalize_processing(db_meta, transaction, claim, TransactionStatus.MANUAL_REVIEW, validation_report, start_time)
 
             # 1.4 XML Speichern (Synchron, falls extrahiert, z.B. bei ZUGFeRD)
             if detected_format in [InvoiceFormat.ZUGFERD_CII, InvoiceFormat.FACTURX_CII]:
@@ -183,16 +218,15 @@ def process_invoice_task(self, transaction_id: str) -> Dict[str, Any]:
                     format_type=detected_format.value
                 )
                 transaction.storage_uri_xml = xml_uri
-                db_meta.commit()
             else:
                 # Bei XRechnung sind Raw Data = XML Data
                 transaction.storage_uri_xml = transaction.storage_uri_raw
-                db_meta.commit()
 
             format_step.status = "SUCCESS"
             format_step.metadata = {"format": detected_format.value, "xml_size_bytes": len(xml_bytes)}
             validation_report.add_step(format_step)
             _log_processing_step(db_meta, transaction_id, "format_detection", "completed", f"Format {detected_format.value} erkannt.", duration=format_step.duration_seconds)
+            _checkpoint(db_meta, claim)
 
             # --------------------------------------------------------------------
             # SCHRITT 2: Technische & Semantische Validierung (Sprint 3)
@@ -213,10 +247,9 @@ def process_invoice_task(self, transaction_id: str) -> Dict[str, Any]:
                  # Setze Level nur, wenn es noch nicht gesetzt wurde
                  if transaction.validation_level_reached == ValidationLevel.NONE:
                      transaction.validation_level_reached = ValidationLevel.FORMAT
-                 return _finalize_processing(db_meta, transaction, TransactionStatus.INVALID, validation_report, start_time)
+                 return _finalize_processing(db_meta, transaction, claim, TransactionStatus.INVALID, validation_report, start_time)
 
             transaction.validation_level_reached = ValidationLevel.STRUCTURE
-            db_meta.commit()
 
             # 2.2 KoSIT/Schematron Validierung
             kosit_failed = _execute_validation_step(
@@ -229,12 +262,12 @@ def process_invoice_task(self, transaction_id: str) -> Dict[str, Any]:
             # Prüfe auf Fehler (Warnungen werden toleriert, Fehler führen zum Abbruch)
             if kosit_failed:
                 logger.error(f"🛑 KoSIT Validierung fehlgeschlagen (Fehler gefunden). Breche Verarbeitung ab.")
-                return _finalize_processing(db_meta, transaction, TransactionStatus.INVALID, validation_report, start_time)
+                return _finalize_processing(db_meta, transaction, claim, TransactionStatus.INVALID, validation_report, start_time)
 
             transaction.validation_level_reached = ValidationLevel.SEMANTIC
             step2_duration = time.time() - step2_start
             _log_processing_step(db_meta, transaction_id, "validation_step2", "completed", f"Schritt 2 Validierung abgeschlossen", duration=step2_duration)
-            db_meta.commit()
+            _checkpoint(db_meta, claim)
 
             # --------------------------------------------------------------------
             # SCHRITT 3: XML Mapping (Integration Sprint 2)
@@ -279,7 +312,7 @@ def process_invoice_task(self, transaction_id: str) -> Dict[str, Any]:
                 _log_processing_step(db_meta, transaction_id, "xml_mapping", "failed", str(e), duration=mapping_step.duration_seconds)
                 
                 # Workflow hier beenden und Status auf INVALID setzen
-                return _finalize_processing(db_meta, transaction, TransactionStatus.INVALID, validation_report, start_time)
+                return _finalize_processing(db_meta, transaction, claim, TransactionStatus.INVALID, validation_report, start_time)
 
             # --------------------------------------------------------------------
             # SCHRITT 4: Mathematische Validierung (Sprint 3)
@@ -297,56 +330,205 @@ def process_invoice_task(self, transaction_id: str) -> Dict[str, Any]:
             # Prüfe auf Fehler
             if calc_failed:
                  logger.error(f"🛑 Mathematische Validierung fehlgeschlagen. Breche Verarbeitung ab.")
-                 return _finalize_processing(db_meta, transaction, TransactionStatus.INVALID, validation_report, start_time)
+                 return _finalize_processing(db_meta, transaction, claim, TransactionStatus.INVALID, validation_report, start_time)
 
             step4_duration = time.time() - step4_start
             _log_processing_step(db_meta, transaction_id, "calculation_validation", "completed", "Mathematische Validierung abgeschlossen", duration=step4_duration)
             transaction.validation_level_reached = ValidationLevel.COMPLIANCE
-            db_meta.commit()
+            _checkpoint(db_meta, claim)
 
 
             # --------------------------------------------------------------------
             # SCHRITT 5: Business Validierung (ERP Integration) (Sprint 4/5)
             # --------------------------------------------------------------------
-            logger.info(f"🏢 Schritt 5: Business Validierung (ERP) für {transaction_id}")
-
-            # Führe die Business Validierung aus
-            business_failed = _execute_validation_step(
-                db_meta, validation_report, "business_validation_erp", 
-                "Abgleich mit ERP-Stammdaten und Bewegungsdaten",
-                # Übergebe das Invoice Objekt und den initialisierten Adapter
-                lambda: validate_business_rules(canonical_invoice, erp_adapter)
-            )
-
-            # Prüfe auf Fehler oder fatale Fehler (z.B. Dubletten)
-            # report._update_summary() wird in _execute_validation_step aufgerufen.
-            if validation_report.summary.fatal_errors > 0 or business_failed:
-                 logger.error(f"🛑 Business Validierung fehlgeschlagen. Breche Verarbeitung ab.")
-                 # Status wird automatisch in _finalize_processing basierend auf dem Report gesetzt (INVALID oder MANUAL_REVIEW).
-                 return _finalize_processing(db_meta, transaction, None, validation_report, start_time)
-
-            transaction.validation_level_reached = ValidationLevel.BUSINESS
-            db_meta.commit()
-
-            # FINALER STATUS
-            # Status wird automatisch bestimmt (VALID oder MANUAL_REVIEW bei Warnungen).
-            return _finalize_processing(db_meta, transaction, None, validation_report, start_time)
+            return _run_business_validation(db_meta, transaction, claim, canonical_invoice, validation_report, erp_adapter, start_time)
             
+    except ClaimLostError as e:
+        # Lease abgelaufen und Transaktion zurückgesetzt/übernommen: Ergebnis verwerfen, nichts schreiben
+        logger.warning(f"⚠️ {e} Verarbeitung wird abgebrochen.")
+        processing_log_buffers.pop(transaction_id)
+        return {"status": "skipped", "reason": "claim_lost"}
     except Exception as e:
         # Generelle Fehlerbehandlung für Systemfehler (Retry durch Celery)
         logger.error(f"❌ Unerwarteter Systemfehler bei Rechnungsverarbeitung {transaction_id}: {str(e)}", exc_info=True)
-        # Inkrementiere Retry Count in der DB
-        try:
-            with get_metadata_session() as db:
-                 db.query(InvoiceTransaction).filter(InvoiceTransaction.id == transaction_id).update({"retry_count": InvoiceTransaction.retry_count + 1})
-                 db.commit()
-        except Exception:
-             pass
+        # Der Claim wird mit Status ERROR freigegeben, damit der Celery Retry die Transaktion erneut übernehmen kann.
+        _release_claim_after_failure(transaction_id, claim, TransactionStatus.ERROR, error_message=f"Verarbeitungsversuch fehlgeschlagen: {str(e)}")
+        raise
+    finally:
+        processing_log_buffers.release(transaction_id)
+
+
+@celery_app.task(bind=True, base=CallbackTask, name="business_validation_task",
+                 autoretry_for=TRANSIENT_ERRORS,
+                 retry_backoff=True, max_retries=5)
+def business_validation_task(self, transaction_id: str, attempt: int = 1) -> Dict[str, Any]:
+    """
+    Setzt eine geparkte Transaktion (AWAITING_ERP) mit der Business Validierung fort.
+    Schritte 1-4 werden nicht wiederholt: Der Report wird aus der DB geladen, das XML neu gemappt.
+    """
+    logger.info(f"🏢 Setze Business Validierung fort für Transaction: {transaction_id} (Versuch {attempt})")
+    
+    # Prüfe Verfügbarkeit des synchronen Storage Service
+    if sync_storage_service is None:
+        raise RuntimeError("Storage Backend ist nicht verfügbar.")
+    
+    claim = TransactionClaim(_to_uuid(transaction_id), current_worker_id(self.request.hostname), settings.processing_lease_seconds)
+    processing_log_buffers.open(transaction_id)
+    try:
+        return _resume_business_validation(transaction_id, attempt, claim)
+    except ClaimLostError as e:
+        # Lease abgelaufen und Transaktion zurückgesetzt/übernommen: Ergebnis verwerfen, nichts schreiben
+        logger.warning(f"⚠️ {e} Business Validierung wird abgebrochen.")
+        processing_log_buffers.pop(transaction_id)
+        return {"status": "skipped", "reason": "claim_lost"}
+    except Exception as e:
+        logger.error(f"❌ Fehler bei der Business Validierung {transaction_id}: {str(e)}", exc_info=True)
+        if claim.acquired:
+            if isinstance(e, TRANSIENT_ERRORS):
+                # Celery Retry: wieder parken, damit der Retry den Claim erneut erhält (Fälligkeit für den Reaper)
+                _release_claim_after_failure(
+                    transaction_id, claim, TransactionStatus.AWAITING_ERP,
+                    lease_expires_at=datetime.now() + timedelta(seconds=settings.erp_business_park_grace_seconds)
+                )
+            else:
+                _release_claim_after_failure(transaction_id, claim, TransactionStatus.ERROR, error_message=f"Business Validierung fehlgeschlagen: {str(e)}")
         raise
+    finally:
+        processing_log_buffers.release(transaction_id)
+
+
+def _resume_business_validation(transaction_id: str, attempt: int, claim: TransactionClaim) -> Dict[str, Any]:
+    with get_metadata_session() as db_meta, get_erp_session() as db_erp:
+        transaction = db_meta.query(InvoiceTransaction).filter(
+            InvoiceTransaction.id == claim.transaction_id
+        ).first()
+
+        if not transaction:
+            raise Exception(f"Transaction {transaction_id} nicht gefunden")
+
+        if transaction.status != TransactionStatus.AWAITING_ERP:
+            logger.warning(f"Transaktion {transaction_id} im Status {transaction.status.value}, nicht AWAITING_ERP. Überspringe.")
+            return {"status": "skipped", "reason": "not_awaiting_erp"}
+
+        # Claim vor jedem Schreibzugriff (auch erneutes Parken): Doppelt zugestellte Fortsetzungen
+        # (z.B. durch den Reaper neu eingeplant) verarbeiten die Transaktion nur einmal
+        if not claim.acquire(db_meta, [TransactionStatus.AWAITING_ERP]):
+            logger.warning(f"Transaktion {transaction_id} wurde bereits von einem anderen Worker übernommen. Überspringe.")
+            return {"status": "skipped", "reason": "already_processed_or_in_progress"}
+        db_meta.commit()
+
+        validation_report = ValidationReport.model_validate(_load_validation_report(transaction.validation_report))
+        # Bisherige Verarbeitungsdauer fortschreiben
+        start_time = time.time() - (validation_report.total_duration_seconds or 0)
+
+        # Circuit weiterhin offen: Ohne Download/Mapping direkt erneut parken
+        if settings.erp_resilience_enabled and get_erp_guard().is_open():
+            return _park_for_business_validation(db_meta, transaction, claim, validation_report, start_time, attempt, get_erp_guard().retry_after(), "ERP Circuit offen")
+
+        xml_bytes = sync_storage_service.download_blob_by_uri(transaction.storage_uri_xml)
+        canonical_invoice = map_xml_to_canonical(xml_bytes, transaction.format_detected)
+
+        return _run_business_validation(db_meta, transaction, claim, canonical_invoice, validation_report, _create_erp_adapter(db_erp), start_time, attempt)
 
 
 # --- Hilfsfunktionen ---
 
+def _create_erp_adapter(db_erp: Session) -> IERPAdapter:
+    """ERP Adapter mit Dubletten-Vorfilter und (optional) Circuit Breaker/Concurrency-Limit."""
+    erp_adapter: IERPAdapter = MSSQL_ERPAdapter(
+        db_session=db_erp,
+        duplicate_filter=get_duplicate_invoice_filter() if settings.duplicate_filter_enabled else None
+    )
+    if settings.erp_resilience_enabled:
+        erp_adapter = ResilientERPAdapter(erp_adapter)
+    return erp_adapter
+
+def _run_business_validation(db_meta: Session, transaction: InvoiceTransaction, claim: TransactionClaim, canonical_invoice: CanonicalInvoice, validation_report: ValidationReport, erp_adapter: IERPAdapter, start_time: float, attempt: int = 0) -> Dict[str, Any]:
+    """
+    Schritt 5 (Business Validierung gegen das ERP) und Abschluss der Verarbeitung.
+    Ist das ERP nicht verfügbar, wird die Transaktion geparkt statt Celery Retries zu verbrauchen.
+    """
+    logger.info(f"🏢 Schritt 5: Business Validierung (ERP) für {transaction.id}")
+
+    # Circuit offen: ERP gar nicht erst belasten
+    if settings.erp_resilience_enabled and get_erp_guard().is_open():
+        return _park_for_business_validation(db_meta, transaction, claim, validation_report, start_time, attempt, get_erp_guard().retry_after(), "ERP Circuit offen")
+
+    try:
+        # Führe die Business Validierung aus
+        business_failed = _execute_validation_step(
+            db_meta, validation_report, "business_validation_erp", 
+            "Abgleich mit ERP-Stammdaten und Bewegungsdaten",
+            # Interne Dublettenprüfung (akzeptiert, aber noch nicht verbucht) und ERP-Abgleich
+            lambda: validate_internal_duplicates(db_meta, transaction.id, canonical_invoice)
+                    + validate_business_rules(canonical_invoice, erp_adapter)
+        )
+    except ERPUnavailableError as e:
+        return _park_for_business_validation(db_meta, transaction, claim, validation_report, start_time, attempt, e.retry_after, str(e))
+
+    # Prüfe auf Fehler oder fatale Fehler (z.B. Dubletten)
+    # report._update_summary() wird in _execute_validation_step aufgerufen.
+    if validation_report.summary.fatal_errors > 0 or business_failed:
+         logger.error(f"🛑 Business Validierung fehlgeschlagen. Breche Verarbeitung ab.")
+         # Status wird automatisch in _finalize_processing basierend auf dem Report gesetzt (INVALID oder MANUAL_REVIEW).
+         return _finalize_processing(db_meta, transaction, claim, None, validation_report, start_time)
+
+    transaction.validation_level_reached = ValidationLevel.BUSINESS
+
+    # FINALER STATUS
+    # Status wird automatisch bestimmt (VALID oder MANUAL_REVIEW bei Warnungen).
+    return _finalize_processing(db_meta, transaction, claim, None, validation_report, start_time)
+
+def _park_for_business_validation(db: Session, transaction: InvoiceTransaction, claim: TransactionClaim, report: ValidationReport, start_time: float, attempt: int, retry_after: float, reason: str) -> Dict[str, Any]:
+    """
+    Parkt die Transaktion auf Stufe COMPLIANCE (Status AWAITING_ERP) und plant die Business Validierung neu ein.
+    Nach erp_business_max_requeues Versuchen wird die Transaktion auf ERROR gesetzt.
+    """
+    report.total_duration_seconds = time.time() - start_time
+    transaction.validation_report = _store_validation_report(transaction.id, report.model_dump(mode='json'))
+    transaction.validation_level_reached = ValidationLevel.COMPLIANCE
+
+    if attempt >= settings.erp_business_max_requeues:
+        logger.error(f"❌ ERP für {transaction.id} nach {attempt} Versuchen nicht verfügbar. Status: ERROR.")
+        error_message = f"ERP nach {attempt} Versuchen nicht verfügbar: {reason}"
+        transaction_id = transaction.id
+        _log_processing_step(db, str(transaction_id), "business_validation_parked", "failed", error_message)
+        _flush_processing_logs(db, transaction_id)
+        _commit_owned_status(db, transaction, claim, TransactionStatus.ERROR, error_message=error_message)
+        return {"transaction_id": str(transaction_id), "status": TransactionStatus.ERROR.value}
+
+    # Exponentielles Backoff mit Jitter, mindestens bis der Circuit wieder eine Probe erlaubt
+    base_delay = settings.erp_business_requeue_delay_seconds
+    countdown = max(retry_after, base_delay * 2 ** min(attempt, 4)) + random.uniform(0, base_delay)
+
+    # (ID vorher lesen: Nach dem Commit würde der Zugriff ein Refresh-SELECT auslösen)
+    transaction_id = transaction.id
+    _log_processing_step(
+        db, str(transaction_id), "business_validation_parked", "parked",
+        f"ERP nicht verfügbar ({reason}). Business Validierung erneut in {countdown:.0f}s (Versuch {attempt + 1})."
+    )
+    _flush_processing_logs(db, transaction_id)
+    # Fälligkeit der Fortsetzung: Geht die eingeplante Nachricht verloren, plant der Reaper danach erneut ein
+    _commit_owned_status(
+        db, transaction, claim, TransactionStatus.AWAITING_ERP,
+        lease_expires_at=datetime.now() + timedelta(seconds=countdown + settings.erp_business_park_grace_seconds),
+        business_validation_attempt=attempt + 1,
+    )
+
+    try:
+        business_validation_task.apply_async(args=[str(transaction_id), attempt + 1], countdown=countdown)
+    except Exception as e:
+        # Bleibt AWAITING_ERP mit Fälligkeit; der Reaper plant nach Ablauf erneut ein
+        logger.error(f"Transaction {transaction_id} geparkt, aber Fortsetzung nicht eingeplant (Reaper übernimmt): {e}")
+    logger.warning(f"🅿️ Transaction {transaction_id} geparkt (AWAITING_ERP): {reason}. Neuer Versuch in {countdown:.0f}s.")
+
+    return {
+        "transaction_id": str(transaction_id),
+        "status": TransactionStatus.AWAITING_ERP.value,
+        "requeue_in_seconds": round(countdown, 1),
+        "attempt": attempt + 1,
+    }
+
 def _execute_validation_step(db: Session, report: ValidationReport, step_name: str, description: str, validation_func) -> bool:
     """
     Führt eine Validierungsfunktion aus, protokolliert die Ergebnisse und aktualisiert den Report.
@@ -360,6 +542,7 @@ def _execute_validation_step(db: Session, report: ValidationReport, step_name: s
     )
     
     validation_failed = False
+    erp_unavailable = False
     try:
         # Führe die Validierungslogik aus (erwartet Liste von ValidationErrors)
         results = validation_func()
@@ -384,6 +567,11 @@ def _execute_validation_step(db: Session, report: ValidationReport, step_name: s
             f"{description} abgeschlossen. Fehler: {len(step.errors)}, Warnungen: {len(step.warnings)}."
         )
 
+    except ERPUnavailableError:
+        # Kein Validierungsergebnis: Der Aufrufer parkt die Transaktion
+        erp_unavailable = True
+        raise
+
     except Exception as e:
         # Fange Systemfehler während der Validierung ab (z.B. Timeout, JRE nicht gefunden)
         logger.error(f"❌ Systemfehler während Validierungsschritt {step_name}: {e}", exc_info=True)
@@ -398,15 +586,17 @@ def _execute_validation_step(db: Session, report: ValidationReport, step_name: s
 
     finally:
         step.duration_seconds = time.time() - start_time
-        report.add_step(step)
+        if not erp_unavailable:
+            report.add_step(step)
         # Wichtig: Summary aktualisieren, damit has_fatal_errors korrekt ist
         report._update_summary()
     
     return validation_failed
     
-def _finalize_processing(db: Session, transaction: InvoiceTransaction, explicit_status: Optional[TransactionStatus], report: ValidationReport, start_time: float) -> Dict[str, Any]:
+def _finalize_processing(db: Session, transaction: InvoiceTransaction, claim: TransactionClaim, explicit_status: Optional[TransactionStatus], report: ValidationReport, start_time: float) -> Dict[str, Any]:
     """
     Schließt die Verarbeitung ab. Bestimmt den finalen Status, wenn nicht explizit gesetzt.
+    Der Status wird nur geschrieben, solange der Claim diesem Worker gehört (sonst ClaimLostError).
     """
     processing_time = time.time() - start_time
     
@@ -430,35 +620,71 @@ def _finalize_processing(db: Session, transaction: InvoiceTransaction, explicit_
             status = TransactionStatus.VALID
             logger.info("✅ Verarbeitung erfolgreich. Keine Fehler oder Warnungen. Status: VALID.")
 
-    transaction.status = status
-
     # Pydantic V2: model_dump(mode='json')
     try:
-        transaction.validation_report = report.model_dump(mode='json')
+        report_json = report.model_dump(mode='json')
     except AttributeError:
         # Fallback für Pydantic V1 (falls Migration nicht vollständig)
-        transaction.validation_report = report.dict()
+        report_json = report.dict()
+    transaction.validation_report = _store_validation_report(transaction.id, report_json)
+    # Findings für Auswertungen nach Regel-Code (im selben Commit)
+    replace_validation_findings(db, transaction.id, findings_from_report(transaction.id, report, transaction.seller_vat_id))
 
     transaction.processing_time_seconds = processing_time
     transaction.processed_at = datetime.now()
-    transaction.updated_at = datetime.now()
-    
-    db.commit()
     
     _log_processing_step(
         db, str(transaction.id), "processing_completed", "completed", 
         f"Verarbeitung abgeschlossen. Status: {status.value}. Dauer: {processing_time:.3f}s"
     )
     
-    logger.info(f"🏁 Rechnungsverarbeitung für {transaction.id} abgeschlossen. Status: {status.value}. Dauer: {processing_time:.3f}s")
+    # Status, Report und alle gepufferten Logs in einem Commit; der Status über den Claim
+    # (Lease freigeben, claimed_by/claimed_at bleiben zur Nachvollziehbarkeit).
+    # (ID vorher lesen: Nach dem Commit würde der Zugriff ein Refresh-SELECT samt neuer DB-Transaktion auslösen)
+    transaction_id = transaction.id
+    _flush_processing_logs(db, transaction_id)
+    _commit_owned_status(db, transaction, claim, status)
+    
+    logger.info(f"🏁 Rechnungsverarbeitung für {transaction_id} abgeschlossen. Status: {status.value}. Dauer: {processing_time:.3f}s")
     
     return {
-        "transaction_id": str(transaction.id),
+        "transaction_id": str(transaction_id),
         "status": status.value,
         "processing_time_seconds": processing_time,
         "validation_summary": report.to_json_summary(),
     }
 
+def _store_validation_report(transaction_id, report_json: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Gibt den Wert für die Spalte validation_report zurück. Große Berichte (z.B. tausende SVRL Findings)
+    werden komprimiert neben processed.xml abgelegt; in der Tabelle bleiben Zusammenfassung und Verweis.
+    """
+    data = report_storage.serialize_report(report_json)
+    if len(data) <= settings.validation_report_offload_threshold_bytes:
+        return report_json
+
+    encoding = report_storage.resolve_encoding(settings.validation_report_compression)
+    compressed = report_storage.compress(data, encoding)
+    try:
+        uri = sync_storage_service.upload_validation_report(
+            transaction_id, compressed, encoding, report_storage.REPORT_BLOB_SUFFIX[encoding]
+        )
+    except IOError as e:
+        # Kein Retry der gesamten Verarbeitung wegen des Berichts: dann eben inline speichern
+        logger.warning(f"⚠️ Validierungsbericht für {transaction_id} konnte nicht ausgelagert werden, speichere inline: {e}")
+        return report_json
+
+    logger.info(f"📦 Validierungsbericht für {transaction_id} ausgelagert ({len(data)} -> {len(compressed)} Bytes, {encoding}).")
+    return report_storage.build_report_stub(report_json, uri, encoding, len(data), len(compressed))
+
+def _load_validation_report(report_json: Dict[str, Any]) -> Dict[str, Any]:
+    """Lädt einen ausgelagerten Bericht vollständig (z.B. zum Fortsetzen geparkter Transaktionen)."""
+    pointer = report_storage.get_offload_pointer(report_json)
+    if pointer is None:
+        return report_json
+    chunks = sync_storage_service.iter_blob_chunks_by_uri(pointer["uri"])
+    return json.loads(b"".join(report_storage.iter_decompress(chunks, pointer["content_encoding"])))
+
 def _update_transaction_with_canonical_data(db: Session, transaction: InvoiceTransaction, invoice: CanonicalInvoice):
     """
     Extrahiert Schlüsseldaten aus dem Canonical Model und speichert sie in der Transaction Tabelle.
@@ -480,12 +706,77 @@ def _update_transaction_with_canonical_data(db: Session, transaction: InvoiceTra
         if invoice.purchase_order_reference:
             transaction.purchase_order_id = invoice.purchase_order_reference.document_id
             
-        db.commit()
+        # Kein Commit: Die Felder werden mit dem finalen Commit (bzw. nächsten Checkpoint) geschrieben
         logger.debug(f"Transaction {transaction.id} mit extrahierten Daten aktualisiert.")
         
     except Exception as e:
         logger.error(f"Fehler beim Aktualisieren der Transaction mit Canonical Daten: {e}", exc_info=True)
+
+def _checkpoint(db: Session, claim: TransactionClaim) -> None:
+    """
+    Abschnittsgrenze: Optionaler Zwischen-Commit (PROCESSING_CHECKPOINT_COMMITS) und Lease-Heartbeat.
+    Standard ist ein einziger Commit beim Abschluss; Checkpoints machen den Fortschritt früher sichtbar.
+    """
+    if settings.processing_checkpoint_commits:
+        _flush_processing_logs(db, claim.transaction_id)
+        db.commit()
+    _renew_lease(claim)
+
+def _renew_lease(claim: TransactionClaim) -> None:
+    """
+    Heartbeat in eigener Session, damit die Verlängerung sofort sichtbar ist (die Hauptsession
+    committet erst beim Abschluss). Löst ClaimLostError aus, wenn der Claim verloren ist.
+    """
+    if not claim.renewal_due():
+        return
+    with get_metadata_session() as db:
+        claim.renew(db)
+        db.commit()
+
+def _commit_owned_status(db: Session, transaction: InvoiceTransaction, claim: TransactionClaim, status: TransactionStatus, **values: Any) -> None:
+    """
+    Schreibt den Status über den Claim (UPDATE ... WHERE claimed_by = :worker AND status = 'PROCESSING')
+    und committet die gesamte Unit of Work. Gehört der Claim nicht mehr diesem Worker (Lease abgelaufen,
+    vom Reaper zurückgesetzt oder übernommen), wird alles verworfen: Rollback und ClaimLostError.
+    """
+    values.setdefault("lease_expires_at", None)
+    if not claim.release(db, status, **values):
         db.rollback()
+        raise ClaimLostError(f"Claim für Transaction {claim.transaction_id} verloren (Worker {claim.worker_id}), Ergebnis verworfen.")
+    # Objekt im Speicher angleichen, ohne ein weiteres UPDATE auszulösen
+    set_committed_value(transaction, "status", status)
+    for key, value in values.items():
+        set_committed_value(transaction, key, value)
+    db.commit()
+
+def _release_claim_after_failure(transaction_id: str, claim: Optional[TransactionClaim], status: TransactionStatus, **values: Any) -> None:
+    """
+    Nach einem Fehler (eigene Session): Claim mit neuem Status freigeben, retry_count erhöhen
+    und die Logs dieses Versuchs im selben Commit sichern. Mit Claim wird retry_count nur im
+    eigenen (owned) UPDATE erhöht, ein fremder Worker mit übernommenem Lease zählt also nicht mit.
+    """
+    try:
+        with get_metadata_session() as db:
+            if claim is not None:
+                claim.release(db, status, retry_count=InvoiceTransaction.retry_count + 1, **values)
+            else:
+                db.query(InvoiceTransaction).filter(InvoiceTransaction.id == _to_uuid(transaction_id)).update({"retry_count": InvoiceTransaction.retry_count + 1})
+            _flush_processing_logs(db, transaction_id)
+            db.commit()
+    except Exception as e:
+        logger.error(f"❌ Freigabe nach Fehler für {transaction_id} fehlgeschlagen: {e}", exc_info=True)
+
+def _flush_processing_logs(db: Session, transaction_id) -> None:
+    """Schreibt die gepufferten Logs der Transaktion in die laufende DB-Transaktion (Commit durch Aufrufer)."""
+    log_buffer = processing_log_buffers.get(transaction_id)
+    if log_buffer is not None:
+        log_buffer.flush(db)
+
+def _to_uuid(transaction_id) -> uuid.UUID:
+    """Konvertiert die transaction_id (Task-Argument ist ein String) zu UUID für UNIQUEIDENTIFIER Spalten."""
+    if isinstance(transaction_id, uuid.UUID):
+        return transaction_id
+    return uuid.UUID(str(transaction_id))
 
 def _log_processing_step(
     db: Session, 
@@ -498,18 +789,21 @@ def _log_processing_step(
 ):
     """
     Hilfsfunktion zum Loggen von Verarbeitungsschritten.
+    Ist für die Transaktion ein Log-Puffer aktiv (innerhalb der Tasks), wird nur gepuffert.
     """
     try:
-        # Konvertiere transaction_id zu UUID für MSSQL UNIQUEIDENTIFIER
         try:
-            if isinstance(transaction_id, uuid.UUID):
-                tx_uuid = transaction_id
-            else:
-                tx_uuid = uuid.UUID(str(transaction_id))
+            tx_uuid = _to_uuid(transaction_id)
         except ValueError:
             logger.error(f"Ungültige transaction_id für Logging (keine UUID): {transaction_id}")
             return
 
+        log_buffer = processing_log_buffers.get(tx_uuid)
+        if log_buffer is not None:
+            log_buffer.add(step_name, step_status, message, details=details, duration=duration)
+            logger.debug(f"📝 Processing Log (gepuffert): {step_name} - {step_status} - {message}")
+            return
+
         log_entry = ProcessingLog(
             transaction_id=tx_uuid,
             step_name=step_name,
@@ -608,7 +902,7 @@ def _process_email_attachments(msg: MailMessage) -> int:
     logger.info(f"📄 Verarbeite Anhänge von E-Mail: {msg.subject} (Von: {msg.from_})")
 
     if sync_storage_service is None:
-        raise RuntimeError("SyncStorageService ist nicht verfügbar für E-Mail-Verarbeitung.")
+        raise RuntimeError("Storage Backend ist nicht verfügbar für E-Mail-Verarbeitung.")
 
     for att in msg.attachments:
         # Filter für relevante Dateitypen (PDF, XML)
@@ -618,14 +912,10 @@ def _process_email_attachments(msg: MailMessage) -> int:
 
         logger.info(f"Processing Anhang: {att.filename} ({len(att.payload)} bytes)")
         
-        # Initialisiere DB Session
-        db = None
         storage_uri = None
         try:
-            # Wir müssen hier eine Session öffnen, da wir außerhalb des Contexts von process_invoice_task sind.
-            # Verwenden Sie die Funktion, die in db/session.py definiert ist.
-            db = get_metadata_session() 
-            with db: # Nutze Session als Context Manager
+            # Eigene Session, da wir außerhalb des Contexts von process_invoice_task sind (Rollback bei Fehlern im Context Manager)
+            with get_metadata_session() as db:
                 # 1. Erstelle neue Transaction in der Datenbank
                 transaction = InvoiceTransaction(
                     status=TransactionStatus.RECEIVED,
@@ -639,28 +929,20 @@ def _process_email_attachments(msg: MailMessage) -> int:
                 db.commit()
                 transaction_id = str(transaction.id) 
                 
-                # 2. Speichere Anhang im Raw Storage (GoBD-konform)
-                # Blob Name Konvention (transaction_id/filename)
-                blob_name = f"{transaction_id}/{att.filename}"
-                
-                # Direkter Upload mit dem synchronen Service Client
-                blob_client = sync_storage_service.blob_service_client.get_blob_client(
-                    container=sync_storage_service.raw_container_name,
-                    blob=blob_name
+                # 2. Speichere Anhang im Raw Storage (GoBD-konform; im CAS-Layout dedupliziert, Metadaten im Manifest)
+                upload = sync_storage_service.upload_raw_bytes(
+                    transaction_id,
+                    att.filename,
+                    att.payload,
+                    att.content_type,
+                    source="EMAIL",
+                    manifest_extra={"email_subject": msg.subject or "", "email_from": msg.from_ or ""},
                 )
-                
-                metadata = {
-                   "transaction_id": transaction_id,
-                   "source": "EMAIL",
-                   "content_hash": hashlib.sha256(att.payload).hexdigest(),
-                }
-                
-                # Synchroner Upload
-                blob_client.upload_blob(att.payload, overwrite=True, metadata=metadata)
-                storage_uri = blob_client.url
+                storage_uri = upload.uri
 
-                # 3. Aktualisiere Transaction mit Storage URI
+                # 3. Aktualisiere Transaction mit Storage URI und Inhalts-Hash (Referenz auf den Blob)
                 transaction.storage_uri_raw = storage_uri
+                transaction.content_hash = upload.content_hash
                 db.commit()
 
                 # 4. Starte asynchronen Verarbeitungsprozess
@@ -670,11 +952,6 @@ def _process_email_attachments(msg: MailMessage) -> int:
 
         except Exception as e:
             logger.error(f"❌ Fehler bei der Verarbeitung des Anhangs {att.filename}: {e}", exc_info=True)
-            if db:
-                try:
-                    db.rollback()
-                except:
-                    pass
             if storage_uri:
                  logger.critical(f"Inkonsistenz! Datei hochgeladen ({storage_uri}), aber DB-Transaktion fehlgeschlagen.")
             raise # Werfe Fehler weiter, damit die E-Mail als fehlerhaft markiert wird
@@ -683,6 +960,247 @@ def _process_email_attachments(msg: MailMessage) -> int:
 
 
 @celery_app.task(name="cleanup_old_results_task")
-def cleanup_old_results_task() -> Dict[str, Any]:
-     logger.info("🧹 Cleanup Task (Platzhalter)")
-     return {"status": "skipped", "note": "Implementierung folgt"}
\ No newline at end of file
+def cleanup_old_results_task(retention_days: Optional[int] = None, max_batches: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Verschiebt abgeschlossene Transaktionen älter als das Aufbewahrungsfenster samt Processing Logs ins Archiv.
+    Ein Commit pro Batch, damit Sperren auf den Live-Tabellen kurz bleiben; pro Lauf höchstens max_batches.
+    """
+    retention_days = retention_days or settings.retention_days
+    max_batches = max_batches or settings.cleanup_max_batches
+    cutoff = datetime.now() - timedelta(days=retention_days)
+    start = time.time()
+    totals = {"transactions": 0, "processing_logs": 0, "findings_deleted": 0}
+    batches = 0
+
+    with get_metadata_session() as db:
+        partitions_added = ensure_archive_partitions(db)
+        db.commit()
+
+        while batches < max_batches:
+            result = archive_batch(db, cutoff, settings.cleanup_batch_size)
+            db.commit()
+            if not result.transactions:
+                break
+            batches += 1
+            totals["transactions"] += result.transactions
+            totals["processing_logs"] += result.processing_logs
+            totals["findings_deleted"] += result.findings_deleted
+            if result.transactions < settings.cleanup_batch_size:
+                break
+
+    duration = time.time() - start
+    logger.info(
+        f"🧹 Cleanup: {totals['transactions']} Transaktionen und {totals['processing_logs']} Logs "
+        f"vor {cutoff:%Y-%m-%d} archiviert ({batches} Batches, {duration:.3f}s)."
+    )
+    return {
+        "status": "completed",
+        "cutoff": cutoff.isoformat(),
+        "batches": batches,
+        "partitions_added": partitions_added,
+        "duration_seconds": round(duration, 3),
+        **totals,
+    }
+
+
+# Fortschritt der Rekomprimierung (im Processed-Container, damit ein Neustart fortsetzen kann)
+RECOMPRESS_PROGRESS_BLOB = "_migrations/recompress_processed_xml.json"
+
+
+@celery_app.task(name="recompress_processed_xml_task")
+def recompress_processed_xml_task(continuation_token: Optional[str] = None, max_pages: int = 10, restart: bool = False) -> Dict[str, Any]:
+    """
+    Migration: komprimiert bestehende (unkomprimierte) processed.xml Blobs seitenweise, pro Seite parallel.
+    Nach jeder Seite werden Continuation Token und Zähler gespeichert; ein Start ohne Token setzt dort fort
+    (restart=True beginnt von vorn). Nach max_pages plant sich der Task mit dem Token selbst erneut ein.
+    """
+    if not hasattr(sync_storage_service, "recompress_processed_page"):
+        return {"status": "skipped", "reason": f"Storage Backend {settings.storage_backend} unterstützt keine Rekomprimierung"}
+    if settings.processed_xml_compression == "none":
+        return {"status": "skipped", "reason": "processed_xml_compression ist none"}
+
+    container = sync_storage_service.processed_container_name
+    progress = None if restart else sync_storage_service.read_json_blob(container, RECOMPRESS_PROGRESS_BLOB)
+    if continuation_token is None and progress:
+        if progress.get("completed"):
+            return {"status": "completed", "pages": 0, **progress["totals"]}
+        continuation_token = progress.get("continuation_token")
+    totals = dict(progress["totals"]) if progress else {
+        "compressed": 0, "skipped": 0, "changed": 0, "failed": 0, "bytes_before": 0, "bytes_after": 0
+    }
+
+    start = time.time()
+    pages = 0
+    completed = False
+    while pages < max_pages and not completed:
+        continuation_token, counts = sync_storage_service.recompress_processed_page(
+            continuation_token,
+            settings.processed_xml_recompress_page_size,
+            settings.processed_xml_recompress_workers,
+        )
+        pages += 1
+        completed = continuation_token is None
+        for key, value in counts.items():
+            totals[key] = totals.get(key, 0) + value
+        sync_storage_service.write_json_blob(container, RECOMPRESS_PROGRESS_BLOB, {
+            "continuation_token": continuation_token,
+            "completed": completed,
+            "totals": totals,
+            "updated_at": datetime.now().isoformat(),
+        })
+
+    if not completed:
+        recompress_processed_xml_task.apply_async(kwargs={"continuation_token": continuation_token, "max_pages": max_pages})
+
+    duration = time.time() - start
+    logger.info(
+        f"🗜️ Rekomprimierung: {pages} Seiten in {duration:.1f}s, insgesamt {totals['compressed']} Blobs komprimiert "
+        f"({totals['bytes_before']} -> {totals['bytes_after']} Bytes){'' if completed else ', wird fortgesetzt'}."
+    )
+    return {
+        "status": "completed" if completed else "in_progress",
+        "pages": pages,
+        "duration_seconds": round(duration, 3),
+        **totals,
+    }
+
+
+@celery_app.task(
+    name="export_gobd_task",
+    soft_time_limit=settings.export_time_limit_seconds,
+    time_limit=settings.export_time_limit_seconds + 60,
+)
+def export_gobd_task(
+    created_from: Optional[str] = None,
+    created_to: Optional[str] = None,
+    vendor: Optional[str] = None,
+    statuses: Optional[List[str]] = None,
+    archive_format: str = "zip",
+    include_archive: bool = True
+) -> Dict[str, Any]:
+    """
+    GoBD Massenexport (Prüferanfragen): Rechnungen, verarbeitete XML und Validierungsberichte der gefilterten
+    Transaktionen als ZIP/TAR mit Hash-Manifest im Export-Container. Liefert URI und Durchsatz.
+    """
+    if not hasattr(sync_storage_service, "list_blobs_by_prefix"):
+        return {"status": "skipped", "reason": f"Storage Backend {settings.storage_backend} unterstützt keinen Export"}
+
+    export_filter = ExportFilter(
+        created_from=datetime.fromisoformat(created_from) if created_from else None,
+        created_to=datetime.fromisoformat(created_to) if created_to else None,
+        vendor=vendor,
+        statuses=[TransactionStatus(status) for status in statuses] if statuses else None,
+        include_archive=include_archive,
+    )
+    export_id = export_gobd_task.request.id or str(uuid.uuid4())
+
+    # Auswahl auf dem Lese-Pool; die Session ist vor dem (langen) Transfer wieder geschlossen
+    with get_metadata_read_session() as db:
+        transactions = select_export_transactions(db, export_filter)
+
+    result = run_export(sync_storage_service, transactions, export_filter, archive_format, settings.export_max_workers, export_id)
+    return {"status": "completed", **result}
+
+
+@celery_app.task(name="reap_stale_transactions_task")
+def reap_stale_transactions_task() -> Dict[str, Any]:
+    """
+    Periodischer Reaper für Transaktionen, deren Lease abgelaufen ist (Worker hart beendet, OOM, task_time_limit).
+    Innerhalb des Retry-Budgets: zurück auf RECEIVED und mit Backoff neu eingeplant, sonst ERROR.
+    Geparkte Transaktionen (AWAITING_ERP), deren Fortsetzung überfällig ist, werden erneut eingeplant.
+    """
+    start = time.time()
+    with get_metadata_session() as db:
+        requeued, failed = reap_expired_claims(
+            db,
+            max_attempts=settings.processing_reaper_max_attempts,
+            lease_seconds=settings.processing_lease_seconds,
+        )
+        parked_requeued, parked_failed = reap_overdue_parked(
+            db,
+            max_attempts=settings.processing_reaper_max_attempts,
+            grace_seconds=settings.erp_business_park_grace_seconds,
+        )
+        db.commit()
+
+    # Erst nach dem Commit einplanen, sonst könnte der Task den Status noch als PROCESSING sehen
+    base_delay = settings.processing_reaper_backoff_seconds
+    for transaction_id, retry_count in requeued:
+        countdown = base_delay * 2 ** min((retry_count or 1) - 1, 6) + random.uniform(0, base_delay)
+        try:
+            process_invoice_task.apply_async(args=[str(transaction_id)], countdown=countdown)
+        except Exception as e:
+            # Bleibt RECEIVED; wird beim Wiederanlauf des Brokers nicht automatisch erneut eingeplant
+            logger.critical(f"Transaction {transaction_id} zurückgesetzt, aber nicht eingeplant: {e}")
+
+    for transaction_id, attempt in parked_requeued:
+        # Mit dem beim Parken persistierten Versuch fortsetzen, damit erp_business_max_requeues weiter greift
+        try:
+            business_validation_task.apply_async(args=[str(transaction_id), attempt])
+        except Exception as e:
+            # Neue Fälligkeit ist gesetzt: nächster Reaper-Lauf nach der Karenz
+            logger.critical(f"Geparkte Transaction {transaction_id} nicht eingeplant: {e}")
+
+    duration = time.time() - start
+    _record_reaper_run({
+        "runs": 1,
+        "requeued_total": len(requeued),
+        "failed_total": failed,
+        "parked_requeued_total": len(parked_requeued),
+        "parked_failed_total": parked_failed,
+    }, {
+        "last_requeued": len(requeued),
+        "last_failed": failed,
+        "last_run_at": datetime.now().isoformat(),
+        "last_duration_seconds": round(duration, 3),
+    })
+
+    if requeued or failed:
+        logger.warning(f"🧟 Reaper: {len(requeued)} hängende Transaktionen neu eingeplant, {failed} auf ERROR gesetzt ({duration:.3f}s).")
+    else:
+        logger.info(f"🧟 Reaper: Keine hängenden Transaktionen ({duration:.3f}s).")
+    if parked_requeued or parked_failed:
+        logger.warning(f"🧟 Reaper: {len(parked_requeued)} überfällige geparkte Transaktionen neu eingeplant, {parked_failed} auf ERROR gesetzt.")
+
+    return {
+        "status": "completed",
+        "requeued": len(requeued),
+        "failed": failed,
+        "parked_requeued": len(parked_requeued),
+        "parked_failed": parked_failed,
+        "duration_seconds": round(duration, 3),
+    }
+
+def _record_reaper_run(counters: Dict[str, int], last_run: Dict[str, Any]) -> None:
+    """Schreibt die Kennzahlen eines Reaper-Laufs in den geteilten Zustandsspeicher."""
+    store = get_state_store()
+    for name, amount in counters.items():
+        store.incrbyfloat(REAPER_METRICS_PREFIX + name, amount)
+    for name, value in last_run.items():
+        store.set(REAPER_METRICS_PREFIX + name, value)
+
+def get_reaper_metrics() -> Dict[str, Any]:
+    """Kennzahlen des Reapers über alle Worker (Summen seit dem letzten Redis-Reset und letzter Lauf)."""
+    store = get_state_store()
+    values = {name: store.get(REAPER_METRICS_PREFIX + name) for name in REAPER_COUNTERS + REAPER_LAST_RUN_FIELDS}
+    # Der Speicher liefert Strings (Redis): Zähler als int, Dauer als float
+    metrics: Dict[str, Any] = {name: int(float(values[name] or 0)) for name in REAPER_COUNTERS + ("last_requeued", "last_failed")}
+    metrics["last_run_at"] = values["last_run_at"]
+    metrics["last_duration_seconds"] = float(values["last_duration_seconds"]) if values["last_duration_seconds"] is not None else None
+    return metrics
+
+
+@celery_app.task(name="refresh_transaction_stats_task")
+def refresh_transaction_stats_task(hours: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Berechnet die stündlichen Statistik-Rollups der letzten Stunden neu (inkl. der laufenden Stunde),
+    dazu ältere Stunden mit seit dem letzten Lauf geänderten Transaktionen. Mit größerem `hours` als Backfill nutzbar.
+    """
+    hours = hours or settings.stats_rollup_refresh_hours
+    start = time.time()
+    with get_metadata_session() as db:
+        rows = refresh_hourly_rollups(db, hours)
+        db.commit()
+    duration = time.time() - start
+    logger.info(f"📊 Statistik-Rollups für {hours} Stunden aktualisiert ({rows} Zeilen, {duration:.3f}s).")
+    return {"status": "completed", "hours": hours, "rows": rows, "duration_seconds": round(duration, 3)}
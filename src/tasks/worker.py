@@ -4,7 +4,9 @@ Asynchrone Verarbeitung von Rechnungen
 """
 
 from celery import Celery
+from celery.signals import worker_process_init
 import logging
+import threading
 from typing import Dict, Any
 
 from ..core.config import settings
@@ -70,8 +72,18 @@ celery_app.conf.update(
             "schedule": 60.0,  # Alle 60 Sekunden
             "options": {"queue": "email_monitoring"}
         },
+        "reap-stale-transactions": {
+            "task": "reap_stale_transactions_task",
+            "schedule": float(settings.processing_reaper_interval_seconds),
+            "options": {"queue": "maintenance"}
+        },
+        "refresh-transaction-stats": {
+            "task": "refresh_transaction_stats_task",
+            "schedule": float(settings.stats_rollup_interval_seconds),
+            "options": {"queue": "maintenance"}
+        },
         "cleanup-old-results": {
-            "task": "src.tasks.processor.cleanup_old_results_task",
+            "task": "cleanup_old_results_task",
             "schedule": 3600.0,  # Stündlich
             "options": {"queue": "maintenance"}
         }
@@ -98,12 +110,24 @@ def health_check_task() -> Dict[str, Any]:
     """
     import datetime
     
+    from ..services.erp.duplicate_filter import get_duplicate_invoice_filter
+    from ..services.erp.resilience import get_erp_guard
+    from ..services.storage_backend import sync_storage_service
+    from .processor import get_reaper_metrics
+    
+    blob_cache = getattr(sync_storage_service, "blob_cache", None)
+    
     return {
         "status": "healthy",
         "worker_id": health_check_task.request.id,
         "timestamp": datetime.datetime.now().isoformat(),
         "celery_version": celery_app.version,
-        "broker_url": settings.celery_broker_url.split("@")[-1] if "@" in settings.celery_broker_url else settings.celery_broker_url
+        "broker_url": settings.celery_broker_url.split("@")[-1] if "@" in settings.celery_broker_url else settings.celery_broker_url,
+        "duplicate_filter": get_duplicate_invoice_filter().stats(),
+        "erp_guard": get_erp_guard().stats(),
+        "stale_transaction_reaper": get_reaper_metrics(),
+        "storage_backend": settings.storage_backend,
+        "raw_blob_cache": blob_cache.stats() if blob_cache else None
     }
 
 
@@ -126,6 +150,30 @@ def setup_worker(sender, **kwargs):
         celery_app.conf.task_always_eager = True
 
 
+# Worker-Prozess Start (pro Prefork-Kind)
+@worker_process_init.connect
+def init_duplicate_filter(**kwargs):
+    """
+    Baut den Dubletten-Vorfilter aus dem ERP-Rechnungsjournal auf.
+    Läuft im Hintergrund-Thread, da worker_process_init nur wenige Sekunden blockieren darf.
+    Bis der Filter bereit ist, fragt der Adapter das ERP direkt ab.
+    """
+    if not settings.duplicate_filter_enabled:
+        return
+    
+    def _build():
+        from ..db.session import get_erp_session
+        from ..services.erp.mssql_adapter import MSSQL_ERPAdapter
+        from ..services.erp.duplicate_filter import get_duplicate_invoice_filter
+        try:
+            with get_erp_session() as db_erp:
+                get_duplicate_invoice_filter().rebuild(MSSQL_ERPAdapter(db_session=db_erp).get_journal_keys())
+        except Exception as e:
+            logger.warning(f"⚠️  Dubletten-Filter konnte nicht aufgebaut werden (ERP wird direkt abgefragt): {e}")
+    
+    threading.Thread(target=_build, name="duplicate-filter-build", daemon=True).start()
+
+
 if __name__ == "__main__":
     # Worker direkt starten
     celery_app.start()
@@ -207,6 +207,8 @@ def mock_db_session(mocker):
     session = MagicMock()
     query = MagicMock()
     session.query.return_value = query
+    # Atomarer Claim (UPDATE ... WHERE status IN ...) trifft standardmäßig genau eine Zeile
+    session.execute.return_value.rowcount = 1
     
     # Mockt den Aufruf von get_metadata_session in processor.py
     # Stellt sicher, dass der Context Manager funktioniert
@@ -214,6 +216,21 @@ def mock_db_session(mocker):
     session.__enter__.return_value = session
     return session, query
 
+@pytest.fixture
+def sqlite_metadata_session():
+    """Echte Metadaten-Session auf einer In-Memory SQLite DB (Schema aus den Modellen)."""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from src.db.models import Base
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine, autoflush=False)()
+    yield session
+    session.close()
+    engine.dispose()
+
 @pytest.fixture
 def mock_sync_storage_service(mocker):
     """Mockt den SyncStorageService in processor.py."""
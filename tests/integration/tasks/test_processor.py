@@ -2,14 +2,16 @@
 import pytest
 import uuid
 from decimal import Decimal
-from datetime import date
-from src.tasks.processor import process_invoice_task
-from src.db.models import InvoiceTransaction, TransactionStatus, InvoiceFormat
+from datetime import date, datetime
+from src.tasks.processor import process_invoice_task, business_validation_task, reap_stale_transactions_task
+from src.db.claims import TransactionClaim
+from src.db.models import InvoiceTransaction, TransactionStatus, InvoiceFormat, ValidationLevel
+from src.services.erp.resilience import ERPUnavailableError
 from src.services.mapping.xpath_util import MappingError
 from unittest.mock import MagicMock
 
 # Importiere ValidationError, um Fehler simulieren zu können
-from src.schemas.validation_report import ValidationError, ValidationCategory, ValidationSeverity
+from src.schemas.validation_report import ValidationError, ValidationCategory, ValidationSeverity, ValidationReport
 
 # Wir nutzen die Mocks (mock_db_session, mock_sync_storage_service) aus conftest.py
 
@@ -24,6 +26,9 @@ class TestProcessorWorkflow:
         self.mock_calc = mocker.patch('src.tasks.processor.validate_calculations', return_value=[])
         # Mocke auch das Mapping.
         self.mock_mapper = mocker.patch('src.tasks.processor.map_xml_to_canonical')
+        # Mocke die Business Validierung (ERP und interne Dublettenprüfung).
+        self.mock_business = mocker.patch('src.tasks.processor.validate_business_rules', return_value=[])
+        self.mock_internal_duplicates = mocker.patch('src.tasks.processor.validate_internal_duplicates', return_value=[])
 
     def test_process_happy_path_ubl(self, mock_db_session, mock_sync_storage_service, minimal_ubl_bytes):
         """Testet den erfolgreichen Workflow (VALID) wenn keine Fehler von Mocks gemeldet werden."""
@@ -139,11 +144,210 @@ class TestProcessorWorkflow:
         transaction_id = str(uuid.uuid4())
         session, query = mock_db_session
         
-        # Simuliere Status PROCESSING
-        mock_transaction = InvoiceTransaction(id=transaction_id, status=TransactionStatus.PROCESSING)
-        query.filter.return_value.first.return_value = mock_transaction
+        # Simuliere Status PROCESSING: Der Claim trifft keine Zeile
+        session.execute.return_value.rowcount = 0
+        query.filter.return_value.scalar.return_value = TransactionStatus.PROCESSING
 
         result = process_invoice_task(transaction_id)
 
         assert result['status'] == "skipped"
-        mock_sync_storage_service.download_blob_by_uri.assert_not_called()
\ No newline at end of file
+        session.commit.assert_not_called()
+        mock_sync_storage_service.download_blob_by_uri.assert_not_called()
+    def _mock_canonical(self):
+        mock_canonical = MagicMock()
+        mock_canonical.invoice_number = "R98765"
+        mock_canonical.payable_amount = Decimal("100.00")
+        mock_canonical.currency_code = MagicMock(value="EUR")
+        mock_canonical.issue_date = date(2025, 9, 11)
+        mock_canonical.seller = MagicMock(name="Seller", vat_id="DE123")
+        mock_canonical.buyer = MagicMock(name="Buyer", vat_id="DE456")
+        mock_canonical.purchase_order_reference = None
+        return mock_canonical
+
+    def test_process_parks_when_erp_unavailable(self, mocker, mock_db_session, mock_sync_storage_service, minimal_ubl_bytes):
+        """Ist das ERP nicht verfügbar, wird die Transaktion geparkt statt Celery Retries zu verbrauchen."""
+        transaction_id = str(uuid.uuid4())
+        session, query = mock_db_session
+        mock_transaction = InvoiceTransaction(id=transaction_id, status=TransactionStatus.RECEIVED, storage_uri_raw="azure://raw/test.xml")
+        query.filter.return_value.first.return_value = mock_transaction
+        mock_sync_storage_service.download_blob_by_uri.return_value = minimal_ubl_bytes
+        self.mock_mapper.return_value = self._mock_canonical()
+        self.mock_business.side_effect = ERPUnavailableError("ERP Circuit ist OPEN.", retry_after=5)
+        mock_requeue = mocker.patch('src.tasks.processor.business_validation_task.apply_async')
+
+        result = process_invoice_task(transaction_id)
+
+        assert result['status'] == TransactionStatus.AWAITING_ERP.value
+        assert mock_transaction.status == TransactionStatus.AWAITING_ERP
+        assert mock_transaction.validation_level_reached == ValidationLevel.COMPLIANCE
+        # Der unvollständige Business-Schritt landet nicht im Report
+        assert "business_validation_erp" not in str(mock_transaction.validation_report)
+        assert mock_requeue.call_args.kwargs["args"] == [transaction_id, 1]
+        assert mock_requeue.call_args.kwargs["countdown"] >= 5
+        # Fälligkeit und Versuch für den Reaper, falls die eingeplante Nachricht verloren geht
+        assert mock_transaction.lease_expires_at > datetime.now()
+        assert mock_transaction.business_validation_attempt == 1
+
+    def test_park_survives_failed_publish(self, mocker, mock_db_session, mock_sync_storage_service, minimal_ubl_bytes):
+        """Schlägt das Einplanen fehl, bleibt die Transaktion mit Fälligkeit geparkt (Reaper übernimmt)."""
+        transaction_id = str(uuid.uuid4())
+        session, query = mock_db_session
+        mock_transaction = InvoiceTransaction(id=transaction_id, status=TransactionStatus.RECEIVED, storage_uri_raw="azure://raw/test.xml")
+        query.filter.return_value.first.return_value = mock_transaction
+        mock_sync_storage_service.download_blob_by_uri.return_value = minimal_ubl_bytes
+        self.mock_mapper.return_value = self._mock_canonical()
+        self.mock_business.side_effect = ERPUnavailableError("ERP Circuit ist OPEN.", retry_after=5)
+        mocker.patch('src.tasks.processor.business_validation_task.apply_async', side_effect=ConnectionError("Broker weg"))
+
+        result = process_invoice_task(transaction_id)
+
+        assert result['status'] == TransactionStatus.AWAITING_ERP.value
+        assert mock_transaction.lease_expires_at is not None
+
+    def test_business_validation_task_resumes_parked_transaction(self, mock_db_session, mock_sync_storage_service, minimal_ubl_bytes):
+        """Die fortgesetzte Validierung wiederholt nur Mapping und Business-Schritt."""
+        transaction_id = str(uuid.uuid4())
+        session, query = mock_db_session
+        mock_transaction = InvoiceTransaction(
+            id=transaction_id, status=TransactionStatus.AWAITING_ERP, format_detected=InvoiceFormat.XRECHNUNG_UBL,
+            storage_uri_xml="azure://raw/test.xml",
+            validation_report=ValidationReport(transaction_id=transaction_id, total_duration_seconds=1.5).model_dump(mode='json')
+        )
+        query.filter.return_value.first.return_value = mock_transaction
+        mock_sync_storage_service.download_blob_by_uri.return_value = minimal_ubl_bytes
+        self.mock_mapper.return_value = self._mock_canonical()
+
+        result = business_validation_task(transaction_id, 2)
+
+        assert result['status'] == TransactionStatus.VALID.value
+        assert mock_transaction.validation_level_reached == ValidationLevel.BUSINESS
+        assert result['processing_time_seconds'] >= 1.5
+        self.mock_business.assert_called_once()
+        self.mock_xsd.assert_not_called()
+
+    def _parked_transaction(self, transaction_id):
+        return InvoiceTransaction(
+            id=transaction_id, status=TransactionStatus.AWAITING_ERP, format_detected=InvoiceFormat.XRECHNUNG_UBL,
+            storage_uri_xml="azure://raw/test.xml",
+            validation_report=ValidationReport(transaction_id=transaction_id).model_dump(mode='json')
+        )
+
+    @pytest.mark.parametrize("error, expected_status", [
+        (MappingError("Pflichtfeld fehlt"), TransactionStatus.ERROR),
+        (IOError("Storage nicht erreichbar"), TransactionStatus.AWAITING_ERP),
+    ])
+    def test_business_validation_task_releases_claim_on_failure(self, mocker, mock_db_session, mock_sync_storage_service, error, expected_status):
+        """Fehler nach dem Claim: ERROR bzw. (transient, Celery Retry) zurück auf AWAITING_ERP."""
+        transaction_id = str(uuid.uuid4())
+        session, query = mock_db_session
+        query.filter.return_value.first.return_value = self._parked_transaction(transaction_id)
+        self.mock_mapper.side_effect = error
+        release = mocker.spy(TransactionClaim, "release")
+
+        with pytest.raises(type(error)):
+            business_validation_task(transaction_id, 2)
+
+        assert release.call_args.args[2] == expected_status
+        if expected_status == TransactionStatus.AWAITING_ERP:
+            assert release.call_args.kwargs["lease_expires_at"] > datetime.now()
+
+    def test_business_validation_task_requires_storage(self, mocker, mock_db_session):
+        mocker.patch('src.tasks.processor.sync_storage_service', None)
+        with pytest.raises(RuntimeError):
+            business_validation_task(str(uuid.uuid4()), 1)
+
+    def test_finalize_discards_result_when_claim_lost(self, mocker, mock_db_session, mock_sync_storage_service, minimal_ubl_bytes):
+        """Lease abgelaufen und Transaktion übernommen: Der finale Status wird nicht geschrieben."""
+        transaction_id = str(uuid.uuid4())
+        session, query = mock_db_session
+        mock_transaction = InvoiceTransaction(id=transaction_id, status=TransactionStatus.RECEIVED, storage_uri_raw="azure://raw/test.xml")
+        query.filter.return_value.first.return_value = mock_transaction
+        mock_sync_storage_service.download_blob_by_uri.return_value = minimal_ubl_bytes
+        self.mock_mapper.return_value = self._mock_canonical()
+        mocker.patch.object(TransactionClaim, "release", return_value=False)
+
+        result = process_invoice_task(transaction_id)
+
+        assert result == {"status": "skipped", "reason": "claim_lost"}
+        session.rollback.assert_called_once()
+        assert mock_transaction.status != TransactionStatus.VALID
+
+    @pytest.mark.parametrize("checkpoints, expected_commits", [(False, 2), (True, 5)])
+    def test_process_commits_claim_and_final_state(self, mocker, mock_db_session, mock_sync_storage_service, minimal_ubl_bytes, checkpoints, expected_commits):
+        """Unit of Work: Claim-Commit + finaler Commit, Zwischen-Commits nur mit PROCESSING_CHECKPOINT_COMMITS."""
+        mocker.patch('src.tasks.processor.settings.processing_checkpoint_commits', checkpoints)
+        transaction_id = str(uuid.uuid4())
+        session, query = mock_db_session
+        mock_transaction = InvoiceTransaction(id=transaction_id, status=TransactionStatus.RECEIVED, storage_uri_raw="azure://raw/test.xml")
+        query.filter.return_value.first.return_value = mock_transaction
+        mock_sync_storage_service.download_blob_by_uri.return_value = minimal_ubl_bytes
+        self.mock_mapper.return_value = self._mock_canonical()
+
+        result = process_invoice_task(transaction_id)
+
+        assert result['status'] == TransactionStatus.VALID.value
+        assert session.commit.call_count == expected_commits
+        # Die extrahierten Felder sind Teil des finalen Commits
+        assert mock_transaction.invoice_number == "R98765"
+
+
+def test_reaper_requeues_after_commit(mocker, mock_db_session):
+    """Der Reaper plant zurückgesetzte Transaktionen nach dem Commit mit Backoff neu ein."""
+    session, _ = mock_db_session
+    transaction_id = uuid.uuid4()
+    parked_id = uuid.uuid4()
+    mocker.patch('src.tasks.processor.reap_expired_claims', return_value=([(transaction_id, 2)], 1))
+    mocker.patch('src.tasks.processor.reap_overdue_parked', return_value=([(parked_id, 4)], 0))
+    mock_requeue = mocker.patch('src.tasks.processor.process_invoice_task.apply_async')
+    mock_resume = mocker.patch('src.tasks.processor.business_validation_task.apply_async')
+
+    result = reap_stale_transactions_task()
+
+    assert result["requeued"] == 1 and result["failed"] == 1 and result["parked_requeued"] == 1
+    session.commit.assert_called_once()
+    assert mock_requeue.call_args.kwargs["args"] == [str(transaction_id)]
+    assert mock_requeue.call_args.kwargs["countdown"] >= 60
+    # Der Reaper setzt mit dem persistierten Versuch fort statt wieder bei 1 zu beginnen
+    assert mock_resume.call_args.kwargs["args"] == [str(parked_id), 4]
+
+
+def test_reaper_metrics_are_shared_via_state_store(mocker, mock_db_session):
+    """Die Kennzahlen liegen im geteilten Zustandsspeicher, nicht im Worker-Prozess."""
+    from src.services.erp.resilience import LocalStateStore
+    from src.tasks.processor import get_reaper_metrics
+
+    mocker.patch('src.tasks.processor.get_state_store', return_value=LocalStateStore())
+    mocker.patch('src.tasks.processor.reap_expired_claims', return_value=([(uuid.uuid4(), 1)], 2))
+    mocker.patch('src.tasks.processor.reap_overdue_parked', return_value=([], 0))
+    mocker.patch('src.tasks.processor.process_invoice_task.apply_async')
+
+    reap_stale_transactions_task()
+    reap_stale_transactions_task()
+
+    metrics = get_reaper_metrics()
+    assert metrics["runs"] == 2 and metrics["requeued_total"] == 2 and metrics["failed_total"] == 4
+    assert metrics["last_requeued"] == 1 and metrics["last_run_at"] is not None
+
+
+def test_failure_release_bumps_retry_count_only_for_owned_claim(mocker, sqlite_metadata_session):
+    """retry_count wird nur im eigenen UPDATE erhöht; ein verlorener Claim zählt nicht mit."""
+    from contextlib import nullcontext
+    from src.tasks.processor import _release_claim_after_failure
+
+    db = sqlite_metadata_session
+    mocker.patch('src.tasks.processor.get_metadata_session', side_effect=lambda: nullcontext(db))
+    transaction = InvoiceTransaction(id=uuid.uuid4(), status=TransactionStatus.RECEIVED, retry_count=0)
+    db.add(transaction)
+    db.commit()
+    owner = TransactionClaim(transaction.id, "worker-a:1", lease_seconds=300)
+    assert owner.acquire(db, [TransactionStatus.RECEIVED])
+    db.commit()
+
+    # Fremder Worker ohne Lease: keine Änderung
+    _release_claim_after_failure(str(transaction.id), TransactionClaim(transaction.id, "worker-b:2", lease_seconds=300), TransactionStatus.ERROR)
+    db.refresh(transaction)
+    assert (transaction.status, transaction.retry_count) == (TransactionStatus.PROCESSING, 0)
+
+    _release_claim_after_failure(str(transaction.id), owner, TransactionStatus.ERROR, error_message="Versuch fehlgeschlagen")
+    db.refresh(transaction)
+    assert (transaction.status, transaction.retry_count) == (TransactionStatus.ERROR, 1)
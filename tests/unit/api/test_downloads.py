@@ -0,0 +1,46 @@
+# tests/unit/api/test_downloads.py
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import HTTPException
+
+from src.api.downloads import sign_download_urls
+from src.core.config import settings
+from src.services import storage_service
+
+
+@pytest.fixture
+def service_client(mocker):
+    storage_service.reset_sas_caches()
+    client = MagicMock(account_name="devstoreaccount1")
+    client.get_blob_client.side_effect = lambda container, blob: MagicMock(
+        url=f"http://127.0.0.1:10000/devstoreaccount1/{container}/{blob}"
+    )
+    mocker.patch("src.services.storage_service.get_async_blob_service_client", return_value=client)
+    mocker.patch.object(settings, "environment", "development")
+    mocker.patch.object(
+        settings, "azure_storage_connection_string",
+        "DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;AccountKey=a2V5;BlobEndpoint=http://127.0.0.1:10000/devstoreaccount1;"
+    )
+    yield client
+    storage_service.reset_sas_caches()
+
+
+def test_bulk_signing_only_signs_known_containers(service_client):
+    raw = "http://127.0.0.1:10000/devstoreaccount1/invoices-raw/tx-1/rechnung.pdf"
+    xml = "http://127.0.0.1:10000/devstoreaccount1/invoices-processed/tx-1/processed.xml"
+    foreign = "http://127.0.0.1:10000/devstoreaccount1/secrets/key.pem"
+
+    result = asyncio.run(sign_download_urls(blob_uris=[raw, xml, raw, foreign, "kaputt"], expiry_hours=24))
+
+    assert set(result["urls"]) == {raw, xml}
+    assert result["urls"][raw].startswith(f"{raw}?") and "sig=" in result["urls"][raw]
+    assert set(result["errors"]) == {foreign, "kaputt"}
+
+
+def test_bulk_signing_rejects_too_many_blobs(service_client, mocker):
+    mocker.patch.object(settings, "sas_bulk_max_urls", 2)
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(sign_download_urls(blob_uris=["a/b", "c/d", "e/f"], expiry_hours=24))
+    assert exc_info.value.status_code == 400
@@ -0,0 +1,68 @@
+# tests/unit/api/test_status_list.py
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+
+from src.api.status import list_transactions
+from src.db.models import InvoiceTransaction, TransactionStatus
+
+
+def _list(db, **kwargs):
+    params = dict(status=None, limit=50, cursor=None, since_hours=None, count="none", fields=None, db=db)
+    params.update(kwargs)
+    return asyncio.run(list_transactions(**params))
+
+
+@pytest.fixture
+def transactions(sqlite_metadata_session):
+    db = sqlite_metadata_session
+    created_at = datetime.now() - timedelta(minutes=10)
+    rows = [
+        # Drei Transaktionen mit identischem created_at: Der Cursor muss über die ID weiterblättern
+        InvoiceTransaction(id=uuid.uuid4(), status=TransactionStatus.VALID, validation_report={"summary": {"is_valid": True}},
+                           created_at=created_at if i < 3 else created_at - timedelta(minutes=i))
+        for i in range(7)
+    ]
+    db.add_all(rows)
+    db.commit()
+    return rows
+
+
+def test_keyset_pagination_visits_every_row_once(sqlite_metadata_session, transactions):
+    db = sqlite_metadata_session
+    seen, cursor, pages = [], None, 0
+    while True:
+        page = _list(db, limit=3, cursor=cursor, count="exact" if pages == 0 else "none")
+        if pages == 0:
+            assert page["pagination"]["total_count"] == 7
+        seen += [row["id"] for row in page["transactions"]]
+        pages += 1
+        cursor = page["pagination"]["next_cursor"]
+        if not page["pagination"]["has_more"]:
+            break
+
+    assert pages == 3
+    assert sorted(seen) == sorted(str(t.id) for t in transactions)
+
+
+def test_list_does_not_load_report_unless_requested(sqlite_metadata_session, transactions):
+    db = sqlite_metadata_session
+    db.expunge_all()
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    page = _list(db, limit=10)
+    assert "validation_report" not in page["transactions"][0]
+    assert len(statements) == 1 and "validation_report" not in statements[0]
+
+    page = _list(db, limit=10, fields="validation_report")
+    assert page["transactions"][0]["validation_report"] == {"summary": {"is_valid": True}}
+
+    with pytest.raises(HTTPException):
+        _list(db, fields="password")
+    with pytest.raises(HTTPException):
+        _list(db, cursor="kein-cursor")
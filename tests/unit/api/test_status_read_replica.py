@@ -0,0 +1,70 @@
+# tests/unit/api/test_status_read_replica.py
+import asyncio
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.api.status import get_transaction_status
+from src.core.config import settings
+from src.db.models import Base, InvoiceTransaction, TransactionStatus
+
+
+@pytest.fixture
+def primary_session(mocker):
+    """Zweite In-Memory DB als Primary; das Replikat ist sqlite_metadata_session."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine, autoflush=False)()
+
+    @contextmanager
+    def _primary():
+        yield session
+
+    primary = mocker.patch("src.api.status.get_metadata_session", side_effect=_primary)
+    mocker.patch.object(settings, "database_read_url", "sqlite://replica")
+    mocker.patch.object(settings, "database_read_staleness_seconds", 30)
+    yield session, primary
+    session.close()
+    engine.dispose()
+
+
+def _status(db, transaction_id):
+    return asyncio.run(get_transaction_status(transaction_id=str(transaction_id), db=db))
+
+
+def test_recent_or_missing_transactions_are_read_from_primary(sqlite_metadata_session, primary_session):
+    replica = sqlite_metadata_session
+    primary, primary_factory = primary_session
+    old_at = datetime.now() - timedelta(hours=1)
+
+    # Alt und auf beiden Seiten identisch: nur das Replikat wird gelesen
+    settled = uuid.uuid4()
+    for db in (replica, primary):
+        db.add(InvoiceTransaction(id=settled, status=TransactionStatus.VALID, created_at=old_at, updated_at=old_at))
+        db.commit()
+    assert _status(replica, settled)["status"] == "VALID"
+    assert primary_factory.call_count == 0
+
+    # Gerade erst aktualisiert: das Replikat hinkt hinterher, der Primary kennt den neuen Status
+    changed = uuid.uuid4()
+    replica.add(InvoiceTransaction(id=changed, status=TransactionStatus.PROCESSING, created_at=old_at, updated_at=datetime.now()))
+    primary.add(InvoiceTransaction(id=changed, status=TransactionStatus.VALID, created_at=old_at, updated_at=datetime.now()))
+    # Gerade erst hochgeladen: noch gar nicht im Replikat
+    fresh = uuid.uuid4()
+    primary.add(InvoiceTransaction(id=fresh, status=TransactionStatus.RECEIVED, created_at=datetime.now(), updated_at=datetime.now()))
+    replica.commit()
+    primary.commit()
+
+    assert _status(replica, changed)["status"] == "VALID"
+    assert _status(replica, fresh)["status"] == "RECEIVED"
+    assert primary_factory.call_count == 2
+
+    with pytest.raises(HTTPException) as exc:
+        _status(replica, uuid.uuid4())
+    assert exc.value.status_code == 404
@@ -0,0 +1,69 @@
+# tests/unit/api/test_status_report.py
+import asyncio
+import gzip
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from azure.core.exceptions import ResourceNotFoundError
+from fastapi import HTTPException
+
+from src.api.status import _stream_offloaded_report
+from src.services.storage_service_local import LocalFSStorageBackend
+
+REPORT = json.dumps({"summary": {"errors": 3}, "steps": ["x" * 100] * 50}).encode()
+URI = "https://test.blob.core.windows.net/invoices-processed/tx-1/validation_report.json.gz"
+
+
+async def _read(response) -> bytes:
+    return b"".join([chunk async for chunk in response.body_iterator])
+
+
+@pytest.fixture
+def blob_client(mocker):
+    client = MagicMock()
+    service_client = MagicMock(account_name="test", get_blob_client=MagicMock(return_value=client))
+    mocker.patch("src.services.storage_service.get_async_blob_service_client", return_value=service_client)
+    return client
+
+
+def _async_chunks(data: bytes):
+    async def chunks():
+        for offset in range(0, len(data), 64):
+            yield data[offset:offset + 64]
+    return chunks()
+
+
+@pytest.mark.parametrize("accept_encoding, passthrough", [("gzip, br", True), ("", False)])
+def test_offloaded_report_is_streamed_through_async_client(blob_client, accept_encoding, passthrough):
+    compressed = gzip.compress(REPORT)
+    blob_client.download_blob = AsyncMock(return_value=MagicMock(chunks=lambda: _async_chunks(compressed)))
+
+    async def run():
+        response = await _stream_offloaded_report({"uri": URI, "content_encoding": "gzip"}, accept_encoding)
+        return response, await _read(response)
+
+    response, body = asyncio.run(run())
+
+    assert blob_client.download_blob.await_args.kwargs["decompress"] is False
+    assert body == (compressed if passthrough else REPORT)
+    assert (response.headers.get("content-encoding") == "gzip") is passthrough
+
+
+def test_missing_offloaded_report_returns_404(blob_client):
+    blob_client.download_blob = AsyncMock(side_effect=ResourceNotFoundError("weg"))
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(_stream_offloaded_report({"uri": URI, "content_encoding": "gzip"}, ""))
+    assert exc_info.value.status_code == 404
+
+
+def test_offloaded_report_from_local_backend(tmp_path, mocker):
+    backend = LocalFSStorageBackend(str(tmp_path))
+    uri = backend.upload_validation_report("tx-1", gzip.compress(REPORT), "gzip", "json.gz")
+    mocker.patch("src.api.status.sync_storage_service", backend)
+
+    async def run():
+        return await _read(await _stream_offloaded_report({"uri": uri, "content_encoding": "gzip"}, ""))
+
+    assert asyncio.run(run()) == REPORT
@@ -0,0 +1,119 @@
+# tests/unit/api/test_upload.py
+import asyncio
+import hashlib
+import io
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from starlette.datastructures import Headers
+
+from src.api.upload import upload_batch, upload_invoice
+from src.core.config import settings
+from src.db.models import InvoiceTransaction
+from src.services import storage_service
+
+
+@pytest.fixture
+def blob_client(mocker):
+    client = MagicMock()
+    client.url = "http://azurite/devstoreaccount1/invoices-raw/tx/rechnung.xml"
+    client.stage_block = AsyncMock()
+    client.commit_block_list = AsyncMock()
+    service_client = MagicMock(get_blob_client=MagicMock(return_value=client))
+    mocker.patch("src.services.storage_service.get_async_blob_service_client", return_value=service_client)
+    mocker.patch.object(settings, "upload_chunk_size_bytes", 1024)
+    return client
+
+
+def _upload_file(content: bytes, size=None) -> UploadFile:
+    return UploadFile(
+        file=io.BytesIO(content), size=size, filename="rechnung.xml",
+        headers=Headers({"content-type": "application/xml"}),
+    )
+
+
+def test_upload_is_streamed_in_blocks(sqlite_metadata_session, blob_client):
+    content = b"<Invoice>" + b"x" * 2500 + b"</Invoice>"
+
+    result = asyncio.run(upload_invoice(_upload_file(content), db=sqlite_metadata_session))
+
+    assert result["file_size_bytes"] == len(content)
+    assert result["content_hash"] == hashlib.sha256(content).hexdigest()
+    # 1024 Byte Chunks: drei Blöcke, gleich lange Block IDs, ein Commit der Blockliste
+    assert blob_client.stage_block.await_count == 3
+    staged = b"".join(call.kwargs["data"] for call in blob_client.stage_block.await_args_list)
+    assert staged == content
+    block_list = blob_client.commit_block_list.await_args.args[0]
+    assert len({len(block.id) for block in block_list}) == 1
+    metadata = blob_client.commit_block_list.await_args.kwargs["metadata"]
+    assert metadata["content_hash"] == result["content_hash"]
+    assert sqlite_metadata_session.query(InvoiceTransaction).count() == 1
+
+
+def test_upload_aborts_when_size_limit_is_exceeded(sqlite_metadata_session, blob_client, mocker):
+    mocker.patch.object(settings, "max_file_size_mb", 0.002)  # ~2 KB
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(upload_invoice(_upload_file(b"x" * 5000), db=sqlite_metadata_session))
+
+    assert exc.value.status_code == 413
+    # Abbruch nach dem Chunk, der das Limit überschreitet: keine weiteren Blöcke, kein Commit
+    assert blob_client.stage_block.await_count == 2
+    blob_client.commit_block_list.assert_not_awaited()
+    assert sqlite_metadata_session.query(InvoiceTransaction).count() == 0
+
+
+def test_batch_upload_uses_one_insert_commit_and_publish(sqlite_metadata_session, blob_client, mocker):
+    db = sqlite_metadata_session
+    commit = mocker.spy(db, "commit")
+    group = mocker.patch("src.api.upload.group")
+    files = [_upload_file(b"<Invoice>%d</Invoice>" % i) for i in range(3)]
+    files.append(UploadFile(file=io.BytesIO(b"MZ"), filename="setup.exe", headers=Headers({"content-type": "application/x-msdownload"})))
+
+    result = asyncio.run(upload_batch(files=files, db=db))
+
+    assert result["batch_summary"] == {"total_files": 4, "successful_uploads": 3, "failed_uploads": 1, "queued": True}
+    assert [entry["status"] for entry in result["results"]] == ["success", "success", "success", "failed"]
+    assert result["results"][3]["error_code"] == 415
+    assert commit.call_count == 1
+    assert db.query(InvoiceTransaction).count() == 3
+
+    group.assert_called_once()
+    signatures = list(group.call_args.args[0])
+    assert sorted(sig.args[0] for sig in signatures) == sorted(entry["transaction_id"] for entry in result["results"][:3])
+    group.return_value.apply_async.assert_called_once()
+
+
+def test_batch_upload_limit_is_configurable(sqlite_metadata_session, blob_client, mocker):
+    mocker.patch.object(settings, "upload_batch_max_files", 2)
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(upload_batch(files=[_upload_file(b"<a/>") for _ in range(3)], db=sqlite_metadata_session))
+    assert exc.value.status_code == 400
+
+
+@pytest.mark.parametrize("already_stored", [True, False])
+def test_cas_upload_skips_transfer_of_known_content(sqlite_metadata_session, blob_client, mocker, already_stored):
+    mocker.patch.object(settings, "raw_storage_layout", "cas")
+    blob_client.exists = AsyncMock(return_value=already_stored)
+    blob_client.upload_blob = AsyncMock()
+    content = b"<Invoice>" + b"x" * 2500 + b"</Invoice>"
+    content_hash = hashlib.sha256(content).hexdigest()
+
+    result = asyncio.run(upload_invoice(_upload_file(content), db=sqlite_metadata_session))
+
+    assert result["content_hash"] == content_hash
+    assert result["deduplicated"] is already_stored
+    # get_blob_client liefert für alle Blobs denselben Mock, die Namen stehen in den Aufrufen
+    get_blob_client = storage_service.get_async_blob_service_client().get_blob_client
+    blob_names = [call.kwargs["blob"] for call in get_blob_client.call_args_list]
+    assert blob_names[0] == f"sha256/{content_hash}"
+    assert blob_names[-1] == f"{result['transaction_id']}/manifest.json"
+    assert blob_client.stage_block.await_count == (0 if already_stored else 3)
+    assert blob_client.commit_block_list.await_count == (0 if already_stored else 1)
+    # Manifest mit den GoBD-Metadaten der Transaktion wird immer geschrieben
+    blob_client.upload_blob.assert_awaited_once()
+    assert content_hash.encode() in blob_client.upload_blob.await_args.kwargs["data"]
+
+    transaction = sqlite_metadata_session.query(InvoiceTransaction).one()
+    assert transaction.content_hash == content_hash
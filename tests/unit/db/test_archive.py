@@ -0,0 +1,51 @@
+# tests/unit/db/test_archive.py
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from src.db.archive import archive_batch, ensure_archive_partitions
+from src.db.models import (
+    InvoiceTransaction, ProcessingLog, TransactionStatus, ValidationFinding,
+    invoice_transactions_archive, processing_logs_archive,
+)
+
+
+def _transaction(db, status, age_days):
+    created_at = datetime.now() - timedelta(days=age_days)
+    transaction = InvoiceTransaction(id=uuid.uuid4(), status=status, created_at=created_at, invoice_number=f"R-{age_days}")
+    db.add(transaction)
+    db.add(ProcessingLog(id=uuid.uuid4(), transaction_id=transaction.id, step_name="finalize", step_status="SUCCESS", created_at=created_at))
+    db.add(ValidationFinding(transaction_id=transaction.id, code="BR-01", category="SEMANTIC", severity="ERROR", step_name="semantic", created_at=created_at))
+    return transaction.id
+
+
+def test_archive_moves_only_old_terminal_transactions_in_batches(sqlite_metadata_session):
+    db = sqlite_metadata_session
+    old_ids = [_transaction(db, TransactionStatus.VALID, age) for age in (400, 300, 200)]
+    in_flight = _transaction(db, TransactionStatus.AWAITING_ERP, 400)
+    recent = _transaction(db, TransactionStatus.INVALID, 10)
+    db.commit()
+    cutoff = datetime.now() - timedelta(days=180)
+
+    # Batchgröße 2: die beiden ältesten zuerst, danach der Rest
+    first = archive_batch(db, cutoff, batch_size=2)
+    db.commit()
+    assert (first.transactions, first.processing_logs, first.findings_deleted) == (2, 2, 2)
+    archived = set(db.execute(select(invoice_transactions_archive.c.id)).scalars())
+    assert archived == set(old_ids[:2])
+
+    second = archive_batch(db, cutoff, batch_size=2)
+    db.commit()
+    assert second.transactions == 1
+    assert archive_batch(db, cutoff, batch_size=2).transactions == 0
+
+    remaining = set(db.execute(select(InvoiceTransaction.id)).scalars())
+    assert remaining == {in_flight, recent}
+    assert db.execute(select(func.count()).select_from(processing_logs_archive)).scalar() == 3
+    assert db.query(ProcessingLog).count() == 2
+    row = db.execute(select(invoice_transactions_archive).where(invoice_transactions_archive.c.id == old_ids[0])).one()
+    assert row.invoice_number == "R-400" and row.status == TransactionStatus.VALID and row.archived_at is not None
+
+    # Partitionspflege nur auf MSSQL
+    assert ensure_archive_partitions(db) == 0
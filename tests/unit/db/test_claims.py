@@ -0,0 +1,120 @@
+# tests/unit/db/test_claims.py
+import uuid
+import pytest
+
+from src.db.claims import TransactionClaim, ClaimLostError
+from src.db.models import InvoiceTransaction, TransactionStatus
+
+CLAIMABLE = [TransactionStatus.RECEIVED, TransactionStatus.ERROR]
+
+
+@pytest.fixture
+def transaction(sqlite_metadata_session):
+    transaction = InvoiceTransaction(id=uuid.uuid4(), status=TransactionStatus.RECEIVED)
+    sqlite_metadata_session.add(transaction)
+    sqlite_metadata_session.commit()
+    return transaction
+
+
+def test_only_one_worker_wins_the_claim(sqlite_metadata_session, transaction):
+    db = sqlite_metadata_session
+    first = TransactionClaim(transaction.id, "worker-a:1", lease_seconds=300)
+    second = TransactionClaim(transaction.id, "worker-b:2", lease_seconds=300)
+
+    assert first.acquire(db, CLAIMABLE) is True
+    db.commit()
+    assert second.acquire(db, CLAIMABLE) is False
+
+    db.refresh(transaction)
+    assert transaction.status == TransactionStatus.PROCESSING
+    assert transaction.claimed_by == "worker-a:1"
+    assert transaction.lease_expires_at > transaction.claimed_at
+
+    # Nur der Besitzer kann den Lease verlängern
+    first.renew(db)
+    with pytest.raises(ClaimLostError):
+        second.renew(db)
+
+
+def test_release_to_error_allows_reclaim(sqlite_metadata_session, transaction):
+    db = sqlite_metadata_session
+    first = TransactionClaim(transaction.id, "worker-a:1", lease_seconds=300)
+    assert first.acquire(db, CLAIMABLE)
+    assert first.release(db, TransactionStatus.ERROR, error_message="Versuch fehlgeschlagen") is True
+    db.commit()
+
+    db.refresh(transaction)
+    assert transaction.status == TransactionStatus.ERROR
+    assert transaction.lease_expires_at is None
+
+    retry = TransactionClaim(transaction.id, "worker-b:2", lease_seconds=300)
+    assert retry.acquire(db, CLAIMABLE) is True
+    # Der alte Claim ist ungültig
+    with pytest.raises(ClaimLostError):
+        first.renew(db)
+
+
+def test_reaper_requeues_expired_claims_and_fails_exhausted(sqlite_metadata_session):
+    from datetime import datetime, timedelta
+    from src.db.claims import reap_expired_claims
+
+    db = sqlite_metadata_session
+    now = datetime.now()
+    expired = InvoiceTransaction(id=uuid.uuid4(), status=TransactionStatus.PROCESSING, retry_count=0, lease_expires_at=now - timedelta(seconds=5))
+    exhausted = InvoiceTransaction(id=uuid.uuid4(), status=TransactionStatus.PROCESSING, retry_count=3, lease_expires_at=now - timedelta(seconds=5))
+    active = InvoiceTransaction(id=uuid.uuid4(), status=TransactionStatus.PROCESSING, retry_count=0, lease_expires_at=now + timedelta(seconds=60))
+    done = InvoiceTransaction(id=uuid.uuid4(), status=TransactionStatus.VALID, retry_count=0, lease_expires_at=None)
+    db.add_all([expired, exhausted, active, done])
+    db.commit()
+
+    requeued, failed = reap_expired_claims(db, max_attempts=3, lease_seconds=300, now=now)
+    db.commit()
+
+    assert requeued == [(expired.id, 1)]
+    assert failed == 1
+    db.expire_all()
+    assert expired.status == TransactionStatus.RECEIVED and expired.lease_expires_at is None
+    assert exhausted.status == TransactionStatus.ERROR
+    assert active.status == TransactionStatus.PROCESSING
+    assert done.status == TransactionStatus.VALID
+
+
+def test_reaper_requeues_overdue_parked_transactions(sqlite_metadata_session):
+    from datetime import datetime, timedelta
+    from src.db.claims import reap_overdue_parked
+
+    db = sqlite_metadata_session
+    now = datetime.now()
+    lost = InvoiceTransaction(id=uuid.uuid4(), status=TransactionStatus.AWAITING_ERP, retry_count=0, lease_expires_at=now - timedelta(seconds=5), business_validation_attempt=3)
+    legacy = InvoiceTransaction(id=uuid.uuid4(), status=TransactionStatus.AWAITING_ERP, retry_count=0, lease_expires_at=None, updated_at=now - timedelta(hours=1))
+    exhausted = InvoiceTransaction(id=uuid.uuid4(), status=TransactionStatus.AWAITING_ERP, retry_count=5, lease_expires_at=now - timedelta(seconds=5))
+    scheduled = InvoiceTransaction(id=uuid.uuid4(), status=TransactionStatus.AWAITING_ERP, retry_count=0, lease_expires_at=now + timedelta(seconds=60))
+    db.add_all([lost, legacy, exhausted, scheduled])
+    db.commit()
+
+    requeued, failed = reap_overdue_parked(db, max_attempts=5, grace_seconds=600, now=now)
+    db.commit()
+
+    # Persistierter Versuch (Altbestand ohne Wert: 1)
+    assert sorted(requeued) == sorted([(lost.id, 3), (legacy.id, 1)])
+    assert failed == 1
+    db.expire_all()
+    assert lost.status == TransactionStatus.AWAITING_ERP and lost.lease_expires_at > now
+    assert exhausted.status == TransactionStatus.ERROR
+    assert scheduled.retry_count == 0
+
+
+def test_release_of_lost_claim_writes_nothing(sqlite_metadata_session, transaction):
+    db = sqlite_metadata_session
+    stale = TransactionClaim(transaction.id, "worker-a:1", lease_seconds=300)
+    assert stale.acquire(db, CLAIMABLE)
+    # Lease abgelaufen, Reaper setzt zurück, Worker B übernimmt
+    stale.release(db, TransactionStatus.RECEIVED)
+    current = TransactionClaim(transaction.id, "worker-b:2", lease_seconds=300)
+    assert current.acquire(db, CLAIMABLE)
+    db.commit()
+
+    assert stale.release(db, TransactionStatus.VALID) is False
+    db.commit()
+    db.refresh(transaction)
+    assert transaction.status == TransactionStatus.PROCESSING and transaction.claimed_by == "worker-b:2"
@@ -0,0 +1,39 @@
+# tests/unit/db/test_findings.py
+import asyncio
+import uuid
+
+from src.api.status import get_top_error_codes
+from src.db.findings import findings_from_report, replace_validation_findings
+from src.db.models import InvoiceTransaction, TransactionStatus, ValidationFinding
+from src.schemas.validation_report import ValidationReport, ValidationStep, ValidationError, ValidationCategory, ValidationSeverity
+
+
+def _report(transaction_id, codes, warnings=()):
+    report = ValidationReport(transaction_id=str(transaction_id))
+    step = ValidationStep(step_name="semantic_validation", step_description="KoSIT", status="FAILED")
+    step.errors = [ValidationError(category=ValidationCategory.SEMANTIC, severity=ValidationSeverity.ERROR, code=code, message="x") for code in codes]
+    step.warnings = [ValidationError(category=ValidationCategory.SEMANTIC, severity=ValidationSeverity.WARNING, code=code, message="x") for code in warnings]
+    report.add_step(step)
+    return report
+
+
+def test_findings_are_replaced_and_aggregated(sqlite_metadata_session):
+    db = sqlite_metadata_session
+    first, second = uuid.uuid4(), uuid.uuid4()
+    db.add_all([InvoiceTransaction(id=first, status=TransactionStatus.INVALID), InvoiceTransaction(id=second, status=TransactionStatus.INVALID)])
+    db.commit()
+
+    # Erster Versuch, dann Wiederholung: Die Findings werden ersetzt, nicht verdoppelt
+    replace_validation_findings(db, first, findings_from_report(first, _report(first, ["BR-DE-15"]), "DE111"))
+    replace_validation_findings(db, first, findings_from_report(first, _report(first, ["BR-DE-15", "BR-CO-10"], warnings=["BR-DE-21"]), "DE111"))
+    replace_validation_findings(db, second, findings_from_report(second, _report(second, ["BR-DE-15"]), "DE222"))
+    db.commit()
+
+    assert db.query(ValidationFinding).filter(ValidationFinding.transaction_id == first).count() == 3
+
+    result = asyncio.run(get_top_error_codes(hours=24, seller_vat_id=None, severity=ValidationSeverity.ERROR, limit=10, db=db))
+    assert result["top_error_codes"][0] == {"code": "BR-DE-15", "occurrences": 2, "transactions": 2}
+    assert {row["code"] for row in result["top_error_codes"]} == {"BR-DE-15", "BR-CO-10"}
+
+    result = asyncio.run(get_top_error_codes(hours=24, seller_vat_id="DE222", severity=None, limit=10, db=db))
+    assert result["top_error_codes"] == [{"code": "BR-DE-15", "occurrences": 1, "transactions": 1}]
@@ -0,0 +1,65 @@
+# tests/unit/db/test_log_buffer.py
+import uuid
+from unittest.mock import MagicMock
+
+from src.db.models import InvoiceTransaction, ProcessingLog, TransactionStatus
+from src.db.log_buffer import ProcessingLogBuffer, ProcessingLogBufferRegistry, processing_log_buffers
+from src.tasks.processor import _log_processing_step
+
+
+def test_buffer_flushes_all_entries_in_one_insert(sqlite_metadata_session):
+    db = sqlite_metadata_session
+    transaction = InvoiceTransaction(id=uuid.uuid4(), status=TransactionStatus.PROCESSING)
+    db.add(transaction)
+    db.commit()
+
+    buffer = ProcessingLogBuffer(transaction.id)
+    buffer.add("processing_started", "started", "Verarbeitung gestartet")
+    buffer.add("format_detection", "completed", "Format erkannt", duration=0.12)
+    buffer.add("processing_completed", "completed", "Fertig", details={"status": "VALID"})
+
+    statements = []
+    from sqlalchemy import event
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    assert buffer.flush(db) == 3
+    db.commit()
+
+    assert len([s for s in statements if s.startswith("INSERT INTO processing_logs")]) == 1
+    logs = db.query(ProcessingLog).order_by(ProcessingLog.created_at).all()
+    assert [log.step_name for log in logs] == ["processing_started", "format_detection", "processing_completed"]
+    assert logs[2].details == {"status": "VALID"}
+    assert len(buffer) == 0 and buffer.flush(db) == 0
+
+
+def test_log_step_is_buffered_while_task_buffer_is_open():
+    transaction_id = str(uuid.uuid4())
+    db = MagicMock()
+    processing_log_buffers.open(transaction_id)
+    try:
+        _log_processing_step(db, transaction_id, "xml_mapping", "completed", "ok")
+        db.add.assert_not_called()
+        db.commit.assert_not_called()
+        assert len(processing_log_buffers.get(transaction_id)) == 1
+    finally:
+        processing_log_buffers.pop(transaction_id)
+
+    # Ohne aktiven Puffer wird direkt geschrieben
+    _log_processing_step(db, transaction_id, "task_failure", "failed", "boom")
+    db.add.assert_called_once()
+    db.commit.assert_called_once()
+
+
+def test_registry_keeps_unflushed_buffer_for_failure_handler():
+    registry = ProcessingLogBufferRegistry()
+    transaction_id = uuid.uuid4()
+
+    registry.open(transaction_id).add("processing_started", "started", "x")
+    registry.release(str(transaction_id))
+    # Nicht geschrieben -> bleibt für on_failure/den nächsten Versuch erhalten
+    assert len(registry.open(str(transaction_id))) == 1
+
+    registry.pop(transaction_id)
+    registry.open(transaction_id)
+    registry.release(transaction_id)
+    assert registry.get(transaction_id) is None
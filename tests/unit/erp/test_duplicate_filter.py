@@ -0,0 +1,112 @@
+# tests/unit/erp/test_duplicate_filter.py
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+from src.services.erp.duplicate_filter import DuplicateInvoiceFilter, BloomFilter
+from src.services.erp.mssql_adapter import MSSQL_ERPAdapter
+
+
+def _journal(n: int):
+    return [(f"K{i % 50}", f"R-{i}", datetime(2025, 1, 1)) for i in range(n)]
+
+
+def test_bloom_filter_has_no_false_negatives():
+    """Jeder hinzugefügte Schlüssel muss gefunden werden."""
+    bloom = BloomFilter(capacity=5000, false_positive_rate=0.01)
+    keys = [f"key-{i}" for i in range(5000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+
+
+def test_bloom_filter_false_positive_rate_within_bounds():
+    bloom = BloomFilter(capacity=5000, false_positive_rate=0.01)
+    for i in range(5000):
+        bloom.add(f"key-{i}")
+    false_positives = sum(1 for i in range(20000) if f"other-{i}" in bloom)
+    assert false_positives / 20000 < 0.03
+
+
+def test_filter_normalizes_keys():
+    """Das ERP vergleicht case-insensitiv, der Filter darf daher keine False Negatives liefern."""
+    dup_filter = DuplicateInvoiceFilter()
+    dup_filter.rebuild(_journal(100))
+    assert dup_filter.might_contain("k1", " r-1 ")
+
+
+def test_filter_incremental_sync_overlaps_watermark():
+    dup_filter = DuplicateInvoiceFilter(sync_lag_seconds=300)
+    dup_filter.rebuild(_journal(10))
+
+    # Spät committeter Eintrag mit älterem Zeitstempel und Eintrag ohne ErfasstAm
+    loader = MagicMock(return_value=[("K99", "NEU-1", datetime(2025, 2, 1)), ("K98", "ALT-1", None)])
+    added = dup_filter.sync(loader)
+
+    assert added == 2
+    loader.assert_called_once_with(datetime(2025, 1, 1) - timedelta(seconds=300))
+    assert dup_filter.might_contain("K99", "NEU-1") and dup_filter.might_contain("K98", "ALT-1")
+    assert dup_filter.stats()["watermark"] == datetime(2025, 2, 1).isoformat()
+
+
+def test_filter_sync_rebuilds_periodically():
+    dup_filter = DuplicateInvoiceFilter(rebuild_interval_seconds=0)
+    dup_filter.rebuild(_journal(10))
+
+    loader = MagicMock(return_value=_journal(20))
+    dup_filter.sync(loader)
+
+    loader.assert_called_once_with(None)
+    assert dup_filter.stats()["rebuild_count"] == 2
+
+
+def test_adapter_skips_erp_query_on_filter_negative():
+    dup_filter = DuplicateInvoiceFilter()
+    dup_filter.rebuild(_journal(100))
+    session = MagicMock()
+    adapter = MSSQL_ERPAdapter(db_session=session, duplicate_filter=dup_filter)
+
+    assert adapter.is_duplicate_invoice("K1", "UNBEKANNT-1") is False
+    session.execute.assert_not_called()
+
+
+def test_adapter_confirms_possible_hit_against_erp():
+    dup_filter = DuplicateInvoiceFilter()
+    dup_filter.rebuild(_journal(100))
+    session = MagicMock()
+    session.execute.return_value.scalar.return_value = 1
+    adapter = MSSQL_ERPAdapter(db_session=session, duplicate_filter=dup_filter)
+
+    assert adapter.is_duplicate_invoice("K1", "R-1") is True
+    session.execute.assert_called_once()
+    assert dup_filter.stats()["confirmed_hits"] == 1
+
+
+def test_adapter_queries_erp_when_filter_not_ready():
+    session = MagicMock()
+    session.execute.return_value.scalar.return_value = 0
+    adapter = MSSQL_ERPAdapter(db_session=session, duplicate_filter=DuplicateInvoiceFilter())
+
+    assert adapter.is_duplicate_invoice("K1", "R-1") is False
+    session.execute.assert_called_once()
+    # Direkte ERP-Abfrage zählt nicht in die FP-Statistik des Filters
+    stats = adapter.duplicate_filter.stats()
+    assert (stats["lookups"], stats["false_positives"], stats["confirmed_hits"]) == (0, 0, 0)
+
+
+def test_adapter_does_not_count_results_when_filter_sync_fails():
+    """Ein veralteter Filter, dessen Sync scheitert, wird nicht befragt und verfälscht die FP-Rate nicht."""
+    from sqlalchemy.exc import OperationalError
+
+    dup_filter = DuplicateInvoiceFilter(max_staleness_seconds=0)
+    dup_filter.rebuild(_journal(100))
+    dup_filter._last_sync_monotonic -= 10
+    session = MagicMock()
+    count_result = MagicMock()
+    count_result.scalar.return_value = 0
+    session.execute.side_effect = [OperationalError("SELECT", {}, Exception("timeout")), count_result]
+    adapter = MSSQL_ERPAdapter(db_session=session, duplicate_filter=dup_filter)
+
+    assert adapter.is_duplicate_invoice("K1", "R-1") is False
+    stats = dup_filter.stats()
+    assert (stats["lookups"], stats["false_positives"], stats["confirmed_hits"]) == (0, 0, 0)
@@ -0,0 +1,130 @@
+# tests/unit/erp/test_resilience.py
+import pytest
+from unittest.mock import MagicMock
+from sqlalchemy.exc import OperationalError
+
+from decimal import Decimal
+
+from src.services.erp.interface import IERPAdapter, ERPVendor, ERPPurchaseOrder
+from src.services.erp.resilience import (
+    LocalStateStore, ERPCircuitBreaker, AdaptiveConcurrencyLimiter, ERPGuard, ResilientERPAdapter, ERPUnavailableError
+)
+
+
+@pytest.fixture
+def store():
+    return LocalStateStore()
+
+
+@pytest.fixture
+def guard(store):
+    return ERPGuard(
+        breaker=ERPCircuitBreaker(store, failure_threshold=3, failure_window_seconds=60, open_seconds=30),
+        limiter=AdaptiveConcurrencyLimiter(store, initial_limit=4, min_limit=1, max_limit=8, latency_target_seconds=0.5, acquire_timeout_seconds=0),
+        slow_call_seconds=5.0,
+    )
+
+
+def _erp_down():
+    return OperationalError("SELECT 1", {}, Exception("Login timeout expired"))
+
+
+def test_circuit_opens_after_threshold_and_allows_single_probe(store, guard):
+    for _ in range(3):
+        with pytest.raises(ERPUnavailableError):
+            with guard.call("test"):
+                raise _erp_down()
+
+    assert guard.breaker.state() == ERPCircuitBreaker.OPEN
+    with pytest.raises(ERPUnavailableError) as exc_info:
+        guard.breaker.before_call()
+    assert exc_info.value.retry_after > 0
+
+    # Open-Phase abgelaufen -> HALF_OPEN: genau ein Probe-Aufruf
+    store.delete("iiev:erp:circuit:open")
+    assert guard.breaker.before_call() is True
+    with pytest.raises(ERPUnavailableError):
+        guard.breaker.before_call()
+
+    guard.breaker.record_success(is_probe=True)
+    assert guard.breaker.state() == ERPCircuitBreaker.CLOSED
+
+
+def test_failed_probe_reopens_circuit(store, guard):
+    guard.breaker._open("test")
+    store.delete("iiev:erp:circuit:open")
+
+    with pytest.raises(ERPUnavailableError):
+        with guard.call("probe"):
+            raise _erp_down()
+
+    assert guard.breaker.state() == ERPCircuitBreaker.OPEN
+
+
+def test_non_transient_errors_do_not_trip_circuit(guard):
+    for _ in range(5):
+        with pytest.raises(ValueError):
+            with guard.call("test"):
+                raise ValueError("Programmierfehler")
+    assert guard.breaker.state() == ERPCircuitBreaker.CLOSED
+
+
+def test_limiter_aimd(store):
+    limiter = AdaptiveConcurrencyLimiter(store, initial_limit=4, min_limit=1, max_limit=8, latency_target_seconds=0.5, decrease_cooldown_seconds=60)
+
+    token = limiter.acquire()
+    limiter.release(token, latency_seconds=0.1, success=True)
+    assert limiter.limit() == pytest.approx(4.25)
+
+    # Langsame Aufrufe: multiplikative Reduktion, höchstens einmal pro Cooldown
+    limiter.release(limiter.acquire(), latency_seconds=2.0, success=True)
+    limiter.release(limiter.acquire(), latency_seconds=2.0, success=True)
+    assert limiter.limit() == pytest.approx(4.25 * 0.7)
+
+
+def test_limiter_rejects_when_saturated(store):
+    limiter = AdaptiveConcurrencyLimiter(store, initial_limit=2, acquire_timeout_seconds=0)
+    limiter.acquire()
+    limiter.acquire()
+    assert limiter.in_flight() == 2
+    with pytest.raises(ERPUnavailableError):
+        limiter.acquire()
+
+
+def test_resilient_adapter_passes_through_and_converts_errors(guard):
+    inner = MagicMock(spec=IERPAdapter)
+    inner.find_vendor_by_vat_id.return_value = ERPVendor(vendor_id="K1", vat_id="DE123456789", is_active=True)
+    inner.get_vendor_bank_details.side_effect = _erp_down()
+    adapter = ResilientERPAdapter(inner, guard)
+
+    assert adapter.find_vendor_by_vat_id("DE123456789").vendor_id == "K1"
+    with pytest.raises(ERPUnavailableError):
+        adapter.get_vendor_bank_details("K1")
+    assert guard.limiter.in_flight() == 0
+
+
+def test_resilient_adapter_guards_lazy_po_line_loading(guard):
+    erp_po = ERPPurchaseOrder(po_number="PO-1", vendor_id="K1", total_net_amount=Decimal("100"), is_open_for_invoicing=True)
+    erp_po.set_line_loader(MagicMock(side_effect=_erp_down()))
+    inner = MagicMock(spec=IERPAdapter)
+    inner.get_purchase_order_details.return_value = erp_po
+
+    po = ResilientERPAdapter(inner, guard).get_purchase_order_details("PO-1", "K1")
+
+    # Fehler beim Nachladen zählen für den Circuit Breaker
+    with pytest.raises(ERPUnavailableError):
+        po.get_line("4000000000001")
+    assert guard.limiter.in_flight() == 0
+
+
+def test_default_guard_is_created_lazily(mocker):
+    from src.services.erp import resilience
+
+    mocker.patch.object(resilience, "_erp_guard", None)
+    factory = mocker.patch.object(resilience, "_create_default_guard", return_value=MagicMock(spec=ERPGuard))
+
+    adapter = ResilientERPAdapter(MagicMock(spec=IERPAdapter))
+
+    factory.assert_called_once()
+    assert adapter.guard is resilience.get_erp_guard()
+    factory.assert_called_once()
@@ -0,0 +1,54 @@
+# tests/unit/erp/test_sqlite_adapter.py
+import pytest
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from src.services.erp.sqlite_adapter import SQLiteERPAdapter, create_sqlite_erp_engine, create_erp_schema
+
+
+@pytest.fixture
+def erp_adapter():
+    engine = create_sqlite_erp_engine()
+    create_erp_schema(engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO dbo.KreditorenStamm (KreditorID, UStIdNr, Status) VALUES ('K1', 'DE123456789', 'Aktiv'), ('K2', 'DE987654321', 'Gesperrt')"))
+        conn.execute(text("INSERT INTO dbo.KreditorenBanken (KreditorID, IBAN) VALUES ('K1', 'DE89370400440532013000')"))
+        conn.execute(text("INSERT INTO dbo.RechnungsJournal (KreditorID, ExterneRechnungsNr, ErfasstAm) VALUES ('K1', 'RE-1', '2025-01-01 10:00:00'), ('K1', 'RE-2', '2025-02-01 10:00:00')"))
+        conn.execute(text("INSERT INTO dbo.Bestellungen (BestellNr, KreditorID, GesamtbetragNetto, Status) VALUES ('PO-1', 'K1', 150.5, 'Offen')"))
+        conn.execute(text("INSERT INTO dbo.BestellPositionen (BestellNr, PositionNr, ArtikelHAN, MengeBestellt, MengeBerechnet) VALUES ('PO-1', 1, 'HAN-A', 5, 1), ('PO-1', 2, 'HAN-A', 3, 0), ('PO-1', 3, 'HAN-B', 2, 0)"))
+
+    with Session(engine) as session:
+        yield SQLiteERPAdapter(session)
+    engine.dispose()
+
+
+def test_vendor_lookup_and_bank_details(erp_adapter):
+    vendor = erp_adapter.find_vendor_by_vat_id("DE123456789")
+    assert vendor.vendor_id == "K1" and vendor.is_active
+    assert not erp_adapter.find_vendor_by_vat_id("DE987654321").is_active
+    assert erp_adapter.find_vendor_by_vat_id("DE000000000") is None
+    assert [b.iban for b in erp_adapter.get_vendor_bank_details("K1")] == ["DE89370400440532013000"]
+
+
+def test_duplicate_check_is_case_insensitive(erp_adapter):
+    """Wie die MSSQL Standard-Collation."""
+    assert erp_adapter.is_duplicate_invoice("K1", "re-1")
+    assert not erp_adapter.is_duplicate_invoice("K1", "RE-3")
+
+
+def test_purchase_order_lines_are_aggregated_per_han(erp_adapter):
+    po = erp_adapter.get_purchase_order_details("PO-1", "K1", ["HAN-A"])
+
+    assert po.total_net_amount == Decimal("150.5")
+    assert list(po.lines) == ["HAN-A"]
+    assert po.lines["HAN-A"].quantity_open == Decimal("7")
+    # Nicht angefragte Position wird bei Bedarf nachgeladen
+    assert po.get_line("HAN-B").quantity_ordered == Decimal("2")
+    assert erp_adapter.get_purchase_order_details("PO-1", "K2", ["HAN-A"]) is None
+
+
+def test_journal_keys_are_returned_as_datetime(erp_adapter):
+    keys = list(erp_adapter.get_journal_keys(since=datetime(2025, 1, 15)))
+    assert keys == [("K1", "RE-2", datetime(2025, 2, 1, 10, 0))]
@@ -0,0 +1,97 @@
+# tests/unit/statistics/test_statistics.py
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from src.db.models import InvoiceTransaction, InvoiceFormat, TransactionStatus
+from src.services.statistics import (
+    estimate_percentile, floor_hour, query_live_stats, query_rollup_stats, refresh_hourly_rollups, summarize
+)
+
+
+@pytest.fixture
+def transactions(sqlite_metadata_session):
+    db = sqlite_metadata_session
+    now = datetime.now()
+    rows = []
+    # 100 UBL Rechnungen mit 0.01s .. 1.00s, zwei davon INVALID
+    for i in range(100):
+        rows.append(InvoiceTransaction(
+            id=uuid.uuid4(), created_at=now - timedelta(minutes=5),
+            status=TransactionStatus.INVALID if i < 2 else TransactionStatus.VALID,
+            format_detected=InvoiceFormat.XRECHNUNG_UBL, processing_time_seconds=(i + 1) / 100,
+        ))
+    rows.append(InvoiceTransaction(id=uuid.uuid4(), created_at=now - timedelta(minutes=5), status=TransactionStatus.RECEIVED))
+    # Älter als zwei Stunden: nur im 24h-Zeitraum enthalten
+    rows.append(InvoiceTransaction(
+        id=uuid.uuid4(), created_at=now - timedelta(hours=3), status=TransactionStatus.ERROR,
+        format_detected=InvoiceFormat.ZUGFERD_CII, processing_time_seconds=12,
+    ))
+    db.add_all(rows)
+    db.commit()
+    return now
+
+
+def test_live_stats_use_single_grouped_query(sqlite_metadata_session, transactions):
+    db = sqlite_metadata_session
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    stats = summarize(query_live_stats(db, transactions - timedelta(hours=1)))
+
+    assert len(statements) == 1
+    assert stats["overview"]["total_transactions"] == 101
+    assert stats["overview"]["error_rate_percent"] == pytest.approx(1.98)
+    assert stats["status_distribution"]["RECEIVED"] == 1
+    assert stats["format_distribution"] == {"XRECHNUNG_UBL": 100}
+    percentiles = stats["processing_time_percentiles"]["XRECHNUNG_UBL"]
+    assert percentiles["count"] == 100
+    # Genauigkeit: Bucket-Breite (0.5 .. 0.75 bzw. 0.75 .. 1)
+    assert 0.4 <= percentiles["p50"] <= 0.6
+    assert 0.9 <= percentiles["p95"] <= 1.0
+
+
+def test_rollups_match_live_stats(sqlite_metadata_session, transactions):
+    db = sqlite_metadata_session
+    refresh_hourly_rollups(db, hours=6, now=transactions)
+    # Idempotent: zweiter Lauf ersetzt die Zeilen
+    refresh_hourly_rollups(db, hours=6, now=transactions)
+    db.commit()
+
+    start = floor_hour(transactions - timedelta(hours=6))
+    assert summarize(query_rollup_stats(db, start)) == summarize(query_live_stats(db, start))
+    assert summarize(query_rollup_stats(db, start))["overview"]["total_transactions"] == 102
+
+
+def test_refresh_recomputes_aged_out_bucket_of_late_finalized_transaction(sqlite_metadata_session):
+    """Eine geparkte Rechnung, die erst nach Verlassen des Refresh-Fensters abgeschlossen wird, landet im Rollup."""
+    db = sqlite_metadata_session
+    now = datetime.now()
+    parked = InvoiceTransaction(
+        id=uuid.uuid4(), created_at=now - timedelta(hours=5), updated_at=now - timedelta(hours=5),
+        status=TransactionStatus.AWAITING_ERP, format_detected=InvoiceFormat.XRECHNUNG_UBL,
+    )
+    db.add(parked)
+    db.commit()
+    refresh_hourly_rollups(db, hours=6, now=now)
+    db.commit()
+
+    # Abschluss später; die Stunde der Rechnung liegt längst außerhalb des 2h-Fensters
+    later = now + timedelta(minutes=30)
+    parked.status = TransactionStatus.VALID
+    parked.updated_at = later
+    db.commit()
+    refresh_hourly_rollups(db, hours=2, now=later)
+    db.commit()
+
+    stats = summarize(query_rollup_stats(db, now - timedelta(hours=6)))
+    assert stats["status_distribution"]["VALID"] == 1
+    assert stats["status_distribution"]["AWAITING_ERP"] == 0
+
+
+def test_estimate_percentile_overflow_bucket():
+    assert estimate_percentile({}, 0.5) is None
+    assert estimate_percentile({-1: 5}, 0.5) is None
+    assert estimate_percentile({100: 3}, 0.99) == 600.0
@@ -0,0 +1,77 @@
+# tests/unit/storage/test_blob_cache.py
+import os
+import time
+from unittest.mock import MagicMock
+
+from azure.core.exceptions import ResourceNotModifiedError
+
+from src.services.blob_cache import BlobDiskCache
+from src.services.storage_service_sync import SyncStorageService
+
+URI = "https://acc.blob.core.windows.net/invoices-raw/tx-1/rechnung.pdf"
+
+
+def _service_with_cache(cache, blob_name="tx-1/rechnung.pdf"):
+    service = SyncStorageService.__new__(SyncStorageService)
+    service.blob_cache = cache
+    blob_client = MagicMock(blob_name=blob_name)
+    service._get_blob_client_from_uri = MagicMock(return_value=blob_client)
+    return service, blob_client
+
+
+def _stream(data, etag):
+    return MagicMock(readall=MagicMock(return_value=data), properties=MagicMock(etag=etag))
+
+
+def _not_modified():
+    error = ResourceNotModifiedError(message="Not Modified")
+    error.status_code = 304
+    return error
+
+
+def test_retry_is_served_from_cache_after_not_modified(tmp_path):
+    cache = BlobDiskCache(str(tmp_path), max_bytes=1024 * 1024)
+    service, blob_client = _service_with_cache(cache)
+    blob_client.download_blob.side_effect = [_stream(b"%PDF-1.7 v1", '"0x1"'), _not_modified()]
+
+    assert service.download_blob_by_uri(URI) == b"%PDF-1.7 v1"
+    # Retry: bedingter GET mit dem gecachten ETag, 304 -> Inhalt von der Platte
+    assert service.download_blob_by_uri(URI) == b"%PDF-1.7 v1"
+    assert blob_client.download_blob.call_args.kwargs["etag"] == '"0x1"'
+    assert cache.stats()["hits"] == 1
+
+    # Geänderter Blob ersetzt die alte Version
+    blob_client.download_blob.side_effect = [_stream(b"%PDF-1.7 v2", '"0x2"')]
+    assert service.download_blob_by_uri(URI) == b"%PDF-1.7 v2"
+    assert cache.cached_etag(URI) == '"0x2"'
+    assert len(os.listdir(cache._entry_dir(URI))) == 1
+
+
+def test_cas_blobs_are_served_without_storage_roundtrip(tmp_path):
+    cache = BlobDiskCache(str(tmp_path), max_bytes=1024 * 1024)
+    service, blob_client = _service_with_cache(cache, blob_name="sha256/abc")
+    blob_client.download_blob.return_value = _stream(b"<Invoice/>", '"0x1"')
+
+    service.download_blob_by_uri(URI)
+    service.download_blob_by_uri(URI)
+
+    blob_client.download_blob.assert_called_once()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = BlobDiskCache(str(tmp_path), max_bytes=250)
+    cache.put(f"{URI}?0", '"0x1"', b"x" * 100)
+    time.sleep(0.01)
+    cache.put(f"{URI}?1", '"0x1"', b"x" * 100)
+    time.sleep(0.01)
+    # Zugriff auf Eintrag 0 macht Eintrag 1 zum ältesten
+    assert cache.get(f"{URI}?0", '"0x1"') is not None
+    time.sleep(0.01)
+    cache.put(f"{URI}?2", '"0x1"', b"x" * 100)
+
+    assert cache.cached_etag(f"{URI}?1") is None
+    assert cache.cached_etag(f"{URI}?0") == '"0x1"'
+    assert cache.stats()["evictions"] == 1
+    # Größer als der gesamte Cache: wird nicht gespeichert
+    cache.put(f"{URI}?big", '"0x1"', b"x" * 300)
+    assert cache.cached_etag(f"{URI}?big") is None
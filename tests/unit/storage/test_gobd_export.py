@@ -0,0 +1,115 @@
+# tests/unit/storage/test_gobd_export.py
+import hashlib
+import io
+import json
+import tarfile
+import uuid
+import zipfile
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from src.db.archive import archive_batch
+from src.db.models import InvoiceTransaction, TransactionStatus
+from src.services.gobd_export import ExportFilter, select_export_transactions, write_export_archive
+
+PDF = b"%PDF-1.7 Rechnung"
+XML = b"<Invoice/>"
+
+
+class FakeStorage:
+    raw_container_name = "invoices-raw"
+    processed_container_name = "invoices-processed"
+
+    def __init__(self, blobs):
+        # {(container, blob_name): (data, content_hash Metadaten)}
+        self.blobs = blobs
+
+    def list_blobs_by_prefix(self, container, prefix):
+        return [
+            SimpleNamespace(name=name, metadata={"content_hash": content_hash} if content_hash else {})
+            for (blob_container, name), (_, content_hash) in sorted(self.blobs.items())
+            if blob_container == container and name.startswith(prefix)
+        ]
+
+    def parse_uri(self, uri):
+        container, blob_name = uri.split("/", 1)
+        return container, blob_name
+
+    def download_blob_decoded(self, container, blob_name):
+        if (container, blob_name) not in self.blobs:
+            raise FileNotFoundError(blob_name)
+        return self.blobs[(container, blob_name)][0]
+
+
+def _transaction(db, status, created_at, vendor, **kwargs):
+    transaction = InvoiceTransaction(id=uuid.uuid4(), status=status, created_at=created_at, erp_vendor_id=vendor, **kwargs)
+    db.add(transaction)
+    return transaction
+
+
+def test_export_filter_includes_archived_transactions(sqlite_metadata_session):
+    db = sqlite_metadata_session
+    now = datetime.now()
+    old_id = _transaction(db, TransactionStatus.VALID, now - timedelta(days=400), "K-1").id
+    _transaction(db, TransactionStatus.VALID, now - timedelta(days=5), "K-1")
+    _transaction(db, TransactionStatus.VALID, now - timedelta(days=5), "K-2")
+    _transaction(db, TransactionStatus.ERROR, now - timedelta(days=5), "K-1")
+    db.commit()
+    archive_batch(db, now - timedelta(days=180), batch_size=10)
+    db.commit()
+
+    export_filter = ExportFilter(created_from=now - timedelta(days=500), vendor="K-1", statuses=[TransactionStatus.VALID])
+    selected = select_export_transactions(db, export_filter)
+    assert len(selected) == 2
+    assert old_id in {row["id"] for row in selected}
+
+    export_filter.include_archive = False
+    assert len(select_export_transactions(db, export_filter)) == 1
+
+
+@pytest.mark.parametrize("archive_format", ["zip", "tar"])
+def test_export_archive_contains_files_and_hash_manifest(archive_format):
+    cas_id, tx_id = str(uuid.uuid4()), str(uuid.uuid4())
+    pdf_hash = hashlib.sha256(PDF).hexdigest()
+    storage = FakeStorage({
+        ("invoices-raw", f"{tx_id}/rechnung.pdf"): (PDF, pdf_hash),
+        ("invoices-processed", f"{tx_id}/processed.xml"): (XML, "falscher-hash"),
+        ("invoices-processed", f"{tx_id}/validation_report.json.gz"): (b'{"summary": {}}', None),
+        ("invoices-raw", f"{cas_id}/manifest.json"): (b"{}", None),
+        ("invoices-raw", f"sha256/{pdf_hash}"): (PDF, pdf_hash),
+    })
+    transactions = [
+        {"id": tx_id, "status": TransactionStatus.VALID, "original_filename": "rechnung.pdf", "content_hash": pdf_hash,
+         "storage_uri_raw": f"invoices-raw/{tx_id}/rechnung.pdf", "validation_report": {"offloaded": {"uri": "x"}},
+         "invoice_number": "R-1", "erp_vendor_id": "K-1", "seller_vat_id": None, "seller_name": None, "created_at": None},
+        # CAS-Layout, Bericht inline, processed.xml fehlt
+        {"id": cas_id, "status": TransactionStatus.INVALID, "original_filename": "a.pdf", "content_hash": pdf_hash,
+         "storage_uri_raw": f"invoices-raw/sha256/{pdf_hash}", "validation_report": {"summary": {"errors": 1}},
+         "invoice_number": "R-2", "erp_vendor_id": "K-1", "seller_vat_id": None, "seller_name": None, "created_at": None},
+    ]
+
+    output = io.BytesIO()
+    stats = write_export_archive(storage, transactions, output, archive_format, max_workers=4, export_filter=ExportFilter())
+
+    output.seek(0)
+    if archive_format == "zip":
+        with zipfile.ZipFile(output) as archive:
+            files = {name: archive.read(name) for name in archive.namelist()}
+    else:
+        with tarfile.open(fileobj=output, mode="r:gz") as archive:
+            files = {member.name: archive.extractfile(member).read() for member in archive.getmembers()}
+
+    assert files[f"{tx_id}/raw/rechnung.pdf"] == PDF
+    assert files[f"{tx_id}/processed/validation_report.json"] == b'{"summary": {}}'
+    assert files[f"{cas_id}/raw/a.pdf"] == PDF
+    assert json.loads(files[f"{cas_id}/validation_report.json"]) == {"summary": {"errors": 1}}
+    assert (stats.files, stats.missing, stats.hash_mismatches) == (6, 0, 1)
+
+    manifest = json.loads(files["manifest.json"])
+    assert manifest["summary"]["files"] == 6
+    records = {record["path"]: record for entry in manifest["transactions"] for record in entry["files"]}
+    assert records[f"{tx_id}/raw/rechnung.pdf"]["hash_verified"] is True
+    assert records[f"{tx_id}/processed/processed.xml"]["hash_verified"] is False
+    assert records[f"{cas_id}/raw/a.pdf"]["sha256"] == pdf_hash
@@ -0,0 +1,95 @@
+# tests/unit/storage/test_processed_xml_compression.py
+import gzip
+import hashlib
+from unittest.mock import MagicMock
+
+from azure.core import MatchConditions
+
+from src.core.config import settings
+from src.services.storage_service_sync import SyncStorageService
+from src.tasks.processor import RECOMPRESS_PROGRESS_BLOB, recompress_processed_xml_task
+
+XML = b"<Invoice>" + b"<Line>Position</Line>" * 200 + b"</Invoice>"
+
+
+def _service(blob_client):
+    service = SyncStorageService.__new__(SyncStorageService)
+    service.blob_cache = None
+    service.processed_container_name = settings.blob_container_processed
+    container_client = MagicMock(get_blob_client=MagicMock(return_value=blob_client))
+    service._get_container_client = MagicMock(return_value=container_client)
+    service._get_blob_client_from_uri = MagicMock(return_value=blob_client)
+    return service, container_client
+
+
+def test_processed_xml_is_stored_compressed_and_read_back_transparently(mocker):
+    mocker.patch.object(settings, "processed_xml_compression", "gzip")
+    blob_client = MagicMock()
+    service, _ = _service(blob_client)
+
+    service.upload_processed_xml("tx-1", XML, "ZUGFERD_CII")
+
+    data = blob_client.upload_blob.call_args.args[0]
+    kwargs = blob_client.upload_blob.call_args.kwargs
+    assert kwargs["content_settings"].content_encoding == "gzip"
+    assert kwargs["metadata"]["content_hash"] == hashlib.sha256(XML).hexdigest()
+    assert int(kwargs["metadata"]["compressed_size_bytes"]) == len(data) < len(XML)
+    assert gzip.decompress(data) == XML
+
+    # Download: gestreamte Dekompression anhand des Content-Encoding
+    stream = MagicMock()
+    stream.properties.content_settings.content_encoding = "gzip"
+    stream.chunks.return_value = iter([data[:10], data[10:]])
+    blob_client.download_blob.return_value = stream
+    assert service.download_blob_by_uri("https://acc.blob.core.windows.net/invoices-processed/tx-1/processed.xml") == XML
+    assert blob_client.download_blob.call_args.kwargs["decompress"] is False
+
+
+def test_recompress_page_only_rewrites_unchanged_uncompressed_blobs(mocker):
+    mocker.patch.object(settings, "processed_xml_compression", "gzip")
+    blob_client = MagicMock()
+    stream = MagicMock(readall=MagicMock(return_value=XML))
+    stream.properties.etag = '"0x1"'
+    stream.properties.metadata = {"transaction_id": "tx-1"}
+    blob_client.download_blob.return_value = stream
+    service, container_client = _service(blob_client)
+
+    plain = MagicMock()
+    plain.name = "tx-1/processed.xml"
+    plain.content_settings.content_encoding = None
+    compressed = MagicMock()
+    compressed.name = "tx-2/processed.xml"
+    compressed.content_settings.content_encoding = "gzip"
+    report = MagicMock()
+    report.name = "tx-1/validation_report.json.gz"
+    pager = MagicMock(continuation_token="next")
+    pager.__next__ = MagicMock(return_value=iter([plain, compressed, report]))
+    container_client.list_blobs.return_value.by_page.return_value = pager
+
+    token, counts = service.recompress_processed_page("start", page_size=100, max_workers=2)
+
+    assert token == "next"
+    assert (counts["compressed"], counts["skipped"]) == (1, 1)
+    kwargs = blob_client.upload_blob.call_args.kwargs
+    assert kwargs["etag"] == '"0x1"' and kwargs["match_condition"] == MatchConditions.IfNotModified
+    assert kwargs["metadata"]["transaction_id"] == "tx-1"
+
+
+def test_recompress_task_resumes_from_saved_progress(mocker):
+    mocker.patch.object(settings, "processed_xml_compression", "gzip")
+    storage = mocker.patch("src.tasks.processor.sync_storage_service")
+    storage.read_json_blob.return_value = {
+        "continuation_token": "t1", "completed": False,
+        "totals": {"compressed": 5, "skipped": 0, "changed": 0, "failed": 0, "bytes_before": 50, "bytes_after": 5},
+    }
+    counts = {"compressed": 2, "skipped": 1, "changed": 0, "failed": 0, "bytes_before": 20, "bytes_after": 2}
+    storage.recompress_processed_page.side_effect = [("t2", counts), (None, counts)]
+    reschedule = mocker.patch.object(recompress_processed_xml_task, "apply_async")
+
+    result = recompress_processed_xml_task.run(max_pages=5)
+
+    assert storage.recompress_processed_page.call_args_list[0].args[0] == "t1"
+    assert result["status"] == "completed" and result["compressed"] == 9
+    blob_name, progress = storage.write_json_blob.call_args.args[1:]
+    assert blob_name == RECOMPRESS_PROGRESS_BLOB and progress["completed"] is True
+    reschedule.assert_not_called()
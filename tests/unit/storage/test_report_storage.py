@@ -0,0 +1,56 @@
+# tests/unit/storage/test_report_storage.py
+import uuid
+
+from src.services import report_storage
+from src.schemas.validation_report import ValidationReport, ValidationStep, ValidationError, ValidationCategory, ValidationSeverity
+from src.tasks.processor import _store_validation_report, _load_validation_report
+
+
+def _large_report(transaction_id: str, findings: int = 2000) -> dict:
+    report = ValidationReport(transaction_id=transaction_id)
+    step = ValidationStep(step_name="semantic_validation", step_description="KoSIT Schematron", status="FAILED")
+    step.errors = [
+        ValidationError(
+            category=ValidationCategory.SEMANTIC, severity=ValidationSeverity.ERROR,
+            code="BR-DE-15", message=f"Finding {i}: Das Element 'Buyer reference' muss übermittelt werden.",
+        )
+        for i in range(findings)
+    ]
+    report.add_step(step)
+    return report.model_dump(mode='json')
+
+
+def test_gzip_roundtrip_decompresses_chunkwise():
+    data = report_storage.serialize_report({"errors": ["x" * 50] * 5000})
+    compressed = report_storage.compress(data, report_storage.GZIP)
+    chunks = [compressed[i:i + 1000] for i in range(0, len(compressed), 1000)]
+
+    assert len(compressed) < len(data) / 10
+    assert b"".join(report_storage.iter_decompress(chunks, report_storage.GZIP)) == data
+
+
+def test_large_report_is_offloaded_and_loaded_back(mocker):
+    blobs = {}
+
+    def upload(transaction_id, data, encoding, suffix):
+        uri = f"https://account.blob.core.windows.net/invoices-processed/{transaction_id}/validation_report.{suffix}"
+        blobs[uri] = data
+        return uri
+
+    storage = mocker.patch('src.tasks.processor.sync_storage_service')
+    storage.upload_validation_report.side_effect = upload
+    storage.iter_blob_chunks_by_uri.side_effect = lambda uri: iter([blobs[uri][:100], blobs[uri][100:]])
+
+    transaction_id = str(uuid.uuid4())
+    report_json = _large_report(transaction_id)
+    stored = _store_validation_report(transaction_id, report_json)
+
+    assert stored["summary"] == report_json["summary"]
+    assert "errors" not in stored
+    assert stored["offloaded"]["content_encoding"] == "gzip"
+    assert stored["offloaded"]["compressed_size_bytes"] < stored["offloaded"]["size_bytes"]
+    assert _load_validation_report(stored) == report_json
+
+    # Kleine Berichte bleiben inline
+    small = ValidationReport(transaction_id=transaction_id).model_dump(mode='json')
+    assert _store_validation_report(transaction_id, small) is small
@@ -0,0 +1,80 @@
+# tests/unit/storage/test_storage_service.py
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from src.core.config import settings
+from src.services import storage_service
+from src.services.storage_service import StorageService, close_async_blob_service_client
+
+
+@pytest.mark.asyncio
+async def test_upload_and_download_await_the_async_client(mocker):
+    blob_client = MagicMock()
+    blob_client.url = "http://azurite/devstoreaccount1/invoices-raw/tx-1/rechnung.xml"
+    blob_client.upload_blob = AsyncMock()
+    downloader = MagicMock(readall=AsyncMock(return_value=b"<Invoice/>"))
+    blob_client.download_blob = AsyncMock(return_value=downloader)
+    service_client = MagicMock(get_blob_client=MagicMock(return_value=blob_client), close=AsyncMock())
+
+    service = StorageService(service_client)
+    uri = await service.upload_raw_file("tx-1", "rechnung.xml", b"<Invoice/>", "application/xml")
+    assert uri == blob_client.url
+    kwargs = blob_client.upload_blob.await_args.kwargs
+    assert kwargs["content_settings"].content_type == "application/xml"
+    assert kwargs["metadata"]["file_size_bytes"] == "10"
+
+    assert await service.download_raw_file("tx-1", "rechnung.xml") == b"<Invoice/>"
+
+    # Shutdown schließt den gemeinsamen Client genau einmal
+    mocker.patch.object(storage_service, "_async_blob_client", service_client)
+    await close_async_blob_service_client()
+    await close_async_blob_service_client()
+    service_client.close.assert_awaited_once()
+    assert storage_service._async_blob_client is None
+
+
+def _delegation_key():
+    from azure.storage.blob import UserDelegationKey
+    key = UserDelegationKey()
+    key.signed_oid = key.signed_tid = "00000000-0000-0000-0000-000000000000"
+    key.signed_start, key.signed_expiry = "2026-01-01T00:00:00Z", "2026-01-08T00:00:00Z"
+    key.signed_service, key.signed_version = "b", "2025-01-05"
+    key.value = "a2V5"
+    return key
+
+
+@pytest.mark.asyncio
+async def test_download_urls_reuse_delegation_key_and_cached_sas_tokens(mocker):
+    mocker.patch.object(settings, "environment", "production")
+    storage_service.reset_sas_caches()
+    blob_client = MagicMock()
+    blob_client.url = "https://acc.blob.core.windows.net/invoices-raw/tx-1/rechnung.pdf"
+    service_client = MagicMock(
+        account_name="acc",
+        get_blob_client=MagicMock(return_value=blob_client),
+        get_user_delegation_key=AsyncMock(return_value=_delegation_key()),
+    )
+    service = StorageService(service_client)
+
+    urls = await service.generate_download_urls([("invoices-raw", f"tx-{i}/rechnung.pdf") for i in range(20)])
+    again = await service.generate_download_url("invoices-raw", "tx-0/rechnung.pdf")
+
+    # Ein Key-Abruf für alle Links, gleicher (Container, Blob, Bucket) liefert denselben Token
+    service_client.get_user_delegation_key.assert_awaited_once()
+    assert all("sig=" in url for url in urls)
+    assert again == urls[0]
+    assert len(storage_service._sas_token_cache) == 20
+
+    # Längere Gültigkeit als der gecachte Key: Key wird erneuert
+    await service.generate_download_url("invoices-raw", "tx-0/rechnung.pdf", expiry_hours=48)
+    assert service_client.get_user_delegation_key.await_count == 2
+    storage_service.reset_sas_caches()
+
+
+def test_sas_expiry_is_rounded_up_to_bucket(mocker):
+    mocker.patch.object(settings, "sas_expiry_bucket_minutes", 15)
+    now = datetime(2026, 3, 1, 10, 7, 30)
+    assert storage_service.sas_expiry_bucket(now, 24) == datetime(2026, 3, 2, 10, 15)
+    assert storage_service.sas_expiry_bucket(datetime(2026, 3, 1, 10, 0), 1) == datetime(2026, 3, 1, 11, 0)
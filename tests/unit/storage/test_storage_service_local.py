@@ -0,0 +1,55 @@
+# tests/unit/storage/test_storage_service_local.py
+import os
+
+import pytest
+
+from src.core.config import settings
+from src.services import storage_backend
+from src.services.storage_backend import StorageBackend, create_storage_backend
+from src.services.storage_service_local import LocalFSStorageBackend
+from src.services.storage_service_sync import SyncStorageService
+
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_local_backend_roundtrip(tmp_path, mocker, use_mmap):
+    mocker.patch.object(storage_backend.settings, "storage_backend", "local")
+    mocker.patch.object(settings, "local_storage_root", str(tmp_path))
+    mocker.patch.object(settings, "local_storage_mmap_reads", use_mmap)
+    backend = create_storage_backend()
+    assert isinstance(backend, LocalFSStorageBackend)
+    assert isinstance(backend, StorageBackend)
+
+    upload = backend.upload_raw_bytes("tx-1", "rechnung.pdf", b"%PDF-1.7", "application/pdf", source="EMAIL")
+    assert upload.uri.startswith("file://")
+    assert backend.download_blob_by_uri(upload.uri) == b"%PDF-1.7"
+
+    xml_uri = backend.upload_processed_xml("tx-1", b"<Invoice/>", "XRECHNUNG_UBL")
+    # processed.xml liegt komprimiert, der Download dekodiert transparent
+    assert b"".join(backend.iter_blob_chunks_by_uri(xml_uri)).startswith(b"\x1f\x8b")
+    assert backend.download_blob_by_uri(xml_uri) == b"<Invoice/>"
+    # Atomare Writes: keine Temp-Dateien bleiben zurück
+    assert not [name for _, _, files in os.walk(tmp_path) for name in files if name.startswith(".tmp-")]
+
+    with pytest.raises(FileNotFoundError):
+        backend.download_blob_by_uri((tmp_path / "invoices-raw" / "fehlt.pdf").as_uri())
+
+
+def test_local_backend_content_addressed_and_confined_to_root(tmp_path, mocker):
+    mocker.patch.object(settings, "raw_storage_layout", "cas")
+    backend = LocalFSStorageBackend(str(tmp_path))
+
+    first = backend.upload_raw_bytes("tx-1", "a.pdf", b"%PDF", "application/pdf", source="API")
+    second = backend.upload_raw_bytes("tx-2", "b.pdf", b"%PDF", "application/pdf", source="EMAIL")
+    assert first.uri == second.uri and not first.deduplicated and second.deduplicated
+    assert (tmp_path / settings.blob_container_raw / "tx-2" / "manifest.json").exists()
+
+    # Im Transaktions-Layout bestimmt der (E-Mail) Dateiname den Pfad
+    mocker.patch.object(settings, "raw_storage_layout", "transaction")
+    with pytest.raises(ValueError):
+        backend.upload_raw_bytes("tx-3", "../../../etc/passwd", b"x", "application/pdf", source="EMAIL")
+    with pytest.raises(ValueError):
+        backend.download_blob_by_uri("file:///etc/passwd")
+
+
+def test_azure_service_implements_protocol():
+    assert issubclass(SyncStorageService, StorageBackend)
@@ -0,0 +1,39 @@
+# tests/unit/storage/test_storage_service_sync.py
+import pytest
+
+from src.core.config import settings
+from src.services.storage_service_sync import SyncStorageService, parse_blob_uri
+
+
+@pytest.mark.parametrize("uri, expected", [
+    ("https://acc.blob.core.windows.net/invoices-raw/tx-1/rechnung.pdf", ("invoices-raw", "tx-1/rechnung.pdf")),
+    # Azurite: Account als erstes Pfadsegment, Blob Name URL-kodiert
+    ("http://127.0.0.1:10000/acc/invoices-raw/tx-1/Rechnung%20M%C3%A4rz.pdf", ("invoices-raw", "tx-1/Rechnung März.pdf")),
+])
+def test_parse_blob_uri(uri, expected):
+    assert parse_blob_uri(uri, "acc") == expected
+
+    with pytest.raises(ValueError):
+        parse_blob_uri("https://acc.blob.core.windows.net/invoices-raw", "acc")
+
+
+def test_blob_clients_share_one_transport(mocker):
+    mocker.patch.object(
+        settings, "azure_storage_connection_string",
+        "DefaultEndpointsProtocol=https;AccountName=acc;AccountKey=dGVzdGtleQ==;EndpointSuffix=core.windows.net",
+    )
+    service = SyncStorageService()
+    shared = service.blob_service_client._pipeline._transport
+
+    first = service._get_blob_client_from_uri("https://acc.blob.core.windows.net/invoices-raw/a/1.xml")
+    second = service._get_blob_client_from_uri("https://acc.blob.core.windows.net/invoices-raw/b/2.xml")
+    assert (first.container_name, first.blob_name) == ("invoices-raw", "a/1.xml")
+    assert service._get_container_client("invoices-raw") is service._get_container_client("invoices-raw")
+
+    for client in (first, second):
+        transport = client._pipeline._transport
+        while hasattr(transport, "_transport"):
+            transport = transport._transport
+        assert transport is shared
+    adapter = shared.session.get_adapter("https://acc.blob.core.windows.net")
+    assert adapter._pool_maxsize == settings.azure_storage_pool_maxsize
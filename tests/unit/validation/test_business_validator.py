@@ -0,0 +1,116 @@
+# tests/unit/validation/test_business_validator.py
+import asyncio
+import pytest
+from decimal import Decimal
+from unittest.mock import MagicMock
+
+from src.services.validation.business_validator import validate_business_rules, validate_business_rules_async
+from src.services.erp.interface import IERPAdapter, AsyncIERPAdapter, ERPVendor, ERPBankDetails, ERPPurchaseOrder, ERPPurchaseOrderLine
+from src.schemas.canonical_model import DocumentReference, BankDetails
+
+# Wir nutzen die base_canonical_invoice Fixture aus conftest.py
+
+
+@pytest.fixture
+def invoice_with_po(base_canonical_invoice):
+    base_canonical_invoice.lines[0].item_identifier = "4000000000001"
+    return base_canonical_invoice.model_copy(update={
+        "purchase_order_reference": DocumentReference(document_id="PO-1")
+    })
+
+
+@pytest.fixture
+def erp_adapter():
+    adapter = MagicMock(spec=IERPAdapter)
+    adapter.find_vendor_by_vat_id.return_value = ERPVendor(vendor_id="K1", vat_id="DE123456789", is_active=True)
+    adapter.is_duplicate_invoice.return_value = False
+    adapter.get_vendor_bank_details.return_value = []
+    return adapter
+
+
+def _purchase_order(lines) -> ERPPurchaseOrder:
+    return ERPPurchaseOrder(po_number="PO-1", vendor_id="K1", total_net_amount=Decimal("100.00"), is_open_for_invoicing=True, lines=lines)
+
+
+def test_po_fetch_requests_only_invoice_items(invoice_with_po, erp_adapter):
+    """Der Adapter erhält nur die HANs der Rechnungspositionen."""
+    erp_adapter.get_purchase_order_details.return_value = _purchase_order({
+        "4000000000001": ERPPurchaseOrderLine(han_ean_gtin="4000000000001", quantity_ordered=Decimal("5"), quantity_invoiced=Decimal("0"))
+    })
+
+    errors = validate_business_rules(invoice_with_po, erp_adapter)
+
+    assert errors == []
+    erp_adapter.get_purchase_order_details.assert_called_once_with("PO-1", "K1", {"4000000000001"})
+
+
+def test_po_line_is_loaded_lazily(invoice_with_po, erp_adapter):
+    """Nicht vorab geladene Positionen werden über den Line-Loader nachgeladen."""
+    erp_po = _purchase_order({})
+    loader = MagicMock(return_value={
+        "4000000000001": ERPPurchaseOrderLine(han_ean_gtin="4000000000001", quantity_ordered=Decimal("1"), quantity_invoiced=Decimal("1"))
+    })
+    erp_po.set_line_loader(loader)
+    erp_adapter.get_purchase_order_details.return_value = erp_po
+
+    errors = validate_business_rules(invoice_with_po, erp_adapter)
+
+    loader.assert_called_once_with(["4000000000001"])
+    assert any(e.code == "ERP_PO_LINE_QUANTITY_EXCEEDED" for e in errors)
+
+
+def test_po_line_known_absent_skips_loader(invoice_with_po, erp_adapter):
+    erp_po = _purchase_order({})
+    loader = MagicMock(return_value={})
+    erp_po.set_line_loader(loader, absent_hans={"4000000000001"})
+    erp_adapter.get_purchase_order_details.return_value = erp_po
+
+    errors = validate_business_rules(invoice_with_po, erp_adapter)
+
+    loader.assert_not_called()
+    assert any(e.code == "ERP_PO_LINE_ITEM_NOT_FOUND" for e in errors)
+
+
+class _SlowAsyncERPAdapter(AsyncIERPAdapter):
+    """Fake Adapter, der die Anzahl gleichzeitig laufender Abfragen protokolliert."""
+
+    def __init__(self, purchase_order: ERPPurchaseOrder):
+        self.purchase_order = purchase_order
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def _simulate_query(self):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+
+    async def find_vendor_by_vat_id(self, vat_id):
+        await self._simulate_query()
+        return ERPVendor(vendor_id="K1", vat_id=vat_id, is_active=True)
+
+    async def is_duplicate_invoice(self, vendor_id, invoice_number):
+        await self._simulate_query()
+        return False
+
+    async def get_vendor_bank_details(self, vendor_id):
+        await self._simulate_query()
+        return [ERPBankDetails(iban="DE89370400440532013000")]
+
+    async def get_purchase_order_details(self, po_number, vendor_id, item_identifiers=None):
+        await self._simulate_query()
+        return self.purchase_order
+
+
+def test_async_validation_fetches_bank_and_po_concurrently(invoice_with_po):
+    invoice = invoice_with_po.model_copy(update={
+        "payment_details": [BankDetails(iban="DE02120300000000202051")]
+    })
+    adapter = _SlowAsyncERPAdapter(_purchase_order({
+        "4000000000001": ERPPurchaseOrderLine(han_ean_gtin="4000000000001", quantity_ordered=Decimal("5"), quantity_invoiced=Decimal("0"))
+    }))
+
+    errors = asyncio.run(validate_business_rules_async(invoice, adapter))
+
+    assert adapter.max_in_flight == 2
+    assert [e.code for e in errors] == ["ERP_BANK_DETAILS_MISMATCH"]